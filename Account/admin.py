@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
 
-#  Copyright (c) 2019-2024 Ramon van der Winkel.
+#  Copyright (c) 2019-2026 Ramon van der Winkel.
 #  All rights reserved.
 #  Licensed under BSD-3-Clause-Clear. See LICENSE file for details.
 
@@ -19,7 +19,7 @@ class AccountAdmin(UserAdmin):
 
     # velden die niet gewijzigd mogen worden via de admin interface
     readonly_fields = ('is_staff', 'is_superuser', 'gekoppelde_functies', 'otp_controle_gelukt_op',
-                       'date_joined', 'last_login', 'laatste_inlog_poging')
+                       'date_joined', 'last_login', 'laatste_inlog_poging', 'rechten_versie')
 
     # volgorde van de te tonen velden
     fieldsets = (
@@ -28,7 +28,8 @@ class AccountAdmin(UserAdmin):
         (_('Email'), {'fields': ('email_is_bevestigd', 'bevestigde_email', 'nieuwe_email',
                                  'optout_nieuwe_taak', 'optout_herinnering_taken', 'laatste_email_over_taken')}),
         (_('Permissions'), {'fields': ('is_active', 'is_gast', 'is_BB',
-                                       'scheids', 'gekoppelde_functies', 'is_staff', 'is_superuser')}),
+                                       'scheids', 'gekoppelde_functies', 'is_staff', 'is_superuser',
+                                       'rechten_versie')}),
         (_('Beveiliging'), {'fields': ('password',
                                        'vraag_nieuw_wachtwoord', 'verkeerd_wachtwoord_teller',
                                        'is_geblokkeerd_tot',
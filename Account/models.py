@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
 
-#  Copyright (c) 2019-2025 Ramon van der Winkel.
+#  Copyright (c) 2019-2026 Ramon van der Winkel.
 #  All rights reserved.
 #  Licensed under BSD-3-Clause-Clear. See LICENSE file for details.
 
@@ -70,6 +70,10 @@ class Account(AbstractUser):
 
     scheids = models.CharField(max_length=2, choices=SCHEIDS_CHOICES, default=SCHEIDS_NIET, blank=True)
 
+    # wordt verhoogd als de rechten van het account ergens anders gewijzigd worden
+    # elke sessie van het account evalueert dan opnieuw of wissel-van-rol getoond moet worden
+    rechten_versie = models.PositiveIntegerField(default=0)
+
     REQUIRED_FIELDS = ['password']
 
     class Meta:
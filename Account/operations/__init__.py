@@ -1,12 +1,12 @@
 # -*- coding: utf-8 -*-
 
-#  Copyright (c) 2025 Ramon van der Winkel.
+#  Copyright (c) 2025-2026 Ramon van der Winkel.
 #  All rights reserved.
 #  Licensed under BSD-3-Clause-Clear. See LICENSE file for details.
 
 from .aanmaken import account_create, AccountCreateError
 from .opschonen import accounts_opschonen
-from .session_vars import zet_sessionvar_if_changed
+from .session_vars import zet_sessionvar_if_changed, get_vluchtige_sessionvar, zet_vluchtige_sessionvar
 from .maak_qrcode import qrcode_get
 from .snelheid import account_controleer_snelheid_verzoeken
 from .wachtwoord import account_test_wachtwoord_sterkte
@@ -24,7 +24,7 @@ __all__ = ['AccountCreateError', 'account_create',
            'accounts_opschonen',
            'otp_zet_controle_niet_gelukt', 'otp_zet_controle_gelukt', 'otp_is_controle_gelukt', 'otp_prepare_koppelen',
            'otp_koppel_met_code', 'otp_controleer_code', 'otp_loskoppelen', 'otp_stuur_email_losgekoppeld',
-           'zet_sessionvar_if_changed',
+           'zet_sessionvar_if_changed', 'get_vluchtige_sessionvar', 'zet_vluchtige_sessionvar',
            'account_controleer_snelheid_verzoeken',
            'account_test_wachtwoord_sterkte']
 
@@ -1,9 +1,14 @@
 # -*- coding: utf-8 -*-
 
-#  Copyright (c) 2024-2025 Ramon van der Winkel.
+#  Copyright (c) 2024-2026 Ramon van der Winkel.
 #  All rights reserved.
 #  Licensed under BSD-3-Clause-Clear. See LICENSE file for details.
 
+from django.core.cache import cache
+
+VLUCHTIG_CACHE_KEY = 'sessie_vluchtig:%s:%s'       # session_key, var_name
+
+
 def zet_sessionvar_if_changed(request, var_name: str, value) -> bool:
     """ voorkom onnodige opslaan van een sessie door onnodige wijzigingen niet te doen
 
@@ -19,4 +24,26 @@ def zet_sessionvar_if_changed(request, var_name: str, value) -> bool:
     return changed
 
 
+def get_vluchtige_sessionvar(request, var_name: str, default=None):
+    """ haal een vluchtige sessie variabele op
+
+        Vluchtige sessie variabelen worden in de gedeelde cache opgeslagen in plaats van in de sessie,
+        zodat een wijziging niet leidt tot het opslaan van de sessie in de database.
+        De cache wordt gedeeld door alle processen van de webserver (zie CACHES in settings_base).
+        Bedoeld voor tijdstempels die alleen het aantal evaluaties beperken:
+        als de waarde kwijt raakt, dan volgt gewoon een extra evaluatie.
+    """
+    session_key = request.session.session_key
+    if not session_key:
+        return default
+    return cache.get(VLUCHTIG_CACHE_KEY % (session_key, var_name), default)
+
+
+def zet_vluchtige_sessionvar(request, var_name: str, value, timeout: int):
+    """ sla een vluchtige sessie variabele op, voor maximaal timeout seconden """
+    session_key = request.session.session_key
+    if session_key:
+        cache.set(VLUCHTIG_CACHE_KEY % (session_key, var_name), value, timeout)
+
+
 # end of file
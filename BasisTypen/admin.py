@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
 
-#  Copyright (c) 2019-2025 Ramon van der Winkel.
+#  Copyright (c) 2019-2026 Ramon van der Winkel.
 #  All rights reserved.
 #  Licensed under BSD-3-Clause-Clear. See LICENSE file for details.
 
@@ -9,7 +9,7 @@ from django.utils.html import format_html
 from django.utils.safestring import mark_safe
 
 # alle klassen zijn hard-coded
-from BasisTypen.models import (BoogType, TeamType, Leeftijdsklasse,
+from BasisTypen.models import (BoogType, TeamType, Leeftijdsklasse, CacheVersie,
                                TemplateCompetitieIndivKlasse, TemplateCompetitieTeamKlasse,
                                KalenderWedstrijdklasse)
 
@@ -115,5 +115,6 @@ admin.site.register(Leeftijdsklasse, BasisTypenLeeftijdsklasseAdmin)
 admin.site.register(TemplateCompetitieIndivKlasse, BasisTypenTemplateCompetitieIndivKlasseAdmin)
 admin.site.register(TemplateCompetitieTeamKlasse, BasisTypenTemplateCompetitieTeamKlasseAdmin)
 admin.site.register(KalenderWedstrijdklasse, BasisTypenKalenderWedstrijdklasseAdmin)
+admin.site.register(CacheVersie, BasisTypenReadonlyAdmin)
 
 # end of file
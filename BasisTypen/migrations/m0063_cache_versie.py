@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+
+#  Copyright (c) 2026 Ramon van der Winkel.
+#  All rights reserved.
+#  Licensed under BSD-3-Clause-Clear. See LICENSE file for details.
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    """ Migratie class voor dit deel van de applicatie """
+
+    # volgorde afdwingen
+    dependencies = [
+        ('BasisTypen', 'm0062_squashed'),
+    ]
+
+    # migratie functies
+    operations = [
+        migrations.CreateModel(
+            name='CacheVersie',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('naam', models.CharField(max_length=50, unique=True)),
+                ('versie', models.PositiveIntegerField(default=1)),
+            ],
+            options={
+                'verbose_name': 'Cache versie',
+            },
+        ),
+    ]
+
+# end of file
@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+
+#  Copyright (c) 2026 Ramon van der Winkel.
+#  All rights reserved.
+#  Licensed under BSD-3-Clause-Clear. See LICENSE file for details.
+
+from django.core.management import call_command
+from django.db import migrations
+
+
+def maak_cache_tabel(apps, schema_editor):
+    """ maak de database tabel voor de gedeelde cache aan (zie CACHES in settings_base)
+        doet niets als de cache niet in de database staat
+    """
+    call_command('createcachetable', database=schema_editor.connection.alias)
+
+
+class Migration(migrations.Migration):
+
+    """ Migratie class voor dit deel van de applicatie """
+
+    # volgorde afdwingen
+    dependencies = [
+        ('BasisTypen', 'm0063_cache_versie'),
+    ]
+
+    # migratie functies
+    operations = [
+        migrations.RunPython(maak_cache_tabel, reverse_code=migrations.RunPython.noop),
+    ]
+
+# end of file
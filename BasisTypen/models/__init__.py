@@ -5,6 +5,7 @@
 #  Licensed under BSD-3-Clause-Clear. See LICENSE file for details.
 
 from .boogtype import BoogType
+from .cache_versie import CacheVersie
 from .competitie import TemplateCompetitieIndivKlasse, TemplateCompetitieTeamKlasse
 from .kalender import KalenderWedstrijdklasse
 from .leeftijdsklasse import Leeftijdsklasse
@@ -13,6 +14,7 @@ from .teamtype import TeamType
 
 __all__ = [
     'BoogType',
+    'CacheVersie',
     'TemplateCompetitieIndivKlasse', 'TemplateCompetitieTeamKlasse',
     'KalenderWedstrijdklasse',
     'Leeftijdsklasse',
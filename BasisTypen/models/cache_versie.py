@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+
+#  Copyright (c) 2026 Ramon van der Winkel.
+#  All rights reserved.
+#  Licensed under BSD-3-Clause-Clear. See LICENSE file for details.
+
+from django.db import models
+
+
+class CacheVersie(models.Model):
+    """ versienummer van gegevens die elk proces (website, achtergrondtaken) in het geheugen bewaart
+
+        een proces dat de gegevens wijzigt verhoogt het versienummer in de database,
+        zodat de andere processen hun kopie opnieuw op kunnen bouwen
+    """
+
+    # unieke naam van de gegevens, bijvoorbeeld "leeftijdsklassen"
+    naam = models.CharField(max_length=50, unique=True)
+
+    # wordt verhoogd bij elke wijziging
+    versie = models.PositiveIntegerField(default=1)
+
+    def __str__(self):
+        """ Lever een tekstuele beschrijving voor de admin interface """
+        return "%s: %s" % (self.naam, self.versie)
+
+    class Meta:
+        """ meta data voor de admin interface """
+        verbose_name = "Cache versie"
+
+    objects = models.Manager()      # for the editor only
+
+
+# end of file
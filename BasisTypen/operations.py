@@ -1,11 +1,12 @@
 # -*- coding: utf-8 -*-
 
-#  Copyright (c) 2022-2025 Ramon van der Winkel.
+#  Copyright (c) 2022-2026 Ramon van der Winkel.
 #  All rights reserved.
 #  Licensed under BSD-3-Clause-Clear. See LICENSE file for details.
 
+from django.db.models import F
 from BasisTypen.definities import ORGANISATIE_KHSN, ORGANISATIE_WA, ORGANISATIE_WA_STRIKT
-from BasisTypen.models import BoogType, TeamType, KalenderWedstrijdklasse
+from BasisTypen.models import BoogType, TeamType, KalenderWedstrijdklasse, CacheVersie
 
 
 def get_organisatie_boogtypen(organisatie):
@@ -68,4 +69,22 @@ def get_organisatie_klassen(organisatie, ook_strikt: bool, filter_bogen=None):
     return klassen
 
 
+def get_cache_versie(naam: str) -> int:
+    """ geef het versienummer van gegevens die elk proces in het geheugen bewaart
+        geeft 0 terug als de versie nog nooit verhoogd is
+    """
+    versie = CacheVersie.objects.filter(naam=naam).values_list('versie', flat=True).first()
+    return versie or 0
+
+
+def verhoog_cache_versie(naam: str):
+    """ verhoog het versienummer, zodat alle processen hun kopie van de gegevens opnieuw opbouwen
+        wordt pas zichtbaar voor de andere processen als de lopende transactie afgerond is
+    """
+    aantal = CacheVersie.objects.filter(naam=naam).update(versie=F('versie') + 1)
+    if aantal == 0:
+        # eerste keer: versie 1 (get_or_create vangt een gelijktijdige aanmaak af)
+        CacheVersie.objects.get_or_create(naam=naam)
+
+
 # end of file
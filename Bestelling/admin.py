@@ -180,11 +180,11 @@ class BestellingMutatieAdmin(admin.ModelAdmin):
 
     readonly_fields = ('when', 'account', 'code_plus', 'bestelling_regel', 'bestelling')
 
-    list_filter = ('is_verwerkt', 'code')
+    list_filter = ('is_verwerkt', 'pogingen', 'code')
 
     fieldsets = (
         ('BestellingMutatie',
-         {'fields': ('when', 'code_plus', 'product_pk', 'is_verwerkt',
+         {'fields': ('when', 'code_plus', 'product_pk', 'is_verwerkt', 'pogingen',
                      'account',
                      'bestelling_regel', 'korting', 'bestelling', 'betaling_is_gelukt', 'bedrag_euro')
           }),
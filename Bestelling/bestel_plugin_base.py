@@ -20,7 +20,25 @@ class BestelPluginBase:
         """ zet de stdout van het management commando """
         self.stdout = stdout
 
-    def mandje_opschonen(self, verval_datum):
+    @staticmethod
+    def _get_mandje_pks(qset) -> list[int]:
+        """ geef de pks van de mandjes waarin de bestelling regels van de producten in qset liggen """
+        mandje_pks = set(qset.values_list('bestelling_regel__bestellingmandje', flat=True))
+        mandje_pks.discard(None)
+        return sorted(mandje_pks)
+
+    def mandjes_met_vervallen(self, verval_datum) -> list[int]:
+        """
+            Geef de pks van de mandjes met producten die te lang in het mandje liggen.
+            Er wordt nog niets aangepast; dat gebeurt per mandje met mandje_opschonen.
+        """
+        raise NotImplementedError()             # pragma: no cover
+
+    def mandje_opschonen(self, mandje: BestellingMandje, verval_datum):
+        """
+            Verwijder de producten uit het mandje die er te lang in liggen en geef de reserveringen vrij.
+            Het mandje is door de aanroeper gelockt (select_for_update).
+        """
         raise NotImplementedError()             # pragma: no cover
 
     def reserveer(self, product_pk, mandje_van_str: str) -> BestellingRegel | None:
@@ -6,25 +6,49 @@
 
 """ achtergrondtaak om mutaties te verwerken zodat concurrency voorkomen kan worden
     deze komen binnen via BestellingMutatie
+
+    de mutaties kunnen verdeeld worden over meerdere workers (zie --workers)
+    alle mutaties voor hetzelfde account (=mandje) worden door dezelfde worker in volgorde verwerkt
+    gedeelde gegevens worden beschermd met row-level locks (mandje, bestelnummer) en atomaire tellers (F)
+    een mutatie die gedeelde gegevens lockt wordt direct gecommit, zodat de andere workers daar kort op wachten
 """
 
-from django.db import connection
-from django.conf import settings
-from django.core.management.base import BaseCommand
-from django.db.utils import OperationalError, IntegrityError, DEFAULT_DB_ALIAS
+from django.db.models import Value
+from django.db.models.functions import Coalesce
+from Bestelling.definities import (BESTELLING_MUTATIE_WEDSTRIJD_INSCHRIJVEN, BESTELLING_MUTATIE_WEBWINKEL_KEUZE,
+                                   BESTELLING_MUTATIE_VERWIJDER, BESTELLING_MUTATIE_MAAK_BESTELLINGEN,
+                                   BESTELLING_MUTATIE_WEDSTRIJD_AFMELDEN, BESTELLING_MUTATIE_ANNULEER,
+                                   BESTELLING_MUTATIE_WEDSTRIJD_AANPASSEN)
 from Bestelling.models import BestellingMutatie
 from Bestelling.operations import VerwerkBestelMutaties
-from Mailer.operations import mailer_notify_internal_error
-from Site.core.background_sync import BackgroundSync
-import traceback
-import datetime
-import sys
+from Site.core.mutatie_daemon import MutatieDaemonCommand
+
+# deze mutaties locken gegevens die door alle workers gedeeld worden:
+# de wedstrijd sessie (aantal inschrijvingen), de webwinkel voorraad en het hoogste bestelnummer
+MUTATIES_MET_GEDEELDE_GEGEVENS = (BESTELLING_MUTATIE_WEDSTRIJD_INSCHRIJVEN,
+                                  BESTELLING_MUTATIE_WEBWINKEL_KEUZE,
+                                  BESTELLING_MUTATIE_VERWIJDER,
+                                  BESTELLING_MUTATIE_MAAK_BESTELLINGEN,
+                                  BESTELLING_MUTATIE_WEDSTRIJD_AFMELDEN,
+                                  BESTELLING_MUTATIE_ANNULEER,
+                                  BESTELLING_MUTATIE_WEDSTRIJD_AANPASSEN)
 
 
-class Command(BaseCommand):
+class Command(MutatieDaemonCommand):
 
     help = "Bestelling mutaties verwerken"
 
+    taak_naam = 'bestel_mutaties'
+    mutatie_model = BestellingMutatie
+    mutatie_select_related = ('account',
+                              'bestelling',
+                              'bestelling_regel')
+    sync_poort_setting = 'BACKGROUND_SYNC__BESTEL_MUTATIES'
+
+    # verdeel op account; mutaties voor een bestelling horen bij het account van de bestelling
+    # mutaties zonder account (zoals afmelden) gaan naar de eerste worker
+    mutatie_shard_sleutel = Coalesce('account_id', 'bestelling__account_id', Value(0))
+
     def __init__(self, stdout=None, stderr=None, no_color=False, force_color=False):
         super().__init__(stdout, stderr, no_color, force_color)
 
@@ -32,193 +56,18 @@ class Command(BaseCommand):
         # (komt binnen via cmdline optie)
         self.verwerk_mutaties = None    # VerwerkBestelMutaties()
 
-        self.stop_at = datetime.datetime.now()
-
-        self._sync = BackgroundSync(settings.BACKGROUND_SYNC__BESTEL_MUTATIES)
-        self._count_ping = 0
-
-        self._hoogste_mutatie_pk = None
-
-    def _out_error(self, msg):
-        self.stdout.write('[ERROR] {bestel_mutaties} %s' % msg)
-
-    def _out_debug(self, msg):
-        self.stdout.write('[DEBUG] {bestel_mutaties} %s' % msg)
-
-    def _out_info(self, msg):
-        self.stdout.write('[INFO] {bestel_mutaties} %s' % msg)
-
-    def add_arguments(self, parser):
-        parser.add_argument('duration', type=int,
-                            choices=(1, 2, 5, 7, 10, 15, 20, 30, 45, 60),
-                            help="Maximum aantal minuten actief blijven")
-        parser.add_argument('--stop_exactly', type=int, default=None, choices=range(60),
-                            help="Stop op deze minuut")
-        parser.add_argument('--quick', action='store_true')                 # for testing
-        parser.add_argument('--use-test-database', action='store_true')     # for testing
-
-    def _verwerk_nieuwe_mutaties(self):
-        begin = datetime.datetime.now()
-
-        mutatie_latest = BestellingMutatie.objects.latest('pk')     # foutafhandeling in handle()
-
-        # als hierna een extra mutatie aangemaakt wordt dan verwerken we een record
-        # misschien dubbel, maar daar kunnen we tegen
-
-        if self._hoogste_mutatie_pk is not None:
-            # gebruik deze informatie om te filteren
-            self._out_info('vorige hoogste BestellingMutatie pk is %s' % self._hoogste_mutatie_pk)
-            qset = (BestellingMutatie
-                    .objects
-                    .exclude(is_verwerkt=True)
-                    .filter(pk__gt=self._hoogste_mutatie_pk))
-        else:
-            qset = (BestellingMutatie
-                    .objects
-                    .exclude(is_verwerkt=True))             # deferred
-
-        # sorteren zodat ze in de juiste volgorde afgehandeld worden
-        mutatie_pks = qset.order_by('pk').values_list('pk', flat=True)     # deferred
-
-        self._hoogste_mutatie_pk = mutatie_latest.pk
-
-        did_useful_work = False
-        for pk in mutatie_pks:
-            # we halen de records hier 1 voor 1 op
-            # zodat we verse informatie hebben inclusief de vorige mutatie
-            # en zodat we 1 plek hebben voor select/prefetch
-            mutatie = (BestellingMutatie
-                       .objects
-                       .select_related('account',
-                                       'bestelling',
-                                       'bestelling_regel')
-                       .get(pk=pk))
-
-            self.verwerk_mutaties.verwerk(mutatie)
-
-            mutatie.is_verwerkt = True
-            mutatie.save(update_fields=['is_verwerkt'])
-            did_useful_work = True
-        # for
-
-        if did_useful_work:
-            self._out_info('Nieuwe hoogste BestellingMutatie pk is %s' % self._hoogste_mutatie_pk)
-
-            klaar = datetime.datetime.now()
-            self._out_info('Mutaties verwerkt in %s seconden' % (klaar - begin))
-
-    def _monitor_nieuwe_mutaties(self):
-        # monitor voor nieuwe mutaties
-        mutatie_count = 0      # moet 0 zijn: beschermd tegen query op lege mutatie tabel
-        now = datetime.datetime.now()
-        while now < self.stop_at:                           # pragma: no branch
-            # self._out_debug('tick')
-            new_count = BestellingMutatie.objects.count()
-            if new_count != mutatie_count:
-                mutatie_count = new_count
-                if mutatie_count:                           # pragma: no branch
-                    self._verwerk_nieuwe_mutaties()
-                now = datetime.datetime.now()
-
-            # wacht 5 seconden voordat we opnieuw in de database kijken
-            # het wachten kan onderbroken worden door een ping, als er een nieuwe mutatie toegevoegd is
-            secs = (self.stop_at - now).total_seconds()
-            if secs > 1:                                    # pragma: no branch
-                timeout = min(5.0, secs)
-                if self._sync.wait_for_ping(timeout):       # pragma: no branch
-                    self._count_ping += 1                   # pragma: no cover
-            else:
-                # near the end
-                break       # from the while                # pragma: no cover
-
-            now = datetime.datetime.now()
-        # while
-
-    def _set_stop_time(self, **options):
-        # bepaal wanneer we moeten stoppen (zoals gevraagd)
-        duration = options['duration']
-        stop_minute = options['stop_exactly']
-
-        now = datetime.datetime.now()
-        self.stop_at = now + datetime.timedelta(minutes=duration)
-
-        if isinstance(stop_minute, int):
-            delta = stop_minute - now.minute
-            if delta < 0:
-                delta += 60
-            if delta != 0:    # avoid stopping in start minute
-                stop_at_exact = now + datetime.timedelta(minutes=delta)
-                stop_at_exact -= datetime.timedelta(seconds=self.stop_at.second,
-                                                    microseconds=self.stop_at.microsecond)
-                self._out_info('Calculated stop at is %s' % stop_at_exact)
-                if stop_at_exact < self.stop_at:
-                    # run duration passes the requested stop minute
-                    self.stop_at = stop_at_exact
-
-        # test moet snel stoppen dus interpreteer duration in seconden
-        if options['quick']:        # pragma: no branch
-            if options['duration'] == 60:
-                # speciale testcase
-                self._hoogste_mutatie_pk = 0
-                duration = 2
-
-            self.stop_at = (datetime.datetime.now()
-                            + datetime.timedelta(seconds=duration))
-
-        self._out_info('Taak loopt tot %s' % str(self.stop_at))
-
-    def handle(self, *args, **options):
-
-        if options['use_test_database']:                    # pragma: no cover
-            # voor gebruik tijdens browser tests
-            connection.close()
-            test_database_name = "test_" + settings.DATABASES[DEFAULT_DB_ALIAS]["NAME"]
-            settings.DATABASES[DEFAULT_DB_ALIAS]["NAME"] = test_database_name
-            connection.settings_dict["NAME"] = test_database_name
-
+    def voorbereiden(self):
         self.verwerk_mutaties = VerwerkBestelMutaties(self.stdout)
+        if self.is_hoofd_worker():
+            self.verwerk_mutaties.mandjes_opschonen()
 
-        self._set_stop_time(**options)
+    def verwerk_mutatie(self, mutatie):
+        self.verwerk_mutaties.verwerk(mutatie)
 
-        # vang generieke fouten af
-        try:
-            self.verwerk_mutaties.mandjes_opschonen()
-            self._monitor_nieuwe_mutaties()
-        except (OperationalError, IntegrityError) as exc:  # pragma: no cover
-            # OperationalError treed op bij system shutdown, als database gesloten wordt
-            _, _, tb = sys.exc_info()
-            lst = traceback.format_tb(tb)
-            self._out_error('Onverwachte database fout: %s' % str(exc))
-            self.stdout.write('Traceback:')
-            self.stdout.write(''.join(lst))
-
-        except KeyboardInterrupt:                       # pragma: no cover
-            pass
-
-        except Exception as exc:
-            # schrijf in de output
-            tups = sys.exc_info()
-            lst = traceback.format_tb(tups[2])
-            tb = traceback.format_exception(*tups)
-
-            tb_msg_start = 'Onverwachte fout tijdens bestel_mutaties\n'
-            tb_msg_start += '\n'
-
-            self._out_error('Onverwachte fout (%s): %s' % (type(exc), str(exc)))
-            self.stdout.write('Traceback:')
-            self.stdout.write(''.join(lst))
-
-            # stuur een mail naar de ontwikkelaars
-            # reduceer tot de nuttige regels
-            tb = [line for line in tb if '/site-packages/' not in line]
-            tb_msg = tb_msg_start + '\n'.join(tb)
-
-            # deze functie stuurt maximaal 1 mail per dag over hetzelfde probleem
-            mailer_notify_internal_error(tb_msg)
-
-        self._out_debug('Aantal pings ontvangen: %s' % self._count_ping)
-
-        self.stdout.write('Klaar')
+    def deelt_gegevens(self, mutatie) -> bool:
+        # houd de lock op gedeelde gegevens maar voor 1 mutatie vast
+        # elke mutatie lockt eerst het eigen product (zoals de inschrijving) en daarna pas de gedeelde gegevens
+        return mutatie.code in MUTATIES_MET_GEDEELDE_GEGEVENS
 
 
 """
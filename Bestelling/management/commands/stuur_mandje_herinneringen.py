@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
 
-#  Copyright (c) 2024-2025 Ramon van der Winkel.
+#  Copyright (c) 2024-2026 Ramon van der Winkel.
 #  All rights reserved.
 #  Licensed under BSD-3-Clause-Clear. See LICENSE file for details.
 
@@ -12,7 +12,7 @@ from django.conf import settings
 from django.core.management.base import BaseCommand
 from django.db.models import Count
 from Bestelling.models import BestellingMandje
-from Mailer.operations import mailer_queue_email, render_email_template
+from Mailer.operations import mailer_queue_bulk
 
 EMAIL_TEMPLATE_HERINNERING_MANDJE = 'email_bestelling/herinnering-mandje.dtl'
 
@@ -25,33 +25,33 @@ class Command(BaseCommand):
         super().__init__(stdout, stderr, no_color, force_color)
 
     @staticmethod
-    def _stuur_herinnering(account, num_prod):
-        """ Stuur een e-mail """
-
+    def _maak_context(account, num_prod):
         context = {
             'voornaam': account.get_first_name(),
             'naam_site': settings.NAAM_SITE,
             'num_prod': num_prod,
         }
-
-        mail_body = render_email_template(context, EMAIL_TEMPLATE_HERINNERING_MANDJE)
-
-        mailer_queue_email(account.bevestigde_email,
-                           'Producten in mandje op MijnHandboogsport',
-                           mail_body)
+        return context
 
     def handle(self, *args, **options):
 
+        ontvangers = list()
         for mandje in (BestellingMandje
                        .objects
                        .annotate(num_regels=Count('regels'))
-                       .exclude(num_regels=0)):
+                       .exclude(num_regels=0)
+                       .select_related('account')):
 
             self.stdout.write('[INFO] Mandje met producten: %s' % mandje)
 
-            self._stuur_herinnering(mandje.account, mandje.num_regels)
-
+            account = mandje.account
+            ontvangers.append((account.bevestigde_email, self._maak_context(account, mandje.num_regels)))
         # for
 
+        # stuur de herinneringen in 1 keer
+        mailer_queue_bulk(EMAIL_TEMPLATE_HERINNERING_MANDJE,
+                          'Producten in mandje op MijnHandboogsport',
+                          ontvangers)
+
 
 # end of file
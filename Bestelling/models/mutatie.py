@@ -35,6 +35,10 @@ class BestellingMutatie(models.Model):
     # is deze mutatie al verwerkt?
     is_verwerkt = models.BooleanField(default=False)
 
+    # houdt bij hoeveel keer de verwerking van deze mutatie mislukt is
+    # na N mislukte pogingen wordt de mutatie niet meer opgepakt (geparkeerd)
+    pogingen = models.PositiveSmallIntegerField(default=0)
+
     # BESTELLING_MUTATIE_WEDSTRIJD_INSCHRIJVEN      account(=mandje), product_pk
     # BESTELLING_MUTATIE_EVENEMENT_INSCHRIJVEN:     account(=mandje), product_pk
     # BESTELLING_MUTATIE_OPLEIDING_INSCHRIJVEN:     account(=mandje), product_pk
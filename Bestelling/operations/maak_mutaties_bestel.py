@@ -24,7 +24,6 @@ from Site.core.background_sync import BackgroundSync
 from Sporter.models import SporterBoog
 from Webwinkel.models import WebwinkelKeuze
 from Wedstrijden.models import WedstrijdInschrijving, WedstrijdSessie
-import time
 
 
 """ Interface naar de achtergrondtaak, waar de mutaties uitgevoerd worden zonder concurrency gevaren """
@@ -39,15 +38,10 @@ def _bestel_ping_achtergrondtaak(mutatie: BestellingMutatie, snel: bool):
     bestel_mutaties_ping.ping()
 
     if not snel:  # pragma: no cover
-        # wacht maximaal 3 seconden tot de mutatie uitgevoerd is
-        interval = 0.2  # om steeds te verdubbelen
-        total = 0.0     # om een limiet te stellen
-        while not mutatie.is_verwerkt and total + interval <= 3.0:
-            time.sleep(interval)
-            total += interval   # 0.0 --> 0.2, 0.6, 1.4, 3.0
-            interval *= 2       # 0.2 --> 0.4, 0.8, 1.6, 3.2
-            mutatie = BestellingMutatie.objects.get(pk=mutatie.pk)
-        # while
+        # wacht maximaal 3 seconden tot de achtergrondtaak meldt dat de mutatie verwerkt is
+        bestel_mutaties_ping.wacht_op_verwerkt(
+                mutatie.pk,
+                lambda: BestellingMutatie.objects.filter(pk=mutatie.pk, is_verwerkt=True).exists())
 
 
 def bestel_mutatieverzoek_inschrijven_wedstrijd(account: Account, inschrijving: WedstrijdInschrijving, snel: bool):
@@ -1,13 +1,13 @@
 # -*- coding: utf-8 -*-
 
-#  Copyright (c) 2022-2025 Ramon van der Winkel.
+#  Copyright (c) 2022-2026 Ramon van der Winkel.
 #  All rights reserved.
 #  Licensed under BSD-3-Clause-Clear. See LICENSE file for details.
 
 from django.utils import timezone
 from datetime import timedelta
 from Account.models import get_account, Account
-from Account.operations import zet_sessionvar_if_changed
+from Account.operations import zet_sessionvar_if_changed, get_vluchtige_sessionvar, zet_vluchtige_sessionvar
 from Bestelling.models import BestellingMandje
 
 
@@ -50,7 +50,7 @@ def mandje_tel_inhoud(request, account: Account | None):
 
     next_eval = timezone.now() + timedelta(seconds=60 * MANDJE_EVAL_INTERVAL_MINUTES)
     eval_after = str(next_eval.timestamp())     # number of seconds since 1-1-1970
-    zet_sessionvar_if_changed(request, SESSIONVAR_MANDJE_EVAL_AFTER, eval_after)
+    zet_vluchtige_sessionvar(request, SESSIONVAR_MANDJE_EVAL_AFTER, eval_after, 60 * MANDJE_EVAL_INTERVAL_MINUTES)
 
 
 def eval_mandje_inhoud(request):
@@ -60,10 +60,7 @@ def eval_mandje_inhoud(request):
     """
 
     # kijk of het alweer tijd is
-    try:
-        eval_after = request.session[SESSIONVAR_MANDJE_EVAL_AFTER]
-    except KeyError:
-        eval_after = None
+    eval_after = get_vluchtige_sessionvar(request, SESSIONVAR_MANDJE_EVAL_AFTER)
 
     now_str = str(timezone.now().timestamp())
 
@@ -66,7 +66,8 @@ class VerwerkBestelMutaties:
 
     """
         Afhandeling van de mutatie verzoeken voor de Bestellingen applicatie.
-        Wordt aangeroepen door de achtergrondtaak, welke gelijktijdigheid voorkomt.
+        Wordt aangeroepen door de achtergrondtaak. Alle mutaties voor hetzelfde mandje worden door dezelfde worker
+        in volgorde verwerkt; gedeelde gegevens worden beschermd met row-level locks en atomaire tellers.
     """
 
     def __init__(self, stdout):
@@ -128,7 +129,8 @@ class VerwerkBestelMutaties:
             mandje = None
         else:
             # let op: geen prefetch_related('producten') gebruiken i.v.m. mutaties
-            mandje, is_created = BestellingMandje.objects.get_or_create(account=account)
+            # lock het mandje tot het einde van de transactie, want het opschonen kan parallel lopen
+            mandje, is_created = BestellingMandje.objects.select_for_update().get_or_create(account=account)
 
         return mandje
 
@@ -157,19 +159,26 @@ class VerwerkBestelMutaties:
 
         verval_datum = timezone.now() - datetime.timedelta(days=settings.MANDJE_VERVAL_NA_DAGEN)
 
-        # doorloop alle producten die nog in een mandje liggen en waarvan de datum verlopen is
-        # hiervan wordt de reservering verwijderd
-        mandje_pks = list()
+        # zoek de mandjes met producten waarvan de datum verlopen is
+        mandje_pks = set()
         for plugin in bestel_plugins.values():
-            pks = plugin.mandje_opschonen(verval_datum)
-            mandje_pks.extend(pks)
+            mandje_pks.update(plugin.mandjes_met_vervallen(verval_datum))
         # for
 
-        # mandjes bijwerken
-        mandje_pks = set(mandje_pks)  # remove dupes
-        for mandje in BestellingMandje.objects.filter(pk__in=mandje_pks):
-            self._automatische_kortingen_toepassen(mandje)
-            self._bepaal_verzendkosten_mandje(mandje)
+        # schoon elk mandje op in een eigen transactie
+        # lock het mandje voordat er iets verwijderd wordt, want een andere worker kan tegelijk
+        # een mutatie voor dit mandje verwerken (zoals bestellen)
+        # de plugins zoeken de vervallen producten daarna opnieuw op
+        for mandje_pk in sorted(mandje_pks):
+            with transaction.atomic():
+                mandje = BestellingMandje.objects.select_for_update().filter(pk=mandje_pk).first()
+                if mandje:      # pragma: no branch
+                    for plugin in bestel_plugins.values():
+                        plugin.mandje_opschonen(mandje, verval_datum)
+                    # for
+
+                    self._automatische_kortingen_toepassen(mandje)
+                    self._bepaal_verzendkosten_mandje(mandje)
         # for
 
         self.stdout.write('[INFO] Opschonen mandjes klaar')
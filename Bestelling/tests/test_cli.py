@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
 
-#  Copyright (c) 2022-2025 Ramon van der Winkel.
+#  Copyright (c) 2022-2026 Ramon van der Winkel.
 #  All rights reserved.
 #  Licensed under BSD-3-Clause-Clear. See LICENSE file for details.
 
@@ -24,8 +24,11 @@ from Taken.models import Taak
 from TestHelpers.e2ehelpers import E2EHelpers
 from Vereniging.models import Vereniging
 from decimal import Decimal
+import threading
 import datetime
+import signal
 import time
+import os
 
 STUUR_OVERBOEKEN_HERINNERING_COMMAND = 'stuur_overboeken_herinneringen'
 STUUR_MANDJE_HERINNERING_COMMAND = 'stuur_mandje_herinneringen'
@@ -179,16 +182,52 @@ class TestBestellingCli(E2EHelpers, TestCase):
         # print('\nf1:', f1.getvalue(), '\nf2:', f2.getvalue())
 
         BestellingMutatie(code=9999).save()                                                 # onbekende mutatie
-        f1, f2 = self.run_management_command(BESTEL_MUTATIES_COMMAND, '60', '--quick')            # 60 == fake-hoogste
+        f1, f2 = self.run_management_command(BESTEL_MUTATIES_COMMAND, '60', '--quick')
         # print('\nf1:', f1.getvalue(), '\nf2:', f2.getvalue())
-        self.assertTrue(' vorige hoogste BestellingMutatie pk is 0' in f2.getvalue())
+        self.assertTrue('[INFO] 1 BestellingMutaties verwerkt in ' in f2.getvalue())
         self.assertTrue('Onbekende mutatie code 9999' in f2.getvalue())
 
+        # meerdere mutaties voor hetzelfde account in 1 batch
+        # de tweede wordt opnieuw opgehaald omdat de eerste het account aangepast kan hebben
+        BestellingMutatie(code=9998, account=self.account).save()
+        BestellingMutatie(code=9997, account=self.account).save()
+        f1, f2 = self.run_management_command(BESTEL_MUTATIES_COMMAND, '1', '--quick')
+        # print('\nf1:', f1.getvalue(), '\nf2:', f2.getvalue())
+        self.assertTrue('[INFO] 2 BestellingMutaties verwerkt in ' in f2.getvalue())
+        self.assertEqual(0, BestellingMutatie.objects.filter(is_verwerkt=False).count())
+
         # trigger een exceptie
-        BestellingMutatie(code=BESTELLING_MUTATIE_VERWIJDER).save()
+        # de mutatie ervoor moet wel als verwerkt gemarkeerd worden
+        mutatie_ok = BestellingMutatie(code=9996)
+        mutatie_ok.save()
+        mutatie_fout = BestellingMutatie(code=BESTELLING_MUTATIE_VERWIJDER)
+        mutatie_fout.save()
         f1, f2 = self.run_management_command(BESTEL_MUTATIES_COMMAND, '60', '--quick')
         # print('\nf1:', f1.getvalue(), '\nf2:', f2.getvalue())
-        self.assertTrue('Traceback:' in f2.getvalue())
+        self.assertTrue('Traceback:' in f1.getvalue())
+        mutatie_ok.refresh_from_db()
+        self.assertTrue(mutatie_ok.is_verwerkt)
+        mutatie_fout.refresh_from_db()
+        self.assertFalse(mutatie_fout.is_verwerkt)
+        self.assertEqual(mutatie_fout.pogingen, 1)
+
+        # na een aantal mislukte pogingen wordt de mutatie geparkeerd
+        for _ in range(4):
+            f1, f2 = self.run_management_command(BESTEL_MUTATIES_COMMAND, '1', '--quick')
+            self.assertTrue('Traceback:' in f1.getvalue())
+        # for
+        # print('\nf1:', f1.getvalue(), '\nf2:', f2.getvalue())
+        self.assertTrue('[ERROR] {bestel_mutaties} Mutatie pk=%s geparkeerd na 5 mislukte pogingen' % mutatie_fout.pk
+                        in f2.getvalue())
+        mutatie_fout.refresh_from_db()
+        self.assertFalse(mutatie_fout.is_verwerkt)
+        self.assertEqual(mutatie_fout.pogingen, 5)
+
+        # een geparkeerde mutatie wordt niet meer opgepakt
+        f1, f2 = self.run_management_command(BESTEL_MUTATIES_COMMAND, '1', '--quick')
+        self.assertEqual(f1.getvalue(), '')
+        mutatie_fout.refresh_from_db()
+        self.assertEqual(mutatie_fout.pogingen, 5)
         BestellingMutatie.objects.all().delete()
 
         # test "stop exactly"
@@ -231,6 +270,87 @@ class TestBestellingCli(E2EHelpers, TestCase):
                                              '--stop_exactly=%s' % (now.minute + 1))
         # print('\nf1: %s\nf2: %s' % (f1.getvalue(), f2.getvalue()))
 
+    def test_mutatie_forever(self):
+        # vervang de worker na een aantal mutaties
+        BestellingMutatie.objects.all().delete()
+        BestellingMutatie(code=9999).save()
+        BestellingMutatie(code=9998).save()
+        f1, f2 = self.run_management_command(BESTEL_MUTATIES_COMMAND, '--forever', '--quick', '--max_mutaties=1')
+        # print('\nf1:', f1.getvalue(), '\nf2:', f2.getvalue())
+        self.assertTrue('[INFO] 2 BestellingMutaties verwerkt in ' in f2.getvalue())
+        self.assertTrue('Worker wordt vervangen na 2 mutaties' in f2.getvalue())
+
+        # vervang de worker vanwege het geheugengebruik
+        f1, f2 = self.run_management_command(BESTEL_MUTATIES_COMMAND, '--forever', '--quick', '--max_geheugen=1')
+        # print('\nf1:', f1.getvalue(), '\nf2:', f2.getvalue())
+        self.assertTrue('Worker wordt vervangen vanwege geheugengebruik' in f2.getvalue())
+
+        # netjes stoppen na een SIGTERM
+        timer = threading.Timer(0.2, os.kill, (os.getpid(), signal.SIGTERM))
+        timer.start()
+        f1, f2 = self.run_management_command(BESTEL_MUTATIES_COMMAND, '10', '--forever', '--quick')
+        # print('\nf1:', f1.getvalue(), '\nf2:', f2.getvalue())
+        timer.join()
+        self.assertTrue('Gestopt door SIGTERM' in f2.getvalue())
+
+    def test_mutatie_shard(self):
+        # verdeel de mutaties over twee workers, op basis van het account
+        account2 = self.e2e_create_account('100002', 'twee@test.not', 'Twee')
+        oneven, even = (self.account, account2) if self.account.pk % 2 else (account2, self.account)
+
+        BestellingMutatie.objects.all().delete()
+        mutatie_oneven = BestellingMutatie(code=9999, account=oneven)
+        mutatie_oneven.save()
+        mutatie_even = BestellingMutatie(code=9998, account=even)
+        mutatie_even.save()
+        mutatie_geen_account = BestellingMutatie(code=9997)           # gaat naar de eerste worker
+        mutatie_geen_account.save()
+        bestelling = Bestelling(bestel_nr=1234, account=oneven, ontvanger=self.instelling)
+        bestelling.save()
+        mutatie_bestelling = BestellingMutatie(code=9996, bestelling=bestelling)    # account van de bestelling
+        mutatie_bestelling.save()
+
+        f1, f2 = self.run_management_command(BESTEL_MUTATIES_COMMAND, '1', '--quick', '--shard=1/2')
+        # print('\nf1:', f1.getvalue(), '\nf2:', f2.getvalue())
+        self.assertEqual(f1.getvalue(), '')
+        self.assertTrue('[INFO] 2 BestellingMutaties verwerkt in ' in f2.getvalue())
+        self.assertTrue('{bestel_mutaties 1/2}' in f2.getvalue())
+        self.assertFalse('Opschonen mandjes' in f2.getvalue())
+        verwerkt = list(BestellingMutatie.objects.filter(is_verwerkt=True).order_by('pk').values_list('pk', flat=True))
+        self.assertEqual(verwerkt, [mutatie_oneven.pk, mutatie_bestelling.pk])
+
+        f1, f2 = self.run_management_command(BESTEL_MUTATIES_COMMAND, '1', '--quick', '--shard=0/2')
+        self.assertEqual(f1.getvalue(), '')
+        self.assertTrue('[INFO] 2 BestellingMutaties verwerkt in ' in f2.getvalue())
+        self.assertTrue('Opschonen mandjes' in f2.getvalue())
+        self.assertEqual(0, BestellingMutatie.objects.filter(is_verwerkt=False).count())
+
+        # 1 deel is hetzelfde als niet verdelen
+        f1, f2 = self.run_management_command(BESTEL_MUTATIES_COMMAND, '1', '--quick', '--shard=0/1')
+        self.assertEqual(f1.getvalue(), '')
+        self.assertFalse('{bestel_mutaties 0/1}' in f2.getvalue())
+
+        # foute parameters
+        for shard in ('2/2', '-1/2', 'x', '1/x', '1/2/3'):
+            f1, f2 = self.run_management_command(BESTEL_MUTATIES_COMMAND, '1', '--quick', '--shard=%s' % shard)
+            self.assertTrue('[ERROR] Ongeldige --shard' in f1.getvalue())
+            self.assertFalse('Klaar' in f2.getvalue())
+        # for
+
+        # --workers werkt alleen met --forever
+        f1, f2 = self.run_management_command(BESTEL_MUTATIES_COMMAND, '1', '--quick', '--workers=2')
+        self.assertTrue('[ERROR] --workers kan alleen gebruikt worden met --forever' in f1.getvalue())
+        self.assertFalse('Klaar' in f2.getvalue())
+
+        f1, f2 = self.run_management_command(BESTEL_MUTATIES_COMMAND, '--forever', '--quick',
+                                             '--workers=2', '--shard=0/2')
+        self.assertTrue('[ERROR] --workers en --shard kunnen niet samen gebruikt worden' in f1.getvalue())
+        self.assertFalse('Klaar' in f2.getvalue())
+
+        # taak die niet verdeeld kan worden
+        f1, f2 = self.run_management_command('betaal_mutaties', '1', '--quick', '--shard=0/2')
+        self.assertTrue('[ERROR] betaal_mutaties ondersteunt geen verdeling over meerdere workers' in f1.getvalue())
+
     def test_koppel_betalingen(self):
         # geen transacties
         f1, f2 = self.run_management_command(KOPPEL_BETALINGEN_COMMAND)
@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+
+#  Copyright (c) 2026 Ramon van der Winkel.
+#  All rights reserved.
+#  Licensed under BSD-3-Clause-Clear. See LICENSE file for details.
+
+from django.core import management
+from django.db import connections
+from django.test import TransactionTestCase
+from django.utils import timezone
+from Account.models import Account
+from BasisTypen.models import BoogType, KalenderWedstrijdklasse, CacheVersie
+from Bestelling.definities import BESTELLING_MUTATIE_WEDSTRIJD_INSCHRIJVEN
+from Bestelling.models import BestellingMandje, BestellingRegel, BestellingMutatie
+from Betaal.models import BetaalInstellingenVereniging
+from Geo.models import Regio
+from Locatie.models import WedstrijdLocatie
+from Sporter.models import Sporter, SporterBoog
+from Vereniging.models import Vereniging
+from Wedstrijden.definities import WEDSTRIJD_STATUS_GEACCEPTEERD, WEDSTRIJD_INSCHRIJVING_STATUS_RESERVERING_MANDJE
+from Wedstrijden.models import Wedstrijd, WedstrijdSessie, WedstrijdInschrijving
+from decimal import Decimal
+import datetime
+import io
+import os
+
+BESTEL_MUTATIES_COMMAND = 'bestel_mutaties'
+
+# volgorde is belangrijk voor het opruimen (eerst de verwijzingen)
+OPRUIMEN_MODELLEN = (WedstrijdInschrijving, BestellingMutatie, BestellingMandje, BestellingRegel,
+                     Wedstrijd, WedstrijdSessie, WedstrijdLocatie, SporterBoog, Sporter, Account,
+                     BetaalInstellingenVereniging, Vereniging, CacheVersie)
+
+
+class TestBestellingWorkers(TransactionTestCase):
+
+    """ tests voor de Bestelling applicatie: bestel_mutaties verdeeld over parallelle workers
+
+        Elke worker draait in een eigen proces met een eigen database verbinding, net als met --workers.
+        Dit kan niet binnen een TestCase, want dan ziet een andere verbinding de test data niet.
+    """
+
+    aantal_plekken = 20
+    aantal_inschrijvingen = 30
+
+    def setUp(self):
+        """ initialisatie van de test case """
+        # onthoud wat er al in de database staat, zodat we alleen onze eigen records opruimen
+        # (niet op hoogste pk, want Vereniging en Sporter gebruiken het ver_nr / lid_nr als pk)
+        self._bestaande_pks = dict()
+        for model in OPRUIMEN_MODELLEN:
+            self._bestaande_pks[model] = set(model.objects.values_list('pk', flat=True))
+        # for
+
+    def _fixture_teardown(self):
+        # TransactionTestCase gooit normaal alle tabellen leeg
+        # dat verwijdert ook de records die door de (squashed) migraties aangemaakt zijn en die
+        # de andere tests nodig hebben, dus ruimen we alleen onze eigen records op
+        self._opruimen()
+
+    def _opruimen(self):
+        for model in OPRUIMEN_MODELLEN:
+            model.objects.exclude(pk__in=self._bestaande_pks[model]).delete()
+        # for
+
+    def _maak_inschrijvingen(self):
+        """ maak een wedstrijd met 1 sessie en meer inschrijvingen (elk van een ander account) dan er plekken zijn
+            voor elke inschrijving wordt een mutatie aangemaakt, zoals de website dat doet
+        """
+        ver = Vereniging(
+                    ver_nr=1000,
+                    naam="Grote Club",
+                    regio=Regio.objects.get(regio_nr=112))
+        ver.save()
+
+        locatie = WedstrijdLocatie(
+                        naam='Test locatie',
+                        plaats='Boogstad')
+        locatie.save()
+
+        datum = timezone.now() + datetime.timedelta(days=31)
+
+        wedstrijd = Wedstrijd(
+                        titel='Test wedstrijd',
+                        status=WEDSTRIJD_STATUS_GEACCEPTEERD,
+                        datum_begin=datum,
+                        datum_einde=datum,
+                        organiserende_vereniging=ver,
+                        locatie=locatie,
+                        verkoopvoorwaarden_status_acceptatie=True,
+                        prijs_euro_normaal=Decimal(10.0),
+                        prijs_euro_onder18=Decimal(10.0))
+        wedstrijd.save()
+
+        sessie = WedstrijdSessie(
+                        datum=datum,
+                        tijd_begin='09:00',
+                        tijd_einde='15:00',
+                        max_sporters=self.aantal_plekken)
+        sessie.save()
+        wedstrijd.sessies.add(sessie)
+
+        boog_r = BoogType.objects.get(afkorting='R')
+        klasse = KalenderWedstrijdklasse.objects.get(volgorde=110)    # R50+ gemengd
+
+        for lid_nr in range(100000, 100000 + self.aantal_inschrijvingen):
+            account = Account(username=str(lid_nr))
+            account.save()
+
+            sporter = Sporter(
+                        lid_nr=lid_nr,
+                        voornaam='Test',
+                        achternaam='Sporter %s' % lid_nr,
+                        geboorte_datum='1988-08-08',
+                        sinds_datum='2020-02-20',
+                        account=account,
+                        bij_vereniging=ver)
+            sporter.save()
+
+            sporterboog = SporterBoog(
+                            sporter=sporter,
+                            boogtype=boog_r,
+                            voor_wedstrijd=True)
+            sporterboog.save()
+
+            inschrijving = WedstrijdInschrijving(
+                                wanneer=timezone.now(),
+                                status=WEDSTRIJD_INSCHRIJVING_STATUS_RESERVERING_MANDJE,
+                                wedstrijd=wedstrijd,
+                                sessie=sessie,
+                                sporterboog=sporterboog,
+                                wedstrijdklasse=klasse,
+                                koper=account)
+            inschrijving.save()
+
+            BestellingMutatie(
+                    code=BESTELLING_MUTATIE_WEDSTRIJD_INSCHRIJVEN,
+                    account=account,
+                    product_pk=inschrijving.pk).save()
+        # for
+
+        return sessie
+
+    @staticmethod
+    def _start_worker(shard_nr, aantal_workers):
+        """ start een worker in een kind-proces; geeft de pid terug """
+        args = [BESTEL_MUTATIES_COMMAND, '1', '--quick']
+        if aantal_workers > 1:
+            args.append('--shard=%s/%s' % (shard_nr, aantal_workers))
+
+        pid = os.fork()
+        if pid == 0:                    # pragma: no cover
+            # kind-proces
+            exit_code = 1
+            try:
+                f1 = io.StringIO()
+                f2 = io.StringIO()
+                management.call_command(*args, stderr=f1, stdout=f2)
+                exit_code = 2 if '[ERROR]' in f1.getvalue() + f2.getvalue() else 0
+            finally:
+                connections.close_all()
+                os._exit(exit_code)
+
+        return pid
+
+    def _verwerk_parallel(self, aantal_workers):
+        """ verwerk alle mutaties met het gevraagde aantal parallelle workers """
+        # elk kind-proces moet een eigen database verbinding opzetten
+        connections.close_all()
+
+        pids = [self._start_worker(shard_nr, aantal_workers) for shard_nr in range(aantal_workers)]
+        for pid in pids:
+            _, status = os.waitpid(pid, 0)
+            self.assertEqual(os.waitstatus_to_exitcode(status), 0)
+        # for
+
+    def test_geen_overboeking(self):
+        # meer aanmeldingen dan plekken; parallelle workers mogen de sessie niet overboeken
+        # (alleen de juistheid wordt getest: met --quick draait elke worker een vaste tijd)
+        for aantal_workers in (1, 2, 4):
+            sessie = self._maak_inschrijvingen()
+
+            self._verwerk_parallel(aantal_workers)
+
+            self.assertEqual(BestellingMutatie.objects.filter(is_verwerkt=False).count(), 0)
+
+            # precies zoveel reserveringen als er plekken zijn
+            sessie.refresh_from_db()
+            self.assertEqual(sessie.aantal_inschrijvingen, self.aantal_plekken)
+            self.assertEqual(WedstrijdInschrijving.objects.filter(sessie=sessie).count(), self.aantal_plekken)
+            self.assertEqual(WedstrijdInschrijving.objects.filter(sessie=sessie,
+                                                                  bestelling_regel=None).count(), 0)
+
+            # elke reservering ligt in het mandje van de koper
+            self.assertEqual(BestellingMandje.regels.through.objects.count(), self.aantal_plekken)
+            for inschrijving in WedstrijdInschrijving.objects.filter(sessie=sessie).select_related('koper'):
+                mandje = BestellingMandje.objects.get(account=inschrijving.koper)
+                self.assertEqual(list(mandje.regels.all()), [inschrijving.bestelling_regel])
+            # for
+
+            # opruimen voor de volgende ronde
+            self._opruimen()
+        # for
+
+
+# end of file
@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
 
-#  Copyright (c) 2021-2025 Ramon van der Winkel.
+#  Copyright (c) 2021-2026 Ramon van der Winkel.
 #  All rights reserved.
 #  Licensed under BSD-3-Clause-Clear. See LICENSE file for details.
 
@@ -10,7 +10,6 @@ from Betaal.definities import BETAAL_MUTATIE_START_ONTVANGST, BETAAL_MUTATIE_PAY
 from Betaal.models import BetaalMutatie
 from Site.core.background_sync import BackgroundSync
 import datetime
-import time
 
 
 """ Interface naar de achtergrondtaak, waar de mutaties uitgevoerd worden zonder concurrency gevaren """
@@ -25,15 +24,10 @@ def _betaal_ping_achtergrondtaak(mutatie, snel):
     betaal_mutaties_ping.ping()
 
     if not snel:  # pragma: no cover
-        # wacht maximaal 3 seconden tot de mutatie uitgevoerd is
-        interval = 0.2  # om steeds te verdubbelen
-        total = 0.0  # om een limiet te stellen
-        while not mutatie.is_verwerkt and total + interval <= 3.0:
-            time.sleep(interval)
-            total += interval  # 0.0 --> 0.2, 0.6, 1.4, 3.0
-            interval *= 2  # 0.2 --> 0.4, 0.8, 1.6, 3.2
-            mutatie = BetaalMutatie.objects.get(pk=mutatie.pk)
-        # while
+        # wacht maximaal 3 seconden tot de achtergrondtaak meldt dat de mutatie verwerkt is
+        betaal_mutaties_ping.wacht_op_verwerkt(
+                mutatie.pk,
+                lambda: BetaalMutatie.objects.filter(pk=mutatie.pk, is_verwerkt=True).exists())
 
 
 def betaal_mutatieverzoek_start_ontvangst(bestelling, beschrijving, bedrag_euro, url_betaling_gedaan, snel):
@@ -8,12 +8,9 @@
     deze komen binnen via BetaalMutatie
 """
 
-from django.db import connection
 from django.conf import settings
 from django.urls import reverse
 from django.utils import timezone
-from django.db.utils import OperationalError, IntegrityError, DEFAULT_DB_ALIAS
-from django.core.management.base import BaseCommand
 from Bestelling.operations import bestel_mutatieverzoek_betaling_afgerond, bestel_betaling_is_gestart
 from Betaal.definities import (BETAAL_MUTATIE_START_ONTVANGST, BETAAL_MUTATIE_START_RESTITUTIE,
                                BETAAL_MUTATIE_PAYMENT_STATUS_CHANGED, BETAAL_PAYMENT_STATUS_MAXLENGTH,
@@ -22,41 +19,41 @@ from Betaal.definities import (BETAAL_MUTATIE_START_ONTVANGST, BETAAL_MUTATIE_ST
                                BETAAL_CHECKOUT_URL_MAXLENGTH,
                                TRANSACTIE_TYPE_MOLLIE_PAYMENT)
 from Betaal.models import BetaalMutatie, BetaalActief, BetaalInstellingenVereniging, BetaalTransactie
-from Mailer.operations import mailer_notify_internal_error
-from Site.core.background_sync import BackgroundSync
+from Site.core.mutatie_daemon import MutatieDaemonCommand
 from mollie.api.client import Client, RequestSetupError, RequestError
 from mollie.api.error import ResponseError, ResponseHandlingError
 from mollie.api.objects.payment import Payment
 from decimal import Decimal, DecimalException
-import traceback
 import datetime
 import json
-import sys
 
 # maximum aantal pogingen om een mutatie te verwerken
 MAX_POGINGEN = 5
 
+# hoe lang de instellingen van de bond hergebruikt worden
+INSTELLINGEN_BOND_MAX_LEEFTIJD = datetime.timedelta(hours=1)
 
-class Command(BaseCommand):
-    help = "Betaal mutaties verwerken"
 
-    def __init__(self, stdout=None, stderr=None, no_color=False, force_color=False):
-        super().__init__(stdout, stderr, no_color, force_color)
+class Command(MutatieDaemonCommand):
+    help = "Betaal mutaties verwerken"
 
-        self.stop_at = datetime.datetime.now()
+    taak_naam = 'betaal_mutaties'
+    mutatie_model = BetaalMutatie
+    mutatie_select_related = ('ontvanger',)
+    mutatie_vaste_relaties = ('ontvanger',)
+    sync_poort_setting = 'BACKGROUND_SYNC__BETAAL_MUTATIES'
+    max_pogingen = MAX_POGINGEN
+    tel_elke_poging = True          # een Mollie verzoek kan slagen terwijl de verwerking daarna faalt
 
-        self._sync = BackgroundSync(settings.BACKGROUND_SYNC__BETAAL_MUTATIES)
-        self._count_ping = 0
+    # wacht niet op Mollie met een open transactie: verwerk de mutaties 1 voor 1, zonder transactie
+    verwerk_buiten_transactie = True
 
-        self._hoogste_mutatie_pk = None
+    def __init__(self, stdout=None, stderr=None, no_color=False, force_color=False):
+        super().__init__(stdout, stderr, no_color, force_color)
 
-        # cache de redelijke statische instellingen (voor 1 uur)
-        try:
-            self._instellingen_bond = (BetaalInstellingenVereniging
-                                       .objects
-                                       .get(vereniging__ver_nr=settings.BETAAL_VIA_BOND_VER_NR))
-        except BetaalInstellingenVereniging.DoesNotExist:
-            self._instellingen_bond = None
+        # redelijk statische instellingen, worden geladen in voorbereiden()
+        self._instellingen_bond = None
+        self._instellingen_bond_geladen = None
 
         # maak de Mollie-client instantie aan
         # de API key zetten we later, afhankelijk van de vereniging waar we deze transactie voor doen
@@ -73,6 +70,28 @@ class Command(BaseCommand):
 
         self._mollie_webhook_url = ""
 
+    def _laad_instellingen_bond(self):
+        try:
+            self._instellingen_bond = (BetaalInstellingenVereniging
+                                       .objects
+                                       .get(vereniging__ver_nr=settings.BETAAL_VIA_BOND_VER_NR))
+        except BetaalInstellingenVereniging.DoesNotExist:
+            self._instellingen_bond = None
+
+        self._instellingen_bond_geladen = timezone.now()
+
+    def _get_instellingen_bond(self):
+        # cache de redelijk statische instellingen (voor 1 uur)
+        # met --forever blijft een worker lang actief, dus periodiek opnieuw laden
+        if timezone.now() - self._instellingen_bond_geladen > INSTELLINGEN_BOND_MAX_LEEFTIJD:
+            self._laad_instellingen_bond()
+        return self._instellingen_bond
+
+    def voorbereiden(self):
+        # elke worker laadt de instellingen zelf
+        # (niet in __init__, want dan erven alle workers de kopie van de supervisor)
+        self._laad_instellingen_bond()
+
     def _get_mollie_webhook_url(self, url_betaling_gedaan):
         if not self._mollie_webhook_url:
             # dynamische url voor LiveServerTestCase
@@ -83,19 +102,11 @@ class Command(BaseCommand):
             self._mollie_webhook_url = site_url + reverse('Betaal:mollie-webhook')
         return self._mollie_webhook_url
 
-    def add_arguments(self, parser):
-        parser.add_argument('duration', type=int,
-                            choices=(1, 2, 5, 7, 10, 15, 20, 30, 45, 60),
-                            help="Maximum aantal minuten actief blijven")
-        parser.add_argument('--stop_exactly', type=int, default=None, choices=range(60),
-                            help="Stop op deze minuut")
-        parser.add_argument('--quick', action='store_true')                 # for testing
-        parser.add_argument('--use-test-database', action='store_true')     # for testing
-
     def _verwerk_mutatie_start_ontvangst(self, mutatie: BetaalMutatie):
         instellingen = mutatie.ontvanger
-        if instellingen.akkoord_via_bond and self._instellingen_bond:
-            instellingen = self._instellingen_bond
+        instellingen_bond = self._get_instellingen_bond()
+        if instellingen.akkoord_via_bond and instellingen_bond:
+            instellingen = instellingen_bond
 
         beschrijving = mutatie.beschrijving
         bedrag_euro_str = str(mutatie.bedrag_euro)      # moet decimale punt geven
@@ -362,8 +373,9 @@ class Command(BaseCommand):
             # schakel de Mollie client over op de API key van deze vereniging
             # als de betaling via de bond loopt, dan zijn dit al de instellingen van de bond
             instellingen = actief.ontvanger
-            if instellingen.akkoord_via_bond and self._instellingen_bond:
-                instellingen = self._instellingen_bond
+            instellingen_bond = self._get_instellingen_bond()
+            if instellingen.akkoord_via_bond and instellingen_bond:
+                instellingen = instellingen_bond
 
             try:
                 self._mollie_client.set_api_key(instellingen.mollie_api_key)
@@ -461,7 +473,7 @@ class Command(BaseCommand):
                                 actief.log += 'Betaling is mislukt\n\n'
                                 actief.save(update_fields=['log'])
 
-    def _verwerk_mutatie(self, mutatie: BetaalMutatie):
+    def verwerk_mutatie(self, mutatie: BetaalMutatie):
         code = mutatie.code
 
         if code == BETAAL_MUTATIE_START_ONTVANGST:
@@ -479,169 +491,6 @@ class Command(BaseCommand):
         else:
             self.stdout.write('[ERROR] Onbekende mutatie code %s (pk=%s)' % (code, mutatie.pk))
 
-    def _verwerk_nieuwe_mutaties(self):
-        begin = datetime.datetime.now()
-
-        try:
-            mutatie_latest = BetaalMutatie.objects.latest('pk')
-        except BetaalMutatie.DoesNotExist:      # pragma: no cover
-            # alle mutatie records zijn verwijderd
-            return
-        # als hierna een extra mutatie aangemaakt wordt dan verwerken we een record
-        # misschien dubbel, maar daar kunnen we tegen
-
-        if self._hoogste_mutatie_pk is not None:
-            # gebruik deze informatie om te filteren
-            self.stdout.write('[INFO] vorige hoogste BetaalMutatie pk is %s' % self._hoogste_mutatie_pk)
-            qset = (BetaalMutatie
-                    .objects
-                    .filter(pk__gt=self._hoogste_mutatie_pk))
-        else:
-            qset = (BetaalMutatie
-                    .objects
-                    .filter(is_verwerkt=False,
-                            pogingen__lt=MAX_POGINGEN))
-
-        mutatie_pks = qset.values_list('pk', flat=True)     # deferred
-
-        self._hoogste_mutatie_pk = mutatie_latest.pk
-
-        work_count = 0
-        for pk in mutatie_pks:
-            # we halen de records hier 1 voor 1 op
-            # zodat we verse informatie hebben inclusief de vorige mutatie
-            # en zodat we 1 plek hebben voor select/prefetch
-            mutatie = (BetaalMutatie
-                       .objects
-                       .select_related('ontvanger')
-                       .get(pk=pk))
-
-            if not mutatie.is_verwerkt and mutatie.pogingen < MAX_POGINGEN:
-                mutatie.pogingen += 1
-                mutatie.save(update_fields=['pogingen'])
-
-                self._verwerk_mutatie(mutatie)
-
-                mutatie.is_verwerkt = True
-                mutatie.save(update_fields=['is_verwerkt'])
-                work_count += 1
-        # for
-
-        if work_count:
-            self.stdout.write('[INFO] nieuwe hoogste BetaalMutatie pk is %s' % self._hoogste_mutatie_pk)
-
-            klaar = datetime.datetime.now()
-            self.stdout.write('[INFO] %s BetaalMutaties verwerkt in %s seconden' % (work_count, klaar - begin))
-
-    def _monitor_nieuwe_mutaties(self):
-        # monitor voor nieuwe mutaties
-        mutatie_count = 0      # moet 0 zijn: beschermd tegen query op lege mutatie tabel
-        now = datetime.datetime.now()
-        while now < self.stop_at:                   # pragma: no branch
-            # self.stdout.write('tick')
-            new_count = BetaalMutatie.objects.count()
-            if new_count != mutatie_count:
-                mutatie_count = new_count
-                if mutatie_count:
-                    self._verwerk_nieuwe_mutaties()
-                now = datetime.datetime.now()
-
-            # wacht 5 seconden voordat we opnieuw in de database kijken
-            # het wachten kan onderbroken worden door een ping, als er een nieuwe mutatie toegevoegd is
-            secs = (self.stop_at - now).total_seconds()
-            if secs > 1:                                    # pragma: no branch
-                timeout = min(5.0, secs)
-                if self._sync.wait_for_ping(timeout):       # pragma: no branch
-                    self._count_ping += 1                   # pragma: no cover
-            else:
-                # near the end
-                break       # from the while                # pragma: no cover
-
-            now = datetime.datetime.now()
-        # while
-
-    def _set_stop_time(self, **options):
-        # bepaal wanneer we moeten stoppen (zoals gevraagd)
-        duration = options['duration']
-        stop_minute = options['stop_exactly']
-
-        now = datetime.datetime.now()
-        self.stop_at = now + datetime.timedelta(minutes=duration)
-
-        if isinstance(stop_minute, int):
-            delta = stop_minute - now.minute
-            if delta < 0:
-                delta += 60
-            if delta != 0:    # avoid stopping in start minute
-                stop_at_exact = now + datetime.timedelta(minutes=delta)
-                stop_at_exact -= datetime.timedelta(seconds=self.stop_at.second,
-                                                    microseconds=self.stop_at.microsecond)
-                self.stdout.write('[INFO] Calculated stop at is %s' % stop_at_exact)
-                if stop_at_exact < self.stop_at:
-                    # run duration passes the requested stop minute
-                    self.stop_at = stop_at_exact
-
-        if options['quick']:        # pragma: no branch
-            # test moet snel stoppen dus interpreteer duration in seconden
-            if options['duration'] == 60:
-                # speciale testcase
-                self._hoogste_mutatie_pk = 0
-                duration = 2
-            self.stop_at = (datetime.datetime.now()
-                            + datetime.timedelta(seconds=duration))
-
-        self.stdout.write('[INFO] {betaal_mutaties} Taak loopt tot %s' % str(self.stop_at))
-
-    def handle(self, *args, **options):
-
-        if options['use_test_database']:                    # pragma: no cover
-            # voor gebruik tijdens browser tests
-            connection.close()
-            test_database_name = "test_" + settings.DATABASES[DEFAULT_DB_ALIAS]["NAME"]
-            settings.DATABASES[DEFAULT_DB_ALIAS]["NAME"] = test_database_name
-            connection.settings_dict["NAME"] = test_database_name
-
-        self._set_stop_time(**options)
-
-        # vang generieke fouten af
-        try:
-            self._monitor_nieuwe_mutaties()
-        except (OperationalError, IntegrityError) as exc:  # pragma: no cover
-            # OperationalError treed op bij system shutdown, als database gesloten wordt
-            _, _, tb = sys.exc_info()
-            lst = traceback.format_tb(tb)
-            self.stderr.write('[ERROR] Onverwachte database fout in betaal_mutaties: %s' % str(exc))
-            self.stderr.write('Traceback:')
-            self.stderr.write(''.join(lst))
-
-        except KeyboardInterrupt:                       # pragma: no cover
-            pass
-
-        except Exception as exc:
-            # schrijf in de output
-            tups = sys.exc_info()
-            lst = traceback.format_tb(tups[2])
-            tb = traceback.format_exception(*tups)
-
-            tb_msg_start = 'Onverwachte fout tijdens betaal_mutaties\n'
-            tb_msg_start += '\n'
-
-            self.stderr.write('[ERROR] Onverwachte fout (%s) tijdens betaal_mutaties: %s' % (type(exc), str(exc)))
-            self.stderr.write('Traceback:')
-            self.stderr.write(''.join(lst))
-
-            # stuur een mail naar de ontwikkelaars
-            # reduceer tot de nuttige regels
-            tb = [line for line in tb if '/site-packages/' not in line]
-            tb_msg = tb_msg_start + '\n'.join(tb)
-
-            # deze functie stuurt maximaal 1 mail per dag over hetzelfde probleem
-            mailer_notify_internal_error(tb_msg)
-
-        self.stdout.write('[DEBUG] Aantal pings ontvangen: %s' % self._count_ping)
-
-        self.stdout.write('Klaar')
-
 
 """
     performance debug helper:
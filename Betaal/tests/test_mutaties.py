@@ -5,6 +5,7 @@
 #  Licensed under BSD-3-Clause-Clear. See LICENSE file for details.
 
 from django.conf import settings
+from django.db import connection
 from django.test import TestCase, override_settings
 from Betaal.definities import TRANSACTIE_TYPE_MOLLIE_RESTITUTIE, TRANSACTIE_TYPE_MOLLIE_PAYMENT
 from Betaal.models import BetaalMutatie, BetaalActief, BetaalTransactie, BetaalInstellingenVereniging
@@ -16,6 +17,8 @@ from TestHelpers.e2ehelpers import E2EHelpers
 from Vereniging.models import Vereniging
 from decimal import Decimal
 from mollie.api.client import Client
+from mollie.api.resources.payments import Payments
+from unittest.mock import patch
 import datetime
 import time
 
@@ -112,10 +115,23 @@ class TestBetaalMutaties(E2EHelpers, TestCase):
         self.assertFalse(mutatie.is_verwerkt)
         self.assertEqual(BetaalActief.objects.count(), 0)
 
-        self._run_achtergrondtaak()
+        # het verzoek aan Mollie wordt gedaan zonder dat de achtergrondtaak een transactie open heeft
+        # (de test zelf draait wel in een transactie)
+        aantal_blocks = len(connection.atomic_blocks)
+        tijdens_create = list()
+        create = Payments.create
+
+        def create_met_check(*args, **kwargs):
+            tijdens_create.append(len(connection.atomic_blocks))
+            return create(*args, **kwargs)
+
+        with patch.object(Payments, 'create', create_met_check):
+            self._run_achtergrondtaak()
+        self.assertEqual(tijdens_create, [aantal_blocks])
 
         mutatie = BetaalMutatie.objects.get(pk=mutatie.pk)
         self.assertTrue(mutatie.is_verwerkt)
+        self.assertEqual(mutatie.pogingen, 1)
 
         self.assertEqual(BetaalActief.objects.count(), 1)
         actief = BetaalActief.objects.first()
@@ -5,6 +5,7 @@
 #  Licensed under BSD-3-Clause-Clear. See LICENSE file for details.
 
 from django.conf import settings
+from django.core.cache import caches
 from django.utils import timezone
 from django.utils.formats import date_format
 from BasisTypen.definities import GESLACHT_ANDERS
@@ -16,7 +17,9 @@ from Sporter.leeftijdsklassen import (bereken_leeftijdsklasse_wa,
 from Sporter.operations import get_sporter_voorkeuren
 from PIL import Image, ImageFont, ImageDraw
 from PIL.TiffImagePlugin import ImageFileDirectory_v2
+import functools
 import datetime
+import hashlib
 import io
 from os import path as os_path
 
@@ -25,6 +28,12 @@ EXIF_TAG_COPYRIGHT = 0x8298
 EXIF_TAG_TITLE = 0x010D     # DocumentName
 # EXIF_TAG_TITLE = 0x010E     # ImageDescription
 
+# hoe lang een gemaakte bondspas in de cache blijft
+BONDSPAS_CACHE_TIMEOUT = 7 * 24 * 3600      # in seconden
+
+# achtergrond plaatjes, 1x per proces ingelezen (opnieuw als het bestand vervangen is)
+_achtergrond_cache = dict()     # [jaar_pas] = (Image, mtime)
+
 
 def bepaal_jaar_bondspas() -> int:
     """ bepaal het jaar voor op de bondspas """
@@ -233,18 +242,46 @@ def plaatje_teken_barcode(lid_nr, draw, begin_x, end_y, font):
     # for
 
 
-def plaatje_teken(jaar_pas, regels):
+@functools.lru_cache(maxsize=None)
+def _get_font(fpath, size):
+    """ lever een font; elk font wordt 1x per proces ingelezen """
+    return ImageFont.truetype(fpath, size=size)
 
+
+def _get_achtergrond(jaar_pas):
+    """ lever het achtergrond plaatje en de modificatie tijd van het bestand
+        het plaatje wordt 1x per proces ingelezen en gedecodeerd
+        de modificatie tijd wordt elke keer opgevraagd, zodat een vervangen plaatje opnieuw ingelezen wordt
+    """
     fpath = os_path.join(settings.INSTALL_PATH, 'Bondspas', 'files', 'achtergrond_bondspas-%s.jpg' % jaar_pas)
-    image = Image.open(fpath)
+    mtime = os_path.getmtime(fpath)
+
+    try:
+        image, cache_mtime = _achtergrond_cache[jaar_pas]
+    except KeyError:
+        cache_mtime = None
+
+    if cache_mtime != mtime:
+        image = Image.open(fpath)
+        image.load()
+        _achtergrond_cache[jaar_pas] = (image, mtime)
+
+    return image, mtime
+
+
+def plaatje_teken(jaar_pas, regels):
+
+    # teken op een kopie, zodat het ingelezen plaatje herbruikbaar blijft
+    image, _ = _get_achtergrond(jaar_pas)
+    image = image.copy()
 
     _, _, width, height = image.getbbox()
     # standard size = 1418 x 2000
 
     draw = ImageDraw.Draw(image)
-    font = ImageFont.truetype(settings.BONDSPAS_FONT, size=40)
-    font_bold = ImageFont.truetype(settings.BONDSPAS_FONT_BOLD, size=45)
-    font_bold_groter = ImageFont.truetype(settings.BONDSPAS_FONT_BOLD, size=55)
+    font = _get_font(settings.BONDSPAS_FONT, 40)
+    font_bold = _get_font(settings.BONDSPAS_FONT_BOLD, 45)
+    font_bold_groter = _get_font(settings.BONDSPAS_FONT_BOLD, 55)
     color_black = (0, 0, 0)
     # color_grijs = (221, 217, 215)       # reverse engineered
 
@@ -314,8 +351,8 @@ def plaatje_teken(jaar_pas, regels):
     plaatje_teken_barcode(lid_nr, draw, witte_kader_x2 - 480, witte_kader_y_midden + 70, font)
 
     # switch naar een kleiner font
-    font = ImageFont.truetype(settings.BONDSPAS_FONT, size=40)
-    font_bold = ImageFont.truetype(settings.BONDSPAS_FONT_BOLD, size=40)
+    font = _get_font(settings.BONDSPAS_FONT, 40)
+    font_bold = _get_font(settings.BONDSPAS_FONT_BOLD, 40)
     _, _, _, text_height = draw.textbbox((0, 0), lid_nr, font=font)
 
     text_spacing = text_height + 15
@@ -363,11 +400,7 @@ def plaatje_teken(jaar_pas, regels):
     return image
 
 
-def maak_bondspas_jpeg_en_pdf(jaar_pas, lid_nr, regels):
-
-    image = plaatje_teken(jaar_pas, regels)
-
-    # maak de JPEG
+def _maak_jpeg(image, jaar_pas, lid_nr):
     ifd = ImageFileDirectory_v2()
     ifd[EXIF_TAG_COPYRIGHT] = "Koninklijke HandboogSport Nederland (KHSN)"
     ifd[EXIF_TAG_TITLE] = "Bondspas %s voor lid %s" % (jaar_pas, lid_nr)
@@ -383,9 +416,10 @@ def maak_bondspas_jpeg_en_pdf(jaar_pas, lid_nr, regels):
             exif=exif_bytes,
             quality='web_medium')
     jpeg.seek(0)
-    out_jpeg = jpeg.getvalue()
+    return jpeg.getvalue()
+
 
-    # maak de PDF
+def _maak_pdf(image, jaar_pas, lid_nr):
     px_w, px_h = image.size
     # height = 2000 pixels
     # target: A6 = 105 x 148 mm == 1.434 x 5.827 inch
@@ -401,9 +435,39 @@ def maak_bondspas_jpeg_en_pdf(jaar_pas, lid_nr, regels):
             creator="%s - %s" % (settings.AFSCHRIFT_SITE_NAAM, settings.AFSCHRIFT_SITE_URL),
             subject="Bondspas %s voor lid %s" % (jaar_pas, lid_nr))
     pdf.seek(0)
-    out_pdf = pdf.getvalue()
+    return pdf.getvalue()
+
+
+def _cache_key(formaat, jaar_pas, lid_nr, regels):
+    """ de sleutel is een hash over alles wat op de pas komt
+        na een wijziging van de gegevens van het lid (bijvoorbeeld door de CRM import) veranderen de regels
+        en daarmee de sleutel, dus een verouderde pas wordt nooit meer opgehaald
+    """
+    _, mtime = _get_achtergrond(jaar_pas)
+    data = repr((jaar_pas, lid_nr, regels, mtime)).encode('utf-8')
+    return 'bondspas:%s:%s' % (formaat, hashlib.sha256(data).hexdigest())
+
+
+def _maak_bondspas(formaat, maak_functie, jaar_pas, lid_nr, regels):
+    # eigen cache, zodat de grote plaatjes de gedeelde cache niet vullen
+    cache = caches['bondspas']
+    key = _cache_key(formaat, jaar_pas, lid_nr, regels)
+    data = cache.get(key)
+    if data is None:
+        image = plaatje_teken(jaar_pas, regels)
+        data = maak_functie(image, jaar_pas, lid_nr)
+        cache.set(key, data, BONDSPAS_CACHE_TIMEOUT)
+    return data
+
+
+def maak_bondspas_jpeg(jaar_pas, lid_nr, regels):
+    """ lever de bondspas als JPEG; wordt alleen gemaakt als deze niet in de cache staat """
+    return _maak_bondspas('jpeg', _maak_jpeg, jaar_pas, lid_nr, regels)
+
 
-    return out_jpeg, out_pdf
+def maak_bondspas_pdf(jaar_pas, lid_nr, regels):
+    """ lever de bondspas als PDF; wordt alleen gemaakt als deze niet in de cache staat """
+    return _maak_bondspas('pdf', _maak_pdf, jaar_pas, lid_nr, regels)
 
 
 # end of file
@@ -4,9 +4,11 @@
 #  All rights reserved.
 #  Licensed under BSD-3-Clause-Clear. See LICENSE file for details.
 
+from django.core.cache import caches
 from django.test import TestCase
-from Bondspas.operations import bepaal_jaar_bondspas, maak_bondspas_regels
+from Bondspas.operations import bepaal_jaar_bondspas, maak_bondspas_regels, maak_bondspas_jpeg, maak_bondspas_pdf
 from Bondspas.models import BondspasJaar
+import Bondspas.operations as bondspas_operations
 from Geo.models import Regio
 from Opleiding.models import OpleidingDiploma
 from Sporter.models import Sporter, Speelsterkte
@@ -163,5 +165,40 @@ class TestBondspasOperations(E2EHelpers, TestCase):
 
         self.assertTrue(('Speelsterkte', 'R1000, RM1100, TS1150') in regels)
 
+    def test_cache(self):
+        caches['bondspas'].clear()
+        regels = [('lid_nr', '123456'), ('WA_id', ''), ('Naam', 'Tester (M)')]
+
+        with patch('Bondspas.operations.plaatje_teken', wraps=bondspas_operations.plaatje_teken) as mock_teken:
+            jpeg1 = maak_bondspas_jpeg(self.bondspas_jaar1, 123456, regels)
+            self.assertEqual(mock_teken.call_count, 1)
+            self.assertTrue(jpeg1.startswith(b'\xff\xd8'))
+
+            # tweede keer uit de cache
+            jpeg2 = maak_bondspas_jpeg(self.bondspas_jaar1, 123456, regels)
+            self.assertEqual(mock_teken.call_count, 1)
+            self.assertEqual(jpeg1, jpeg2)
+
+            # pdf wordt pas gemaakt als er om gevraagd wordt
+            pdf = maak_bondspas_pdf(self.bondspas_jaar1, 123456, regels)
+            self.assertEqual(mock_teken.call_count, 2)
+            self.assertTrue(pdf.startswith(b'%PDF'))
+
+            # andere gegevens geeft een nieuwe pas
+            regels[2] = ('Naam', 'Tester (V)')
+            jpeg3 = maak_bondspas_jpeg(self.bondspas_jaar1, 123456, regels)
+            self.assertEqual(mock_teken.call_count, 3)
+            self.assertNotEqual(jpeg1, jpeg3)
+
+            # vervangen achtergrond plaatje geeft een nieuwe pas
+            with patch('Bondspas.operations.os_path.getmtime', return_value=1.0):
+                jpeg4 = maak_bondspas_jpeg(self.bondspas_jaar1, 123456, regels)
+            self.assertEqual(mock_teken.call_count, 4)
+            self.assertEqual(jpeg3, jpeg4)
+        # with
+
+        # zet de cache van het achtergrond plaatje terug
+        bondspas_operations._achtergrond_cache.clear()
+
 
 # end of file
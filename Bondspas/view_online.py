@@ -10,7 +10,7 @@ from django.shortcuts import render, reverse
 from django.views.generic import View
 from django.contrib.auth.mixins import UserPassesTestMixin
 from Account.models import get_account
-from Bondspas.operations import bepaal_jaar_bondspas, maak_bondspas_regels, maak_bondspas_jpeg_en_pdf
+from Bondspas.operations import bepaal_jaar_bondspas, maak_bondspas_regels, maak_bondspas_jpeg, maak_bondspas_pdf
 from Functie.definities import Rol
 from Functie.rol import rol_get_huidige, rol_get_huidige_functie
 from Sporter.models import Sporter, get_sporter
@@ -100,7 +100,7 @@ class DynamicBondspasOphalenView(UserPassesTestMixin, View):
 
         jaar_pas = bepaal_jaar_bondspas()
         regels = maak_bondspas_regels(sporter, jaar_pas)
-        img_data, _ = maak_bondspas_jpeg_en_pdf(jaar_pas, sporter.lid_nr, regels)
+        img_data = maak_bondspas_jpeg(jaar_pas, sporter.lid_nr, regels)
 
         # base64 is nodig voor img in html
         # alternatief is javascript laten tekenen op een canvas en base64 maken met dataToUrl
@@ -130,7 +130,7 @@ class DynamicBondspasDownloadView(UserPassesTestMixin, View):
 
         jaar_pas = bepaal_jaar_bondspas()
         regels = maak_bondspas_regels(sporter, jaar_pas)
-        _, pdf_data = maak_bondspas_jpeg_en_pdf(jaar_pas, sporter.lid_nr, regels)
+        pdf_data = maak_bondspas_pdf(jaar_pas, sporter.lid_nr, regels)
 
         fname = 'bondspas_%s_%s.pdf' % (sporter.lid_nr, jaar_pas)
 
@@ -171,7 +171,7 @@ class ToonBondspasBeheerderView(UserPassesTestMixin, View):
 
         jaar_pas = bepaal_jaar_bondspas()
         regels = maak_bondspas_regels(sporter, jaar_pas)
-        img_data, _ = maak_bondspas_jpeg_en_pdf(jaar_pas, sporter.lid_nr, regels)
+        img_data = maak_bondspas_jpeg(jaar_pas, sporter.lid_nr, regels)
 
         # base64 is nodig voor img in html
         context['bondspas_base64'] = base64.b64encode(img_data).decode()
@@ -201,7 +201,7 @@ class ToonBondspasBeheerderView(UserPassesTestMixin, View):
 
         jaar_pas = bepaal_jaar_bondspas()
         regels = maak_bondspas_regels(sporter, jaar_pas)
-        _, pdf_data = maak_bondspas_jpeg_en_pdf(jaar_pas, sporter.lid_nr, regels)
+        pdf_data = maak_bondspas_pdf(jaar_pas, sporter.lid_nr, regels)
 
         fname = 'bondspas_%s_%s.pdf' % (sporter.lid_nr, jaar_pas)
 
@@ -245,7 +245,7 @@ class ToonBondspasVerenigingView(UserPassesTestMixin, View):
 
         jaar_pas = bepaal_jaar_bondspas()
         regels = maak_bondspas_regels(sporter, jaar_pas)
-        img_data, _ = maak_bondspas_jpeg_en_pdf(jaar_pas, sporter.lid_nr, regels)
+        img_data = maak_bondspas_jpeg(jaar_pas, sporter.lid_nr, regels)
 
         # base64 is nodig voor img in html
         context['bondspas_base64'] = base64.b64encode(img_data).decode()
@@ -278,7 +278,7 @@ class ToonBondspasVerenigingView(UserPassesTestMixin, View):
 
         jaar_pas = bepaal_jaar_bondspas()
         regels = maak_bondspas_regels(sporter, jaar_pas)
-        _, pdf_data = maak_bondspas_jpeg_en_pdf(jaar_pas, sporter.lid_nr, regels)
+        pdf_data = maak_bondspas_pdf(jaar_pas, sporter.lid_nr, regels)
 
         fname = 'bondspas_%s_%s.pdf' % (sporter.lid_nr, jaar_pas)
 
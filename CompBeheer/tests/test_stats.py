@@ -6,12 +6,15 @@
 
 from django.test import TestCase
 from django.utils import timezone
-from Competitie.operations import competities_aanmaken
+from Competitie.models import Competitie, CompetitieStatistiek
+from Competitie.operations import (competities_aanmaken, verhoog_uitslagen_versie,
+                                   werk_competitie_statistiek_bij)
 from Competitie.test_utils.tijdlijn import zet_competitie_fase_regio_prep
 from CompLaagRegio.models import RegioDeelnemer
 from Sporter.models import Sporter
 from TestHelpers.e2ehelpers import E2EHelpers
 from TestHelpers import testdata
+import datetime
 
 
 class TestCompBeheerStats(E2EHelpers, TestCase):
@@ -71,7 +74,9 @@ class TestCompBeheerStats(E2EHelpers, TestCase):
 
         # cornercase: nul alle inschrijvingen
         RegioDeelnemer.objects.all().delete()
-        with self.assert_max_queries(56):
+        verhoog_uitslagen_versie()
+        werk_competitie_statistiek_bij()
+        with self.assert_max_queries(20):
             resp = self.client.get(self.url_statistiek)
         self.assertEqual(resp.status_code, 200)     # 200 = OK
         self.assert_html_ok(resp)
@@ -113,4 +118,66 @@ class TestCompBeheerStats(E2EHelpers, TestCase):
 
         self.e2e_assert_other_http_commands_not_supported(self.url_statistiek)
 
+    def test_momentopname(self):
+        self.e2e_login_and_pass_otp(self.testdata.account_bb)
+        self.e2e_wisselnaarrol_bb()
+
+        # de eerste keer wordt de momentopname gemaakt
+        self.assertEqual(CompetitieStatistiek.objects.count(), 0)
+        resp = self.client.get(self.url_statistiek)
+        self.assertEqual(resp.status_code, 200)     # 200 = OK
+        self.assertEqual(CompetitieStatistiek.objects.count(), 2)
+        stat = CompetitieStatistiek.objects.get(competitie=self.testdata.comp18)
+        self.assertTrue(str(stat) != '')
+        self.assertEqual(stat.data['aantal_indiv'], resp.context['totaal_18m_indiv'])
+        self.assertEqual(stat.data['aantal_teams'], resp.context['totaal_18m_teams'])
+        bijgewerkt = stat.bijgewerkt
+
+        # de tweede keer wordt de momentopname hergebruikt
+        with self.assert_max_queries(20):
+            resp = self.client.get(self.url_statistiek)
+        self.assertEqual(resp.status_code, 200)     # 200 = OK
+        stat.refresh_from_db()
+        self.assertEqual(stat.bijgewerkt, bijgewerkt)
+
+        # na een wijziging van de uitslagen toont de pagina nog de laatste momentopname
+        verhoog_uitslagen_versie([self.testdata.comp18.pk])
+        with self.assert_max_queries(20):
+            resp = self.client.get(self.url_statistiek)
+        self.assertEqual(resp.status_code, 200)     # 200 = OK
+        stat.refresh_from_db()
+        self.assertEqual(stat.bijgewerkt, bijgewerkt)
+
+        # de achtergrondtaak bepaalt de momentopname opnieuw
+        werk_competitie_statistiek_bij()
+        self.assertEqual(CompetitieStatistiek.objects.count(), 2)
+        stat.refresh_from_db()
+        self.assertTrue(stat.bijgewerkt > bijgewerkt)
+        comp = Competitie.objects.get(pk=self.testdata.comp18.pk)
+        self.assertEqual(stat.uitslagen_versie, comp.uitslagen_versie)
+
+        # een verouderde momentopname wordt opnieuw bepaald door de achtergrondtaak
+        RegioDeelnemer.objects.filter(regiocomp__competitie=comp).delete()
+        oud = stat.bijgewerkt - datetime.timedelta(hours=1)
+        CompetitieStatistiek.objects.filter(pk=stat.pk).update(bijgewerkt=oud)
+        werk_competitie_statistiek_bij()
+        stat.refresh_from_db()
+        self.assertTrue(stat.bijgewerkt > oud)
+        self.assertEqual(stat.data['aantal_indiv'], 0)
+
+        # momentopnames van eerdere dagen worden getoond als verloop
+        gisteren = stat.datum - datetime.timedelta(days=1)
+        CompetitieStatistiek.objects.create(competitie=comp,
+                                            datum=gisteren,
+                                            uitslagen_versie=0,
+                                            data={'aantal_indiv': 42, 'aantal_teams': 7})
+        resp = self.client.get(self.url_statistiek)
+        self.assertEqual(resp.status_code, 200)     # 200 = OK
+        self.assert_html_ok(resp)
+        verloop = resp.context['verloop']
+        self.assertEqual(len(verloop), 2)
+        datum, aantallen = verloop[-1]
+        self.assertEqual(datum, gisteren)
+        self.assertEqual(aantallen[:2], [42, 7])
+
 # end of file
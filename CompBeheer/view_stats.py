@@ -6,22 +6,19 @@
 
 from django.urls import reverse
 from django.utils import timezone
-from django.db.models import Count
 from django.views.generic import TemplateView
 from django.utils.safestring import mark_safe
 from django.contrib.auth.mixins import UserPassesTestMixin
-from Competitie.definities import DEELNAME_NEE
-from Competitie.models import Competitie
-from CompLaagBond.models import DeelnemerBK, TeamBK
-from CompLaagRayon.models import DeelnemerRK, TeamRK
-from CompLaagRegio.models import RegioComp, RegioDeelnemer, RegioTeam
+from Competitie.models import Competitie, CompetitieStatistiek
+from Competitie.operations.statistiek import competitie_statistiek_ophalen, tel_unieke_sporters
+from CompLaagRegio.models import RegioComp
 from Functie.definities import Rol
 from Functie.rol import rol_get_huidige
-from Sporter.models import Sporter
-from decimal import Decimal
 
 TEMPLATE_COMPETITIE_STATISTIEK = 'compbeheer/statistiek.dtl'
 
+VERLOOP_AANTAL_DAGEN = 14
+
 
 class CompetitieStatistiekView(UserPassesTestMixin, TemplateView):
     """ Deze view biedt statistiek over de competities """
@@ -34,23 +31,19 @@ class CompetitieStatistiekView(UserPassesTestMixin, TemplateView):
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         self.rol_nu = None
-        self.comp_pks = list()
         self.huidig_jaar = timezone.now().year
-        self.age_group_counts_18m_indiv_rk = dict()
-        self.age_group_counts_25m_indiv_rk = dict()
-        self.age_group_counts_18m_teams_rk = dict()
-        self.age_group_counts_25m_teams_rk = dict()
+        self.data = {'18': dict(), '25': dict()}        # [afstand] = momentopname data
 
     def test_func(self):
         """ called by the UserPassesTestMixin to verify the user has permissions to use this view """
         self.rol_nu = rol_get_huidige(self.request)
         return self.rol_nu in (Rol.ROL_BB, Rol.ROL_BKO, Rol.ROL_RKO, Rol.ROL_RCL)
 
-    def _add_to_age_group(self, age_group_counts: dict, geboorte_jaar: int):
+    def _add_to_age_group(self, age_group_counts: dict, geboorte_jaar: int, aantal: int):
         leeftijd = self.huidig_jaar - geboorte_jaar
         leeftijd = min(leeftijd, 89)  # groep "80 en ouder"
         group = leeftijd // 10
-        age_group_counts[group] += 1
+        age_group_counts[group] += aantal
 
     @staticmethod
     def _make_age_groups(age_group_counts: dict, titel) -> tuple[str, int, list]:
@@ -67,56 +60,29 @@ class CompetitieStatistiekView(UserPassesTestMixin, TemplateView):
 
         return titel, total, age_groups
 
-    def _tel_totalen(self, context, actuele_comps):
-        context['totaal_18m_indiv'] = 0
-        context['aantal_18m_teams_niet_af'] = 0
-
-        context['totaal_25m_indiv'] = 0
-        context['aantal_25m_teams_niet_af'] = 0
-
-        aantal_18m_teams = dict()
-        aantal_25m_teams = dict()
-        for regio_nr in range(101, 116+1):
-            aantal_18m_teams[regio_nr] = 0
-            aantal_25m_teams[regio_nr] = 0
+    def _maak_age_groups(self, afstand: str, naam: str, titel: str):
+        age_group_counts = dict()       # [groep] = aantal
+        for leeftijd in (1, 10, 20, 30, 40, 50, 60, 70, 80):
+            group = leeftijd // 10
+            age_group_counts[group] = 0
         # for
 
-        self.comp_pks = list()
-        for comp in actuele_comps:
-            self.comp_pks.append(comp.pk)
-
-            aantal_indiv = (RegioDeelnemer
-                            .objects
-                            .filter(regiocomp__competitie=comp)
-                            .count())
-
-            floor = Decimal(0.001)
-            aantal_teams_ag_nul = 0
-
-            for values in (RegioTeam
-                           .objects
-                           .filter(regiocomp__competitie=comp)
-                           .values_list('vereniging__regio__regio_nr',
-                                        'aanvangsgemiddelde')):
+        for jaar_str, aantal in self.data[afstand].get('geboortejaar_' + naam, dict()).items():
+            self._add_to_age_group(age_group_counts, int(jaar_str), aantal)
+        # for
 
-                regio_nr, ag = values
+        return self._make_age_groups(age_group_counts, titel)
 
-                if ag < floor:                  # pragma: no branch
-                    aantal_teams_ag_nul += 1
+    def _get_aantal(self, afstand: str, naam: str, nr: int) -> int:
+        """ haal een telling per rayon/regio uit de momentopname """
+        return self.data[afstand].get(naam, dict()).get(str(nr), 0)
 
-                if comp.is_indoor():
-                    aantal_18m_teams[regio_nr] += 1
-                else:
-                    aantal_25m_teams[regio_nr] += 1
-            # for
+    def _tel_totalen(self, context, actuele_comps):
+        context['totaal_18m_indiv'] = self.data['18'].get('aantal_indiv', 0)
+        context['aantal_18m_teams_niet_af'] = self.data['18'].get('teams_ag_nul', 0)
 
-            if comp.is_indoor():
-                context['totaal_18m_indiv'] = aantal_indiv
-                context['aantal_18m_teams_niet_af'] = aantal_teams_ag_nul
-            else:
-                context['totaal_25m_indiv'] = aantal_indiv
-                context['aantal_25m_teams_niet_af'] = aantal_teams_ag_nul
-        # for
+        context['totaal_25m_indiv'] = self.data['25'].get('aantal_indiv', 0)
+        context['aantal_25m_teams_niet_af'] = self.data['25'].get('teams_ag_nul', 0)
 
         context['aantal_18m_teams'] = list()
         context['aantal_25m_teams'] = list()
@@ -141,187 +107,85 @@ class CompetitieStatistiekView(UserPassesTestMixin, TemplateView):
 
         for regio_nr in range(101, 116+1):
             if regio_organiseert_teamcompetitie['18', regio_nr]:
-                context['aantal_18m_teams'].append(aantal_18m_teams[regio_nr])
-                context['totaal_18m_teams'] += aantal_18m_teams[regio_nr]
+                aantal = self._get_aantal('18', 'teams_regio', regio_nr)
+                context['aantal_18m_teams'].append(aantal)
+                context['totaal_18m_teams'] += aantal
             else:
                 context['aantal_18m_teams'].append('-')
 
             if regio_organiseert_teamcompetitie['25', regio_nr]:
-                context['aantal_25m_teams'].append(aantal_25m_teams[regio_nr])
-                context['totaal_25m_teams'] += aantal_25m_teams[regio_nr]
+                aantal = self._get_aantal('25', 'teams_regio', regio_nr)
+                context['aantal_25m_teams'].append(aantal)
+                context['totaal_25m_teams'] += aantal
             else:
                 context['aantal_25m_teams'].append('-')
         # for
 
-    def _tel_regio(self, context):
-        aantal_18m_rayon = dict()
-        aantal_25m_rayon = dict()
-        aantal_18m_regio = dict()
-        aantal_25m_regio = dict()
-        aantal_18m_geen_rk = dict()
-        aantal_25m_geen_rk = dict()
-        aantal_zelfstandig_18m_regio = dict()
-        aantal_zelfstandig_25m_regio = dict()
-        aantal_geen_scores_18m_regio = dict()
-        aantal_geen_scores_25m_regio = dict()
-        aantal_leden_regio = dict()
-
-        age_group_counts_18m_indiv_regio = dict()       # [groep] = aantal
-        age_group_counts_25m_indiv_regio = dict()
-        age_group_counts_18m_teams_regio = dict()
-        age_group_counts_25m_teams_regio = dict()
-        for leeftijd in (1, 10, 20, 30, 40, 50, 60, 70, 80):
-            group = leeftijd // 10
-            age_group_counts_18m_indiv_regio[group] = 0
-            age_group_counts_25m_indiv_regio[group] = 0
-            age_group_counts_18m_teams_regio[group] = 0
-            age_group_counts_25m_teams_regio[group] = 0
-        # for
-
-        for rayon_nr in range(1, 4+1):
-            aantal_18m_rayon[rayon_nr] = 0
-            aantal_25m_rayon[rayon_nr] = 0
-            aantal_18m_geen_rk[rayon_nr] = 0
-            aantal_25m_geen_rk[rayon_nr] = 0
-        # for
-
-        for regio_nr in range(101, 116+1):
-            aantal_18m_regio[regio_nr] = 0
-            aantal_25m_regio[regio_nr] = 0
-            aantal_zelfstandig_18m_regio[regio_nr] = 0
-            aantal_zelfstandig_25m_regio[regio_nr] = 0
-            aantal_leden_regio[regio_nr] = 0
-            aantal_geen_scores_18m_regio[regio_nr] = 0
-            aantal_geen_scores_25m_regio[regio_nr] = 0
-        # for
-
-        hoogste_aantal_scores = 0
-        for values in (RegioDeelnemer       # 14ms
-                       .objects
-                       .filter(regiocomp__competitie__pk__in=self.comp_pks)
-                       .values_list('bij_vereniging__regio__rayon_nr',
-                                    'bij_vereniging__regio__regio_nr',
-                                    'aangemeld_door',
-                                    'sporterboog__sporter__geboorte_datum',
-                                    'sporterboog__sporter__account',
-                                    'regiocomp__competitie__afstand',
-                                    'inschrijf_voorkeur_rk_bk',
-                                    'aantal_scores')):
-
-            rayon_nr, regio_nr, aangemeld_door, geboorte_datum, account, afstand, voorkeur_rk_bk, aantal_scores = values
-            zelfstandig = (aangemeld_door == account)
-
-            if afstand == '18':
-                aantal_18m_rayon[rayon_nr] += 1
-                aantal_18m_regio[regio_nr] += 1
-                if not voorkeur_rk_bk:
-                    aantal_18m_geen_rk[rayon_nr] += 1
-                if zelfstandig:
-                    aantal_zelfstandig_18m_regio[regio_nr] += 1
-                if aantal_scores == 0:
-                    aantal_geen_scores_18m_regio[regio_nr] += 1
-
-                self._add_to_age_group(age_group_counts_18m_indiv_regio, geboorte_datum.year)
-            else:
-                aantal_25m_rayon[rayon_nr] += 1
-                aantal_25m_regio[regio_nr] += 1
-                if not voorkeur_rk_bk:
-                    aantal_25m_geen_rk[rayon_nr] += 1
-                if zelfstandig:
-                    aantal_zelfstandig_25m_regio[regio_nr] += 1
-                if aantal_scores == 0:
-                    aantal_geen_scores_25m_regio[regio_nr] += 1
-
-                self._add_to_age_group(age_group_counts_25m_indiv_regio, geboorte_datum.year)
-
-            if aantal_scores > hoogste_aantal_scores:
-                hoogste_aantal_scores = aantal_scores
-        # for
-
+    def _tel_regio(self, context, actuele_comps):
         context['aantal_18m_rayon'] = list()
         context['aantal_25m_rayon'] = list()
         context['aantal_18m_geen_rk'] = list()
         context['aantal_25m_geen_rk'] = list()
         for rayon_nr in range(1, 4+1):
-            context['aantal_18m_rayon'].append(aantal_18m_rayon[rayon_nr])
-            context['aantal_25m_rayon'].append(aantal_25m_rayon[rayon_nr])
-            context['aantal_18m_geen_rk'].append(aantal_18m_geen_rk[rayon_nr])
-            context['aantal_25m_geen_rk'].append(aantal_25m_geen_rk[rayon_nr])
+            context['aantal_18m_rayon'].append(self._get_aantal('18', 'rayon', rayon_nr))
+            context['aantal_25m_rayon'].append(self._get_aantal('25', 'rayon', rayon_nr))
+            context['aantal_18m_geen_rk'].append(self._get_aantal('18', 'geen_rk_rayon', rayon_nr))
+            context['aantal_25m_geen_rk'].append(self._get_aantal('25', 'geen_rk_rayon', rayon_nr))
         # for
 
         context['aantal_18m_regio'] = list()
         context['aantal_25m_regio'] = list()
         for regio_nr in range(101, 116+1):
-            context['aantal_18m_regio'].append(aantal_18m_regio[regio_nr])
-            context['aantal_25m_regio'].append(aantal_25m_regio[regio_nr])
+            context['aantal_18m_regio'].append(self._get_aantal('18', 'regio', regio_nr))
+            context['aantal_25m_regio'].append(self._get_aantal('25', 'regio', regio_nr))
         # for
 
+        hoogste_aantal_scores = max(self.data['18'].get('hoogste_aantal_scores', 0),
+                                    self.data['25'].get('hoogste_aantal_scores', 0))
         if hoogste_aantal_scores > 5:
             context['toon_geen_scores'] = True
             context['aantal_18m_geen_scores'] = list()
             context['aantal_25m_geen_scores'] = list()
             for regio_nr in range(101, 116+1):
-                context['aantal_18m_geen_scores'].append(aantal_geen_scores_18m_regio[regio_nr])
-                context['aantal_25m_geen_scores'].append(aantal_geen_scores_25m_regio[regio_nr])
+                context['aantal_18m_geen_scores'].append(self._get_aantal('18', 'geen_scores_regio', regio_nr))
+                context['aantal_25m_geen_scores'].append(self._get_aantal('25', 'geen_scores_regio', regio_nr))
             # for
 
-        pks1 = list()
-        pks2 = list()
-        zelfstandig = 0
-        for values in (RegioDeelnemer       # 10,5ms
-                       .objects
-                       .filter(regiocomp__competitie__pk__in=self.comp_pks)
-                       .values_list('sporterboog__pk',
-                                    'sporterboog__sporter__lid_nr',
-                                    'sporterboog__sporter__account',
-                                    'aangemeld_door')):
-            sporterboog_pk, lid_nr, account, aangemeld_door = values
-            pks1.append(sporterboog_pk)
-            pks2.append(lid_nr)
-            if account == aangemeld_door:
-                zelfstandig += 1
-        # for
-
-        aantal_sportersboog = len(set(pks1))
-        context['aantal_sporters'] = len(set(pks2))
+        uniek = tel_unieke_sporters(actuele_comps)
+        aantal_sportersboog = uniek['sportersboog']
+        context['aantal_sporters'] = uniek['sporters']
         context['aantal_multiboog'] = aantal_sportersboog - context['aantal_sporters']
-        context['aantal_zelfstandig'] = zelfstandig
-
-        for regio_nr in (Sporter        # 3,8ms
-                         .objects
-                         .select_related('bij_vereniging__regio')
-                         .filter(is_actief_lid=True)
-                         .exclude(bij_vereniging=None)
-                         .values_list('bij_vereniging__regio__regio_nr', flat=True)):
-            if regio_nr >= 101:
-                aantal_leden_regio[regio_nr] += 1
-        # for
+        context['aantal_zelfstandig'] = uniek['zelfstandig']
+
+        # de leden tellingen zijn in elke momentopname hetzelfde
+        afstand = '18' if self.data['18'] else '25'
 
         context['perc_zelfstandig_18m_regio'] = perc_zelfstandig_18m_regio = list()
         context['perc_zelfstandig_25m_regio'] = perc_zelfstandig_25m_regio = list()
         context['perc_leden_18m_regio'] = perc_leden_18m_regio = list()
         context['perc_leden_25m_regio'] = perc_leden_25m_regio = list()
         for regio_nr in range(101, 116+1):
-            aantal = aantal_18m_regio[regio_nr]
-            if aantal > 0:
-                perc_str = '%.1f' % ((aantal_zelfstandig_18m_regio[regio_nr] / aantal) * 100.0)
+            aantal_18m = self._get_aantal('18', 'regio', regio_nr)
+            aantal_25m = self._get_aantal('25', 'regio', regio_nr)
+
+            if aantal_18m > 0:
+                perc_str = '%.1f' % ((self._get_aantal('18', 'zelfstandig_regio', regio_nr) / aantal_18m) * 100.0)
             else:
                 perc_str = '0.0'
             perc_zelfstandig_18m_regio.append(perc_str)
 
-            aantal = aantal_25m_regio[regio_nr]
-            if aantal > 0:
-                perc_str = '%.1f' % ((aantal_zelfstandig_25m_regio[regio_nr] / aantal) * 100.0)
+            if aantal_25m > 0:
+                perc_str = '%.1f' % ((self._get_aantal('25', 'zelfstandig_regio', regio_nr) / aantal_25m) * 100.0)
             else:
                 perc_str = '0.0'
             perc_zelfstandig_25m_regio.append(perc_str)
 
-            aantal = aantal_leden_regio[regio_nr]
+            aantal = self._get_aantal(afstand, 'leden_regio', regio_nr)
             if aantal > 0:
-                perc_str = '%.1f' % ((aantal_18m_regio[regio_nr] / aantal) * 100.0)
+                perc_str = '%.1f' % ((aantal_18m / aantal) * 100.0)
                 perc_leden_18m_regio.append(perc_str)
 
-                perc_str = '%.1f' % ((aantal_25m_regio[regio_nr] / aantal) * 100.0)
+                perc_str = '%.1f' % ((aantal_25m / aantal) * 100.0)
                 perc_leden_25m_regio.append(perc_str)
             else:
                 perc_str = '0.0'
@@ -332,131 +196,69 @@ class CompetitieStatistiekView(UserPassesTestMixin, TemplateView):
         if aantal_sportersboog > 0:
             context['procent_zelfstandig'] = '%.1f' % ((context['aantal_zelfstandig'] / aantal_sportersboog) * 100.0)
 
-        for values in (RegioDeelnemer
-                       .objects
-                       .annotate(c=Count('regioteam'))
-                       .exclude(c=0)
-                       .values_list('sporterboog__sporter__geboorte_datum',
-                                    'regiocomp__competitie__afstand')):
-            geboorte_datum, afstand = values
-
-            if afstand == '18':
-                self._add_to_age_group(age_group_counts_18m_teams_regio, geboorte_datum.year)
-            else:
-                self._add_to_age_group(age_group_counts_25m_teams_regio, geboorte_datum.year)
-        # for
-
         context['age_groups_regio'] = (
-            self._make_age_groups(age_group_counts_18m_indiv_regio, 'Indoor individueel'),
-            self._make_age_groups(age_group_counts_25m_indiv_regio, '25m 1pijl individueel'),
-            self._make_age_groups(age_group_counts_18m_teams_regio, 'Indoor teams'),
-            self._make_age_groups(age_group_counts_25m_teams_regio, '25m 1pijl teams') )
+            self._maak_age_groups('18', 'indiv', 'Indoor individueel'),
+            self._maak_age_groups('25', 'indiv', '25m 1pijl individueel'),
+            self._maak_age_groups('18', 'teams', 'Indoor teams'),
+            self._maak_age_groups('25', 'teams', '25m 1pijl teams') )
 
     def _tel_rk_bk(self, context):
-        age_group_counts_18m_indiv_rk = dict()
-        age_group_counts_25m_indiv_rk = dict()
-        age_group_counts_18m_teams_rk = dict()
-        age_group_counts_25m_teams_rk = dict()
-        for leeftijd in (1, 10, 20, 30, 40, 50, 60, 70, 80):
-            group = leeftijd // 10
-            age_group_counts_18m_indiv_rk[group] = 0
-            age_group_counts_25m_indiv_rk[group] = 0
-            age_group_counts_18m_teams_rk[group] = 0
-            age_group_counts_25m_teams_rk[group] = 0
-        # for
-
-        for afstand in (18, 25):
+        for afstand in ('18', '25'):
             context['geplaatst_rk_%sm' % afstand] = geplaatst_rk = list()
             context['deelnemers_rk_%sm' % afstand] = deelnemers_rk = list()
             context['in_uitslag_rk_%sm' % afstand] = in_uitslag_rk = list()
             context['teams_rk_%sm' % afstand] = teams_rk = list()
 
-            qset = (DeelnemerRK
-                    .objects
-                    .filter(kamp__competitie__afstand=afstand,
-                            kamp__competitie__pk__in=self.comp_pks)
-                    .select_related('sporterboog__sporter')
-                    .prefetch_related('kampioenschapteam'))
-
-            qset_teams = (TeamRK
-                          .objects
-                          .filter(kamp__competitie__afstand=afstand,
-                                  kamp__competitie__pk__in=self.comp_pks))
-
-            totaal1 = totaal2 = totaal3 = totaal4 = 0
-            for rayon_nr in range(1, 4+1):
-                qset_rayon = qset.filter(kamp__rayon__rayon_nr=rayon_nr)
-
-                aantal = qset_rayon.count()
-                geplaatst_rk.append(aantal)
-                totaal1 += aantal
-
-                qset_rayon = qset_rayon.exclude(deelname=DEELNAME_NEE)
-                aantal = qset_rayon.count()
-                deelnemers_rk.append(aantal)
-                totaal2 += aantal
-
-                aantal = qset_rayon.filter(result_rank__gte=1, result_rank__lt=100).count()
-                in_uitslag_rk.append(aantal)
-                totaal3 += aantal
-
-                aantal = qset_teams.filter(kamp__rayon__rayon_nr=rayon_nr).count()
-                teams_rk.append(aantal)
-                totaal4 += aantal
-            # for
-
-            geplaatst_rk.append(totaal1)
-            deelnemers_rk.append(totaal2)
-            in_uitslag_rk.append(totaal3)
-            teams_rk.append(totaal4)
-
-            if afstand == 18:
-                age_group_counts = age_group_counts_18m_indiv_rk
-            else:
-                age_group_counts = age_group_counts_25m_indiv_rk
-
-            for values in qset.values_list('sporterboog__sporter__geboorte_datum'):
-                geboorte_datum = values[0]
-                self._add_to_age_group(age_group_counts, geboorte_datum.year)
+            for naam, lijst in (('rk_geplaatst', geplaatst_rk),
+                                ('rk_deelnemers', deelnemers_rk),
+                                ('rk_in_uitslag', in_uitslag_rk),
+                                ('rk_teams', teams_rk)):
+                for rayon_nr in range(1, 4+1):
+                    lijst.append(self._get_aantal(afstand, naam, rayon_nr))
+                # for
+                lijst.append(sum(lijst))    # totaal
             # for
 
-            if afstand == 18:
-                age_group_counts = age_group_counts_18m_teams_rk
-            else:
-                age_group_counts = age_group_counts_25m_teams_rk
-
-            for values in (qset
-                           .annotate(c=Count('teamrk_gekoppelde_leden') + Count('teambk_gekoppelde_leden'))
-                           .exclude(c=0)
-                           .values_list('sporterboog__sporter__geboorte_datum')):
-                geboorte_datum = values[0]
-                self._add_to_age_group(age_group_counts, geboorte_datum.year)
-            # for
-
-            qset_bk = (DeelnemerBK
-                       .objects
-                       .filter(kamp__competitie__afstand=afstand,
-                               kamp__competitie__pk__in=self.comp_pks))
-            context['deelnemers_bk_%sm' % afstand] = qset_bk.count()
+            bk = self.data[afstand].get('bk', dict())
+            context['deelnemers_bk_%sm' % afstand] = bk.get('deelnemers', 0)
+            context['uitslag_bk_%sm' % afstand] = bk.get('in_uitslag', 0)
 
-            qset_bk = qset_bk.filter(result_rank__gte=1, result_rank__lt=100)
-            context['uitslag_bk_%sm' % afstand] = qset_bk.count()
+            bk = self.data[afstand].get('bk_teams', dict())
+            context['teams_bk_%sm' % afstand] = bk.get('deelnemers', 0)
+            context['uitslag_teams_bk_%sm' % afstand] = bk.get('in_uitslag', 0)
+        # for
 
-            qset_bk = (TeamBK
-                       .objects
-                       .filter(kamp__competitie__afstand=afstand,
-                               kamp__competitie__pk__in=self.comp_pks))
-            context['teams_bk_%sm' % afstand] = qset_bk.count()
+        context['age_groups_rk'] = (
+            self._maak_age_groups('18', 'rk_indiv', 'RK Indoor individueel'),
+            self._maak_age_groups('25', 'rk_indiv', 'RK 25m 1pijl individueel'),
+            self._maak_age_groups('18', 'rk_teams', 'RK Indoor teams'),
+            self._maak_age_groups('25', 'rk_teams', 'RK 25m 1pijl teams') )
 
-            qset_bk = qset_bk.filter(result_rank__gte=1, result_rank__lt=100)
-            context['uitslag_teams_bk_%sm' % afstand] = qset_bk.count()
+    @staticmethod
+    def _verloop(context, actuele_comps):
+        """ toon het verloop van het aantal aanmeldingen over de laatste dagen """
+        datum2aantallen = dict()        # [datum] = [indiv 18m, teams 18m, indiv 25m, teams 25m]
+        for datum, afstand, aantal_indiv, aantal_teams in (CompetitieStatistiek
+                                                            .objects
+                                                            .filter(competitie__in=actuele_comps)
+                                                            .order_by('-datum')
+                                                            .values_list('datum',
+                                                                         'competitie__afstand',
+                                                                         'data__aantal_indiv',
+                                                                         'data__aantal_teams')):
+            try:
+                aantallen = datum2aantallen[datum]
+            except KeyError:
+                if len(datum2aantallen) >= VERLOOP_AANTAL_DAGEN:
+                    break
+                aantallen = datum2aantallen[datum] = [0, 0, 0, 0]
+
+            offset = 0 if afstand == '18' else 2
+            aantallen[offset] = aantal_indiv or 0
+            aantallen[offset + 1] = aantal_teams or 0
         # for
 
-        context['age_groups_rk'] = (
-            self._make_age_groups(age_group_counts_18m_indiv_rk, 'RK Indoor individueel'),
-            self._make_age_groups(age_group_counts_25m_indiv_rk, 'RK 25m 1pijl individueel'),
-            self._make_age_groups(age_group_counts_18m_teams_rk, 'RK Indoor teams'),
-            self._make_age_groups(age_group_counts_25m_teams_rk, 'RK 25m 1pijl teams') )
+        context['verloop'] = [(datum, aantallen) for datum, aantallen in datum2aantallen.items()]
 
     def get_context_data(self, **kwargs):
         """ called by the template system to get the context data for the template """
@@ -484,10 +286,18 @@ class CompetitieStatistiekView(UserPassesTestMixin, TemplateView):
         context['heeft_data'] = len(actuele_comps) > 0
 
         if len(actuele_comps):
+            # haal de laatste momentopnames op; de achtergrondtaak houdt deze bij
+            # alleen als er nog geen momentopname is wordt deze nu gemaakt (database wijziging in een GET)
+            comp_pk2stat = competitie_statistiek_ophalen(actuele_comps)
+            for comp in actuele_comps:
+                self.data[comp.afstand] = comp_pk2stat[comp.pk].data
+            # for
+
             context['toon_aantal_inschrijvingen'] = True
             self._tel_totalen(context, actuele_comps)
-            self._tel_regio(context)
+            self._tel_regio(context, actuele_comps)
             self._tel_rk_bk(context)
+            self._verloop(context, actuele_comps)
 
         context['kruimels'] = (
             (reverse('Competitie:kies'), mark_safe('Bonds<wbr>competities')),
@@ -5,27 +5,50 @@
 #  Licensed under BSD-3-Clause-Clear. See LICENSE file for details.
 
 from django.utils import timezone
-from GoogleDrive.models import Bestand
-from GoogleDrive.operations import StorageGoogleSheet, MonitorDriveFiles
+from GoogleDrive.models import Bestand, DriveWijzigingen
+from GoogleDrive.operations import StorageGoogleSheet, StorageError, MonitorDriveFiles
 from CompKampioenschap.models import SheetStatus
 from CompKampioenschap.operations.wedstrijdformulieren_indiv_lees import LeesIndivWedstrijdFormulier
 from CompKampioenschap.operations.wedstrijdformulieren_teams import LeesTeamsWedstrijdFormulier
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
 
 
 class MonitorGoogleSheetsWedstrijdformulieren:
 
+    # maximaal aantal wedstrijdformulieren dat tegelijkertijd ingelezen wordt
+    # (elk formulier kost 2 requests: sheet ids + 1 batchGet voor alle ranges)
+    MAX_PARALLEL = 6
+
+    # hoe vaak halen we de changes feed van Google Drive op
+    WIJZIGINGEN_INTERVAL = 10.0        # seconden
+
     def __init__(self, stdout, werk: list):
         """ initialiseer de bestanden monitor
             werk = list of tuples (begin_jaar, afstand, is_bk, is_teams)
         """
         self.stdout = stdout
-        self._sheets = StorageGoogleSheet(stdout)
         self._drive = MonitorDriveFiles(stdout)
 
-        self._bestanden = list()
+        self._bestanden = list()                # per bestand de laatste wijziging opvragen
         self._bestanden_nieuw = list()          # zonder SheetStatus
         self._sheetstatus_cache = dict()
         self._sheetstatus_todo = list()
+        self._file_id2bestand = dict()          # alle bestanden die we volgen via de changes feed
+
+        # elke worker thread krijgt een eigen verbinding met Google Sheets
+        self._pool = None
+        self._thread_data = threading.local()
+
+        # per bestand een lock, zodat een bestand nooit door 2 threads tegelijk gelezen wordt
+        self._file_locks = dict()               # [file_id] = Lock
+        self._file_locks_lock = threading.Lock()
+
+        self._wijzigingen = DriveWijzigingen.objects.first()
+        if not self._wijzigingen:
+            self._wijzigingen = DriveWijzigingen.objects.create()
+        self._volgende_wijzigingen = 0.0        # time.monotonic()
 
         for status in (SheetStatus
                        .objects
@@ -35,7 +58,7 @@ class MonitorGoogleSheetsWedstrijdformulieren:
             self._sheetstatus_cache[status.bestand.pk] = status
 
             if status.keep_monitoring():
-                self._bestanden.append(status.bestand)
+                self._file_id2bestand[status.bestand.file_id] = status.bestand
 
                 if status.gewijzigd_op > status.bekeken_op:
                     self._sheetstatus_todo.append(status)
@@ -53,6 +76,20 @@ class MonitorGoogleSheetsWedstrijdformulieren:
         for bestand in Bestand.objects.filter(begin_jaar=begin_jaar, afstand=afstand, is_bk=is_bk, is_teams=is_teams):
             if bestand.pk not in self._sheetstatus_cache:
                 self._bestanden_nieuw.append(bestand)
+                self._file_id2bestand[bestand.file_id] = bestand
+        # for
+
+    def _start_wijzigingen(self):
+        """ begin (opnieuw) met de changes feed
+            wijzigingen van voor het nieuwe token vangen we af door alle bestanden 1x los te bevragen
+        """
+        page_token = self._drive.get_start_page_token()
+        self._wijzigingen.page_token = page_token
+        self._wijzigingen.save(update_fields=['page_token', 'when'])
+
+        for bestand in self._file_id2bestand.values():
+            if bestand not in self._bestanden and bestand not in self._bestanden_nieuw:
+                self._bestanden.append(bestand)
         # for
 
     def _get_sheetstatus(self, bestand):
@@ -63,51 +100,116 @@ class MonitorGoogleSheetsWedstrijdformulieren:
 
         return status
 
-    def _kijk_in_google_sheet(self, status: SheetStatus):
-        self.stdout.write('[INFO] analyseer wedstrijdformulier %s' % repr(status.bestand.fname))
+    def _get_file_lock(self, file_id: str) -> threading.Lock:
+        with self._file_locks_lock:
+            try:
+                lock = self._file_locks[file_id]
+            except KeyError:
+                lock = threading.Lock()
+                self._file_locks[file_id] = lock
+        return lock
+
+    def _get_sheets(self) -> StorageGoogleSheet:
+        # de Google API client is niet thread-safe, dus elke thread krijgt een eigen exemplaar
+        sheets = getattr(self._thread_data, 'sheets', None)
+        if sheets is None:
+            sheets = StorageGoogleSheet(self.stdout)
+            self._thread_data.sheets = sheets
+        return sheets
+
+    def _lees_google_sheet(self, bestand: Bestand):
+        """ lees een wedstrijdformulier uit
+            draait in een worker thread, dus geen database toegang hier
+        """
+        with self._get_file_lock(bestand.file_id):
+            sheets = self._get_sheets()
+
+            if bestand.is_teams:
+                lezer = LeesTeamsWedstrijdFormulier(self.stdout, sheets)
+            else:
+                lezer = LeesIndivWedstrijdFormulier(self.stdout, bestand, sheets, lees_oppervlakkig=True)
+
+            aantal_deelnemers = lezer.tel_deelnemers()
+            heeft_scores = lezer.heeft_scores()
+            fase = lezer.bepaal_wedstrijd_fase()
 
-        if status.bestand.is_teams:
-            lezer = LeesTeamsWedstrijdFormulier(self.stdout, self._sheets)
-        else:
-            lezer = LeesIndivWedstrijdFormulier(self.stdout, status.bestand, self._sheets, lees_oppervlakkig=True)
+            # is de uitslag al compleet?
+            uitslag_is_compleet = heeft_scores and lezer.heeft_uitslag()
+
+        return aantal_deelnemers, heeft_scores, fase, uitslag_is_compleet
+
+    def _verwerk_google_sheet(self, status: SheetStatus, resultaat: tuple):
+        aantal_deelnemers, heeft_scores, fase, uitslag_is_compleet = resultaat
+
+        self.stdout.write('[INFO] analyseer wedstrijdformulier %s' % repr(status.bestand.fname))
 
-        aantal_deelnemers = lezer.tel_deelnemers()
         if aantal_deelnemers != status.aantal_deelnemers:
             self.stdout.write('[INFO] aantal_deelnemers %s --> %s' % (status.aantal_deelnemers, aantal_deelnemers))
             status.aantal_deelnemers = aantal_deelnemers
             status.save(update_fields=['aantal_deelnemers'])
 
-        heeft_scores = lezer.heeft_scores()
         if heeft_scores != status.bevat_scores:
             self.stdout.write('[INFO] heeft_scores %s --> %s' % (status.bevat_scores, heeft_scores))
             status.bevat_scores = heeft_scores
             status.save(update_fields=['bevat_scores'])
 
-        fase = lezer.bepaal_wedstrijd_fase()
         if fase != status.wedstrijd_fase:
             self.stdout.write('[INFO] wedstrijd_fase %s --> %s' % (repr(status.wedstrijd_fase), repr(fase)))
             status.wedstrijd_fase = fase
             status.save(update_fields=['wedstrijd_fase'])
 
-        # is de uitslag al compleet?
-        if status.bevat_scores:
-            uitslag_is_compleet = lezer.heeft_uitslag()
-            if uitslag_is_compleet != status.uitslag_is_compleet:
-                self.stdout.write('[INFO] uitslag_is_compleet %s --> %s' % (status.uitslag_is_compleet,
-                                                                            uitslag_is_compleet))
-                status.uitslag_is_compleet = uitslag_is_compleet
-                status.save(update_fields=['uitslag_is_compleet'])
-
-        elif status.uitslag_is_compleet:
+        if uitslag_is_compleet != status.uitslag_is_compleet:
             self.stdout.write('[INFO] uitslag_is_compleet %s --> %s' % (status.uitslag_is_compleet,
-                                                                        False))
-            status.uitslag_is_compleet = False
+                                                                        uitslag_is_compleet))
+            status.uitslag_is_compleet = uitslag_is_compleet
             status.save(update_fields=['uitslag_is_compleet'])
 
         # update bekeken_op
         status.bekeken_op = timezone.now()
         status.save(update_fields=['bekeken_op'])
 
+    def _kijk_in_google_sheets(self):
+        """ lees een aantal wedstrijdformulieren tegelijkertijd in
+            het inlezen gebeurt in worker threads; de database wordt alleen hier bijgewerkt
+        """
+        todo = self._sheetstatus_todo[:self.MAX_PARALLEL]
+        self._sheetstatus_todo = self._sheetstatus_todo[self.MAX_PARALLEL:]
+
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.MAX_PARALLEL,
+                                            thread_name_prefix='monitor_wf')
+
+        futures = [(status, self._pool.submit(self._lees_google_sheet, status.bestand))
+                   for status in todo]
+
+        for status, future in futures:
+            try:
+                resultaat = future.result()
+            except StorageError as exc:
+                # bij de volgende wijziging proberen we het opnieuw
+                self.stdout.write('[ERROR] Kan wedstrijdformulier %s niet lezen: %s' % (repr(status.bestand.fname),
+                                                                                        str(exc)))
+            else:
+                self._verwerk_google_sheet(status, resultaat)
+        # for
+
+    def _noteer_wijziging(self, bestand: Bestand, op, door):
+        status = self._get_sheetstatus(bestand)
+
+        if op:
+            if op != status.gewijzigd_op or door != status.gewijzigd_door:
+                status.gewijzigd_op, status.gewijzigd_door = op, door
+                status.save(update_fields=['gewijzigd_op', 'gewijzigd_door'])
+
+                self.stdout.write('[INFO] bestand %s is gewijzigd op %s door %s' % (repr(bestand.fname),
+                                                                                    timezone.localtime(status.gewijzigd_op).strftime('%Y-%m-%d %H:%M:%S'),
+                                                                                    repr(door)))
+
+        if status.gewijzigd_op > status.bekeken_op:
+            if status.keep_monitoring():
+                if status not in self._sheetstatus_todo:
+                    self._sheetstatus_todo.append(status)
+
     def _get_bestand_todo(self) -> Bestand | None:
         if len(self._bestanden_nieuw):
             return self._bestanden_nieuw.pop(0)
@@ -117,52 +219,60 @@ class MonitorGoogleSheetsWedstrijdformulieren:
 
         return None
 
-    def _get_sheet_todo(self) -> SheetStatus | None:
-        if len(self._sheetstatus_todo):
-            return self._sheetstatus_todo.pop(0)
+    def _verwerk_wijzigingen(self):
+        """ haal de wijzigingen op uit de changes feed van Google Drive
+            en zet de gewijzigde wedstrijdformulieren op de lijst om in te lezen
+        """
+        nu = time.monotonic()
+        if nu < self._volgende_wijzigingen:
+            return
+        self._volgende_wijzigingen = nu + self.WIJZIGINGEN_INTERVAL
 
-        return None
+        wijzigingen, page_token = self._drive.get_wijzigingen(self._wijzigingen.page_token)
+        if page_token is None:
+            # feed niet bruikbaar (bijvoorbeeld een verlopen token): opnieuw beginnen
+            self.stdout.write('[WARNING] Kan de changes feed niet ophalen; alle bestanden worden opnieuw bevraagd')
+            self._start_wijzigingen()
+            return
+
+        for file_id, (op, door) in wijzigingen.items():
+            bestand = self._file_id2bestand.get(file_id, None)
+            if bestand:
+                self._noteer_wijziging(bestand, op, door)
+        # for
+
+        if page_token != self._wijzigingen.page_token:
+            self._wijzigingen.page_token = page_token
+            self._wijzigingen.save(update_fields=['page_token', 'when'])
 
     def doe_beetje_werk(self):
         """
             deze functie wordt ongeveer elke 3 seconden aangeroepen om een beetje werk te doen
-            we willen binnen 1 uur door al het werk heen zijn, dus 60*60 = 3600 / 5 = 720 calls
-            welke keer 1 doen is dus OK
+            per aanroep worden maximaal MAX_PARALLEL wedstrijdformulieren tegelijk ingelezen,
+            zodat tijdens een RK/BK weekend alle gewijzigde formulieren binnen een minuut bijgewerkt zijn
         """
-        bestand_count = len(self._bestanden) + len(self._bestanden_nieuw)
-        sheet_count = len(self._sheetstatus_todo)
-        if sheet_count + bestand_count == 0:
+        # analyseer de inhoud van een aantal wedstrijdformulieren
+        if len(self._sheetstatus_todo):
+            self._kijk_in_google_sheets()
             return
 
-        # self.stdout.write('[DEBUG] {doe_beetje_werk} %s sheets en %s bestanden te gaan' % (sheet_count, bestand_count))
-
-        # analyseer de inhoud van een wedstrijdformulier
-        status = self._get_sheet_todo()
-        if status:
-            self._kijk_in_google_sheet(status)
+        if len(self._file_id2bestand) == 0:
             return
 
-        # zoek naar nieuwe revisies van de google drive bestanden
-        bestand = self._get_bestand_todo()
-        # self.stdout.write('[INFO] bepaal laatste wijziging voor Bestand %s' % repr(bestand.fname))
+        if not self._wijzigingen.page_token:
+            # eerste keer: alle bestanden 1x los bevragen, daarna alleen nog de changes feed
+            self._start_wijzigingen()
 
-        status = self._get_sheetstatus(bestand)
-
-        # wanneer is het bestand voor het laatst gewijzigd?
-        op, door = self._drive.get_laatste_wijziging(bestand.file_id)
-        if op:
-            if op != status.gewijzigd_op or door != status.gewijzigd_door:
-                status.gewijzigd_op, status.gewijzigd_door = op, door
-                status.save(update_fields=['gewijzigd_op', 'gewijzigd_door'])
-
-                self.stdout.write('[INFO] bestand %s is gewijzigd op %s door %s' % (repr(bestand.fname),
-                                                                                    timezone.localtime(status.gewijzigd_op).strftime('%Y-%m-%d %H:%M:%S'),
-                                                                                    repr(door)))
+        # nieuwe bestanden (en de eerste keer: alle bestanden) 1x los bevragen
+        bestand = self._get_bestand_todo()
+        if bestand:
+            # self.stdout.write('[INFO] bepaal laatste wijziging voor Bestand %s' % repr(bestand.fname))
+            op, door = self._drive.get_laatste_wijziging(bestand.file_id)
+            self._noteer_wijziging(bestand, op, door)
+            return
 
-        if status.gewijzigd_op > status.bekeken_op:
-            if status.keep_monitoring():
-                if status not in self._sheetstatus_todo:
-                    self._sheetstatus_todo.append(status)
+        # zoek naar nieuwe revisies van de google drive bestanden
+        self._verwerk_wijzigingen()
 
 
 # end of file
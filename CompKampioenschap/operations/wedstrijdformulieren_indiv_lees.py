@@ -56,8 +56,33 @@ class LeesIndivWedstrijdFormulier:
         self._wedstrijd_voortgang = ''
 
         self.sheet.selecteer_file(bestand.file_id)
+        self._laad_ranges_vooraf()
         self._laad_sheet()
 
+    def _laad_ranges_vooraf(self):
+        """ haal alle ranges die _laad_sheet kan gaan bekijken in 1 request op
+            dit scheelt een request (met eigen retry) per range
+        """
+        sheet_name = 'Voorronde' if self.afstand == 18 else 'Wedstrijd'
+        sheet_ranges = [(sheet_name, self.ranges[range_name])
+                        for range_name in ('deelnemers', 'voorronde_1', 'voorronde_2',
+                                           'voorronde_scores', 'voorronde_uitslag')]
+
+        if self.afstand == 18:
+            # alleen voor de Indoor: de finales
+            for aantal in (16, 8, 4):
+                prefixes = ('finales%s_' % aantal,)
+                if not self.lees_oppervlakkig:
+                    prefixes += ('deelnemers_finales%s_' % aantal,)
+
+                for range_name, range_a1 in self.ranges.items():
+                    if range_name.startswith(prefixes):
+                        sheet_ranges.append(('Finales %s' % aantal, range_a1))
+                # for
+            # for
+
+        self.sheet.laad_ranges(sheet_ranges)
+
     def _check_input(self, range_name):
         cells_range = self.ranges[range_name]
         values = self.sheet.get_range(cells_range)
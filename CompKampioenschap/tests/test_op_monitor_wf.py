@@ -9,8 +9,8 @@ from django.utils import timezone
 from django.core.management.base import OutputWrapper
 from CompKampioenschap.models import SheetStatus
 from CompKampioenschap.operations.monitor_wedstrijdformulieren import MonitorGoogleSheetsWedstrijdformulieren
-from GoogleDrive.models import Bestand
-from GoogleDrive.operations import StorageGoogleSheet
+from GoogleDrive.models import Bestand, DriveWijzigingen
+from GoogleDrive.operations import StorageGoogleSheet, StorageError
 from TestHelpers.e2ehelpers import E2EHelpers
 from unittest.mock import patch
 import io
@@ -18,6 +18,8 @@ import io
 
 class MockMonitorDriveFiles:
 
+    wijzigingen_ok = True
+
     def __init__(self, stdout, retry_delay:float=1.0):
         self.stdout = stdout
 
@@ -27,6 +29,20 @@ class MockMonitorDriveFiles:
 
         return op, door
 
+    @staticmethod
+    def get_start_page_token():
+        return 'token_1'
+
+    def get_wijzigingen(self, page_token):
+        if not self.wijzigingen_ok:
+            return dict(), None
+
+        wijzigingen = {
+            'file_id_1': (timezone.now(), 'Wijziger'),
+            'file_id_onbekend': (timezone.now(), 'Iemand'),
+        }
+        return wijzigingen, page_token + '+'
+
 
 class MockLeesIndivWedstrijdFormulier:
 
@@ -50,6 +66,12 @@ class MockLeesIndivWedstrijdFormulier:
         return 'hoi'
 
 
+class MockLeesIndivWedstrijdFormulierFout(MockLeesIndivWedstrijdFormulier):
+
+    def tel_deelnemers(self):
+        raise StorageError('test')
+
+
 class TestCompKampioenschapOpMonitorWf(E2EHelpers, TestCase):
 
     """ tests voor de CompKampioenschap module, operations Monitor Wedstrijdformulieren """
@@ -109,8 +131,35 @@ class TestCompKampioenschapOpMonitorWf(E2EHelpers, TestCase):
             monitor.doe_beetje_werk()       # sheet
             monitor.doe_beetje_werk()       # bestand
             monitor.doe_beetje_werk()       # bestand
-            monitor.doe_beetje_werk()       # geen werk
+            monitor.doe_beetje_werk()       # changes feed
+            monitor.doe_beetje_werk()       # sheet
+            monitor.doe_beetje_werk()       # geen werk (changes feed nog niet aan de beurt)
+
+        # print(out.getvalue())
+        self.assertTrue("[INFO] bestand 'fname_1' is gewijzigd op " in out.getvalue())
+        self.assertTrue(" door 'Wijziger'" in out.getvalue())
+        self.assertEqual(DriveWijzigingen.objects.get().page_token, 'token_1+')
 
-        #print(out.getvalue())
+        # tweede keer: token is bekend, dus geen losse bevraging van de bestanden
+        out = OutputWrapper(io.StringIO())
+        with patch('CompKampioenschap.operations.monitor_wedstrijdformulieren.MonitorDriveFiles', MockMonitorDriveFiles):
+            monitor = MonitorGoogleSheetsWedstrijdformulieren(out, werk)
+        self.assertEqual(monitor._bestanden, [])
+
+        # fout bij het lezen van een sheet
+        status = SheetStatus.objects.filter(bestand=self.bestand1).first()
+        monitor._sheetstatus_todo = [status]
+        with patch('CompKampioenschap.operations.monitor_wedstrijdformulieren.LeesIndivWedstrijdFormulier', MockLeesIndivWedstrijdFormulierFout):
+            monitor.doe_beetje_werk()
+        self.assertTrue("[ERROR] Kan wedstrijdformulier 'fname_1' niet lezen: test" in out.getvalue())
+
+        # changes feed is niet bruikbaar
+        MockMonitorDriveFiles.wijzigingen_ok = False
+        try:
+            monitor.doe_beetje_werk()
+        finally:
+            MockMonitorDriveFiles.wijzigingen_ok = True
+        self.assertTrue('[WARNING] Kan de changes feed niet ophalen' in out.getvalue())
+        self.assertEqual(len(monitor._bestanden), 2)
 
 # end of file
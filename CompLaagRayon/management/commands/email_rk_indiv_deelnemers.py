@@ -13,7 +13,7 @@ from Competitie.definities import DEELNAME_ONBEKEND
 from Competitie.models import Competitie, CompetitieMatch
 from CompLaagRayon.models import KampRK, DeelnemerRK
 from Functie.models import Functie
-from Mailer.operations import mailer_queue_email, render_email_template
+from Mailer.operations import mailer_queue_bulk
 from Vereniging.models import Vereniging
 import datetime
 
@@ -136,13 +136,10 @@ class Command(BaseCommand):
                 self.deelname_onbekend.append(tup)
         # for
 
-    def _stuur_email(self, deelnemer: DeelnemerRK, match: CompetitieMatch, url_deelnemerslijst):
-        """ Stuur een e-mail """
+    def _maak_context(self, deelnemer: DeelnemerRK, match: CompetitieMatch, url_deelnemerslijst):
+        """ bepaal de context voor de e-mail aan deze deelnemer """
 
-        sporter = deelnemer.sporterboog.sporter
-        account = sporter.account
-        if not account:
-            return
+        account = deelnemer.sporterboog.sporter.account
 
         org_ver = match.vereniging
         if match.locatie:
@@ -162,17 +159,30 @@ class Command(BaseCommand):
             'contact_email': org_ver.contact_email,
             'url_deelnemerslijst': url_deelnemerslijst,
         }
+        return context
+
+    def _stuur_emails(self):
+        """ Stuur alle e-mails in 1 keer """
 
-        mail_body = render_email_template(context, EMAIL_TEMPLATE_BEVESTIG_DEELNAME)
+        ontvangers = list()
+        bijwerken = list()
+        for deelnemer, match in self.deelname_onbekend:
+            account = deelnemer.sporterboog.sporter.account
+            if account:
+                context = self._maak_context(deelnemer, match, deelnemer.url_deelnemerslijst)
+                ontvangers.append((account.bevestigde_email, context))
 
-        mailer_queue_email(account.bevestigde_email,
-                           'Kan je deelnemen aan het ' + self.rk_kort + '?',
-                           mail_body)
+                deelnemer.bevestiging_gevraagd_op = self.now
+                bijwerken.append(deelnemer)
+        # for
 
-        deelnemer.bevestiging_gevraagd_op = self.now
-        deelnemer.save(update_fields=['bevestiging_gevraagd_op'])
+        mailer_queue_bulk(EMAIL_TEMPLATE_BEVESTIG_DEELNAME,
+                          'Kan je deelnemen aan het ' + self.rk_kort + '?',
+                          ontvangers)
 
-        self.email_count += 1
+        DeelnemerRK.objects.bulk_update(bijwerken, ['bevestiging_gevraagd_op'])
+
+        self.email_count += len(ontvangers)
 
     def handle(self, *args, **options):
 
@@ -198,9 +208,7 @@ class Command(BaseCommand):
         self.stdout.write('[INFO] Deelname onbekend: %s sporters' % len(self.deelname_onbekend))
 
         if do_stuur:
-            for deelnemer, match in self.deelname_onbekend:
-                self._stuur_email(deelnemer, match, deelnemer.url_deelnemerslijst)
-            # for
+            self._stuur_emails()
             self.stdout.write('[INFO] %s e-mails verstuurd' % self.email_count)
 
 
@@ -10,17 +10,21 @@
 from django.db import connection
 from django.conf import settings
 from django.db.utils import DataError, OperationalError, IntegrityError, DEFAULT_DB_ALIAS
-from django.db.models import F, Q
+from django.db.models import F, Q, Window
+from django.db.models.functions import RowNumber
 from django.core.management.base import BaseCommand
 from Competitie.models import Competitie, CompetitieIndivKlasse, CompetitieTaken
-from CompLaagRegio.models import RegioComp, RegioRonde, RegioTeam, RegioRondeTeam, RegioDeelnemer
+from Competitie.operations import verhoog_uitslagen_versie, werk_competitie_statistiek_bij
+from CompLaagRegio.models import RegioComp, RegioRondeTeam, RegioDeelnemer
 from Score.definities import SCORE_WAARDE_VERWIJDERD
-from Score.models import ScoreHist
+from Score.models import Score, ScoreHist
 import traceback
 import datetime
 import time
 import sys
 
+STATISTIEK_INTERVAL = datetime.timedelta(seconds=60)
+
 
 class Command(BaseCommand):
     help = "Competitie tussenstand bijwerken"
@@ -40,6 +44,13 @@ class Command(BaseCommand):
 
         self._onbekend2beter = dict()       # [CompetitieIndivKlasse.pk] = [klasse, ..] met oplopend AG
 
+        self._gewijzigde_sporterboog_pks = set()    # sporterboog met een nieuwe ScoreHist
+        self._alle_teams = False                    # alle team scores bijwerken (na trigger of met --all)
+        self._gewijzigde_comp_pks = set()           # competities met een bijgewerkte deelnemer of team
+
+        # de statistiek wordt periodiek in de achtergrond bijgewerkt, zodat de pagina snel is
+        self._volgende_statistiek = None
+
     def add_arguments(self, parser):
         parser.add_argument('duration', type=int,
                             choices=(1, 2, 5, 7, 10, 15, 20, 30, 45, 60),
@@ -116,7 +127,7 @@ class Command(BaseCommand):
         for indiv in klassen_qset:
             if not indiv.is_onbekend:
                 tup = (indiv.boogtype.pk,)
-                tup += tuple(indiv.leeftijdsklassen.values_list('pk', flat=True))
+                tup += tuple([lkl.pk for lkl in indiv.leeftijdsklassen.all()])      # gebruik prefetch
                 try:
                     if indiv not in indiv_alike[tup]:
                         indiv_alike[tup].append(indiv)
@@ -129,7 +140,7 @@ class Command(BaseCommand):
         for indiv in klassen_qset:
             if indiv.is_onbekend:
                 tup = (indiv.boogtype.pk,)
-                tup += tuple(indiv.leeftijdsklassen.values_list('pk', flat=True))
+                tup += tuple([lkl.pk for lkl in indiv.leeftijdsklassen.all()])      # gebruik prefetch
 
                 for alike in indiv_alike[tup]:
                     if alike.competitie == indiv.competitie:
@@ -148,7 +159,7 @@ class Command(BaseCommand):
     def _vind_scores(self):
         """ zoek alle recent ingevoerde scores en bepaal van welke schuttersboog
             de tussenstand bijgewerkt moet worden.
-            Vult index2scores.
+            Vult sporterboog2scores, alleen voor de sporterboog met een nieuwe ScoreHist.
         """
         self.sporterboog2scores = dict()
 
@@ -157,11 +168,7 @@ class Command(BaseCommand):
         # misschien dubbel, maar daar kunnen we tegen
 
         # bepaal de scorehist objecten die we willen bekijken
-        qset = (ScoreHist
-                .objects
-                .select_related('score',
-                                'score__sporterboog')
-                .all())
+        qset = ScoreHist.objects.all()
 
         try:
             if self.taken.hoogste_scorehist:
@@ -172,12 +179,17 @@ class Command(BaseCommand):
             self.stdout.write('[ERROR] CompetitieTaken.hoogste_scorehist bestaat niet meer!')
 
         # bepaal de sporterboog pk's die we bij moeten werken
-        allowed_sporterboog_pks = list(qset.values_list('score__sporterboog__pk', flat=True))
+        sporterboog_pks = set(qset.exclude(score=None).values_list('score__sporterboog__pk', flat=True))
+        self._gewijzigde_sporterboog_pks = sporterboog_pks
 
         self.taken.hoogste_scorehist = scorehist_latest
         self.taken.save()  # update_fields=['hoogste_scorehist'])
         self.stdout.write('[INFO] nieuwe hoogste ScoreHist pk is %s' % self.taken.hoogste_scorehist.pk)
 
+        if len(sporterboog_pks) == 0:
+            self.stdout.write('[INFO] Aantal unieke sporterboog in sporterboog2scores: 0')
+            return
+
         # een regiocompetitie heeft ingeschreven deelnemer
         # een regiocompetitie bestaat uit rondes (RegioRonde);
         # elke ronde bevat een plan met wedstrijden;
@@ -185,51 +197,41 @@ class Command(BaseCommand):
         # wedstrijden hebben een uitslag met scores;
         # scores refereren aan een sporterboog;
         # schutters kunnen in een wedstrijd buiten hun ingeschreven rayon geschoten hebben
-        rondes = list()
-        for ronde in (RegioRonde
+        # haal in 1 query alle scores op van de gewijzigde sporterboog, met de ronde en wedstrijd
+        # waarin de score neergezet is
+        scores = list()
+        for score in (Score
                       .objects
-                      .select_related('regiocomp')
+                      .filter(sporterboog__pk__in=sporterboog_pks,
+                              uitslag__competitiematch__regioronde__isnull=False)
                       # .filter(regiocomp__is_afgesloten=False)   # geeft problemen tijdens afsluiten met sporters die verhuisd zijn
-                      .all()):
-
-            week_nr = ronde.week_nr
+                      .exclude(waarde=0)                # 0 scores zijn voor team competitie only
+                      .annotate(uitslag_afstand=F('uitslag__afstand'),
+                                ronde_week_nr=F('uitslag__competitiematch__regioronde__week_nr'),
+                                ronde_pk=F('uitslag__competitiematch__regioronde__pk'),
+                                match_datum=F('uitslag__competitiematch__datum_wanneer'),
+                                match_tijd=F('uitslag__competitiematch__tijd_begin_wedstrijd'),
+                                match_pk=F('uitslag__competitiematch__pk'))):
+
+            week_nr = score.ronde_week_nr
             if week_nr < 26:
                 week_nr += 100
 
-            tup = (week_nr, ronde.pk, ronde)
-            rondes.append(tup)
+            tup = (week_nr, score.ronde_pk, score.match_datum, score.match_tijd, score.match_pk, score.pk, score)
+            scores.append(tup)
         # for
 
-        # sorteer op weeknummer, anders raken de scores in de war en berekenen we
-        # een verkeerd gemiddelde en verplaatsen we de sporter naar de verkeerde klasse
-        rondes.sort()
-
-        for _, _, ronde in rondes:
-            # sorteer de beschikbare scores op het moment van de wedstrijd
-            for match in (ronde
-                          .matches
-                          .select_related('uitslag')
-                          .order_by('datum_wanneer',
-                                    'tijd_begin_wedstrijd',
-                                    'pk')
-                          .all()):
-
-                uitslag = match.uitslag
-                if uitslag:
-                    for score in (uitslag
-                                  .scores
-                                  .select_related('sporterboog')
-                                  .exclude(waarde=0)                # 0 scores zijn voor team competitie only
-                                  .all()):
-                        pk = score.sporterboog.pk
-                        if pk in allowed_sporterboog_pks:   # presumed better than huge __in
-                            tup = (uitslag.afstand, score)
-                            try:
-                                self.sporterboog2scores[pk].append(tup)
-                            except KeyError:
-                                self.sporterboog2scores[pk] = [tup]
-                    # for
-            # for
+        # sorteer op weeknummer en dan het moment van de wedstrijd, anders raken de scores in de war en berekenen
+        # we een verkeerd gemiddelde en verplaatsen we de sporter naar de verkeerde klasse
+        scores.sort(key=lambda x: x[:-1])
+
+        for tup in scores:
+            score = tup[-1]
+            tup = (score.uitslag_afstand, score)
+            try:
+                self.sporterboog2scores[score.sporterboog_id].append(tup)
+            except KeyError:
+                self.sporterboog2scores[score.sporterboog_id] = [tup]
         # for
 
         self.stdout.write('[INFO] Aantal unieke sporterboog in sporterboog2scores: %s' % len(self.sporterboog2scores))
@@ -272,14 +274,23 @@ class Command(BaseCommand):
         return gem, totaal
 
     def _update_regiocompetitiesportersboog(self):
-        count = 0
-        for deelcomp in (RegioComp
-                         .objects
-                         .exclude(is_afgesloten=True)
-                         .select_related('competitie')
-                         .all()):
+        """ werk de RegioDeelnemer bij van de sporterboog in sporterboog2scores
+            alleen de deelnemers van deze sporterboog worden opgehaald, in regiocompetities die nog open zijn
+        """
+        bijgewerkt = list()
+        scores_erbij = list()
+        scores_eraf = list()
+
+        deelnemers = (RegioDeelnemer
+                      .objects
+                      .exclude(regiocomp__is_afgesloten=True)
+                      .filter(sporterboog__pk__in=self.sporterboog2scores.keys())
+                      .select_related('regiocomp__competitie',
+                                      'sporterboog__sporter')
+                      .prefetch_related('scores'))
 
-            comp = deelcomp.competitie
+        for deelnemer in deelnemers:
+            comp = deelnemer.regiocomp.competitie
 
             if comp.is_indoor():
                 pijlen_per_ronde = 30
@@ -290,157 +301,211 @@ class Command(BaseCommand):
                 max_score = 250
                 comp_afstand = 25
 
-            for deelnemer in (RegioDeelnemer
-                              .objects
-                              .filter(regiocomp=deelcomp)
-                              .select_related('sporterboog')
-                              .prefetch_related('scores')
-                              .all()):
+            tups = self.sporterboog2scores[deelnemer.sporterboog.pk]
+
+            # tot nu toe hebben we de verwijderde scores meegenomen zodat we deze
+            # change-trigger krijgen. Nu moeten de verwijderde scores eruit
+            scores = [score
+                      for afstand, score in tups
+                      if score.waarde != SCORE_WAARDE_VERWIJDERD and afstand == comp_afstand]
+            score_pks = set([score.pk for score in scores])
+
+            # nieuwe scores toevoegen
+            curr_score_pks = set([score.pk for score in deelnemer.scores.all()])
+            for score in scores:
+                if score.pk not in curr_score_pks:
+                    self.stdout.write('[INFO] Deelnemer pk=%s: add score pk=%s' % (deelnemer.pk, score.pk))
+                    scores_erbij.append(RegioDeelnemer.scores.through(regiodeelnemer=deelnemer, score=score))
+                    curr_score_pks.add(score.pk)        # voorkom dubbel toevoegen
+            # for
 
+            # verwijderde scores doorvoeren
+            for score in deelnemer.scores.all():
+                if score.pk not in score_pks:
+                    self.stdout.write('[INFO] Deelnemer pk=%s: remove score pk=%s' % (deelnemer.pk, score.pk))
+                    scores_eraf.append(Q(regiodeelnemer=deelnemer, score=score))
+            # for
+
+            # door waarde te filteren op max_score voorkomen we problemen
+            # die anders pas naar boven komen tijdens de save()
+            waardes = [score.waarde
+                       for afstand, score in tups
+                       if score.waarde <= max_score and afstand == comp_afstand]
+
+            waardes.extend([0, 0, 0, 0, 0, 0, 0])
+            waardes = waardes[:7]
+            deelnemer.score1 = waardes[0]
+            deelnemer.score2 = waardes[1]
+            deelnemer.score3 = waardes[2]
+            deelnemer.score4 = waardes[3]
+            deelnemer.score5 = waardes[4]
+            deelnemer.score6 = waardes[5]
+            deelnemer.score7 = waardes[6]
+            deelnemer.aantal_scores = len(waardes) - waardes.count(0)
+            deelnemer.laagste_score_nr, laagste = self._bepaal_laagste_nr(waardes)
+            deelnemer.gemiddelde, deelnemer.totaal = self._bepaal_gemiddelde_en_totaal(
+                                                            waardes,
+                                                            comp.aantal_scores_voor_rk_deelname,
+                                                            pijlen_per_ronde)
+
+            # kijk of verplaatsing uit klasse onbekend van toepassing is
+            if deelnemer.ag_voor_indiv < 0.001:
                 try:
-                    tups = self.sporterboog2scores[deelnemer.sporterboog.pk]
+                    betere_klassen = self._onbekend2beter[deelnemer.indiv_klasse_id]
                 except KeyError:
+                    # overslaan, want niet meer in een klasse onbekend
                     pass
                 else:
-                    # tot nu toe hebben we de verwijderde scores meegenomen zodat we deze
-                    # change-trigger krijgen. Nu moeten de verwijderde scores eruit
-                    scores = [score
-                              for afstand, score in tups
-                              if score.waarde != SCORE_WAARDE_VERWIJDERD and afstand == comp_afstand]
-
-                    # nieuwe scores toevoegen
-                    curr_scores = deelnemer.scores.all()
-                    for score in scores:
-                        if score not in curr_scores:
-                            self.stdout.write('[INFO] Deelnemer pk=%s: add score pk=%s' % (deelnemer.pk, score.pk))
-                            deelnemer.scores.add(score)
-                    # for
-
-                    # verwijderde scores doorvoeren
-                    for score in curr_scores:
-                        if score not in scores:
-                            self.stdout.write('[INFO] Deelnemer pk=%s: remove score pk=%s' % (deelnemer.pk, score.pk))
-                            deelnemer.scores.remove(score)
-                    # for
-
-                    # door waarde te filteren op max_score voorkomen we problemen
-                    # die anders pas naar boven komen tijdens de save()
-                    waardes = [score.waarde
-                               for afstand, score in tups
-                               if score.waarde <= max_score and afstand == comp_afstand]
-
-                    waardes.extend([0, 0, 0, 0, 0, 0, 0])
-                    waardes = waardes[:7]
-                    deelnemer.score1 = waardes[0]
-                    deelnemer.score2 = waardes[1]
-                    deelnemer.score3 = waardes[2]
-                    deelnemer.score4 = waardes[3]
-                    deelnemer.score5 = waardes[4]
-                    deelnemer.score6 = waardes[5]
-                    deelnemer.score7 = waardes[6]
-                    deelnemer.aantal_scores = len(waardes) - waardes.count(0)
-                    deelnemer.laagste_score_nr, laagste = self._bepaal_laagste_nr(waardes)
-                    deelnemer.gemiddelde, deelnemer.totaal = self._bepaal_gemiddelde_en_totaal(
-                                                                    waardes,
-                                                                    comp.aantal_scores_voor_rk_deelname,
-                                                                    pijlen_per_ronde)
-
-                    # kijk of verplaatsing uit klasse onbekend van toepassing is
-                    if deelnemer.ag_voor_indiv < 0.001:
-                        try:
-                            betere_klassen = self._onbekend2beter[deelnemer.indiv_klasse.pk]
-                        except KeyError:
-                            # overslaan, want niet meer in een klasse onbekend
-                            pass
-                        else:
-                            # kijk of 3 scores ingevuld zijn
-                            # dit hoeven niet de eerste drie scores te zijn!
-                            waardes_niet_nul = [waarde for waarde in waardes if waarde > 0]
-                            if len(waardes_niet_nul) >= 3:
-                                totaal = sum(waardes_niet_nul[:3])      # max 3 scores meenemen
-                                # afronden op 3 decimalen (anders gebeurt dat tijdens opslaan in database)
-                                new_ag = round(totaal / (3 * pijlen_per_ronde), 3)
-
-                                # de betere klassen zijn gesorteerd op AG, hoogste eerst
-                                for klasse in betere_klassen:       # pragma: no branch
-                                    if new_ag >= klasse.min_ag:
-                                        # dit is de nieuwe klasse
-                                        self.stdout.write(
-                                            '[INFO] Verplaats %s (%sm) met nieuw AG %.3f naar klasse %s' % (
-                                                deelnemer.sporterboog.sporter.lid_nr,
-                                                klasse.competitie.afstand,
-                                                new_ag, klasse))
-                                        deelnemer.indiv_klasse = klasse
-                                        break
-                                # for
-
-                    deelnemer.save()
-                    count += 1
+                    # kijk of 3 scores ingevuld zijn
+                    # dit hoeven niet de eerste drie scores te zijn!
+                    waardes_niet_nul = [waarde for waarde in waardes if waarde > 0]
+                    if len(waardes_niet_nul) >= 3:
+                        totaal = sum(waardes_niet_nul[:3])      # max 3 scores meenemen
+                        # afronden op 3 decimalen (anders gebeurt dat tijdens opslaan in database)
+                        new_ag = round(totaal / (3 * pijlen_per_ronde), 3)
+
+                        # de betere klassen zijn gesorteerd op AG, hoogste eerst
+                        for klasse in betere_klassen:       # pragma: no branch
+                            if new_ag >= klasse.min_ag:
+                                # dit is de nieuwe klasse
+                                self.stdout.write(
+                                    '[INFO] Verplaats %s (%sm) met nieuw AG %.3f naar klasse %s' % (
+                                        deelnemer.sporterboog.sporter.lid_nr,
+                                        klasse.competitie.afstand,
+                                        new_ag, klasse))
+                                deelnemer.indiv_klasse = klasse
+                                break
+                        # for
+
+            bijgewerkt.append(deelnemer)
+            self._gewijzigde_comp_pks.add(comp.pk)
         # for
-        self.stdout.write('[INFO] Scores voor %s deelnemers bijgewerkt' % count)
 
-    @staticmethod
-    def _update_team_scores():
-        """ Update alle team scores aan de hand van wie er in de teams zitten en de door de RCL geselecteerde scores
+        if len(scores_erbij):
+            RegioDeelnemer.scores.through.objects.bulk_create(scores_erbij)
+
+        if len(scores_eraf):
+            filter_eraf = scores_eraf.pop(0)
+            for filter_q in scores_eraf:
+                filter_eraf |= filter_q
+            RegioDeelnemer.scores.through.objects.filter(filter_eraf).delete()
+
+        if len(bijgewerkt):
+            RegioDeelnemer.objects.bulk_update(bijgewerkt,
+                                               ('score1', 'score2', 'score3', 'score4', 'score5', 'score6', 'score7',
+                                                'aantal_scores', 'laagste_score_nr', 'gemiddelde', 'totaal',
+                                                'indiv_klasse'),
+                                               batch_size=500)
+
+        self.stdout.write('[INFO] Scores voor %s deelnemers bijgewerkt' % len(bijgewerkt))
+
+    def _update_team_scores(self):
+        """ Update de team scores aan de hand van wie er in de teams zitten en de door de RCL geselecteerde scores
+            Na een trigger (of met --all) worden alle teams bijgewerkt,
+            anders alleen de teams met een score van een sporterboog met een nieuwe ScoreHist.
         """
-        for deelcomp in RegioComp.objects.filter(is_afgesloten=False):
-            ronde_nr = deelcomp.huidige_team_ronde
-            if 1 <= ronde_nr <= 7:
-                # pak alle teams in deze regiocompetitie erbij
-                teams = RegioTeam.objects.filter(regiocomp=deelcomp).values_list('pk', flat=True)
-
-                # doorloop alle ronde-teams voor de huidige ronde van de regiocompetitie
-                for ronde_team in (RegioRondeTeam
-                                   .objects
-                                   .prefetch_related('scores_feitelijk')
-                                   .filter(team__in=teams,
-                                           ronde_nr=ronde_nr)):
-
-                    team_scores = list()
-                    score_pks = list()
-                    for score in ronde_team.scores_feitelijk.exclude(waarde=SCORE_WAARDE_VERWIJDERD):
-                        team_scores.append(score.waarde)
-                        score_pks.append(score.pk)
-                    # for
-                    team_scores.sort(reverse=True)      # hoogste eerst
-
-                    # ScoreHist erbij zoeken
-                    hist_pks = list()
-                    for scorehist in (ScoreHist
-                                      .objects
-                                      .select_related('score')
-                                      .filter(score__in=score_pks)
-                                      .order_by('-when')):      # nieuwste eerst
-                        if scorehist.score.pk in score_pks:
-                            hist_pks.append(scorehist.pk)
-                            score_pks.remove(scorehist.score.pk)
-
-                        if len(score_pks) == 0:
-                            # no more scores for which to find a ScoreHist
-                            break       # from the for
-                    # for
-
-                    # sla de ScoreHist op
-                    ronde_team.scorehist_feitelijk.set(hist_pks)
-
-                    # de hoogste 3 scores maken de teamscore
-                    team_score = 0
-                    for score in team_scores[:3]:
-                        team_score += score
-                    # for
-
-                    # is de team score aangepast?
-                    if ronde_team.team_score != team_score:
-                        # print('nieuwe team_score voor team %s: %s --> %s' % (
-                        #           ronde_team, ronde_team.team_score, team_score))
-                        ronde_team.team_score = team_score
-                        ronde_team.save(update_fields=['team_score'])
-
-                # for (ronde team)
-        # for (deelcomp)
+        # ronde-teams van de huidige team ronde van elke regiocompetitie die nog niet afgesloten is
+        qset = (RegioRondeTeam
+                .objects
+                .filter(team__regiocomp__is_afgesloten=False,
+                        team__regiocomp__huidige_team_ronde__gte=1,
+                        team__regiocomp__huidige_team_ronde__lte=7,
+                        ronde_nr=F('team__regiocomp__huidige_team_ronde')))
+
+        if not self._alle_teams:
+            if len(self._gewijzigde_sporterboog_pks) == 0:
+                return
+            qset = qset.filter(scores_feitelijk__sporterboog__pk__in=self._gewijzigde_sporterboog_pks).distinct()
+        self._alle_teams = False
+
+        pk2ronde_team = dict()
+        for ronde_team in (qset
+                           .only('pk', 'team_score')
+                           .annotate(comp_pk=F('team__regiocomp__competitie__pk'))):
+            ronde_team.team_scores = list()
+            ronde_team.hist_pks = set()
+            pk2ronde_team[ronde_team.pk] = ronde_team
+        # for
+
+        if len(pk2ronde_team) == 0:
+            return
+
+        # haal in 1 query alle gekozen scores op, met de nieuwste ScoreHist van elke score
+        for ronde_team_pk, waarde, hist_pk in (RegioRondeTeam
+                                               .scores_feitelijk
+                                               .through
+                                               .objects
+                                               .filter(regiorondeteam__pk__in=pk2ronde_team.keys())
+                                               .exclude(score__waarde=SCORE_WAARDE_VERWIJDERD)
+                                               .annotate(hist_pk=F('score__scorehist__pk'),
+                                                         nieuwste=Window(
+                                                             RowNumber(),
+                                                             partition_by=F('pk'),
+                                                             order_by=F('score__scorehist__when').desc(nulls_last=True)))
+                                               .filter(nieuwste=1)
+                                               .values_list('regiorondeteam__pk', 'score__waarde', 'hist_pk')):
+            ronde_team = pk2ronde_team[ronde_team_pk]
+            ronde_team.team_scores.append(waarde)
+            if hist_pk:
+                ronde_team.hist_pks.add(hist_pk)
+        # for
+
+        # huidige ScoreHist koppelingen ophalen
+        hist_through = RegioRondeTeam.scorehist_feitelijk.through
+        huidige_hist = dict()       # [ronde_team.pk] = set(ScoreHist.pk)
+        for ronde_team_pk, hist_pk in (hist_through
+                                       .objects
+                                       .filter(regiorondeteam__pk__in=pk2ronde_team.keys())
+                                       .values_list('regiorondeteam__pk', 'scorehist__pk')):
+            try:
+                huidige_hist[ronde_team_pk].add(hist_pk)
+            except KeyError:
+                huidige_hist[ronde_team_pk] = {hist_pk}
+        # for
+
+        hist_erbij = list()
+        hist_eraf = list()
+        bijgewerkt = list()
+        for ronde_team in pk2ronde_team.values():
+            # sla de ScoreHist op
+            huidig = huidige_hist.get(ronde_team.pk, set())
+            for hist_pk in ronde_team.hist_pks - huidig:
+                hist_erbij.append(hist_through(regiorondeteam_id=ronde_team.pk, scorehist_id=hist_pk))
+            # for
+            for hist_pk in huidig - ronde_team.hist_pks:
+                hist_eraf.append(Q(regiorondeteam__pk=ronde_team.pk, scorehist__pk=hist_pk))
+            # for
+            if huidig != ronde_team.hist_pks:
+                self._gewijzigde_comp_pks.add(ronde_team.comp_pk)
+
+            # de hoogste 3 scores maken de teamscore
+            ronde_team.team_scores.sort(reverse=True)      # hoogste eerst
+            team_score = sum(ronde_team.team_scores[:3])
+
+            # is de team score aangepast?
+            if ronde_team.team_score != team_score:
+                # print('nieuwe team_score voor team %s: %s --> %s' % (
+                #           ronde_team, ronde_team.team_score, team_score))
+                ronde_team.team_score = team_score
+                bijgewerkt.append(ronde_team)
+                self._gewijzigde_comp_pks.add(ronde_team.comp_pk)
+        # for
+
+        if len(hist_erbij):
+            hist_through.objects.bulk_create(hist_erbij)
+
+        if len(hist_eraf):
+            filter_eraf = hist_eraf.pop(0)
+            for filter_q in hist_eraf:
+                filter_eraf |= filter_q
+            hist_through.objects.filter(filter_eraf).delete()
+
+        if len(bijgewerkt):
+            RegioRondeTeam.objects.bulk_update(bijgewerkt, ('team_score',), batch_size=500)
 
     def _update_tussenstand(self):
         begin = datetime.datetime.now()
+        self._gewijzigde_comp_pks = set()
 
         # stap 1: alle RegioDeelnemer.scores vaststellen
         self._vind_scores()
@@ -451,13 +516,23 @@ class Command(BaseCommand):
         # stap 3: teams scores bijwerken
         self._update_team_scores()
 
+        # stap 4: de uitslagen in de cache van de bijgewerkte competities zijn verouderd
+        if len(self._gewijzigde_comp_pks):
+            verhoog_uitslagen_versie(self._gewijzigde_comp_pks)
+
         klaar = datetime.datetime.now()
         self.stdout.write('[INFO] Tussenstand bijgewerkt in %s seconden' % (klaar - begin))
 
+    def _statistiek_bijwerken(self, now):
+        if now >= self._volgende_statistiek:
+            self._volgende_statistiek = now + STATISTIEK_INTERVAL
+            werk_competitie_statistiek_bij()
+
     def _monitor_nieuwe_scores(self):
         # monitor voor nieuwe ScoreHist
         hist_count = 0      # moet 0 zijn: beschermd tegen query op lege scorehist tabel
         now = datetime.datetime.now()
+        self._volgende_statistiek = now + STATISTIEK_INTERVAL
         while now < self.stop_at:               # pragma: no branch
             new_count = ScoreHist.objects.count()
             if new_count != hist_count:
@@ -467,6 +542,8 @@ class Command(BaseCommand):
                 if fake_count > 0:
                     self.stdout.write('[DEBUG] Verwijder %s fake ScoreHist records' % fake_count)
                     fake_objs.delete()
+                    # de trigger is voor de teams
+                    self._alle_teams = True
                     new_count = ScoreHist.objects.count()
 
                 hist_count = new_count
@@ -474,6 +551,8 @@ class Command(BaseCommand):
                     self._update_tussenstand()
                 now = datetime.datetime.now()
 
+            self._statistiek_bijwerken(now)
+
             # sleep at least 2 seconds, then check again
             secs = (self.stop_at - now).total_seconds()
             if secs > 2:                          # pragma: no branch
@@ -526,6 +605,7 @@ class Command(BaseCommand):
 
         if options['all']:
             self.taken.hoogste_scorehist = None
+            self._alle_teams = True
 
         self._verwerk_overstappers()
 
@@ -5,12 +5,12 @@
 #  Licensed under BSD-3-Clause-Clear. See LICENSE file for details.
 
 from django.test import TestCase
-from BasisTypen.models import BoogType
-from Competitie.models import Competitie, CompetitieIndivKlasse, CompetitieMatch
+from BasisTypen.models import BoogType, TeamType
+from Competitie.models import Competitie, CompetitieIndivKlasse, CompetitieMatch, update_uitslag_teamcompetitie
 from Competitie.operations import competities_aanmaken, competitie_klassengrenzen_vaststellen
 from Competitie.test_utils.tijdlijn import zet_competitie_fases
 from CompLaagBond.models import KampBK
-from CompLaagRegio.models import RegioComp, RegioRonde, RegioDeelnemer
+from CompLaagRegio.models import RegioComp, RegioRonde, RegioDeelnemer, RegioTeam, RegioRondeTeam
 from Geo.models import Regio
 from Score.definities import SCORE_WAARDE_VERWIJDERD
 from Score.models import Score, ScoreHist
@@ -261,7 +261,7 @@ class TestCompLaagRegioCliRegiocompTussenstand(E2EHelpers, TestCase):
         ScoreHist.objects.all().delete()
         Score.objects.all().delete()
 
-        with self.assert_max_queries(115):
+        with self.assert_max_queries(7):
             f1, f2 = self.run_management_command('regiocomp_tussenstand', '2', '--quick')
         self.assertTrue(f1.getvalue() == '')
         self.assertTrue('Klaar' in f2.getvalue())
@@ -271,10 +271,17 @@ class TestCompLaagRegioCliRegiocompTussenstand(E2EHelpers, TestCase):
         self._score_opslaan(self.uitslagen[0], self.sporterboog_100001, 123)
         self._score_opslaan(self.uitslagen[2], self.sporterboog_100001, 124)
 
-        with self.assert_max_queries(176):
+        versies = dict(Competitie.objects.values_list('afstand', 'uitslagen_versie'))
+
+        with self.assert_max_queries(18):
             f1, f2 = self.run_management_command('regiocomp_tussenstand', '2', '--quick')
         self.assertTrue('Scores voor 1 deelnemers bijgewerkt' in f2.getvalue())
 
+        # alleen de uitslagen van de bijgewerkte competitie zijn verouderd
+        nieuw = dict(Competitie.objects.values_list('afstand', 'uitslagen_versie'))
+        self.assertEqual(nieuw['18'], versies['18'] + 1)
+        self.assertEqual(nieuw['25'], versies['25'])
+
         deelnemer = RegioDeelnemer.objects.get(sporterboog=self.sporterboog_100001)
         self.assertEqual(deelnemer.score1, 123)
         self.assertEqual(deelnemer.score2, 124)
@@ -290,12 +297,13 @@ class TestCompLaagRegioCliRegiocompTussenstand(E2EHelpers, TestCase):
         #           deelnemer.laagste_score_nr, deelnemer.totaal, deelnemer.gemiddelde))
 
         # nog een keer - nu wordt er niets bijgewerkt omdat er geen nieuwe scores zijn
-        with self.assert_max_queries(173):
+        with self.assert_max_queries(13):
             f1, f2 = self.run_management_command('regiocomp_tussenstand', '2', '--quick')
         self.assertTrue('Scores voor 0 deelnemers bijgewerkt' in f2.getvalue())
+        self.assertEqual(nieuw, dict(Competitie.objects.values_list('afstand', 'uitslagen_versie')))
 
         # nog een keer met 'all'
-        with self.assert_max_queries(174):
+        with self.assert_max_queries(17):
             f1, f2 = self.run_management_command('regiocomp_tussenstand', '2', '--quick', '--all')
         # print("f1: %s" % f1.getvalue())
         # print("f2: %s" % f2.getvalue())
@@ -310,7 +318,7 @@ class TestCompLaagRegioCliRegiocompTussenstand(E2EHelpers, TestCase):
         self._score_opslaan(self.uitslagen[4], self.sporterboog_100001, 127)
         self._score_opslaan(self.uitslagen[5], self.sporterboog_100001, 128)
         self._score_opslaan(self.uitslagen[6], self.sporterboog_100001, 129)
-        with self.assert_max_queries(182):
+        with self.assert_max_queries(18):
             f1, f2 = self.run_management_command('regiocomp_tussenstand', '2', '--quick')
         # print("f1: %s" % f1.getvalue())
         # print("f2: %s" % f2.getvalue())
@@ -334,7 +342,7 @@ class TestCompLaagRegioCliRegiocompTussenstand(E2EHelpers, TestCase):
         score.waarde = SCORE_WAARDE_VERWIJDERD
         score.save()
 
-        with self.assert_max_queries(176):
+        with self.assert_max_queries(19):
             f1, f2 = self.run_management_command('regiocomp_tussenstand', '2', '--quick')
         # print("f1: %s" % f1.getvalue())
         # print("f2: %s" % f2.getvalue())
@@ -399,7 +407,7 @@ class TestCompLaagRegioCliRegiocompTussenstand(E2EHelpers, TestCase):
 
         self._score_opslaan(self.uitslagen[4], self.sporterboog_100005, 128)
 
-        with self.assert_max_queries(191):
+        with self.assert_max_queries(18):
             f1, f2 = self.run_management_command('regiocomp_tussenstand', '2', '--quick')
         # print("f2: %s" % f2.getvalue())
         self.assertTrue('[INFO] Verplaats 100001 (18m) met nieuw AG 4.167 naar klasse Recurve klasse' in f2.getvalue())
@@ -421,7 +429,7 @@ class TestCompLaagRegioCliRegiocompTussenstand(E2EHelpers, TestCase):
         self._score_opslaan(self.uitslagen[5], self.sporterboog_100001, 129)
         self._score_opslaan(self.uitslagen[6], self.sporterboog_100001, 128)
 
-        with self.assert_max_queries(182):
+        with self.assert_max_queries(18):
             f1, f2 = self.run_management_command('regiocomp_tussenstand', '2', '--quick')
         # print("f2: %s" % f2.getvalue())
         self.assertTrue('[INFO] Verplaats 100001 (18m) met nieuw AG 4.133 naar klasse Recurve klasse' in f2.getvalue())
@@ -433,7 +441,7 @@ class TestCompLaagRegioCliRegiocompTussenstand(E2EHelpers, TestCase):
         self._score_opslaan(self.uitslagen[0], self.sporterboog_100001, 123)
         self._score_opslaan(self.uitslagen[2], self.sporterboog_100001, 124)
 
-        with self.assert_max_queries(176):
+        with self.assert_max_queries(18):
             f1, f2 = self.run_management_command('regiocomp_tussenstand', '2', '--quick')
         self.assertTrue('Scores voor 1 deelnemers bijgewerkt' in f2.getvalue())
 
@@ -445,7 +453,7 @@ class TestCompLaagRegioCliRegiocompTussenstand(E2EHelpers, TestCase):
         sporter.bij_vereniging = None
         sporter.save(update_fields=['bij_vereniging'])
 
-        with self.assert_max_queries(174):
+        with self.assert_max_queries(17):
             f1, f2 = self.run_management_command('regiocomp_tussenstand', '2', '--all', '--quick')
         self.assertFalse("[INFO] Verwerk overstap" in f2.getvalue())
 
@@ -461,7 +469,7 @@ class TestCompLaagRegioCliRegiocompTussenstand(E2EHelpers, TestCase):
         sporter.bij_vereniging = ver
         sporter.save(update_fields=['bij_vereniging'])
 
-        with self.assert_max_queries(178):
+        with self.assert_max_queries(17):
             f1, f2 = self.run_management_command('regiocomp_tussenstand', '2', '--quick')
         self.assertTrue("[INFO] Verwerk overstap 100001: [101] [1000] Grote Club --> [116] [1100] Zuidelijke Club"
                         in f2.getvalue())
@@ -472,7 +480,7 @@ class TestCompLaagRegioCliRegiocompTussenstand(E2EHelpers, TestCase):
         sporter.bij_vereniging = self.ver
         sporter.save(update_fields=['bij_vereniging'])
 
-        with self.assert_max_queries(178):
+        with self.assert_max_queries(14):
             f1, f2 = self.run_management_command('regiocomp_tussenstand', '2', '--quick')
         self.assertTrue("[INFO] Verwerk overstap 100001: [116] [1100] Zuidelijke Club --> [116] [1000] Grote Club"
                         in f2.getvalue())
@@ -485,7 +493,7 @@ class TestCompLaagRegioCliRegiocompTussenstand(E2EHelpers, TestCase):
         # for
         sporter.bij_vereniging = ver
         sporter.save()
-        with self.assert_max_queries(173):
+        with self.assert_max_queries(12):
             f1, f2 = self.run_management_command('regiocomp_tussenstand', '2', '--quick')
         # print("f1: %s" % f1.getvalue())
         # print("f2: %s" % f2.getvalue())
@@ -497,7 +505,7 @@ class TestCompLaagRegioCliRegiocompTussenstand(E2EHelpers, TestCase):
         # maak een paar score + scorehist
         self._score_opslaan(self.uitslagen[0], self.sporterboog_100001, 123)
         self._score_opslaan(self.uitslagen[2], self.sporterboog_100001, 124)
-        with self.assert_max_queries(176):
+        with self.assert_max_queries(18):
             f1, f2 = self.run_management_command('regiocomp_tussenstand', '2', '--quick')
         self.assertTrue('Scores voor 1 deelnemers bijgewerkt' in f2.getvalue())
 
@@ -505,7 +513,7 @@ class TestCompLaagRegioCliRegiocompTussenstand(E2EHelpers, TestCase):
         sporter = self.sporterboog_100001.sporter
         sporter.bij_vereniging = None
         sporter.save()
-        with self.assert_max_queries(176, check_duration=False):        # 7 seconden is boven de limiet
+        with self.assert_max_queries(16, check_duration=False):        # 7 seconden is boven de limiet
             f1, f2 = self.run_management_command('regiocomp_tussenstand', '7', '--quick')
         # print("f1: %s" % f1.getvalue())
         # print("f2: %s" % f2.getvalue())
@@ -515,6 +523,69 @@ class TestCompLaagRegioCliRegiocompTussenstand(E2EHelpers, TestCase):
         self.assertIsNone(deelnemer.sporterboog.sporter.bij_vereniging)
         self.assertIsNotNone(deelnemer.bij_vereniging)
 
+    def test_team_scores(self):
+        self.deelcomp_r101.huidige_team_ronde = 1
+        self.deelcomp_r101.save(update_fields=['huidige_team_ronde'])
+
+        team_type = TeamType.objects.get(afkorting='R2')
+        team1 = RegioTeam.objects.create(regiocomp=self.deelcomp_r101, vereniging=self.ver, volg_nr=1,
+                                         team_type=team_type)
+        team2 = RegioTeam.objects.create(regiocomp=self.deelcomp_r101, vereniging=self.ver, volg_nr=2,
+                                         team_type=team_type)
+        ronde_team1 = RegioRondeTeam.objects.create(team=team1, ronde_nr=1)
+        ronde_team2 = RegioRondeTeam.objects.create(team=team2, ronde_nr=1)
+        RegioRondeTeam.objects.create(team=team2, ronde_nr=2, team_score=42)      # niet de huidige ronde
+
+        self._score_opslaan(self.uitslagen[0], self.sporterboog_100001, 280)
+        self._score_opslaan(self.uitslagen[0], self.sporterboog_100002, 270)
+        self._score_opslaan(self.uitslagen[0], self.sporterboog_100004, 260)
+        self._score_opslaan(self.uitslagen[0], self.sporterboog_100005, 250)
+        score_pks = list(Score.objects.filter(waarde__gte=250).order_by('-waarde').values_list('pk', flat=True))
+        ronde_team1.scores_feitelijk.set(score_pks)
+        ronde_team2.scores_feitelijk.set(score_pks[3:])
+
+        f1, f2 = self.run_management_command('regiocomp_tussenstand', '2', '--quick')
+        ronde_team1.refresh_from_db()
+        self.assertEqual(ronde_team1.team_score, 280 + 270 + 260)
+        self.assertEqual(ronde_team1.scorehist_feitelijk.count(), 4)
+        ronde_team2.refresh_from_db()
+        self.assertEqual(ronde_team2.team_score, 250)
+        self.assertEqual(RegioRondeTeam.objects.get(ronde_nr=2).team_score, 42)
+
+        # nieuwe score van een sporter in team 1: alleen team 1 wordt bijgewerkt
+        ronde_team2.team_score = 1
+        ronde_team2.save(update_fields=['team_score'])
+
+        score = Score.objects.get(pk=score_pks[1])
+        ScoreHist(score=score, oude_waarde=score.waarde, nieuwe_waarde=275).save()
+        score.waarde = 275
+        score.save(update_fields=['waarde'])
+
+        f1, f2 = self.run_management_command('regiocomp_tussenstand', '2', '--quick')
+        ronde_team1.refresh_from_db()
+        self.assertEqual(ronde_team1.team_score, 280 + 275 + 260)
+        self.assertEqual(ronde_team1.scorehist_feitelijk.count(), 4)
+        self.assertEqual(ronde_team1.scorehist_feitelijk.order_by('-when')[0].nieuwe_waarde, 275)
+        ronde_team2.refresh_from_db()
+        self.assertEqual(ronde_team2.team_score, 1)
+
+        # verwijderde score telt niet mee
+        score = Score.objects.get(pk=score_pks[0])
+        ScoreHist(score=score, oude_waarde=score.waarde, nieuwe_waarde=SCORE_WAARDE_VERWIJDERD).save()
+        score.waarde = SCORE_WAARDE_VERWIJDERD
+        score.save(update_fields=['waarde'])
+
+        f1, f2 = self.run_management_command('regiocomp_tussenstand', '2', '--quick')
+        ronde_team1.refresh_from_db()
+        self.assertEqual(ronde_team1.team_score, 275 + 260 + 250)
+        self.assertEqual(ronde_team1.scorehist_feitelijk.count(), 3)
+
+        # trigger van de RCL: alle teams worden bijgewerkt
+        update_uitslag_teamcompetitie()
+        f1, f2 = self.run_management_command('regiocomp_tussenstand', '2', '--quick')
+        ronde_team2.refresh_from_db()
+        self.assertEqual(ronde_team2.team_score, 250)
+
     def test_stop_exactly(self):
         now = datetime.datetime.now()
         if now.minute == 0:                             # pragma: no cover
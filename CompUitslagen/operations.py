@@ -5,8 +5,13 @@
 #  Licensed under BSD-3-Clause-Clear. See LICENSE file for details.
 
 from django.urls import reverse
+from django.core.cache import cache
 from Overig.helpers import make_valid_hashtag
 
+# hoe lang een berekende uitslag in de cache blijft
+# de achtergrondtaken verhogen Competitie.uitslagen_versie, dus normaal gesproken is een uitslag al eerder verouderd
+UITSLAG_CACHE_TIMEOUT = 10 * 60     # in seconden
+
 
 def maak_url_uitslag_bk_indiv(seizoen_url: str, boog_type_url: str, klasse_str: str):
     url = reverse('CompUitslagen:uitslagen-bk-indiv',
@@ -42,4 +47,20 @@ def maak_url_uitslag_rk_teams(seizoen_url: str, rayon_nr: int, team_type_url: st
     return url
 
 
+def get_uitslag_uit_cache(comp, soort: str, sleutel: tuple, maak_uitslag):
+    """ lever de uitslag (een dict voor de context) uit de cache, of laat deze maken met maak_uitslag()
+
+        de sleutel bevat Competitie.uitslagen_versie en de fases van de competitie,
+        dus na een wijziging door de achtergrondtaken of een nieuwe fase wordt de uitslag opnieuw gemaakt
+        comp.bepaal_fase() moet al aangeroepen zijn
+    """
+    key = 'uitslag:%s:%s:%s:%s%s:%s' % (soort, comp.pk, comp.uitslagen_versie, comp.fase_indiv, comp.fase_teams,
+                                        ':'.join([str(waarde) for waarde in sleutel]))
+    uitslag = cache.get(key)
+    if uitslag is None:
+        uitslag = maak_uitslag()
+        cache.set(key, uitslag, UITSLAG_CACHE_TIMEOUT)
+    return uitslag
+
+
 # end of file
@@ -6,6 +6,9 @@
 
 from django.test import TestCase
 from django.utils import timezone
+from django.core.cache import cache
+from Competitie.operations import verhoog_uitslagen_versie
+from CompLaagRegio.models import RegioDeelnemer
 from TestHelpers.e2ehelpers import E2EHelpers
 from TestHelpers.testdata import TestData
 
@@ -230,6 +233,49 @@ class TestCompUitslagenRegio(E2EHelpers, TestCase):
         self.assert_html_ok(resp)
         self.assert_template_used(resp, ('compuitslagen/regio-teams.dtl', 'design/site_layout.dtl'))
 
+    def test_cache(self):
+        cache.clear()
+
+        url = self.url_uitslagen_regio_indiv_n % (self.testdata.comp18.pk, 101, 'R')
+        with self.assert_max_queries(20):
+            resp = self.client.get(url)
+        self.assertEqual(resp.status_code, 200)
+
+        deelnemer = (RegioDeelnemer
+                     .objects
+                     .filter(regiocomp__competitie=self.testdata.comp18,
+                             regiocomp__regio__regio_nr=101,
+                             sporterboog__boogtype__afkorting='R')
+                     .select_related('sporterboog__sporter')
+                     .first())
+        sporter = deelnemer.sporterboog.sporter
+        sporter.voornaam = 'Gecached'
+        sporter.save(update_fields=['voornaam'])
+
+        # de uitslag komt uit de cache
+        with self.assert_max_queries(8):
+            resp = self.client.get(url)
+        self.assertEqual(resp.status_code, 200)
+        self.assert_html_ok(resp)
+        self.assertNotContains(resp, 'Gecached')
+
+        # na een wijziging door de achtergrondtaak wordt de uitslag opnieuw gemaakt
+        verhoog_uitslagen_versie([self.testdata.comp18.pk])
+        with self.assert_max_queries(20):
+            resp = self.client.get(url)
+        self.assertEqual(resp.status_code, 200)
+        self.assertContains(resp, 'Gecached')
+
+        # team uitslag
+        url = self.url_uitslagen_regio_teams_n % (self.testdata.comp18.pk, 101, 'R2')
+        with self.assert_max_queries(20):
+            resp = self.client.get(url)
+        self.assertEqual(resp.status_code, 200)
+        with self.assert_max_queries(8):
+            resp = self.client.get(url)
+        self.assertEqual(resp.status_code, 200)
+        self.assert_html_ok(resp)
+
     def test_hist(self):
         # test redirect naar HistComp uitslag
         resp = self.client.get(self.url_uitslagen_regio_indiv % ('indoor-2000-2001', 'r'))
@@ -14,6 +14,7 @@ from Competitie.models import Competitie, CompetitieMatch
 from Competitie.seizoenen import get_comp_pk
 from CompLaagBond.models import KampBK, TeamBK
 from CompLaagRayon.models import DeelnemerRK
+from CompUitslagen.operations import get_uitslag_uit_cache
 from Functie.rol import rol_get_huidige_functie
 from HistComp.operations import get_hist_url
 from Overig.helpers import make_valid_hashtag
@@ -117,47 +118,8 @@ class UitslagenBKTeamsView(TemplateView):
 
         return teller
 
-    def get_context_data(self, **kwargs):
-        """ called by the template system to get the context data for the template """
-        context = super().get_context_data(**kwargs)
-
-        if not self.comp:
-            raise Http404('Competitie niet gevonden')
-
-        context['comp'] = self.comp
-
-        teamtype_afkorting = kwargs['team_type'][:3]     # afkappen voor de veiligheid
-
-        self._maak_filter_knoppen(context, teamtype_afkorting)
-
-        teamtype = context['teamtype']
-        if not teamtype:
-            raise Http404('Team type niet bekend')
-
-        try:
-            deelkamp_bk = (KampBK
-                           .objects
-                           .select_related('competitie')
-                           .get(competitie__is_afgesloten=False,
-                                competitie=self.comp))
-        except KampBK.DoesNotExist:
-            raise Http404('Kampioenschap niet gevonden')
-
-        context['deelkamp_bk'] = deelkamp_bk
-
-        # als de gebruiker ingelogd is, laat dan de voor de teams van zijn vereniging zien wie er in de teams zitten
-        toon_team_leden_van_ver_nr = None
-        rol_nu, functie_nu = rol_get_huidige_functie(self.request)
-        account = get_account(self.request)
-        if account.is_authenticated:
-            if functie_nu and functie_nu.vereniging:
-                # HWL, WL
-                toon_team_leden_van_ver_nr = functie_nu.vereniging.ver_nr
-            else:
-                # geen beheerder, dus sporter
-                sporter = Sporter.objects.filter(account=account).first()
-                if sporter and sporter.is_actief_lid and sporter.bij_vereniging:
-                    toon_team_leden_van_ver_nr = sporter.bij_vereniging.ver_nr
+    def _maak_uitslag(self, deelkamp_bk, teamtype, toon_team_leden_van_ver_nr):
+        """ bepaal de teams in de uitslag; het resultaat wordt in de cache bewaard """
 
         # haal de planning erbij: team klasse --> match
         teamklasse2match = dict()     # [team_klasse.pk] = competitiematch
@@ -186,7 +148,7 @@ class UitslagenBKTeamsView(TemplateView):
             bk_cache[deelnemer.pk] = deelnemer
         # for
 
-        context['bk_teams'] = totaal_lijst = list()
+        totaal_lijst = list()
 
         prev_klasse = ""
         klasse_teams_done = list()
@@ -349,7 +311,60 @@ class UitslagenBKTeamsView(TemplateView):
         totaal_lijst.extend(klasse_teams_plan)
         totaal_lijst.extend(klasse_teams_afgemeld)
 
-        context['geen_teams'] = len(totaal_lijst) == 0
+        uitslag = {
+            'bk_teams': totaal_lijst,
+            'geen_teams': len(totaal_lijst) == 0,
+        }
+        return uitslag
+
+    def get_context_data(self, **kwargs):
+        """ called by the template system to get the context data for the template """
+        context = super().get_context_data(**kwargs)
+
+        if not self.comp:
+            raise Http404('Competitie niet gevonden')
+
+        context['comp'] = self.comp
+
+        teamtype_afkorting = kwargs['team_type'][:3]     # afkappen voor de veiligheid
+
+        self._maak_filter_knoppen(context, teamtype_afkorting)
+
+        teamtype = context['teamtype']
+        if not teamtype:
+            raise Http404('Team type niet bekend')
+
+        try:
+            deelkamp_bk = (KampBK
+                           .objects
+                           .select_related('competitie')
+                           .get(competitie__is_afgesloten=False,
+                                competitie=self.comp))
+        except KampBK.DoesNotExist:
+            raise Http404('Kampioenschap niet gevonden')
+
+        context['deelkamp_bk'] = deelkamp_bk
+
+        # als de gebruiker ingelogd is, laat dan de voor de teams van zijn vereniging zien wie er in de teams zitten
+        toon_team_leden_van_ver_nr = None
+        rol_nu, functie_nu = rol_get_huidige_functie(self.request)
+        account = get_account(self.request)
+        if account.is_authenticated:
+            if functie_nu and functie_nu.vereniging:
+                # HWL, WL
+                toon_team_leden_van_ver_nr = functie_nu.vereniging.ver_nr
+            else:
+                # geen beheerder, dus sporter
+                sporter = Sporter.objects.filter(account=account).first()
+                if sporter and sporter.is_actief_lid and sporter.bij_vereniging:
+                    toon_team_leden_van_ver_nr = sporter.bij_vereniging.ver_nr
+
+        uitslag = get_uitslag_uit_cache(self.comp, 'bk-teams',
+                                        (deelkamp_bk.pk, deelkamp_bk.is_afgesloten, teamtype.pk,
+                                         toon_team_leden_van_ver_nr),
+                                        lambda: self._maak_uitslag(deelkamp_bk, teamtype,
+                                                                   toon_team_leden_van_ver_nr))
+        context.update(uitslag)
 
         context['canonical'] = reverse('CompUitslagen:uitslagen-bk-teams',      # TODO: keep?
                                        kwargs={'comp_pk_of_seizoen': self.comp.maak_seizoen_url(),
@@ -11,6 +11,7 @@ from django.utils.safestring import mark_safe
 from Competitie.models import Competitie
 from Competitie.seizoenen import get_comp_pk
 from CompLaagRegio.models import RegioComp, RegioDeelnemer
+from CompUitslagen.operations import get_uitslag_uit_cache
 from Geo.models import Regio
 from HistComp.operations import get_hist_url
 from Overig.helpers import make_valid_hashtag
@@ -135,6 +136,61 @@ class UitslagenRegioIndivView(TemplateView):
         needs_closure = not is_first
         return needs_closure
 
+    def _maak_uitslag(self, deelcomp, boogtype):
+        """ bepaal de deelnemers in de uitslag; het resultaat wordt in de cache bewaard """
+
+        deelnemers = (RegioDeelnemer
+                      .objects
+                      .filter(regiocomp=deelcomp)
+                      .select_related('sporterboog__sporter',
+                                      'bij_vereniging',
+                                      'indiv_klasse__boogtype')
+                      .filter(indiv_klasse__boogtype=boogtype)
+                      .order_by('indiv_klasse__volgorde',
+                                '-gemiddelde',          # hoogste eerst
+                                '-ag_voor_indiv',       # hoogste eerst (gebruik: bij 0 scores)
+                                'pk'))                  # consistente volgorde, vooral in klasse onbekend
+
+        objs = list()
+        objs1 = list()      # primary lijst (genoeg scores)
+        objs2 = list()      # secundaire lijst (te weinig scores)
+        klasse = -1
+        klasse_str = None
+        needs_closure = False
+        for deelnemer in deelnemers:
+
+            if klasse != deelnemer.indiv_klasse.volgorde:
+                if klasse_str:
+                    needs_closure = self._lijstjes_toevoegen_aan_uitslag(objs, objs1, objs2, needs_closure, klasse_str)
+                objs1 = list()
+                objs2 = list()
+                klasse_str = deelnemer.indiv_klasse.beschrijving
+                klasse = deelnemer.indiv_klasse.volgorde
+
+            sporter = deelnemer.sporterboog.sporter
+            deelnemer.naam_str = "[%s] %s" % (sporter.lid_nr, sporter.volledige_naam())
+            deelnemer.ver_str = str(deelnemer.bij_vereniging)
+
+            # in plaats van allemaal 0,000 willen we het AG tonen tijdens de inschrijffase
+            if self.comp.fase_indiv < 'F':
+                deelnemer.gemiddelde = deelnemer.ag_voor_indiv
+
+            # zet sporters met te weinig scores in een secundair lijst die volgt op de primaire lijst
+            if True and deelcomp.is_afgesloten and deelnemer.aantal_scores < self.comp.aantal_scores_voor_rk_deelname:
+                # eindstand en te weinig scores
+                objs2.append(deelnemer)
+            else:
+                objs1.append(deelnemer)
+        # for
+
+        self._lijstjes_toevoegen_aan_uitslag(objs, objs1, objs2, needs_closure, klasse_str)
+
+        uitslag = {
+            'deelnemers': objs,
+            'heeft_deelnemers': len(objs) > 0,
+        }
+        return uitslag
+
     def get_context_data(self, **kwargs):
         """ called by the template system to get the context data for the template """
         context = super().get_context_data(**kwargs)
@@ -184,54 +240,9 @@ class UitslagenRegioIndivView(TemplateView):
         if not boogtype:
             raise Http404('Boogtype niet bekend')
 
-        deelnemers = (RegioDeelnemer
-                      .objects
-                      .filter(regiocomp=deelcomp)
-                      .select_related('sporterboog__sporter',
-                                      'bij_vereniging',
-                                      'indiv_klasse__boogtype')
-                      .filter(indiv_klasse__boogtype=boogtype)
-                      .order_by('indiv_klasse__volgorde',
-                                '-gemiddelde',          # hoogste eerst
-                                '-ag_voor_indiv',       # hoogste eerst (gebruik: bij 0 scores)
-                                'pk'))                  # consistente volgorde, vooral in klasse onbekend
-
-        objs = list()
-        objs1 = list()      # primary lijst (genoeg scores)
-        objs2 = list()      # secundaire lijst (te weinig scores)
-        klasse = -1
-        klasse_str = None
-        needs_closure = False
-        for deelnemer in deelnemers:
-
-            if klasse != deelnemer.indiv_klasse.volgorde:
-                if klasse_str:
-                    needs_closure = self._lijstjes_toevoegen_aan_uitslag(objs, objs1, objs2, needs_closure, klasse_str)
-                objs1 = list()
-                objs2 = list()
-                klasse_str = deelnemer.indiv_klasse.beschrijving
-                klasse = deelnemer.indiv_klasse.volgorde
-
-            sporter = deelnemer.sporterboog.sporter
-            deelnemer.naam_str = "[%s] %s" % (sporter.lid_nr, sporter.volledige_naam())
-            deelnemer.ver_str = str(deelnemer.bij_vereniging)
-
-            # in plaats van allemaal 0,000 willen we het AG tonen tijdens de inschrijffase
-            if self.comp.fase_indiv < 'F':
-                deelnemer.gemiddelde = deelnemer.ag_voor_indiv
-
-            # zet sporters met te weinig scores in een secundair lijst die volgt op de primaire lijst
-            if True and deelcomp.is_afgesloten and deelnemer.aantal_scores < self.comp.aantal_scores_voor_rk_deelname:
-                # eindstand en te weinig scores
-                objs2.append(deelnemer)
-            else:
-                objs1.append(deelnemer)
-        # for
-
-        self._lijstjes_toevoegen_aan_uitslag(objs, objs1, objs2, needs_closure, klasse_str)
-
-        context['deelnemers'] = objs
-        context['heeft_deelnemers'] = (len(objs) > 0)
+        uitslag = get_uitslag_uit_cache(self.comp, 'regio-indiv', (deelcomp.pk, deelcomp.is_afgesloten, boogtype.pk),
+                                        lambda: self._maak_uitslag(deelcomp, boogtype))
+        context.update(uitslag)
         context['canonical'] = reverse('CompUitslagen:uitslagen-regio-indiv',       # TODO: keep?
                                        kwargs={'comp_pk_of_seizoen': self.comp.maak_seizoen_url(),
                                                'comp_boog': comp_boog})
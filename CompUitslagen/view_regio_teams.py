@@ -13,6 +13,7 @@ from Competitie.models import Competitie
 from Competitie.seizoenen import get_comp_pk
 from Competitie.operations.poules import maak_poule_schema
 from CompLaagRegio.models import RegioComp, RegioTeam, RegioRondeTeam, RegioPoule
+from CompUitslagen.operations import get_uitslag_uit_cache
 from Geo.models import Regio
 from HistComp.operations import get_hist_url
 from Overig.helpers import make_valid_hashtag
@@ -120,60 +121,9 @@ class UitslagenRegioTeamsView(TemplateView):
 
                 context['ver_filters'] = vers
 
-    def get_context_data(self, **kwargs):
-        """ called by the template system to get the context data for the template """
-        context = super().get_context_data(**kwargs)
-
-        if not self.comp:
-            raise Http404('Competitie niet gevonden')
-
-        context['comp'] = self.comp
-
-        teamtype_afkorting = kwargs['team_type'][:3]     # afkappen voor de veiligheid
-
-        # regio_nr is optioneel (eerste binnenkomst zonder regio nummer)
-        try:
-            regio_nr = kwargs['regio_nr'][:3]   # afkappen voor de veiligheid
-            regio_nr = int(regio_nr)
-        except KeyError:
-            # bepaal welke (initiële) regio bij de huidige gebruiker past
-            regio_nr = get_request_regio_nr(self.request)
-        except ValueError:
-            raise Http404('Verkeerd regionummer')
-
-        # voorkom 404 voor leden in de administratieve regio
-        if regio_nr == 100:
-            regio_nr = 101
-
-        try:
-            deelcomp = (RegioComp
-                        .objects
-                        .select_related('competitie', 'regio')
-                        .get(competitie=self.comp,
-                             competitie__is_afgesloten=False,
-                             regio__regio_nr=regio_nr))
-        except RegioComp.DoesNotExist:
-            raise Http404('Competitie niet gevonden')
-
-        context['deelcomp'] = deelcomp
-
-        comp = deelcomp.competitie
-        comp.bepaal_fase()
-        if comp.fase_teams > 'F':
-            deelcomp.huidige_team_ronde = 8     # voorkomt kleurmarkering ronde 7 als actieve ronde
-
-        context['toon_punten'] = (deelcomp.regio_team_punten_model != TEAM_PUNTEN_MODEL_SOM_SCORES)
-
-        self._maak_filter_knoppen(context, regio_nr, teamtype_afkorting)
-        if not context['teamtype']:
-            raise Http404('Verkeerd team type')
-
-        context['url_filters'] = reverse('CompUitslagen:uitslagen-regio-teams-n',
-                                         kwargs={'comp_pk_of_seizoen': comp.maak_seizoen_url(),
-                                                 'team_type': '~1',
-                                                 'regio_nr': '~2'})
-
-        # zoek alle regio teams erbij
+    @staticmethod
+    def _maak_uitslag(deelcomp, teamtype):
+        """ zoek alle regio teams erbij en bepaal de stand; het resultaat wordt in de cache bewaard """
 
         heeft_poules = False
         poules = (RegioPoule
@@ -193,7 +143,7 @@ class UitslagenRegioTeamsView(TemplateView):
                     poule_pk2laagste_klasse_volgorde[poule.pk] = min(poule_pk2laagste_klasse_volgorde[poule.pk],
                                                                      team.team_klasse.volgorde)
 
-                if team.team_type == context['teamtype']:
+                if team.team_type == teamtype:
                     team_pk2poule[team.pk] = poule
                     heeft_teams = True
             # for
@@ -209,7 +159,7 @@ class UitslagenRegioTeamsView(TemplateView):
                  .objects
                  .exclude(team_klasse=None)
                  .filter(regiocomp=deelcomp,
-                         team_type=context['teamtype'])
+                         team_type=teamtype)
                  .select_related('vereniging',
                                  'team_klasse')
                  .order_by('team_klasse__volgorde'))
@@ -268,7 +218,7 @@ class UitslagenRegioTeamsView(TemplateView):
         # for
         unsorted_teams.sort()
 
-        context['teams'] = teams = list()
+        teams = list()
         prev_klasse = None
         prev_poule = None
         rank = 0
@@ -313,6 +263,71 @@ class UitslagenRegioTeamsView(TemplateView):
                             schema=prev_poule.schema)
             teams.append(afsluiter)
 
+        uitslag = {
+            'teams': teams,
+        }
+        return uitslag
+
+    def get_context_data(self, **kwargs):
+        """ called by the template system to get the context data for the template """
+        context = super().get_context_data(**kwargs)
+
+        if not self.comp:
+            raise Http404('Competitie niet gevonden')
+
+        context['comp'] = self.comp
+
+        teamtype_afkorting = kwargs['team_type'][:3]     # afkappen voor de veiligheid
+
+        # regio_nr is optioneel (eerste binnenkomst zonder regio nummer)
+        try:
+            regio_nr = kwargs['regio_nr'][:3]   # afkappen voor de veiligheid
+            regio_nr = int(regio_nr)
+        except KeyError:
+            # bepaal welke (initiële) regio bij de huidige gebruiker past
+            regio_nr = get_request_regio_nr(self.request)
+        except ValueError:
+            raise Http404('Verkeerd regionummer')
+
+        # voorkom 404 voor leden in de administratieve regio
+        if regio_nr == 100:
+            regio_nr = 101
+
+        try:
+            deelcomp = (RegioComp
+                        .objects
+                        .select_related('competitie', 'regio')
+                        .get(competitie=self.comp,
+                             competitie__is_afgesloten=False,
+                             regio__regio_nr=regio_nr))
+        except RegioComp.DoesNotExist:
+            raise Http404('Competitie niet gevonden')
+
+        context['deelcomp'] = deelcomp
+
+        comp = deelcomp.competitie
+        comp.bepaal_fase()
+        if comp.fase_teams > 'F':
+            deelcomp.huidige_team_ronde = 8     # voorkomt kleurmarkering ronde 7 als actieve ronde
+
+        context['toon_punten'] = (deelcomp.regio_team_punten_model != TEAM_PUNTEN_MODEL_SOM_SCORES)
+
+        self._maak_filter_knoppen(context, regio_nr, teamtype_afkorting)
+        if not context['teamtype']:
+            raise Http404('Verkeerd team type')
+
+        context['url_filters'] = reverse('CompUitslagen:uitslagen-regio-teams-n',
+                                         kwargs={'comp_pk_of_seizoen': comp.maak_seizoen_url(),
+                                                 'team_type': '~1',
+                                                 'regio_nr': '~2'})
+
+        teamtype = context['teamtype']
+        uitslag = get_uitslag_uit_cache(comp, 'regio-teams',
+                                        (deelcomp.pk, deelcomp.huidige_team_ronde, deelcomp.regio_team_punten_model,
+                                         teamtype.pk),
+                                        lambda: self._maak_uitslag(deelcomp, teamtype))
+        context.update(uitslag)
+
         context['canonical'] = reverse('CompUitslagen:uitslagen-regio-teams',       # TODO: keep?
                                        kwargs={'comp_pk_of_seizoen': comp.maak_seizoen_url(),
                                                'team_type': teamtype_afkorting})
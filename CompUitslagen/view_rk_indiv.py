@@ -13,6 +13,7 @@ from Competitie.models import Competitie, CompetitieMatch
 from Competitie.seizoenen import get_comp_pk
 from CompLaagRayon.models import KampRK, DeelnemerRK, CutRK
 from CompLaagRegio.models import RegioComp, RegioDeelnemer
+from CompUitslagen.operations import get_uitslag_uit_cache
 from Geo.models import Rayon
 from HistComp.operations import get_hist_url
 from Overig.helpers import make_valid_hashtag
@@ -90,53 +91,8 @@ class UitslagenRayonIndivView(TemplateView):
                 rayon.selected = True
         # for
 
-    def get_context_data(self, **kwargs):
-        """ called by the template system to get the context data for the template """
-        context = super().get_context_data(**kwargs)
-
-        if not self.comp:
-            raise Http404('Competitie niet gevonden')
-
-        context['comp'] = self.comp
-
-        if self.comp.fase_indiv == 'J':
-            context['bevestig_tot_datum'] = self.comp.begin_fase_L_indiv - datetime.timedelta(days=14)
-
-        comp_boog = kwargs['comp_boog'][:2]          # afkappen voor de veiligheid
-
-        # rayon_nr is optioneel (eerste binnenkomst zonder rayon nummer)
-        try:
-            rayon_nr = kwargs['rayon_nr'][:2]        # afkappen voor de veiligheid
-            rayon_nr = int(rayon_nr)
-        except KeyError:
-            rayon_nr = get_request_rayon_nr(self.request)
-        except ValueError:
-            raise Http404('Verkeerd rayonnummer')
-
-        self._maak_filter_knoppen(context, rayon_nr, comp_boog)
-
-        context['url_filters'] = reverse('CompUitslagen:uitslagen-rk-indiv-n',
-                                         kwargs={'comp_pk_of_seizoen': self.comp.maak_seizoen_url(),
-                                                 'comp_boog': '~1',
-                                                 'rayon_nr': '~2'})
-
-        boogtype = context['comp_boog']
-        if not boogtype:
-            raise Http404('Boogtype niet bekend')
-
-        try:
-            deelkamp = (KampRK
-                        .objects
-                        .select_related('competitie',
-                                        'rayon')
-                        .prefetch_related('matches')
-                        .get(competitie=self.comp,
-                             competitie__is_afgesloten=False,
-                             rayon__rayon_nr=rayon_nr))
-        except KampRK.DoesNotExist:
-            raise Http404('Kampioenschap niet gevonden')
-
-        context['deelkamp'] = deelkamp
+    def _maak_uitslag(self, deelkamp, boogtype):
+        """ bepaal de deelnemers in de uitslag; het resultaat wordt in de cache bewaard """
 
         # haal de planning erbij: competitie klasse --> competitie match
         indiv2match = dict()    # [indiv_pk] = CompetitieMatch
@@ -155,6 +111,8 @@ class UitslagenRayonIndivView(TemplateView):
             # for
         # for
 
+        uitslag = dict()
+
         wkl2limiet = dict()    # [pk] = aantal
         is_lijst_rk = False
 
@@ -182,17 +140,17 @@ class UitslagenRayonIndivView(TemplateView):
                 wkl2limiet[limiet.indiv_klasse.pk] = limiet.limiet
             # for
 
-            context['is_lijst_rk'] = is_lijst_rk = True
+            uitslag['is_lijst_rk'] = is_lijst_rk = True
         else:
             # competitie is nog in de regiocompetitie fase
-            context['regiocomp_nog_actief'] = True
+            uitslag['regiocomp_nog_actief'] = True
 
             # sporters komen uit de 4 regio's van het rayon
             deelcomp_pks = (RegioComp
                             .objects
                             .filter(competitie=self.comp,
                                     competitie__is_afgesloten=False,
-                                    regio__rayon_nr=rayon_nr)
+                                    regio__rayon_nr=deelkamp.rayon.rayon_nr)
                             .values_list('pk', flat=True))
 
             deelnemers = (RegioDeelnemer
@@ -208,14 +166,14 @@ class UitslagenRayonIndivView(TemplateView):
                                     '-gemiddelde'))
 
         # bepaal in welke klassen we de uitslag gaan tonen
-        context['toon_uitslag'] = False
+        uitslag['toon_uitslag'] = False
         klasse2toon_uitslag = dict()        # [klasse volgorde] = True/False
         if is_lijst_rk:
             for deelnemer in deelnemers:
                 if deelnemer.result_rank > 0:
                     klasse = deelnemer.indiv_klasse.volgorde
                     klasse2toon_uitslag[klasse] = True
-                    context['toon_uitslag'] = True
+                    uitslag['toon_uitslag'] = True
             # for
 
         klasse = -1
@@ -288,8 +246,62 @@ class UitslagenRayonIndivView(TemplateView):
             curr_teller.aantal_regels += 1
         # for
 
-        context['deelnemers'] = deelnemers
-        context['heeft_deelnemers'] = (len(deelnemers) > 0)
+        uitslag['deelnemers'] = deelnemers = list(deelnemers)
+        uitslag['heeft_deelnemers'] = (len(deelnemers) > 0)
+        return uitslag
+
+    def get_context_data(self, **kwargs):
+        """ called by the template system to get the context data for the template """
+        context = super().get_context_data(**kwargs)
+
+        if not self.comp:
+            raise Http404('Competitie niet gevonden')
+
+        context['comp'] = self.comp
+
+        if self.comp.fase_indiv == 'J':
+            context['bevestig_tot_datum'] = self.comp.begin_fase_L_indiv - datetime.timedelta(days=14)
+
+        comp_boog = kwargs['comp_boog'][:2]          # afkappen voor de veiligheid
+
+        # rayon_nr is optioneel (eerste binnenkomst zonder rayon nummer)
+        try:
+            rayon_nr = kwargs['rayon_nr'][:2]        # afkappen voor de veiligheid
+            rayon_nr = int(rayon_nr)
+        except KeyError:
+            rayon_nr = get_request_rayon_nr(self.request)
+        except ValueError:
+            raise Http404('Verkeerd rayonnummer')
+
+        self._maak_filter_knoppen(context, rayon_nr, comp_boog)
+
+        context['url_filters'] = reverse('CompUitslagen:uitslagen-rk-indiv-n',
+                                         kwargs={'comp_pk_of_seizoen': self.comp.maak_seizoen_url(),
+                                                 'comp_boog': '~1',
+                                                 'rayon_nr': '~2'})
+
+        boogtype = context['comp_boog']
+        if not boogtype:
+            raise Http404('Boogtype niet bekend')
+
+        try:
+            deelkamp = (KampRK
+                        .objects
+                        .select_related('competitie',
+                                        'rayon')
+                        .prefetch_related('matches')
+                        .get(competitie=self.comp,
+                             competitie__is_afgesloten=False,
+                             rayon__rayon_nr=rayon_nr))
+        except KampRK.DoesNotExist:
+            raise Http404('Kampioenschap niet gevonden')
+
+        context['deelkamp'] = deelkamp
+
+        uitslag = get_uitslag_uit_cache(self.comp, 'rk-indiv',
+                                        (deelkamp.pk, deelkamp.heeft_deelnemerslijst, boogtype.pk),
+                                        lambda: self._maak_uitslag(deelkamp, boogtype))
+        context.update(uitslag)
 
         context['canonical'] = reverse('CompUitslagen:uitslagen-rk-indiv',          # TODO: keep?
                                        kwargs={'comp_pk_of_seizoen': self.comp.maak_seizoen_url(),
@@ -9,7 +9,7 @@ from BasisTypen.definities import SCHEIDS_NIET
 from Competitie.models import (Competitie,
                                CompetitieIndivKlasse, CompetitieTeamKlasse,
                                CompetitieMatch,
-                               CompetitieMutatie)
+                               CompetitieMutatie, CompetitieStatistiek)
 from CompLaagBond.models import KampBK
 from CompLaagRayon.models import KampRK
 from CompLaagRegio.models import RegioComp
@@ -115,7 +115,7 @@ class CompetitieMutatieAdmin(CreateOnlyAdmin):
                            'deelnemer_bk__sporterboog__boogtype'
                            )
 
-    list_filter = ('is_verwerkt', 'mutatie')
+    list_filter = ('is_verwerkt', 'pogingen', 'mutatie')
 
     def __init__(self, model, admin_site):
         super().__init__(model, admin_site)
@@ -165,10 +165,20 @@ class CompetitieMutatieAdmin(CreateOnlyAdmin):
         return super().formfield_for_foreignkey(db_field, request, **kwargs)
 
 
+class CompetitieStatistiekAdmin(admin.ModelAdmin):
+
+    readonly_fields = ('competitie', 'datum', 'bijgewerkt', 'uitslagen_versie')
+
+    list_filter = ('competitie',)
+
+    list_select_related = ('competitie',)
+
+
 admin.site.register(Competitie, CompetitieAdmin)
 admin.site.register(CompetitieIndivKlasse, CompetitieIndivKlasseAdmin)
 admin.site.register(CompetitieTeamKlasse, CompetitieTeamKlasseAdmin)
 admin.site.register(CompetitieMatch, CompetitieMatchAdmin)
 admin.site.register(CompetitieMutatie, CompetitieMutatieAdmin)
+admin.site.register(CompetitieStatistiek, CompetitieStatistiekAdmin)
 
 # end of file
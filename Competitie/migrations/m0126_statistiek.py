@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+
+#  Copyright (c) 2026 Ramon van der Winkel.
+#  All rights reserved.
+#  Licensed under BSD-3-Clause-Clear. See LICENSE file for details.
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    """ Migratie class voor dit deel van de applicatie """
+
+    # volgorde afdwingen
+    dependencies = [
+        ('Competitie', 'm0125_uitslagen_versie'),
+    ]
+
+    # migratie functies
+    operations = [
+        migrations.CreateModel(
+            name='CompetitieStatistiek',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('datum', models.DateField()),
+                ('bijgewerkt', models.DateTimeField(auto_now=True)),
+                ('uitslagen_versie', models.PositiveIntegerField(default=0)),
+                ('data', models.JSONField(default=dict)),
+                ('competitie', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE,
+                                                 to='Competitie.competitie')),
+            ],
+            options={
+                'verbose_name': 'Competitie statistiek',
+                'verbose_name_plural': 'Competitie statistiek',
+                'constraints': [models.UniqueConstraint(fields=('competitie', 'datum'),
+                                                        name='Een statistiek per competitie per dag')],
+            },
+        ),
+    ]
+
+# end of file
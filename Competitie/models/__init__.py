@@ -7,12 +7,14 @@
 from .competitie import (Competitie, CompetitieIndivKlasse, CompetitieTeamKlasse, CompetitieMatch,
                          get_competitie_boog_typen, get_competitie_indiv_leeftijdsklassen)
 from .mutatie import CompetitieMutatie, CompetitieTaken, update_uitslag_teamcompetitie
+from .statistiek import CompetitieStatistiek
 
 
 __all__ = [
     'Competitie', 'CompetitieIndivKlasse', 'CompetitieTeamKlasse', 'CompetitieMatch',
     'get_competitie_boog_typen', 'get_competitie_indiv_leeftijdsklassen',
-    'CompetitieMutatie', 'CompetitieTaken', 'update_uitslag_teamcompetitie'
+    'CompetitieMutatie', 'CompetitieTaken', 'update_uitslag_teamcompetitie',
+    'CompetitieStatistiek'
 ]
 
 
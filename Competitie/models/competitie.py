@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
 
-#  Copyright (c) 2019-2025 Ramon van der Winkel.
+#  Copyright (c) 2019-2026 Ramon van der Winkel.
 #  All rights reserved.
 #  Licensed under BSD-3-Clause-Clear. See LICENSE file for details.
 
@@ -157,6 +157,10 @@ class Competitie(models.Model):
     bk_is_afgelast = models.BooleanField(default=False)
     bk_afgelast_bericht = models.TextField(blank=True)
 
+    # wordt verhoogd als de achtergrondtaken scores, klassen of deelnemers aanpassen
+    # onderdeel van de cache sleutel voor de uitslagen (zie CompUitslagen)
+    uitslagen_versie = models.PositiveIntegerField(default=0)
+
     def __str__(self):
         """ geef een tekstuele afkorting van dit object, voor in de admin interface """
         return self.beschrijving
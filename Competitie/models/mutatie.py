@@ -32,6 +32,10 @@ class CompetitieMutatie(models.Model):
     # is deze mutatie al verwerkt?
     is_verwerkt = models.BooleanField(default=False)
 
+    # houdt bij hoeveel keer de verwerking van deze mutatie mislukt is
+    # na N mislukte pogingen wordt de mutatie niet meer opgepakt (geparkeerd)
+    pogingen = models.PositiveSmallIntegerField(default=0)
+
     # door wie is de mutatie geïnitieerd
     # als het een account is, dan volledige naam + rol
     # als er geen account is (sporter zonder account) dan lid details
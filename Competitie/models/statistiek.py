@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+
+#  Copyright (c) 2026 Ramon van der Winkel.
+#  All rights reserved.
+#  Licensed under BSD-3-Clause-Clear. See LICENSE file for details.
+
+from django.db import models
+from Competitie.models.competitie import Competitie
+
+
+class CompetitieStatistiek(models.Model):
+    """ Momentopname van de statistiek van een competitie, 1 per dag.
+        Wordt bijgewerkt door de achtergrondtaak en gebruikt door de statistiek pagina.
+        De records van eerdere dagen blijven bewaard als historie.
+    """
+
+    # bij welke competitie hoort deze statistiek
+    competitie = models.ForeignKey(Competitie, on_delete=models.CASCADE)
+
+    # voor welke dag is deze momentopname
+    datum = models.DateField()
+
+    # wanneer voor het laatst bijgewerkt
+    bijgewerkt = models.DateTimeField(auto_now=True)
+
+    # Competitie.uitslagen_versie op het moment van bijwerken
+    # als deze afwijkt, dan moet de statistiek opnieuw bepaald worden
+    uitslagen_versie = models.PositiveIntegerField(default=0)
+
+    # de tellingen
+    data = models.JSONField(default=dict)
+
+    def __str__(self):
+        return "[%s] %s" % (self.datum, self.competitie)
+
+    class Meta:
+        verbose_name = "Competitie statistiek"
+        verbose_name_plural = "Competitie statistiek"
+
+        constraints = [
+            # 1 momentopname per dag
+            models.UniqueConstraint(fields=('competitie', 'datum'),
+                                    name='Een statistiek per competitie per dag'),
+        ]
+
+    objects = models.Manager()      # for the editor only
+
+
+# end of file
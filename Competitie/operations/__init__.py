@@ -15,6 +15,9 @@ from .vul_histcomp import (uitslag_regio_indiv_naar_histcomp, uitslag_regio_team
                            uitslag_bk_indiv_naar_histcomp, uitslag_bk_teams_naar_histcomp)
 from .overstappen import competitie_hanteer_overstap_sporter
 from .ping_achtergrondtaak import ping_competitie_achtergrondtaak
+from .uitslagen_versie import verhoog_uitslagen_versie
+from .statistiek import (competitie_statistiek_bijwerken, competitie_statistiek_ophalen,
+                         werk_competitie_statistiek_bij)
 
 __all__ = ['bepaal_startjaar_nieuwe_competitie', 'competities_aanmaken', 'maak_regiocompetitie_ronde',
            'aanvangsgemiddelden_vaststellen_voor_afstand', 'get_competitie_bogen',
@@ -24,6 +27,8 @@ __all__ = ['bepaal_startjaar_nieuwe_competitie', 'competities_aanmaken', 'maak_r
            'uitslag_rk_indiv_naar_histcomp', 'uitslag_rk_teams_naar_histcomp',
            'uitslag_bk_indiv_naar_histcomp', 'uitslag_bk_teams_naar_histcomp',
            'competitie_hanteer_overstap_sporter',
-           'ping_competitie_achtergrondtaak']
+           'ping_competitie_achtergrondtaak',
+           'verhoog_uitslagen_versie',
+           'competitie_statistiek_bijwerken', 'competitie_statistiek_ophalen', 'werk_competitie_statistiek_bij']
 
 # end of file
@@ -1,18 +1,15 @@
 # -*- coding: utf-8 -*-
 
-#  Copyright (c) 2019-2024 Ramon van der Winkel.
+#  Copyright (c) 2019-2026 Ramon van der Winkel.
 #  All rights reserved.
 #  Licensed under BSD-3-Clause-Clear. See LICENSE file for details.
 
-from django.utils import timezone
 from BasisTypen.definities import (MAXIMALE_WEDSTRIJDLEEFTIJD_ASPIRANT,
                                    GESLACHT_MAN, GESLACHT_VROUW, GESLACHT_ANDERS, GESLACHT_ALLE)
 from Competitie.models import CompetitieIndivKlasse, CompetitieTeamKlasse
 from Score.definities import AG_NUL, AG_LAAGSTE_NIET_NUL, AG_DOEL_INDIV
 from Score.models import Aanvangsgemiddelde
-from Sporter.models import Sporter
 from decimal import Decimal
-import datetime
 
 
 def _get_targets_indiv(comp):
@@ -104,21 +101,7 @@ def bepaal_klassengrenzen_indiv(comp):
     # dat is het tweede jaar van de competitie, waarin de BK gehouden wordt
     jaar = comp.begin_jaar + 1
 
-    # haal de AG 1x op per boogtype
-    boogtype2ags = dict()        # [boogtype.afkorting] = scores
-    for boogtype in comp.boogtypen.all():
-        boogtype2ags[boogtype.afkorting] = (Aanvangsgemiddelde
-                                            .objects
-                                            .select_related('sporterboog',
-                                                            'sporterboog__boogtype',        # TODO: niet nodig?
-                                                            'sporterboog__sporter')
-                                            .filter(doel=AG_DOEL_INDIV,
-                                                    afstand_meter=comp.afstand,
-                                                    boogtype=boogtype))
-    # for
-    del boogtype
-
-    lkl_pks = list()
+    lkl_pks = set()
     lkl_unsorted = list()
     klasse2lkl = dict()     # [klasse.pk] = [lkl, lkl, lkl..]
     for klasse in (CompetitieIndivKlasse
@@ -131,41 +114,52 @@ def bepaal_klassengrenzen_indiv(comp):
             lkls.append(lkl)
 
             if lkl.pk not in lkl_pks:
-                lkl_pks.append(lkl.pk)
+                lkl_pks.add(lkl.pk)
                 tup = (lkl.volgorde, lkl)
                 lkl_unsorted.append(tup)
         # for
     # for
     del klasse
     del lkl_pks
-    lkl_unsorted.sort()
+    lkl_unsorted.sort(key=lambda tup: tup[0])
     lkl_cache = [lkl for _, lkl in lkl_unsorted]
     del lkl_unsorted
 
+    # haal alle AG's in 1 keer op, als platte tuples
     # verdeel de sportersboog (waar we een AG van hebben) over boogtype-leeftijdsklasse groepjes
-    done_nrs = list()
-    boogtype_lkl2schutters = dict()      # [boogtype.afkorting + '_' + leeftijdsklasse.afkorting] = [lid_nr, lid_nr, ..]
-    for boogtype_afkorting in boogtype2ags.keys():
-        ags = boogtype2ags[boogtype_afkorting]
-
-        for lkl in lkl_cache:
-            index = boogtype_afkorting + '_' + lkl.afkorting
-            boogtype_lkl2schutters[index] = nrs = list()
-
-            for ag in ags:
-                sporterboog = ag.sporterboog
-                nr = sporterboog.pk
-                if nr not in done_nrs:
-                    sporter = sporterboog.sporter
-                    age = sporter.bereken_wedstrijdleeftijd_wa(jaar)
-                    # volgorde lkl is jongste naar oudste
-                    # pak de eerste de beste klasse die compatible is
-                    if lkl.geslacht_is_compatible(sporter.geslacht) and lkl.leeftijd_is_compatible(age):
-                        nrs.append(nr)
-                        done_nrs.append(nr)
-            # for (score)
-        # for (lkl)
-    # for (boogtype)
+    # volgorde lkl is jongste naar oudste: pak de eerste de beste klasse die compatible is
+    index2gemiddelden = dict()      # [boogtype.afkorting + '_' + leeftijdsklasse.afkorting] = [AG, AG, ..]
+    sporterboog2index = dict()      # [sporterboog.pk] = index
+    for boog_afk, sporterboog_pk, waarde, geboorte_datum, geslacht in (
+                                    Aanvangsgemiddelde
+                                    .objects
+                                    .filter(doel=AG_DOEL_INDIV,
+                                            afstand_meter=comp.afstand,
+                                            boogtype__in=comp.boogtypen.all())
+                                    .values_list('boogtype__afkorting',
+                                                 'sporterboog__pk',
+                                                 'waarde',
+                                                 'sporterboog__sporter__geboorte_datum',
+                                                 'sporterboog__sporter__geslacht')):
+        try:
+            index = sporterboog2index[sporterboog_pk]
+        except KeyError:
+            index = None
+            age = jaar - geboorte_datum.year        # zie Sporter.bereken_wedstrijdleeftijd_wa
+            for lkl in lkl_cache:
+                if lkl.geslacht_is_compatible(geslacht) and lkl.leeftijd_is_compatible(age):
+                    index = boog_afk + '_' + lkl.afkorting
+                    break
+            # for
+            sporterboog2index[sporterboog_pk] = index
+
+        if index:
+            try:
+                index2gemiddelden[index].append(waarde)
+            except KeyError:
+                index2gemiddelden[index] = [waarde]
+    # for
+    del sporterboog2index
 
     # wedstrijdklassen vs leeftijd + bogen
     targets = _get_targets_indiv(comp)
@@ -175,21 +169,16 @@ def bepaal_klassengrenzen_indiv(comp):
     objs = list()
     for tup, klassen in targets.items():
         _, _, boogtype, geslacht, heeft_klasse_onbekend = tup
-        ags = boogtype2ags[boogtype.afkorting]
 
         # zoek alle sporters-boog die hier in passen (boog, leeftijd, geslacht)
         gemiddelden = list()
-        index_gehad = list()
+        index_gehad = set()
         for klasse in klassen:
             for lkl in klasse2lkl[klasse.pk]:
                 index = boogtype.afkorting + '_' + lkl.afkorting
                 if index not in index_gehad:
-                    index_gehad.append(index)
-                    nrs = boogtype_lkl2schutters[index]
-                    for ag in ags:
-                        if ag.sporterboog.pk in nrs:
-                            gemiddelden.append(ag.waarde)
-                # for
+                    index_gehad.add(index)
+                    gemiddelden.extend(index2gemiddelden.get(index, []))
             # for
         # for
 
@@ -278,33 +267,38 @@ def bepaal_klassengrenzen_teams(comp):
     else:
         aantal_pijlen = 25
 
-    # eenmalig de wedstrijdleeftijd van elke lid berekenen in het vorige seizoen
+    # de wedstrijdleeftijd in het vorige seizoen bepaalt of een lid aspirant was
     # hiermee kunnen we de aspiranten scores eruit filteren
     jaar = comp.begin_jaar      # gelijk aan tweede jaar vorig seizoen
+    aspirant_geboren_vanaf = jaar - MAXIMALE_WEDSTRIJDLEEFTIJD_ASPIRANT
+
+    # haal de AG's in 1 keer op, als platte tuples
+    # en verdeel ze per boogtype en vereniging
+    # TODO: ooit ingevoerde handmatige AG uit filteren
+    boog2ver2gemiddelden = dict()       # [boogtype afkorting] = dict[ver_nr] = list(gemiddelde, gemiddelde, ...)
+    for boog_afk, waarde, geboorte_datum, ver_nr in (
+                                Aanvangsgemiddelde
+                                .objects
+                                .exclude(sporterboog__sporter__bij_vereniging=None)
+                                .filter(doel=AG_DOEL_INDIV,
+                                        afstand_meter=comp.afstand,
+                                        boogtype__in=comp.boogtypen.all())
+                                .values_list('boogtype__afkorting',
+                                             'waarde',
+                                             'sporterboog__sporter__geboorte_datum',
+                                             'sporterboog__sporter__bij_vereniging__ver_nr')):
+
+        # zie Sporter.bereken_wedstrijdleeftijd_wa
+        if geboorte_datum.year < aspirant_geboren_vanaf:
+            try:
+                per_ver_gemiddelden = boog2ver2gemiddelden[boog_afk]
+            except KeyError:
+                per_ver_gemiddelden = boog2ver2gemiddelden[boog_afk] = dict()
 
-    # zoek een ongeveer datum zodat we 80% van de leden niet hoeven te analyseren
-    jaar_nu = timezone.now().year
-    geboren_na = datetime.date(year=jaar_nu - MAXIMALE_WEDSTRIJDLEEFTIJD_ASPIRANT - 1, month=1, day=1)
-
-    was_aspirant = dict()     # [ lid_nr ] = True/False
-    for sporter in Sporter.objects.filter(geboorte_datum__gte=geboren_na):
-        was_aspirant[sporter.lid_nr] = sporter.bereken_wedstrijdleeftijd_wa(jaar) <= MAXIMALE_WEDSTRIJDLEEFTIJD_ASPIRANT
-    # for
-
-    # haal de AG's op per boogtype
-    boogtype2ags = dict()        # [boogtype.afkorting] = AG's
-    for boogtype in comp.boogtypen.all():
-        # TODO: ooit ingevoerde handmatige AG uit filteren
-        boogtype2ags[boogtype.afkorting] = (Aanvangsgemiddelde
-                                            .objects
-                                            .select_related('sporterboog',
-                                                            'sporterboog__boogtype',        # TODO: niet nodig?
-                                                            'sporterboog__sporter',
-                                                            'sporterboog__sporter__bij_vereniging')
-                                            .exclude(sporterboog__sporter__bij_vereniging=None)
-                                            .filter(doel=AG_DOEL_INDIV,
-                                                    afstand_meter=comp.afstand,
-                                                    boogtype=boogtype))
+            try:
+                per_ver_gemiddelden[ver_nr].append(waarde)
+            except KeyError:
+                per_ver_gemiddelden[ver_nr] = [waarde]
     # for
 
     # wedstrijdklassen vs leeftijd + bogen
@@ -328,21 +322,8 @@ def bepaal_klassengrenzen_teams(comp):
 
         boog2team_scores[boogtype_afkorting] = team_scores = list()
 
-        # zoek alle schutters-boog die hier in passen (boog, leeftijd)
-        per_ver_gemiddelden = dict()    # [ver_nr] = list(gemiddelde, gemiddelde, ...)
-        for ag in boogtype2ags[boogtype_afkorting]:
-            try:
-                lid_was_aspirant = was_aspirant[ag.sporterboog.sporter.lid_nr]
-            except KeyError:
-                lid_was_aspirant = False
-
-            if not lid_was_aspirant:
-                ver_nr = ag.sporterboog.sporter.bij_vereniging.ver_nr
-                try:
-                    per_ver_gemiddelden[ver_nr].append(ag.waarde)
-                except KeyError:
-                    per_ver_gemiddelden[ver_nr] = [ag.waarde]
-        # for
+        # alle sporters-boog die hier in passen (boog, leeftijd)
+        per_ver_gemiddelden = boog2ver2gemiddelden.get(boogtype_afkorting, dict())
 
         for ver_nr, gemiddelden in per_ver_gemiddelden.items():
             gemiddelden.sort(reverse=True)  # in-place sort, highest to lowest
@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*-
+
+#  Copyright (c) 2026 Ramon van der Winkel.
+#  All rights reserved.
+#  Licensed under BSD-3-Clause-Clear. See LICENSE file for details.
+
+""" Statistiek over de competities, opgeslagen als momentopname per competitie per dag.
+
+    De tellingen worden met GROUP BY queries in de database gedaan.
+    Een momentopname wordt opnieuw bepaald als Competitie.uitslagen_versie verhoogd is
+    (door competitie_mutaties of regiocomp_tussenstand) of als deze te oud is
+    (voor wijzigingen die de versie niet verhogen, zoals een nieuwe inschrijving).
+    Het bijwerken doet de achtergrondtaak; de statistiek pagina toont de laatste momentopname.
+"""
+
+from django.utils import timezone
+from django.db.models import Count, Max, Q, F
+from django.db.models.functions import ExtractYear
+from Competitie.definities import DEELNAME_NEE
+from Competitie.models import Competitie, CompetitieStatistiek
+from CompLaagBond.models import DeelnemerBK, TeamBK
+from CompLaagRayon.models import DeelnemerRK, TeamRK
+from CompLaagRegio.models import RegioDeelnemer, RegioTeam
+from Sporter.models import Sporter
+from decimal import Decimal
+import datetime
+
+STATISTIEK_MAX_LEEFTIJD = datetime.timedelta(minutes=10)
+
+# RegioDeelnemer die zichzelf aangemeld heeft
+ZELFSTANDIG_AANGEMELD = (Q(aangemeld_door=F('sporterboog__sporter__account')) |
+                         Q(aangemeld_door=None, sporterboog__sporter__account=None))
+
+
+def _per_sleutel(qset, sleutel, *velden):
+    """ zet het resultaat van een GROUP BY query om naar een dictionary per veld
+        de sleutels zijn strings, zodat de data na opslaan in een JSONField hetzelfde is
+    """
+    tellingen = {veld: dict() for veld in velden}
+    for obj in qset:
+        for veld in velden:
+            tellingen[veld][str(obj[sleutel])] = obj[veld]
+        # for
+    # for
+    return tellingen
+
+
+def _per_geboortejaar(qset, pad):
+    qset = (qset
+            .values(jaar=ExtractYear(pad + 'geboorte_datum'))
+            .annotate(aantal=Count('pk', distinct=True))
+            .order_by())
+    return _per_sleutel(qset, 'jaar', 'aantal')['aantal']
+
+
+def bereken_competitie_statistiek(comp: Competitie) -> dict:
+    """ bepaal alle tellingen voor de statistiek van een competitie """
+
+    data = dict()
+
+    # regiocompetitie individueel, per regio
+    deelnemers = RegioDeelnemer.objects.filter(regiocomp__competitie=comp)
+
+    qset = (deelnemers
+            .values('bij_vereniging__regio__regio_nr')
+            .annotate(aantal=Count('pk'),
+                      zelfstandig=Count('pk', filter=ZELFSTANDIG_AANGEMELD),
+                      geen_scores=Count('pk', filter=Q(aantal_scores=0)),
+                      hoogste_aantal_scores=Max('aantal_scores'))
+            .order_by())
+    tellingen = _per_sleutel(qset, 'bij_vereniging__regio__regio_nr',
+                             'aantal', 'zelfstandig', 'geen_scores', 'hoogste_aantal_scores')
+    data['regio'] = tellingen['aantal']
+    data['zelfstandig_regio'] = tellingen['zelfstandig']
+    data['geen_scores_regio'] = tellingen['geen_scores']
+    data['hoogste_aantal_scores'] = max(tellingen['hoogste_aantal_scores'].values(), default=0)
+    data['aantal_indiv'] = sum(data['regio'].values())
+
+    # per rayon
+    qset = (deelnemers
+            .values('bij_vereniging__regio__rayon_nr')
+            .annotate(aantal=Count('pk'),
+                      geen_rk=Count('pk', filter=Q(inschrijf_voorkeur_rk_bk=False)))
+            .order_by())
+    tellingen = _per_sleutel(qset, 'bij_vereniging__regio__rayon_nr', 'aantal', 'geen_rk')
+    data['rayon'] = tellingen['aantal']
+    data['geen_rk_rayon'] = tellingen['geen_rk']
+
+    data['geboortejaar_indiv'] = _per_geboortejaar(deelnemers, 'sporterboog__sporter__')
+    data['geboortejaar_teams'] = _per_geboortejaar(deelnemers.filter(regioteam__isnull=False),
+                                                   'sporterboog__sporter__')
+
+    # regiocompetitie teams, per regio
+    qset = (RegioTeam
+            .objects
+            .filter(regiocomp__competitie=comp)
+            .values('vereniging__regio__regio_nr')
+            .annotate(aantal=Count('pk'),
+                      ag_nul=Count('pk', filter=Q(aanvangsgemiddelde__lt=Decimal('0.001'))))
+            .order_by())
+    tellingen = _per_sleutel(qset, 'vereniging__regio__regio_nr', 'aantal', 'ag_nul')
+    data['teams_regio'] = tellingen['aantal']
+    data['teams_ag_nul'] = sum(tellingen['ag_nul'].values())
+    data['aantal_teams'] = sum(data['teams_regio'].values())
+
+    # actieve leden per regio
+    qset = (Sporter
+            .objects
+            .filter(is_actief_lid=True)
+            .exclude(bij_vereniging=None)
+            .values('bij_vereniging__regio__regio_nr')
+            .annotate(aantal=Count('pk'))
+            .order_by())
+    data['leden_regio'] = _per_sleutel(qset, 'bij_vereniging__regio__regio_nr', 'aantal')['aantal']
+
+    # RK individueel, per rayon
+    deelnemers_rk = DeelnemerRK.objects.filter(kamp__competitie=comp)
+
+    in_uitslag = Q(result_rank__gte=1, result_rank__lt=100) & ~Q(deelname=DEELNAME_NEE)
+    qset = (deelnemers_rk
+            .values('kamp__rayon__rayon_nr')
+            .annotate(geplaatst=Count('pk'),
+                      deelnemers=Count('pk', filter=~Q(deelname=DEELNAME_NEE)),
+                      in_uitslag=Count('pk', filter=in_uitslag))
+            .order_by())
+    tellingen = _per_sleutel(qset, 'kamp__rayon__rayon_nr', 'geplaatst', 'deelnemers', 'in_uitslag')
+    data['rk_geplaatst'] = tellingen['geplaatst']
+    data['rk_deelnemers'] = tellingen['deelnemers']
+    data['rk_in_uitslag'] = tellingen['in_uitslag']
+
+    data['geboortejaar_rk_indiv'] = _per_geboortejaar(deelnemers_rk, 'sporterboog__sporter__')
+    data['geboortejaar_rk_teams'] = _per_geboortejaar(
+                                        deelnemers_rk.filter(Q(teamrk_gekoppelde_leden__isnull=False) |
+                                                             Q(teambk_gekoppelde_leden__isnull=False)),
+                                        'sporterboog__sporter__')
+
+    # RK teams, per rayon
+    qset = (TeamRK
+            .objects
+            .filter(kamp__competitie=comp)
+            .values('kamp__rayon__rayon_nr')
+            .annotate(aantal=Count('pk'))
+            .order_by())
+    data['rk_teams'] = _per_sleutel(qset, 'kamp__rayon__rayon_nr', 'aantal')['aantal']
+
+    # BK individueel en teams
+    in_uitslag = Q(result_rank__gte=1, result_rank__lt=100)
+    data['bk'] = (DeelnemerBK
+                  .objects
+                  .filter(kamp__competitie=comp)
+                  .aggregate(deelnemers=Count('pk'),
+                             in_uitslag=Count('pk', filter=in_uitslag)))
+
+    data['bk_teams'] = (TeamBK
+                        .objects
+                        .filter(kamp__competitie=comp)
+                        .aggregate(deelnemers=Count('pk'),
+                                   in_uitslag=Count('pk', filter=in_uitslag)))
+
+    return data
+
+
+def tel_unieke_sporters(comps) -> dict:
+    """ tel de unieke sporters over meerdere competities heen
+        dit kan niet uit de momentopnames per competitie gehaald worden
+    """
+    return (RegioDeelnemer
+            .objects
+            .filter(regiocomp__competitie__in=comps)
+            .aggregate(sportersboog=Count('sporterboog', distinct=True),
+                       sporters=Count('sporterboog__sporter', distinct=True),
+                       zelfstandig=Count('pk', filter=ZELFSTANDIG_AANGEMELD)))
+
+
+def _is_verouderd(stat: CompetitieStatistiek, comp: Competitie, now) -> bool:
+    return (stat.uitslagen_versie != comp.uitslagen_versie
+            or now - stat.bijgewerkt > STATISTIEK_MAX_LEEFTIJD)
+
+
+def competitie_statistiek_bijwerken(comps) -> dict:
+    """ geef de momentopname van vandaag terug voor elk van de competities
+        momentopnames die ontbreken of verouderd zijn worden eerst (opnieuw) bepaald
+
+        geeft een dictionary terug: [comp.pk] = CompetitieStatistiek
+    """
+    now = timezone.now()
+    vandaag = now.date()
+
+    comp_pk2stat = dict()
+    for stat in CompetitieStatistiek.objects.filter(competitie__in=comps, datum=vandaag):
+        comp_pk2stat[stat.competitie_id] = stat
+    # for
+
+    for comp in comps:
+        stat = comp_pk2stat.get(comp.pk, None)
+        if stat and not _is_verouderd(stat, comp, now):
+            continue
+
+        # comp.uitslagen_versie is opgehaald voordat de tellingen gedaan worden,
+        # zodat een gelijktijdige wijziging niet gemist wordt
+        # update_or_create voorkomt een dubbel record als de achtergrondtaak tegelijk bezig is
+        stat, _ = CompetitieStatistiek.objects.update_or_create(
+                                competitie=comp,
+                                datum=vandaag,
+                                defaults={'uitslagen_versie': comp.uitslagen_versie,
+                                          'data': bereken_competitie_statistiek(comp)})
+        comp_pk2stat[comp.pk] = stat
+    # for
+
+    return comp_pk2stat
+
+
+def competitie_statistiek_ophalen(comps) -> dict:
+    """ geef de meest recente momentopname terug voor elk van de competities
+        het bijwerken wordt overgelaten aan de achtergrondtaak (zie werk_competitie_statistiek_bij)
+        alleen voor een competitie zonder enige momentopname wordt deze nu bepaald
+
+        geeft een dictionary terug: [comp.pk] = CompetitieStatistiek
+    """
+    comp_pk2stat = dict()
+    for stat in (CompetitieStatistiek
+                 .objects
+                 .filter(competitie__in=comps)
+                 .order_by('competitie_id', '-datum')
+                 .distinct('competitie_id')):           # alleen de laatste per competitie
+        comp_pk2stat[stat.competitie_id] = stat
+    # for
+
+    ontbreekt = [comp for comp in comps if comp.pk not in comp_pk2stat]
+    if len(ontbreekt):
+        comp_pk2stat.update(competitie_statistiek_bijwerken(ontbreekt))
+
+    return comp_pk2stat
+
+
+def werk_competitie_statistiek_bij():
+    """ werk de statistiek bij van alle competities die ver genoeg zijn
+        wordt periodiek aangeroepen door een achtergrondtaak
+    """
+    comps = list()
+    for comp in Competitie.objects.exclude(is_afgesloten=True):
+        comp.bepaal_fase()
+        if comp.fase_indiv >= 'C':
+            comps.append(comp)
+    # for
+
+    if len(comps):
+        competitie_statistiek_bijwerken(comps)
+
+
+# end of file
@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+
+#  Copyright (c) 2026 Ramon van der Winkel.
+#  All rights reserved.
+#  Licensed under BSD-3-Clause-Clear. See LICENSE file for details.
+
+from django.db.models import F
+from Competitie.models import Competitie
+
+
+def verhoog_uitslagen_versie(comp_pks=None):
+    """ meld dat de uitslagen van de competities gewijzigd zijn
+        de uitslagen in de cache worden daarna niet meer gebruikt
+
+        comp_pks: lijst met Competitie.pk, of None voor alle actieve competities
+    """
+    qset = Competitie.objects.filter(is_afgesloten=False)
+    if comp_pks is not None:
+        qset = qset.filter(pk__in=comp_pks)
+    qset.update(uitslagen_versie=F('uitslagen_versie') + 1)
+
+
+# end of file
@@ -31,7 +31,7 @@ class TestCompetitieCliCompetitieMutaties(E2EHelpers, TestCase):
         # print("f1: %s" % f1.getvalue())
         # print("f2: %s" % f2.getvalue())
 
-        self.assertTrue('Onverwachte fout (' in f2.getvalue())
+        self.assertTrue('Onverwachte fout (' in f1.getvalue())
         self.assertEqual(1, MailQueue.objects.count())
 
     def test_stop_exactly(self):
@@ -8,7 +8,7 @@ from django.conf import settings
 from django.utils import timezone
 from Bestelling.bestel_plugin_base import BestelPluginBase
 from Bestelling.definities import BESTELLING_REGEL_CODE_EVENEMENT, BESTELLING_KORT_BREAK
-from Bestelling.models import BestellingRegel
+from Bestelling.models import BestellingRegel, BestellingMandje
 from Betaal.format import format_bedrag_euro
 from Evenement.definities import (EVENEMENT_INSCHRIJVING_STATUS_TO_STR,
                                   EVENEMENT_INSCHRIJVING_STATUS_RESERVERING_MANDJE,
@@ -30,13 +30,19 @@ class EvenementBestelPlugin(BestelPluginBase):
     def __init__(self):
         super().__init__()
 
-    def mandje_opschonen(self, verval_datum):
-        # evenementen
-        mandje_pks = list()
-        for inschrijving in (EvenementInschrijving
-                             .objects
-                             .filter(status=EVENEMENT_INSCHRIJVING_STATUS_RESERVERING_MANDJE,
-                                     wanneer__lt=verval_datum)
+    @staticmethod
+    def _vervallen(verval_datum):
+        return (EvenementInschrijving
+                .objects
+                .filter(status=EVENEMENT_INSCHRIJVING_STATUS_RESERVERING_MANDJE,
+                        wanneer__lt=verval_datum))
+
+    def mandjes_met_vervallen(self, verval_datum) -> list[int]:
+        return self._get_mandje_pks(self._vervallen(verval_datum))
+
+    def mandje_opschonen(self, mandje: BestellingMandje, verval_datum):
+        for inschrijving in (self._vervallen(verval_datum)
+                             .filter(bestelling_regel__bestellingmandje=mandje)
                              .select_related('bestelling_regel',
                                              'koper')):
 
@@ -45,11 +51,6 @@ class EvenementBestelPlugin(BestelPluginBase):
             self.stdout.write('[INFO] Vervallen: BestellingRegel pk=%s EvenementInschrijving (%s) in mandje van %s' % (
                               regel.pk, inschrijving, inschrijving.koper))
 
-            # onthoud in welk mandje deze lag
-            mandje = regel.bestellingmandje_set.first()
-            if mandje.pk not in mandje_pks:
-                mandje_pks.append(mandje.pk)
-
             self.annuleer(regel)
 
             # verwijder het product, dan verdwijnt deze ook uit het mandje
@@ -57,8 +58,6 @@ class EvenementBestelPlugin(BestelPluginBase):
             regel.delete()
         # for
 
-        return mandje_pks
-
     def reserveer(self, product_pk: int, mandje_van_str: str) -> BestellingRegel | None:
         """ Maak een reservering voor het evenement (zodat iemand anders deze niet kan reserveren)
             en geef een BestellingRegel terug.
@@ -171,9 +171,13 @@ class TestEvenementBestellingPlugin(E2EHelpers, TestCase):
         self.mandje.regels.add(regel1)
         self.mandje.regels.add(regel2)
 
-        mandje_pks = plugin.mandje_opschonen(verval)
+        mandje_pks = plugin.mandjes_met_vervallen(verval)
         self.assertEqual(len(mandje_pks), 1)
         self.assertEqual(mandje_pks, [self.mandje.pk])
+        self.assertEqual(self.mandje.regels.count(), 2)     # nog niets verwijderd
+
+        plugin.mandje_opschonen(self.mandje, verval)
+        self.assertEqual(self.mandje.regels.count(), 0)
 
         self.assertTrue('[INFO] Vervallen: BestellingRegel pk=' in stdout.getvalue())
         self.assertTrue('[INFO] BestellingRegel met pk=' in stdout.getvalue())
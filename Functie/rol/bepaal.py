@@ -6,17 +6,22 @@
 
 """ Ondersteuning voor de rollen binnen de applicatie """
 
+from django.db.models.signals import post_save, post_delete
 from Account.models import Account
+from BasisTypen.operations import get_cache_versie, verhoog_cache_versie
 from CompLaagBond.models import KampBK
 from CompLaagRayon.models import KampRK
 from Functie.definities import Rol, functie_rol_str2rol
 from Functie.models import Functie
 from Functie.rol.beschrijving import rol_get_beschrijving, rol_zet_beschrijving
-from Functie.rol.mag_wisselen import rol_zet_mag_wisselen
-from Functie.rol.scheids import rol_zet_is_scheids
+from Functie.rol.mag_wisselen import rol_eval_mag_wisselen
 from Functie.rol.huidige import rol_get_huidige_functie
+from Vereniging.models import Vereniging
 from typing import Generator
+import threading
 import typing
+import time
+import copy
 
 
 def rol_eval_rechten_simpel(request, account: Account):
@@ -34,15 +39,7 @@ def rol_eval_rechten_simpel(request, account: Account):
             - huidige rol en functie
     """
 
-    mag_wisselen = account.is_staff or account.is_BB
-
-    if not mag_wisselen:
-        if account.functie_set.count() > 0:
-            mag_wisselen = True
-
-    rol_zet_mag_wisselen(request, mag_wisselen)
-
-    rol_zet_is_scheids(request, account)
+    rol_eval_mag_wisselen(request, account)
 
     # zorg dat de beschrijving gezet is
     msg = rol_get_beschrijving(request)
@@ -67,52 +64,60 @@ class ShortFunc:
         self.ver_nr = 0          # alleen voor SEC, HWL en WL
 
 
-class RolBepaler:
+def _make_func(obj: Functie) -> ShortFunc:
+    func = ShortFunc()
+    func.functie_pk = obj.pk
+    func.functie = obj
+    func.rol_str = obj.rol
+    try:
+        func.rol = functie_rol_str2rol[obj.rol]
+    except KeyError:
+        func.rol = Rol.ROL_NONE
+    func.comp_type = obj.comp_type
 
-    """ Verzameling van alle logica voor toegestane rollen
+    if obj.rayon_id:
+        func.rko_rayon_nr = obj.rayon.rayon_nr
 
-        Wordt gebruikt voor het wissel-van-rol scherm
-        En voor activeer_rol/functie
-    """
+    if obj.regio_id:
+        func.rcl_regio_nr = obj.regio.regio_nr
+        func.rcl_regio_rayon_nr = obj.regio.rayon_nr
 
-    def __init__(self, account):
-        self._alle: typing.Dict[int, ShortFunc] = dict()                    # [functie.pk] = func
-        self._rayon2rcl: typing.Dict[int, typing.List[ShortFunc]] = dict()  # [rayon_nr] = [func, ...]
-        self._regio2hwl: typing.Dict[int, typing.List[ShortFunc]] = dict()  # [regio_nr] = [func, ...]
+    if obj.vereniging_id:
+        func.ver_nr = obj.vereniging.ver_nr
 
-        self._eigen: typing.List[ShortFunc] = list()                        # [func, ...]
-        self._management: typing.List[ShortFunc] = list()                   # [func, ...]
+    return func
 
-        self._has_bb: bool = account.is_staff or account.is_BB
 
-        self._vul_cache()
-        self._directe_rollen_van_account_toevoegen(account)
+class RolIndex:
 
-    @staticmethod
-    def _make_func(obj: Functie) -> ShortFunc:
-        func = ShortFunc()
-        func.functie_pk = obj.pk
-        func.functie = obj
-        func.rol_str = obj.rol
-        try:
-            func.rol = functie_rol_str2rol[obj.rol]
-        except KeyError:
-            func.rol = Rol.ROL_NONE
-        func.comp_type = obj.comp_type
+    """ Index over alle functies, gedeeld door alle RolBepaler instanties in dit proces.
+        Wordt 1x opgebouwd en daarna niet meer aangepast (alleen vervangen door een nieuwe index).
+    """
 
-        if obj.rayon_id:
-            func.rko_rayon_nr = obj.rayon.rayon_nr
+    def __init__(self, versie, db_versie):
+        self.versie = versie
+        self.db_versie = db_versie
+        self.gebouwd = time.monotonic()
 
-        if obj.regio_id:
-            func.rcl_regio_nr = obj.regio.regio_nr
-            func.rcl_regio_rayon_nr = obj.regio.rayon_nr
+        self.alle: typing.Dict[int, ShortFunc] = dict()                     # [functie.pk] = func
+        self.rayon2rcl: typing.Dict[int, typing.List[ShortFunc]] = dict()   # [rayon_nr] = [func, ...]
+        self.regio2hwl: typing.Dict[int, typing.List[ShortFunc]] = dict()   # [regio_nr] = [func, ...]
+        self.ver2hwl: typing.Dict[int, typing.List[ShortFunc]] = dict()     # [ver_nr] = [func, ...]
+        self.ver2wl: typing.Dict[int, typing.List[ShortFunc]] = dict()      # [ver_nr] = [func, ...]
+        self.alle_hwl: typing.List[ShortFunc] = list()                      # [func, ...]
+        self.alle_rko: typing.List[ShortFunc] = list()                      # [func, ...]
+        self.management: typing.List[ShortFunc] = list()                    # [func, ...]
 
-        if obj.vereniging_id:
-            func.ver_nr = obj.vereniging.ver_nr
+        self._bouw()
 
-        return func
+    @staticmethod
+    def _voeg_toe(lookup, sleutel, func):
+        try:
+            lookup[sleutel].append(func)
+        except KeyError:
+            lookup[sleutel] = [func]
 
-    def _vul_cache(self):
+    def _bouw(self):
         """ haal alle Functie records binnen """
 
         for obj in (Functie
@@ -124,33 +129,114 @@ class RolBepaler:
                                     'vereniging__regio')
                     .all()):
 
-            func = self._make_func(obj)
+            func = _make_func(obj)
 
-            self._alle[obj.pk] = func
+            self.alle[obj.pk] = func
 
             # regio 100 zijn speciale verenigingen die door rol BB gebruikt mogen worden
             if obj.rol == 'HWL' and obj.vereniging:
-                regio_nr = obj.vereniging.regio.regio_nr
-                try:
-                    self._regio2hwl[regio_nr].append(func)
-                except KeyError:
-                    self._regio2hwl[regio_nr] = [func]
+                self._voeg_toe(self.regio2hwl, obj.vereniging.regio.regio_nr, func)
+                self._voeg_toe(self.ver2hwl, func.ver_nr, func)
+                self.alle_hwl.append(func)
 
-            # alle management rollen
-            if self._has_bb:
-                if func.rol in (Rol.ROL_MO, Rol.ROL_MWZ, Rol.ROL_MWW, Rol.ROL_MLA,
-                                Rol.ROL_SUP, Rol.ROL_CS, Rol.ROL_BKO):
-                    self._management.append(func)
-            # for
+            if obj.rol == 'WL' and obj.vereniging:
+                self._voeg_toe(self.ver2wl, func.ver_nr, func)
+
+            if func.rol == Rol.ROL_RKO:
+                self.alle_rko.append(func)
+
+            # alle management rollen (alleen gebruikt voor BB)
+            if func.rol in (Rol.ROL_MO, Rol.ROL_MWZ, Rol.ROL_MWW, Rol.ROL_MLA,
+                            Rol.ROL_SUP, Rol.ROL_CS, Rol.ROL_BKO):
+                self.management.append(func)
 
             if obj.rol == 'RCL' and obj.regio:
-                rayon_nr = obj.regio.rayon_nr
-                try:
-                    self._rayon2rcl[rayon_nr].append(func)
-                except KeyError:
-                    self._rayon2rcl[rayon_nr] = [func]
+                self._voeg_toe(self.rayon2rcl, obj.regio.rayon_nr, func)
         # for
 
+
+# de index wordt opnieuw opgebouwd als:
+# - in dit proces een Functie of Vereniging opgeslagen/verwijderd is (versie)
+# - een ander proces een Functie of Vereniging opgeslagen/verwijderd heeft (db_versie)
+# - de index ouder is dan ROL_INDEX_MAX_LEEFTIJD, voor wijzigingen buiten de signals om
+ROL_INDEX_MAX_LEEFTIJD = 5 * 60     # in seconden
+
+CACHE_VERSIE_NAAM = 'rol_index'
+
+# velden die wel in de database opgeslagen worden, maar niet via de index gebruikt
+_VELDEN_NIET_IN_INDEX = frozenset(['laatste_email_over_taken'])
+
+_rol_index_lock = threading.Lock()
+_rol_index = None
+_rol_index_versie = 1
+
+
+def _is_actueel(index, db_versie):
+    return (index is not None
+            and index.versie == _rol_index_versie
+            and index.db_versie == db_versie
+            and time.monotonic() - index.gebouwd < ROL_INDEX_MAX_LEEFTIJD)
+
+
+def get_rol_index() -> RolIndex:
+    """ geef de actuele index over alle functies terug; wordt opgebouwd als deze niet bestaat of verouderd is """
+    global _rol_index
+
+    # de versie in de database moet opgehaald worden voordat de functies opgehaald worden
+    db_versie = get_cache_versie(CACHE_VERSIE_NAAM)
+
+    index = _rol_index
+    if not _is_actueel(index, db_versie):
+        with _rol_index_lock:
+            index = _rol_index
+            if not _is_actueel(index, db_versie):
+                index = RolIndex(_rol_index_versie, db_versie)
+                _rol_index = index
+
+    return index
+
+
+def verhoog_rol_index_versie(update_fields=None, **kwargs):
+    """ signal handler: een functie of vereniging is aangepast --> index opnieuw opbouwen bij volgende gebruik
+        de versie in de database zorgt dat de andere processen dit ook doen
+    """
+    if update_fields and _VELDEN_NIET_IN_INDEX.issuperset(update_fields):
+        # alleen administratie bijgewerkt; de index blijft geldig
+        return
+
+    global _rol_index_versie
+    _rol_index_versie += 1
+    verhoog_cache_versie(CACHE_VERSIE_NAAM)
+
+
+post_save.connect(verhoog_rol_index_versie, sender=Functie, dispatch_uid='rol_index_functie_save')
+post_delete.connect(verhoog_rol_index_versie, sender=Functie, dispatch_uid='rol_index_functie_del')
+post_save.connect(verhoog_rol_index_versie, sender=Vereniging, dispatch_uid='rol_index_ver_save')
+post_delete.connect(verhoog_rol_index_versie, sender=Vereniging, dispatch_uid='rol_index_ver_del')
+
+
+class RolBepaler:
+
+    """ Verzameling van alle logica voor toegestane rollen
+
+        Wordt gebruikt voor het wissel-van-rol scherm
+        En voor activeer_rol/functie
+
+        De gedeelde RolIndex bevat alle functies; alleen de eigen functies van het account
+        worden per RolBepaler opgehaald.
+        De Functie objecten uit de index worden gedeeld met andere requests en worden daarom
+        als kopie doorgegeven.
+    """
+
+    def __init__(self, account):
+        self._index = get_rol_index()
+
+        self._eigen: typing.List[ShortFunc] = list()                        # [func, ...]
+
+        self._has_bb: bool = account.is_staff or account.is_BB
+
+        self._directe_rollen_van_account_toevoegen(account)
+
     def _directe_rollen_van_account_toevoegen(self, account):
         self._eigen = list()
 
@@ -163,7 +249,7 @@ class RolBepaler:
                                     'vereniging__regio')
                     .all()):
 
-            func = self._make_func(obj)
+            func = _make_func(obj)
             self._eigen.append(func)
         # for
 
@@ -180,6 +266,24 @@ class RolBepaler:
 
         yield Rol.ROL_SPORTER, None
 
+    def _zoek_func(self, functie_pk: int) -> ShortFunc | None:
+        """ zoek een functie op in de index, met terugval op de eigen functies
+            (voor als de index nog niet bijgewerkt is)
+        """
+        func = self._index.alle.get(functie_pk, None)
+        if not func:
+            for func in self._eigen:
+                if func.functie_pk == functie_pk:
+                    return func
+            # for
+            func = None
+        return func
+
+    @staticmethod
+    def _kopie(func: ShortFunc) -> Functie:
+        # het Functie object in de index wordt gedeeld; de aanroeper mag de kopie aanpassen
+        return copy.copy(func.functie)
+
     def iter_indirecte_rollen(self, rol: Rol, huidige_functie_pk: int) -> \
             Generator[tuple[Rol, Functie | None], None, None]:
         #             yields,                     send, returns
@@ -189,26 +293,29 @@ class RolBepaler:
             Welke rollen beschikbaar zijn is afhankelijk van de huidige functie
         """
 
+        index = self._index
+
         # BB mag wisselen naar alle management rollen
         if rol == Rol.ROL_BB:
-            for func in self._management:
-                yield func.rol, func.functie
-            # for
+            if self._has_bb:
+                for func in index.management:
+                    yield func.rol, self._kopie(func)
+                # for
 
             # bondsbureau beheert de speciale vereniging in regio 100
-            for func in self._regio2hwl.get(100, []):
-                yield func.rol, func.functie
+            for func in index.regio2hwl.get(100, []):
+                yield func.rol, self._kopie(func)
             # for
 
-        func_nu = self._alle.get(huidige_functie_pk, None)
+        func_nu = self._zoek_func(huidige_functie_pk)
         if not func_nu:
             return
 
         if func_nu.rol == Rol.ROL_BKO:
             # expandeer naar de RKO rollen van dezelfde competitie
-            for func in self._alle.values():
-                if func.rol == Rol.ROL_RKO and func.comp_type == func.comp_type:
-                    yield Rol.ROL_RKO, func.functie      # sorteren (op rayon_nr) is niet nodig
+            for func in index.alle_rko:
+                if func.comp_type == func.comp_type:
+                    yield Rol.ROL_RKO, self._kopie(func)      # sorteren (op rayon_nr) is niet nodig
             # for
 
             # expandeer naar de HWL van verenigingen gekozen voor de BK's
@@ -217,27 +324,27 @@ class RolBepaler:
                     .filter(competitie__afstand=func_nu.comp_type)
                     .prefetch_related('matches'))
 
-            ver_nrs = list()
+            ver_nrs = set()
             for deelkamp in qset:
-                ver_nrs.extend(list(deelkamp
-                                    .matches
-                                    .select_related('vereniging')
-                                    .values_list('vereniging__ver_nr', flat=True)))
+                ver_nrs.update(deelkamp
+                               .matches
+                               .select_related('vereniging')
+                               .values_list('vereniging__ver_nr', flat=True))
             # for
 
             # zoek de HWL functies op
-            for func in self._alle.values():
-                if func.rol == Rol.ROL_HWL and func.ver_nr in ver_nrs:
-                    yield Rol.ROL_HWL, func.functie
+            for func in index.alle_hwl:
+                if func.ver_nr in ver_nrs:
+                    yield Rol.ROL_HWL, self._kopie(func)
             # for
 
             return
 
         if func_nu.rol == Rol.ROL_RKO:
             # expandeer naar de RCL rollen binnen het rayon
-            for func in self._rayon2rcl[func_nu.rko_rayon_nr]:
+            for func in index.rayon2rcl.get(func_nu.rko_rayon_nr, []):
                 if func.comp_type == func_nu.comp_type:
-                    yield Rol.ROL_RCL, func.functie        # sorteren (op regio_nr) is niet nodig
+                    yield Rol.ROL_RCL, self._kopie(func)        # sorteren (op regio_nr) is niet nodig
             # for
 
             # expandeer naar de HWL van verenigingen gekozen voor de RK's
@@ -247,42 +354,40 @@ class RolBepaler:
                             rayon__rayon_nr=func_nu.rko_rayon_nr)
                     .prefetch_related('matches'))
 
-            ver_nrs = list()
+            ver_nrs = set()
             for deelkamp in qset:
-                ver_nrs.extend(list(deelkamp
-                                    .matches
-                                    .select_related('vereniging')
-                                    .values_list('vereniging__ver_nr', flat=True)))
+                ver_nrs.update(deelkamp
+                               .matches
+                               .select_related('vereniging')
+                               .values_list('vereniging__ver_nr', flat=True))
             # for
 
             # zoek de HWL functies op
-            for func in self._alle.values():
-                if func.rol == Rol.ROL_HWL and func.ver_nr in ver_nrs:
-                    yield Rol.ROL_HWL, func.functie
+            for func in index.alle_hwl:
+                if func.ver_nr in ver_nrs:
+                    yield Rol.ROL_HWL, self._kopie(func)
             # for
 
             return
 
         if func_nu.rol == Rol.ROL_RCL:
             # RCL mag wisselen naar de HWL van alle verenigingen in zijn regio
-            for func in self._regio2hwl.get(func_nu.rcl_regio_nr, []):
-                yield Rol.ROL_HWL, func.functie
+            for func in index.regio2hwl.get(func_nu.rcl_regio_nr, []):
+                yield Rol.ROL_HWL, self._kopie(func)
             # for
             return
 
         if func_nu.rol == Rol.ROL_SEC:
             # SEC mag HWL worden, binnen de vereniging
-            for func in self._alle.values():
-                if func.rol == Rol.ROL_HWL and func.ver_nr == func_nu.ver_nr:
-                    yield Rol.ROL_HWL, func.functie
+            for func in index.ver2hwl.get(func_nu.ver_nr, []):
+                yield Rol.ROL_HWL, self._kopie(func)
             # for
             return
 
         if func_nu.rol == Rol.ROL_HWL:
             # expandeer naar de WL rollen binnen dezelfde vereniging
-            for func in self._alle.values():
-                if func.rol == Rol.ROL_WL and func.ver_nr == func_nu.ver_nr:
-                    yield Rol.ROL_WL, func.functie
+            for func in index.ver2wl.get(func_nu.ver_nr, []):
+                yield Rol.ROL_WL, self._kopie(func)
             # for
             return
 
@@ -301,15 +406,13 @@ class RolBepaler:
 
         # IT en BB mogen direct wisselen naar elke andere functie
         if self._has_bb:
-            for func in self._alle.values():
-                if func.functie_pk == functie_pk:
-                    return True, func.rol
-            # for
+            func = self._zoek_func(functie_pk)
+            if func:
+                return True, func.rol
 
         # is dit een van de eigen functies?
-        for mag_rol, mag_functie in self.iter_directe_rollen():
-            if mag_functie and mag_functie.pk == functie_pk:
-                func = self._alle[functie_pk]
+        for func in self._eigen:
+            if func.functie_pk == functie_pk:
                 return True, func.rol
         # for
 
@@ -318,11 +421,9 @@ class RolBepaler:
         if functie_nu:
             for mag_rol, mag_functie in self.iter_indirecte_rollen(rol_nu, functie_nu.pk):
                 if mag_functie.pk == functie_pk:
-                    func = self._alle[functie_pk]
-                    return True, func.rol
+                    return True, mag_rol
             # for
 
         return False, Rol.ROL_NONE
 
-
 # end of file
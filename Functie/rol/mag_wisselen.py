@@ -1,16 +1,18 @@
 # -*- coding: utf-8 -*-
 
-#  Copyright (c) 2019-2025 Ramon van der Winkel.
+#  Copyright (c) 2019-2026 Ramon van der Winkel.
 #  All rights reserved.
 #  Licensed under BSD-3-Clause-Clear. See LICENSE file for details.
 
 """ Ondersteuning voor de rollen binnen de applicatie """
 
-from django.contrib.sessions.backends.db import SessionStore
+from django.db.models import F
 from Account.operations import zet_sessionvar_if_changed
-from Account.models import AccountSessions
+from Account.models import Account, get_account
+from Functie.rol.scheids import rol_zet_is_scheids
 
 SESSIONVAR_ROL_MAG_WISSELEN_BOOL = 'gebruiker_rol_mag_wisselen_bool'
+SESSIONVAR_ROL_RECHTEN_VERSIE = 'gebruiker_rol_rechten_versie'
 
 
 def rol_zet_mag_wisselen(request, mag_wisselen: bool):
@@ -19,8 +21,37 @@ def rol_zet_mag_wisselen(request, mag_wisselen: bool):
     zet_sessionvar_if_changed(request, SESSIONVAR_ROL_MAG_WISSELEN_BOOL, mag_wisselen)
 
 
+def rol_eval_mag_wisselen(request, account: Account):
+    """ Evalueer opnieuw of de gebruiker van rol mag wisselen en scheidsrechter is.
+        De sessie wordt alleen aangepast als er iets gewijzigd is.
+    """
+
+    # versie onthouden voor de evaluatie, zodat een gelijktijdige wijziging niet gemist wordt
+    versie = account.rechten_versie
+
+    mag_wisselen = account.is_staff or account.is_BB
+
+    if not mag_wisselen:
+        if account.functie_set.count() > 0:
+            mag_wisselen = True
+
+    rol_zet_mag_wisselen(request, mag_wisselen)
+
+    rol_zet_is_scheids(request, account)
+
+    zet_sessionvar_if_changed(request, SESSIONVAR_ROL_RECHTEN_VERSIE, versie)
+
+
 def rol_mag_wisselen(request):
     """ Geeft True terug als deze gebruiker de wissel-van-rol getoond moet worden """
+
+    if request.user.is_authenticated:
+        # controleer of de rechten van dit account ergens anders gewijzigd zijn
+        account = get_account(request)
+        if request.session.get(SESSIONVAR_ROL_RECHTEN_VERSIE, None) != account.rechten_versie:
+            # let op: dit is een database wijziging die in een GET handler kan optreden
+            rol_eval_mag_wisselen(request, account)
+
     try:
         check = request.session[SESSIONVAR_ROL_MAG_WISSELEN_BOOL]
     except KeyError:
@@ -30,28 +61,13 @@ def rol_mag_wisselen(request):
 
 
 def rol_zet_mag_wisselen_voor_account(account):
-    """ Deze functie geeft een nieuwe beheerder direct toegang tot Wissel van rol.
+    """ Deze functie geeft een beheerder direct toegang tot Wissel van rol (of neemt het weg).
 
         Aangezien dit om performance redenen onthouden wordt in de sessie van de gebruiker,
-        moeten we op zoek naar alle sessie(s) en daar een aanpassing in doen.
+        verhogen we de versie van de rechten van het account in de database.
+        Elke sessie van het account ziet dit bij het volgende request en evalueert dan opnieuw.
     """
-
-    # doorloop alle bekende sessies van deze gebruiker
-    for obj in (AccountSessions
-                .objects
-                .filter(account=account)):
-        session = SessionStore(obj.session.session_key)
-        try:
-            mag_wisselen = session[SESSIONVAR_ROL_MAG_WISSELEN_BOOL]
-        except KeyError:
-            # expired sessions do not have keys
-            pass
-        else:
-            if not mag_wisselen:
-                # wijziging
-                session[SESSIONVAR_ROL_MAG_WISSELEN_BOOL] = True
-                session.save()
-    # for
+    Account.objects.filter(pk=account.pk).update(rechten_versie=F('rechten_versie') + 1)
 
 
 # end of file
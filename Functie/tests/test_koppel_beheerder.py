@@ -687,14 +687,21 @@ class TestFunctieKoppelBeheerder(E2EHelpers, TestCase):
         # koppel beheerder1 aan zijn eerste rol
         self.assertEqual(self.functie_bko.accounts.count(), 0)
         url = self.url_wijzig_ontvang % self.functie_bko.pk
-        with self.assert_max_queries(21):
+        with self.assert_max_queries(15):
             resp = self.client.post(url, {'add': self.account_beh1.pk}, follow=True)
         self.assertEqual(resp.status_code, 200)     # 200 = OK
         self.assertEqual(self.functie_bko.accounts.count(), 1)
 
+        # de sessie van de andere gebruiker wordt niet aangepast
         session = SessionStore(session_key_beh1)
-        self.assertEqual(session[SESSIONVAR_ROL_MAG_WISSELEN_BOOL], True)
+        self.assertEqual(session[SESSIONVAR_ROL_MAG_WISSELEN_BOOL], False)
 
+        # de versie van de rechten staat in de database, zodat elk proces van de webserver dit ziet
+        versie = self.account_beh1.rechten_versie
+        self.account_beh1.refresh_from_db()
+        self.assertEqual(self.account_beh1.rechten_versie, versie + 1)
+
+        # het volgende request ziet dat de rechten gewijzigd zijn
         resp = client2.get('/plein/')
         urls = self.extract_all_urls(resp)
         self.assertIn('/functie/wissel-van-rol/', urls)
@@ -707,8 +714,21 @@ class TestFunctieKoppelBeheerder(E2EHelpers, TestCase):
         resp = self.client.post(url, {'add': self.account_beh1.pk}, follow=True)
         self.assertEqual(resp.status_code, 200)     # 200 = OK
 
+        resp = client2.get('/plein/')
+        urls = self.extract_all_urls(resp)
+        self.assertIn('/functie/wissel-van-rol/', urls)
+
+        # laatste koppeling verwijderen --> wissel van rol verdwijnt
+        resp = self.client.post(url, {'drop': self.account_beh1.pk}, follow=True)
+        self.assertEqual(resp.status_code, 200)     # 200 = OK
+        self.assertEqual(self.functie_bko.accounts.count(), 0)
+
+        resp = client2.get('/plein/')
+        urls = self.extract_all_urls(resp)
+        self.assertNotIn('/functie/wissel-van-rol/', urls)
+
         session = SessionStore(session_key_beh1)
-        self.assertEqual(session[SESSIONVAR_ROL_MAG_WISSELEN_BOOL], True)
+        self.assertEqual(session[SESSIONVAR_ROL_MAG_WISSELEN_BOOL], False)
 
 
 # end of file
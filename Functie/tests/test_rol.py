@@ -4,14 +4,17 @@
 #  All rights reserved.
 #  Licensed under BSD-3-Clause-Clear. See LICENSE file for details.
 
+from django.db.models import F
 from django.test import TestCase
+from django.utils import timezone
 from Account.models import get_account
+from BasisTypen.models import CacheVersie
 from Functie.definities import Rol
 from Functie.operations import maak_account_vereniging_secretaris
 from Functie.tests.helpers import maak_functie
 from Functie.rol import (rol_mag_wisselen, rol_get_beschrijving, rol_zet_beschrijving, rol_activeer_functie,
                          rol_activeer_rol, rol_get_huidige, rol_get_huidige_functie)
-from Functie.rol.bepaal import RolBepaler
+from Functie.rol.bepaal import RolBepaler, get_rol_index
 from Functie.rol.beschrijving import SESSIONVAR_ROL_BESCHRIJVING
 from Functie.rol.huidige import SESSIONVAR_ROL_HUIDIGE, SESSIONVAR_ROL_HUIDIGE_FUNCTIE_PK
 from Functie.rol.mag_wisselen import SESSIONVAR_ROL_MAG_WISSELEN_BOOL
@@ -216,5 +219,44 @@ class TestFunctieRol(E2EHelpers, TestCase):
         self.assertFalse(mag)
         self.assertEqual(rol, Rol.ROL_NONE)
 
+    def test_index(self):
+        # de index wordt gedeeld totdat een functie aangepast wordt
+        index1 = get_rol_index()
+        index2 = get_rol_index()
+        self.assertTrue(index1 is index2)
+        self.assertTrue(self.functie_sec.pk in index1.alle)
+        self.assertEqual(index1.ver2hwl.get(self.ver1.ver_nr, []), [])
+
+        functie_hwl = maak_functie("HWL test", "HWL")
+        functie_hwl.vereniging = self.ver1
+        functie_hwl.save()
+
+        index3 = get_rol_index()
+        self.assertFalse(index1 is index3)
+        self.assertEqual([func.functie_pk for func in index3.ver2hwl[self.ver1.ver_nr]], [functie_hwl.pk])
+
+        # SEC mag wisselen naar HWL; de functie is een kopie van het object in de index
+        self.functie_sec.accounts.add(self.account_normaal)
+        bepaler = RolBepaler(self.account_normaal)
+        rollen = list(bepaler.iter_indirecte_rollen(Rol.ROL_SEC, self.functie_sec.pk))
+        self.assertEqual(len(rollen), 1)
+        rol, functie = rollen[0]
+        self.assertEqual(rol, Rol.ROL_HWL)
+        self.assertEqual(functie.pk, functie_hwl.pk)
+        functie.beschrijving = 'Aangepast'
+        self.assertEqual(index3.alle[functie_hwl.pk].functie.beschrijving, 'HWL test')
+
+        # een ander proces heeft een functie aangepast (alleen de versie in de database is verhoogd)
+        self.assertTrue(get_rol_index() is index3)
+        CacheVersie.objects.filter(naam='rol_index').update(versie=F('versie') + 1)
+        index4 = get_rol_index()
+        self.assertFalse(index3 is index4)
+        self.assertTrue(get_rol_index() is index4)
+
+        # alleen de administratie van de taken e-mails bijwerken laat de index ongemoeid
+        functie_hwl.laatste_email_over_taken = timezone.now()
+        functie_hwl.save(update_fields=['laatste_email_over_taken'])
+        self.assertTrue(get_rol_index() is index4)
+
 
 # end of file
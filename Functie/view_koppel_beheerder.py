@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
 
-#  Copyright (c) 2020-2025 Ramon van der Winkel.
+#  Copyright (c) 2020-2026 Ramon van der Winkel.
 #  All rights reserved.
 #  Licensed under BSD-3-Clause-Clear. See LICENSE file for details.
 
@@ -396,6 +396,9 @@ class OntvangBeheerderWijzigingenView(View):
 
             functie_wijziging_stuur_email_notificatie(account, wie, functie.beschrijving, remove=True)
 
+            if account.functie_set.count() == 0:
+                rol_zet_mag_wisselen_voor_account(account)
+
         return HttpResponseRedirect(reverse('Functie:wijzig-beheerders', kwargs={'functie_pk': functie.pk}))
 
 
@@ -5,7 +5,7 @@
 #  Licensed under BSD-3-Clause-Clear. See LICENSE file for details.
 
 from django.contrib import admin
-from GoogleDrive.models import Transactie, Token, Bestand
+from GoogleDrive.models import Transactie, Token, Bestand, DriveWijzigingen
 
 
 class TransactieAdmin(admin.ModelAdmin):
@@ -42,5 +42,6 @@ class BestandAdmin(admin.ModelAdmin):
 admin.site.register(Transactie, TransactieAdmin)
 admin.site.register(Token)
 admin.site.register(Bestand, BestandAdmin)
+admin.site.register(DriveWijzigingen)
 
 # end of file
@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+
+#  Copyright (c) 2026 Ramon van der Winkel.
+#  All rights reserved.
+#  Licensed under BSD-3-Clause-Clear. See LICENSE file for details.
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    """ Migratie class voor dit deel van de applicatie """
+
+    # volgorde afdwingen
+    dependencies = [
+        ('GoogleDrive', 'm0001_initial'),
+    ]
+
+    # migratie functies
+    operations = [
+        migrations.CreateModel(
+            name='DriveWijzigingen',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('page_token', models.CharField(blank=True, default='', max_length=100)),
+                ('when', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Drive wijzigingen',
+                'verbose_name_plural': 'Drive wijzigingen',
+            },
+        ),
+    ]
+
+# end of file
@@ -102,6 +102,30 @@ class Bestand(models.Model):
         verbose_name_plural = "Bestanden"
 
 
+class DriveWijzigingen(models.Model):
+    """ Deze tabel onthoudt tot waar de changes feed van Google Drive verwerkt is,
+        zodat we niet elk bestand los hoeven te bevragen.
+        Er is maar 1 record.
+    """
+
+    # page token waarmee de volgende keer verder gegaan wordt met de changes feed
+    # leeg = nog niet opgehaald
+    page_token = models.CharField(max_length=100, default='', blank=True)
+
+    # wanneer is het token voor het laatst bijgewerkt
+    when = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Drive wijzigingen"
+        verbose_name_plural = "Drive wijzigingen"
+
+    def __str__(self):
+        """ geef een tekstuele afkorting van dit object, voor in de admin interface """
+        msg = "[%s]" % timezone.localtime(self.when).strftime('%Y-%m-%d %H:%M:%S')
+        msg += " %s" % self.page_token
+        return msg
+
+
 def maak_unieke_code(**kwargs):
     """ Bereken een unieke code die we kunnen gebruiken in een URL
     """
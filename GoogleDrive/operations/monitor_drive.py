@@ -31,6 +31,7 @@ class MonitorDriveFiles:
     def __init__(self, stdout, retry_delay:float=1.0):
         self.stdout = stdout
         self._service_files = None
+        self._service_changes = None
         self._retry_delay = retry_delay
 
         self._setup_service()
@@ -46,12 +47,17 @@ class MonitorDriveFiles:
             creds = Credentials.from_service_account_file(self.SERVICE_ACCOUNT_FILE, scopes=self.SCOPES)
             service = build('drive', 'v3', credentials=creds)
             self._service_files = service.files()
+            self._service_changes = service.changes()
 
     def _close_services(self):
         if self._service_files:             # pragma: no branch
             self._service_files.close()
             self._service_files = None
 
+        if self._service_changes:           # pragma: no branch
+            self._service_changes.close()
+            self._service_changes = None
+
     def _execute(self, request: HttpRequest) -> dict | None:
         retries = 7
         wait_sec = self._retry_delay
@@ -82,6 +88,20 @@ class MonitorDriveFiles:
 
         return None
 
+    @staticmethod
+    def _decodeer_wijziging(resp: dict):
+        op = resp.get('modifiedTime', '')
+        op = datetime.datetime.fromisoformat(op)
+        last_user = resp.get('lastModifyingUser', None)
+        if last_user and isinstance(last_user, dict):
+            door = (last_user.get('displayName', '') or
+                    last_user.get('emailAddress', '') or    # if present, in case displayName is empty
+                    'Anoniem')                              # fallback
+        else:
+            door = 'Anoniem'
+
+        return op, door
+
     def get_laatste_wijziging(self, file_id):
         # self.stdout.write('[DEBUG] {get_laatste_wijziging} file_id=%s' % repr(file_id))
 
@@ -92,17 +112,62 @@ class MonitorDriveFiles:
 
         op = door = ''
         if resp:
-            op = resp.get('modifiedTime', '')
-            op = datetime.datetime.fromisoformat(op)
-            last_user = resp.get('lastModifyingUser', None)
-            if last_user and isinstance(last_user, dict):
-                door = (last_user.get('displayName', '') or
-                        last_user.get('emailAddress', '') or    # if present, in case displayName is empty
-                        'Anoniem')                              # fallback
-            else:
-                door = 'Anoniem'
+            op, door = self._decodeer_wijziging(resp)
 
         return op, door
 
+    def get_start_page_token(self) -> str:
+        """ vraag het startpunt van de changes feed op
+            met dit token kan get_wijzigingen later alle wijzigingen vanaf dit moment ophalen
+        """
+        request = self._service_changes.getStartPageToken()
+        resp = self._execute(request)
+
+        token = ''
+        if resp:
+            token = resp.get('startPageToken', '')
+
+        return token
+
+    def get_wijzigingen(self, page_token: str):
+        """ haal alle wijzigingen op uit de changes feed van Google Drive, vanaf page_token
+            in plaats van elk bestand los te bevragen met get_laatste_wijziging
+
+            geeft een tuple terug: (wijzigingen, nieuw_token)
+                wijzigingen = dict: [file_id] = (op, door)
+                nieuw_token = token om de volgende keer mee verder te gaan
+                              of None als de feed niet (helemaal) opgehaald kon worden
+        """
+        wijzigingen = dict()
+        fields = ("nextPageToken,newStartPageToken,"
+                  "changes(fileId,removed,file(modifiedTime,lastModifyingUser(displayName,emailAddress)))")
+
+        while page_token:
+            request = self._service_changes.list(pageToken=page_token,
+                                                 fields=fields,
+                                                 pageSize=1000,
+                                                 spaces='drive',
+                                                 includeItemsFromAllDrives=True,
+                                                 supportsAllDrives=True)
+            resp = self._execute(request)
+            if not resp:
+                # probeer het de volgende keer opnieuw vanaf hetzelfde token
+                return wijzigingen, None
+
+            for change in resp.get('changes', []):
+                file = change.get('file', None)
+                if not change.get('removed', False) and file and 'modifiedTime' in file:
+                    # latere wijzigingen van hetzelfde bestand overschrijven eerdere
+                    wijzigingen[change['fileId']] = self._decodeer_wijziging(file)
+            # for
+
+            if 'newStartPageToken' in resp:
+                # einde van de feed bereikt
+                return wijzigingen, resp['newStartPageToken']
+
+            page_token = resp.get('nextPageToken', '')
+        # while
+
+        return wijzigingen, None
 
 # end of file
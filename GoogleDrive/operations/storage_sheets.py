@@ -36,6 +36,7 @@ class StorageGoogleSheet:
         self._value_changes = list()
         self._spreadsheet_requests = list()
         self._sheet_name2id = dict()
+        self._range_cache = dict()      # [(sheet_name, range_a1)] = values, gevuld door laad_ranges
 
     def __enter__(self):
         return self
@@ -108,11 +109,16 @@ class StorageGoogleSheet:
         self._file_id = file_id
         self._value_changes = list()
         self._spreadsheet_requests = list()
+        self._range_cache = dict()
         self._get_sheet_ids()
 
-    def selecteer_sheet(self, sheet_name: str):
+    @staticmethod
+    def _quote_sheet_name(sheet_name: str) -> str:
         # om spaties te ondersteunen moet de sheet_naam tussen quotes gezet worden
-        self._sheet_name = "'" + sheet_name.replace("'", "\\'") + "'"
+        return "'" + sheet_name.replace("'", "\\'") + "'"
+
+    def selecteer_sheet(self, sheet_name: str):
+        self._sheet_name = self._quote_sheet_name(sheet_name)
 
     def _stuur_value_changes(self):
         if self._value_changes:
@@ -152,6 +158,7 @@ class StorageGoogleSheet:
         # TODO: error propagation
         self._stuur_value_changes()
         self._stuur_spreadsheet_requests()
+        self._range_cache = dict()
 
     def _set_sheet_hidden(self, sheet_name: str, hidden: bool):
         # vertaal de sheet naam naar het sheetId
@@ -203,12 +210,53 @@ class StorageGoogleSheet:
         }
         self._value_changes.append(change)
 
+    def laad_ranges(self, sheet_ranges: list):
+        """ haal meerdere ranges in een keer op (batchGet), in plaats van een request per range
+            sheet_ranges: list of tuples (sheet_name, range_a1)
+
+            de waarden worden onthouden tot de volgende selecteer_file of wijziging
+            en daarna zonder nieuwe request teruggegeven door get_range
+            ranges op een sheet die niet in het bestand voorkomt worden overgeslagen
+        """
+        keys = list()
+        for sheet_name, range_a1 in sheet_ranges:
+            if sheet_name in self._sheet_name2id:
+                key = (self._quote_sheet_name(sheet_name), range_a1)
+                if key not in self._range_cache and key not in keys:
+                    keys.append(key)
+        # for
+
+        if len(keys) == 0:
+            return
+
+        request = self._api_sheet_values.batchGet(
+                        spreadsheetId=self._file_id,
+                        ranges=[sheet_name + '!' + range_a1 for sheet_name, range_a1 in keys],
+                        majorDimension="ROWS",
+                        valueRenderOption="UNFORMATTED_VALUE")      # niet aanpassen aan locale
+
+        response = self._execute(request)
+
+        if response:
+            # de value ranges komen terug in dezelfde volgorde als gevraagd
+            for key, value_range in zip(keys, response.get('valueRanges', [])):
+                # als er geen getallen zijn gevonden in de range, dan is 'values' ook niet aanwezig
+                self._range_cache[key] = value_range.get('values', [[]])
+            # for
+
+        # bij een fout halen we de ranges later alsnog los op, via get_range
+
     def get_range(self, range_a1: str) -> list | None:
         # haal de values op in een specifieke range (format: A1:B20) in het huidige sheet
         # geeft een list(rows) terug, met elke row = list(cells)
 
         # print('{get_range} %s!%s' % (self._sheet_name, range_a1))
 
+        try:
+            return self._range_cache[(self._sheet_name, range_a1)]
+        except KeyError:
+            pass
+
         request = self._api_sheet_values.get(
                         spreadsheetId=self._file_id,
                         range=self._sheet_name + '!' + range_a1,
@@ -228,6 +276,7 @@ class StorageGoogleSheet:
 
     def clear_range(self, range_a1: str):
         """ wis de cells in de range """
+        self._range_cache = dict()
         request = self._api_sheet_values.clear(spreadsheetId=self._file_id,
                                                range=self._sheet_name + '!' + range_a1)
         response = self._execute(request)
@@ -79,17 +79,54 @@ class GoogleApiFilesMock:
         pass
 
 
+class GoogleApiChangesMock(GoogleApiFilesMock):
+
+    def getStartPageToken(self):                    # noqa
+        self.next_resp = {'startPageToken': '100'}
+        return self
+
+    def list(self, pageToken: str, **kwargs):       # noqa
+        if self.verbose:    # pragma: no cover
+            print('[DEBUG] {GoogleApiChangesMock.list} pageToken=%s, kwargs=%s' % (repr(pageToken), repr(kwargs)))
+
+        if pageToken == '100':
+            self.next_resp = {
+                'nextPageToken': '101',
+                'changes': [
+                    {'fileId': 'file_user',
+                     'file': {'modifiedTime': '2099-01-01T00:00:00.000000',
+                              'lastModifyingUser': {'displayName': 'User'}}},
+                    {'fileId': 'file_removed', 'removed': True},
+                ]
+            }
+        else:
+            self.next_resp = {
+                'newStartPageToken': '102',
+                'changes': [
+                    {'fileId': 'file_user',
+                     'file': {'modifiedTime': '2099-01-02T00:00:00.000000'}},
+                ]
+            }
+
+        return self
+
+
 class GoogleApiMock:
 
     def __init__(self, verbose=False):
         self.files_service = GoogleApiFilesMock(verbose)
+        self.changes_service = GoogleApiChangesMock(verbose)
 
     def prime_error(self, error_str: str, match: str, error_type: str):
         self.files_service.prime_error(error_str, match, error_type)
+        self.changes_service.prime_error(error_str, match, error_type)
 
     def files(self):
         return self.files_service
 
+    def changes(self):
+        return self.changes_service
+
 
 class TestGoogleDriveOpMonitorDrive(E2EHelpers, TestCase):
 
@@ -119,4 +156,31 @@ class TestGoogleDriveOpMonitorDrive(E2EHelpers, TestCase):
                 op, door = drive.get_laatste_wijziging('file_user')
                 self.assertTrue(op == door == '')
 
+    def test_wijzigingen(self):
+        out = OutputWrapper(io.StringIO())
+
+        my_service = GoogleApiMock(verbose=False)
+        with patch('GoogleDrive.operations.monitor_drive.build', return_value=my_service):
+            # einde van "with" roept __exit__ aan
+            with MonitorDriveFiles(out, retry_delay=0.001) as drive:
+                page_token = drive.get_start_page_token()
+                self.assertEqual(page_token, '100')
+
+                # 2 pagina's; de laatste wijziging van een bestand telt
+                wijzigingen, page_token = drive.get_wijzigingen(page_token)
+                self.assertEqual(page_token, '102')
+                self.assertEqual(list(wijzigingen.keys()), ['file_user'])
+                op, door = wijzigingen['file_user']
+                self.assertEqual(op.day, 2)
+                self.assertEqual(door, 'Anoniem')
+
+                # fout: geen nieuw token
+                my_service.prime_error('test A', '-', 'GoogleApiError')
+                wijzigingen, page_token = drive.get_wijzigingen('102')
+                self.assertIsNone(page_token)
+                self.assertEqual(wijzigingen, dict())
+
+                page_token = drive.get_start_page_token()
+                self.assertEqual(page_token, '')
+
 # end of file
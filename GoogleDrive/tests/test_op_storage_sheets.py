@@ -45,6 +45,12 @@ class GoogleApiSpreadsheetsMock:
 
         return self
 
+    def batchGet(self, spreadsheetId, ranges, majorDimension, valueRenderOption):    # noqa
+        self.next_resp = {
+            'valueRanges': [{'range': range_a1, 'values': [[range_a1]]} for range_a1 in ranges]
+        }
+        return self
+
     def batchUpdate(self, spreadsheetId, body):             # noqa
         return self
 
@@ -160,6 +166,44 @@ class TestGoogleDriveStorageSheets(E2EHelpers, TestCase):
 
                 sheet.clear_range('A1:A5')
 
+    def test_laad_ranges(self):
+        # meerdere ranges in 1 request ophalen
+        out = OutputWrapper(io.StringIO())
+
+        # einde van "with" roept __exit__ aan
+        with StorageGoogleSheet(out, retry_delay=0.0001) as sheet:
+            my_service = GoogleApiMock(verbose=False)
+            with patch('GoogleDrive.operations.storage_sheets.build', return_value=my_service):
+                sheet.selecteer_file('x')
+
+                # sheet 'niet' bestaat niet en wordt overgeslagen
+                sheet.laad_ranges([('test', 'A1:A5'), ('test', 'error'), ('niet', 'B1:B5')])
+
+                # komt uit de cache
+                sheet.selecteer_sheet('test')
+                res = sheet.get_range('error')
+                self.assertEqual(res, [["'test'!error"]])
+
+                # niet in de cache
+                res = sheet.get_range('A1:A6')
+                self.assertIsNotNone(res)
+
+                # alles al in de cache, dus geen request
+                sheet.laad_ranges([('test', 'A1:A5')])
+                sheet.laad_ranges([])
+
+                # na een wijziging is de cache leeg
+                sheet.clear_range('A1:A5')
+                res = sheet.get_range('error')
+                self.assertIsNone(res)
+
+                # bij een fout valt get_range terug op een eigen request
+                my_service.prime_error('test', 'retry', 'GoogleApiError')
+                sheet.laad_ranges([('test', 'A1:A5')])
+                my_service.spreadsheets_service.next_error = None
+                res = sheet.get_range('A1:A5')
+                self.assertEqual(res, [1, 2, 3, 4, 5])
+
     def test_value_actions(self):
         # value actions are queued up
         out = OutputWrapper(io.StringIO())
@@ -8,6 +8,7 @@
 
 from django.conf import settings
 from django.utils import timezone
+from django.db import transaction
 from django.db.models import ProtectedError
 from django.core.management.base import BaseCommand
 from django.core.validators import URLValidator
@@ -18,6 +19,8 @@ from Functie.models import Functie
 from Functie.operations import maak_account_vereniging_secretaris
 from Functie.tests.helpers import maak_functie
 from Geo.models import Rayon, Regio
+from ImportCRM.models import IMPORT_LIMIETEN_PK, ImportLimieten
+from ImportCRM.operations import JsonStroomLezer
 from Locatie.definities import BAAN_TYPE_BUITEN, BAAN_TYPE_EXTERN
 from Locatie.models import WedstrijdLocatie
 from Logboek.models import schrijf_in_logboek
@@ -27,9 +30,11 @@ from Opleiding.models import OpleidingDiploma
 from Opleiding.operations import opleiding_post_import_crm
 from Overig.helpers import maak_unaccented
 from Records.models import IndivRecord
-from Sporter.models import Sporter, Speelsterkte
+from Sporter.models import Sporter, Speelsterkte, SporterVoorkeuren
 from Vereniging.models import Vereniging, Secretaris
 import traceback
+import hashlib
+import time
 import datetime
 import logging
 import json
@@ -61,6 +66,13 @@ EXPECTED_MEMBER_KEYS = ('club_number', 'member_number', 'name', 'prefix', 'first
 OPTIONAL_MEMBER_KEYS = ('skill_levels', 'educations')
 SKIP_VER_NR = (settings.EXTERN_VER_NR,)
 
+# aantal records per bulk_create / bulk_update query
+BULK_BATCH_SIZE = 1000
+
+# delta import: leden waarvan de status binnen dit aantal dagen wijzigt door het verstrijken van de tijd
+# worden ook verwerkt, ook al is het record niet gewijzigd (ingangsdatum lidmaatschap, lang ex-lid)
+DELTA_MARGE_DAGEN = 7
+
 
 class Command(BaseCommand):
 
@@ -89,13 +101,18 @@ class Command(BaseCommand):
         self._count_recordhouders = 0
 
         self._nieuwe_clubs = list()
-        self._recordhouder_lid_nrs = list()
+        self._recordhouder_lid_nrs = set()
 
         self.lidmaatschap_jaar = 0
         self.zet_lidmaatschap_jaar(timezone.now())
 
         self.dryrun = False
 
+        # delta import (zie _bepaal_delta)
+        self._vorige_fname = None
+        self._delta_lid_nrs = None          # None = volledige import, anders: set met alle lid_nrs voor de caches
+        self._delta_kandidaten = None       # lid_nrs die verwijderd mogen worden: verwerkt of verdwenen uit het CRM
+
         self._cache_account = dict()    # [username] = Account()
         self._cache_rayon = dict()      # [rayon_nr] = Rayon()
         self._cache_regio = dict()      # [regio_nr] = Regio()
@@ -110,8 +127,31 @@ class Command(BaseCommand):
         self._code2opleiding = dict()           # [opleiding code] = (beschrijving, toon_op_pas)
         self._opleiding_onbekend = dict()       # [opleiding code] = aantal
 
+        # wijzigingen van de leden worden verzameld en in 1 keer opgeslagen (zie _leden_wijzigingen_opslaan)
+        self._nieuwe_sporters = list()          # [Sporter(), ...]
+        self._gewijzigde_sporters = dict()      # [tuple(update_fields)] = [Sporter(), ...]
+        self._gewijzigde_voorkeuren = list()    # [SporterVoorkeuren(), ...]
+        self._nieuwe_speelsterktes = list()     # [Speelsterkte(), ...]
+        self._vervallen_speelsterkte_pks = list()
+        self._nieuwe_diplomas = list()          # [OpleidingDiploma(), ...]
+        self._gewijzigde_diplomas = list()      # [OpleidingDiploma(), ...]
+
+        self._fase_duur = list()                # [(fase, seconden), ...]
+
     def _maak_cache(self):
-        for account in Account.objects.all():
+        # bij een delta import alleen de gegevens van de betrokken leden ophalen
+        accounts = Account.objects.all()
+        sporters = Sporter.objects.select_related('bij_vereniging').all()
+        sterktes = Speelsterkte.objects.select_related('sporter').all()
+        diplomas = OpleidingDiploma.objects.select_related('sporter').all()
+        if self._delta_lid_nrs is not None:
+            lid_nrs = list(self._delta_lid_nrs)
+            accounts = accounts.filter(username__in=[str(lid_nr) for lid_nr in lid_nrs])
+            sporters = sporters.filter(lid_nr__in=lid_nrs)
+            sterktes = sterktes.filter(sporter__lid_nr__in=lid_nrs)
+            diplomas = diplomas.filter(sporter__lid_nr__in=lid_nrs)
+
+        for account in accounts:
             self._cache_account[account.username] = account
         # for
 
@@ -140,7 +180,7 @@ class Command(BaseCommand):
             self._cache_sec[sec.vereniging.ver_nr] = sec
         # for
 
-        for sporter in Sporter.objects.select_related('bij_vereniging').all():
+        for sporter in sporters:
             self._cache_sporter[sporter.lid_nr] = sporter
         # for
 
@@ -153,14 +193,14 @@ class Command(BaseCommand):
             self._cache_functie[tup] = functie
         # for
 
-        for sterkte in Speelsterkte.objects.select_related('sporter').all():
+        for sterkte in sterktes:
             try:
                 self._cache_sterk[sterkte.sporter.lid_nr].append(sterkte)
             except KeyError:
                 self._cache_sterk[sterkte.sporter.lid_nr] = [sterkte]
         # for
 
-        for diploma in OpleidingDiploma.objects.select_related('sporter').all():
+        for diploma in diplomas:
             tup = (diploma.sporter.lid_nr, diploma.code)
             diploma.gezien_tijdens_import = False
             self._cache_diploma[tup] = diploma
@@ -267,6 +307,8 @@ class Command(BaseCommand):
         parser.add_argument('filename', nargs=1, help="pad naar het JSON bestand")
         parser.add_argument('--dryrun', action='store_true')
         parser.add_argument('--sim_now', nargs=1, metavar='YYYY-MM-DD', help="gesimuleerde datum: YYYY-MM-DD")
+        parser.add_argument('--vorige', nargs=1, metavar='PAD',
+                            help="pad naar het JSON bestand van de vorige import; alleen de verschillen verwerken")
 
     def _check_keys(self, keys, expected_keys, optional_keys, level):
         has_error = False
@@ -316,10 +358,10 @@ class Command(BaseCommand):
         """ Sporters met een NL record op hun naam worden niet verwijderd.
             Zoek deze op zodat we niet eens een poging gaan doen om ze te verwijderen.
         """
-        self._recordhouder_lid_nrs = list(IndivRecord
-                                          .objects
-                                          .distinct('sporter')
-                                          .values_list('sporter__lid_nr', flat=True))
+        self._recordhouder_lid_nrs = set(IndivRecord
+                                         .objects
+                                         .distinct('sporter')
+                                         .values_list('sporter__lid_nr', flat=True))
         # self.stdout.write('[DEBUG] Record houders: %s' % repr(self._recordhouder_lid_nrs))
 
     def _import_rayons(self, data):
@@ -991,15 +1033,11 @@ class Command(BaseCommand):
     def _import_members(self, data):
         """ Importeert data van alle leden """
 
-        # check alleen het eerste record
-        if self._check_keys(data[0].keys(), EXPECTED_MEMBER_KEYS, OPTIONAL_MEMBER_KEYS, "member"):
-            return
-
         date_now = timezone.now().date()
 
         # houd bij welke leden lid_nrs in de database zitten
         # als deze niet meer voorkomen, dan zijn ze verwijderd
-        lid_nrs = list(self._cache_sporter.keys())
+        lid_nrs = set(self._cache_sporter.keys())
 
         """ JSON velden (string, except):
              'club_number':         int,
@@ -1029,7 +1067,16 @@ class Command(BaseCommand):
              'educations':          lijst van opleidingen
              'skill_level':         lijst van speelsterktes
         """
+        is_eerste = True
         for member in data:
+            if is_eerste:
+                is_eerste = False
+
+                # check alleen het eerste record
+                # de overige leden zijn al gecontroleerd tijdens het lezen van het bestand (zie _controleer_leden)
+                if self._check_keys(member.keys(), EXPECTED_MEMBER_KEYS, OPTIONAL_MEMBER_KEYS, "member"):
+                    return
+
             is_valid = True
             is_administratief_aanwezig = False
 
@@ -1335,9 +1382,9 @@ class Command(BaseCommand):
                 is_nieuw = True
             else:
                 try:
-                    # krimp de lijst zodat verwijderde leden over blijven
+                    # krimp de set zodat verwijderde leden over blijven
                     lid_nrs.remove(lid_nr)
-                except ValueError:          # pragma: no cover
+                except KeyError:            # pragma: no cover
                     self.stderr.write("[ERROR] Unexpected: lid_nr %s onverwacht niet in lijst bestaande nummers" % (
                                             repr(lid_nr)))
                     self._count_errors += 1
@@ -1513,7 +1560,7 @@ class Command(BaseCommand):
                         self._count_wijzigingen += 1
 
                     if not self.dryrun:
-                        obj.save(update_fields=updated)
+                        self._noteer_sporter_wijziging(obj, updated)
                         self._cache_sporter[obj.pk] = obj
 
                         # wijziging van geslacht
@@ -1534,7 +1581,7 @@ class Command(BaseCommand):
                                     voorkeuren.wedstrijd_geslacht = lid_geslacht
                                     self.stdout.write('[INFO] Lid %s voorkeuren: wedstrijd geslacht vastgezet' % lid_nr)
 
-                                voorkeuren.save(update_fields=['wedstrijd_geslacht_gekozen', 'wedstrijd_geslacht'])
+                                self._gewijzigde_voorkeuren.append(voorkeuren)
                 # else
             # else
 
@@ -1580,7 +1627,7 @@ class Command(BaseCommand):
                 if lid_blocked:
                     obj.is_actief_lid = False
                 if not self.dryrun:
-                    obj.save()
+                    self._nieuwe_sporters.append(obj)
                     self._cache_sporter[obj.pk] = obj
                 self._count_toevoegingen += 1
 
@@ -1658,8 +1705,7 @@ class Command(BaseCommand):
                             nieuwe_lijst.append(sterk)
                             self._count_toevoegingen += 1
                 # for
-                if len(nieuwe_lijst):
-                    Speelsterkte.objects.bulk_create(nieuwe_lijst)
+                self._nieuwe_speelsterktes.extend(nieuwe_lijst)
             else:
                 # sporter is geen actief lid meer
                 # drop zijn speelsterktes
@@ -1670,11 +1716,11 @@ class Command(BaseCommand):
                 for sterk in huidige_lijst:
                     self.stdout.write('[INFO] Speelsterkte is vervallen: lid=%s: %s' % (lid_nr, sterk))
                     self._count_verwijderingen += 1
-                    sterk.delete()
+                    self._vervallen_speelsterkte_pks.append(sterk.pk)
                 # for
 
             if obj.is_actief_lid:
-                dupe_codes = list()
+                dupe_codes = set()
                 for code, beschrijving, toon_op_pas, date_start in lid_edus:
                     # meld dubbele codes omdat we er niet tegen kunnen en het gejojo met de datums veroorzaakt
                     if code in dupe_codes:
@@ -1682,7 +1728,7 @@ class Command(BaseCommand):
                         self._count_warnings += 1
                         continue        # niet importeren
 
-                    dupe_codes.append(code)
+                    dupe_codes.add(code)
 
                     try:
                         tup = (obj.lid_nr, code)
@@ -1694,26 +1740,35 @@ class Command(BaseCommand):
                                         beschrijving=beschrijving,
                                         toon_op_pas=toon_op_pas,
                                         datum_begin=date_start)
+                        if not self.dryrun:
+                            self._nieuwe_diplomas.append(diploma)
                     else:
                         diploma.gezien_tijdens_import = True
+                        is_gewijzigd = False
 
                         if diploma.beschrijving != beschrijving:
                             diploma.beschrijving = beschrijving
+                            is_gewijzigd = True
 
                         if str(diploma.datum_begin) != date_start:
                             self.stdout.write('[INFO] Lid %s: opleiding %s datum_begin: %s --> %s' % (
                                                 obj.lid_nr, code, diploma.datum_begin, date_start))
                             diploma.datum_begin = date_start
+                            is_gewijzigd = True
 
-                    if not self.dryrun:
-                        diploma.save()
+                        if is_gewijzigd and not self.dryrun:
+                            self._gewijzigde_diplomas.append(diploma)
                 # for
         # for member
 
+        if self._delta_kandidaten is not None:
+            # delta import: de cache bevat ook ongewijzigde leden (secretarissen, ledenadministrateurs)
+            # alleen de leden die uit het CRM verdwenen zijn of deze keer niet geimporteerd konden worden
+            lid_nrs.intersection_update(self._delta_kandidaten)
+
         # self.stdout.write('[DEBUG] Volgende %s bondsnummers moeten verwijderd worden: %s' % (len(lid_nrs),
         #                                                                                      repr(lid_nrs)))
-        while len(lid_nrs) > 0:
-            lid_nr = lid_nrs.pop(0)
+        for lid_nr in sorted(lid_nrs):
             obj = self._vind_sporter(lid_nr)
 
             # behoud fictieve leden en externe leden
@@ -1727,7 +1782,7 @@ class Command(BaseCommand):
                 obj.bij_vereniging = None
                 self._count_wijzigingen += 2
                 if not self.dryrun:
-                    obj.save()
+                    self._noteer_sporter_wijziging(obj, ['is_actief_lid', 'bij_vereniging'])
                     self._cache_sporter[obj.pk] = obj
                 # FUTURE: afhandelen van het inactiveren/verwijderen van een lid dat in een team zit in een competitie
                 # FUTURE: afhandelen van het inactiveren/verwijderen van een lid dat secretaris is
@@ -1772,13 +1827,62 @@ class Command(BaseCommand):
                     except ProtectedError as exc:
                         self.stderr.write('[ERROR] Onverwachte fout bij het verwijderen van een lid: %s' % str(exc))
                         self._count_errors += 1
-        # while
+        # for
+
+        if not self.dryrun:
+            self._leden_wijzigingen_opslaan()
 
         for code, aantal in self._opleiding_onbekend.items():
             self.stdout.write('[WARNING] Opleiding code %s is niet bekend (%s keer in gebruik)' % (code, aantal))
             self._count_warnings += 1
         # for
 
+    def _noteer_sporter_wijziging(self, obj, updated):
+        """ onthoud dat een sporter gewijzigd is, voor _leden_wijzigingen_opslaan
+            sporters worden gegroepeerd op de gewijzigde velden, zodat bulk_update alleen deze velden schrijft
+        """
+        if len(updated):
+            tup = tuple(updated)
+            try:
+                self._gewijzigde_sporters[tup].append(obj)
+            except KeyError:
+                self._gewijzigde_sporters[tup] = [obj]
+
+    def _leden_wijzigingen_opslaan(self):
+        """ sla alle verzamelde wijzigingen van de leden in 1 transactie op, met bulk queries """
+
+        # savepoint=False: geen extra queries als de import zelf al in een transactie draait
+        with transaction.atomic(savepoint=False):
+            # eerst de sporters, want speelsterktes en diploma's verwijzen naar de sporter
+            Sporter.objects.bulk_create(self._nieuwe_sporters, batch_size=BULK_BATCH_SIZE)
+
+            for fields, sporters in self._gewijzigde_sporters.items():
+                Sporter.objects.bulk_update(sporters, fields, batch_size=BULK_BATCH_SIZE)
+            # for
+
+            SporterVoorkeuren.objects.bulk_update(self._gewijzigde_voorkeuren,
+                                                  ['wedstrijd_geslacht_gekozen', 'wedstrijd_geslacht'],
+                                                  batch_size=BULK_BATCH_SIZE)
+
+            pks = self._vervallen_speelsterkte_pks
+            for nr in range(0, len(pks), BULK_BATCH_SIZE):
+                Speelsterkte.objects.filter(pk__in=pks[nr:nr + BULK_BATCH_SIZE]).delete()
+            # for
+
+            Speelsterkte.objects.bulk_create(self._nieuwe_speelsterktes, batch_size=BULK_BATCH_SIZE)
+
+            OpleidingDiploma.objects.bulk_create(self._nieuwe_diplomas, batch_size=BULK_BATCH_SIZE)
+            OpleidingDiploma.objects.bulk_update(self._gewijzigde_diplomas, ['beschrijving', 'datum_begin'],
+                                                 batch_size=BULK_BATCH_SIZE)
+
+        self._nieuwe_sporters = list()
+        self._gewijzigde_sporters = dict()
+        self._gewijzigde_voorkeuren = list()
+        self._nieuwe_speelsterktes = list()
+        self._vervallen_speelsterkte_pks = list()
+        self._nieuwe_diplomas = list()
+        self._gewijzigde_diplomas = list()
+
     def _import_locaties(self, data):
         """ Importeert data van verenigingen als basis voor locaties """
 
@@ -1912,10 +2016,195 @@ class Command(BaseCommand):
         if len(pks) > 0:
             OpleidingDiploma.objects.filter(pk__in=pks).delete()
 
+    @staticmethod
+    def _is_datum_gevoelig(member, date_now):
+        """ geeft True als de status van het lid rond deze tijd wijzigt door het verstrijken van de tijd,
+            zonder dat het record in het CRM wijzigt
+        """
+        try:
+            lid_sinds = datetime.datetime.strptime(member['member_from'], "%Y-%m-%d").date()
+        except (ValueError, TypeError, KeyError):
+            # wordt gerapporteerd tijdens de import
+            return True
+
+        if (lid_sinds - date_now).days > -DELTA_MARGE_DAGEN:
+            # lidmaatschap gaat binnenkort in, of is net ingegaan
+            return True
+
+        tot_str = str(member.get('member_until', None) or '')
+        if tot_str and not tot_str.startswith('9999-'):
+            try:
+                lid_tot = datetime.datetime.strptime(tot_str, "%Y-%m-%d").date()
+            except ValueError:
+                return True
+
+            dagen_geen_lid = (date_now - lid_tot).days
+            if abs(dagen_geen_lid - 2 * 365) <= DELTA_MARGE_DAGEN:
+                # lid wordt binnenkort (of is net) uit de administratie verwijderd
+                return True
+
+        return False
+
+    @staticmethod
+    def _lid_hash(member):
+        """ vingerafdruk van de gegevens van een lid, om te kunnen vergelijken met de vorige import """
+        return hashlib.blake2b(json.dumps(member, sort_keys=True).encode(), digest_size=16).digest()
+
+    def _bepaal_delta(self, fname, clubs):
+        """ vergelijk het bestand met het JSON bestand van de vorige (geslaagde) import
+
+            geeft de leden die verwerkt moeten worden
+            of None als de import niet door mag gaan vanwege de limieten
+        """
+        members = JsonStroomLezer(fname).lijst_van('members')
+
+        # van de vorige import worden alleen de vingerafdrukken van de leden bewaard
+        vorige_clubs = list()
+        vorige_lid = dict()         # [member_number] = hash
+        gezien = list()
+        try:
+            lezer = JsonStroomLezer(self._vorige_fname)
+            for sleutel in lezer.sleutels():
+                if sleutel == 'clubs':
+                    vorige_clubs = lezer.waarde()
+                elif sleutel == 'members':
+                    for member in lezer.lijst():
+                        vorige_lid[member.get('member_number', None)] = self._lid_hash(member)
+                    # for
+                gezien.append(sleutel)
+            # for
+            if 'clubs' not in gezien or 'members' not in gezien:
+                raise ValueError('clubs of members ontbreekt')
+        except (IOError, ValueError, AttributeError) as exc:
+            self.stdout.write('[WARNING] Vorige import is niet bruikbaar (%s); volledige import' % str(exc))
+            self._count_warnings += 1
+            return members
+
+        # aan het begin van een nieuw lidmaatschap jaar moeten alle leden bijgewerkt worden
+        if (Sporter
+                .objects
+                .filter(is_actief_lid=True)
+                .exclude(lid_tot_einde_jaar=self.lidmaatschap_jaar)
+                .exclude(bij_vereniging__ver_nr__in=settings.CRM_IMPORT_BEHOUD_CLUB)
+                .exists()):
+            self.stdout.write('[INFO] Nieuw lidmaatschap jaar; volledige import')
+            return members
+
+        # verenigingen worden altijd allemaal verwerkt (dit zijn er weinig); alleen tellen voor de limiet
+        vorige_ver = dict()
+        for club in vorige_clubs:
+            vorige_ver[club.get('club_number', None)] = club
+        # for
+
+        aantal_clubs = 0
+        for club in clubs:
+            if vorige_ver.pop(club.get('club_number', None), None) != club:
+                aantal_clubs += 1
+        # for
+        aantal_clubs += len(vorige_ver)         # verwijderde verenigingen
+
+        date_now = timezone.now().date()
+        aantal_leden = 0
+        aantal_totaal = 0
+        delta_members = list()
+        for member in members:
+            aantal_totaal += 1
+            if vorige_lid.pop(member.get('member_number', None), None) != self._lid_hash(member):
+                aantal_leden += 1
+                delta_members.append(member)
+            elif self._is_datum_gevoelig(member, date_now):
+                delta_members.append(member)
+        # for
+
+        # vorige_lid bevat nu alleen nog de leden die niet meer in het CRM voorkomen
+        aantal_leden += len(vorige_lid)
+
+        self.stdout.write('[INFO] Delta import: %s van de %s leden gewijzigd of verwijderd' % (
+                            aantal_leden, aantal_totaal))
+        self.stdout.write('[INFO] Delta import: %s verenigingen gewijzigd' % aantal_clubs)
+
+        limieten = ImportLimieten.objects.filter(pk=IMPORT_LIMIETEN_PK).first()
+        if limieten and limieten.use_limits:
+            if aantal_leden > limieten.max_member_changes:
+                self.stderr.write('[ERROR] Te veel gewijzigde leden: %s (limiet: %s)' % (
+                                    aantal_leden, limieten.max_member_changes))
+                self._exit_code = 1
+
+            if aantal_clubs > limieten.max_club_changes:
+                self.stderr.write('[ERROR] Te veel gewijzigde verenigingen: %s (limiet: %s)' % (
+                                    aantal_clubs, limieten.max_club_changes))
+                self._exit_code = 2
+
+            if self._exit_code > 0:
+                return None
+
+        # verwerkte en verdwenen leden mogen verwijderd worden
+        kandidaten = set()
+        for lid_nr in [member.get('member_number', None) for member in delta_members] + list(vorige_lid.keys()):
+            try:
+                kandidaten.add(int(lid_nr))
+            except (TypeError, ValueError):
+                # wordt gerapporteerd tijdens de import
+                pass
+        # for
+
+        # de secretarissen en ledenadministrateurs moeten ook in de cache zitten
+        lid_nrs = set(kandidaten)
+        for club in clubs:
+            for sub in (club.get('secretaris', None) or []) + (club.get('member_admins', None) or []):
+                try:
+                    lid_nrs.add(int(sub['member_number']))
+                except (KeyError, TypeError, ValueError):
+                    pass
+            # for
+        # for
+
+        self._delta_kandidaten = kandidaten
+        self._delta_lid_nrs = lid_nrs
+        return delta_members
+
+    def _meet_fase(self, fase, func, *args):
+        """ voer een fase van de import uit en onthoud hoe lang dit duurde """
+        start = time.monotonic()
+        res = func(*args)
+        self._fase_duur.append((fase, time.monotonic() - start))
+        return res
+
+    def _controleer_leden(self, members):
+        """ controleer van elk lid of alle verplichte sleutels aanwezig zijn
+            het eerste lid wordt gecontroleerd door _import_members
+            geeft het aantal leden terug
+        """
+        verplicht = set(EXPECTED_MEMBER_KEYS)
+        aantal = 0
+        for member in members:
+            aantal += 1
+            if aantal > 1:
+                ontbreekt = verplicht.difference(member.keys())
+                if len(ontbreekt):
+                    self.stderr.write("[ERROR] Lid %s mist verplichte sleutels: %s" % (
+                                        member.get('member_number', '?'), ", ".join(sorted(ontbreekt))))
+                    self._count_errors += 1
+        # for
+        return aantal
+
+    def _lees_bestand(self, fname):
+        """ eerste doorgang door het bestand: lees alles, behalve de leden
+            de leden worden alleen gecontroleerd en geteld; deze worden later 1 voor 1 ingelezen
+        """
+        data = dict()
+        lezer = JsonStroomLezer(fname)
+        for sleutel in lezer.sleutels():
+            if sleutel == 'members':
+                data[sleutel] = self._controleer_leden(lezer.lijst())
+            else:
+                data[sleutel] = lezer.waarde()
+        # for
+        return data
+
     def _import_bestand(self, fname):
         try:
-            with open(fname, encoding='raw_unicode_escape') as f_handle:
-                data = json.load(f_handle)
+            data = self._meet_fase('lezen', self._lees_bestand, fname)
         except IOError as exc:
             self.stderr.write("[ERROR] Bestand kan niet gelezen worden (%s)" % str(exc))
             return
@@ -1930,22 +2219,33 @@ class Command(BaseCommand):
             return
 
         for key in EXPECTED_DATA_KEYS:
-            if len(data[key]) < 1:
+            # voor de leden staat hier alleen het aantal
+            aantal = data[key] if key == 'members' else len(data[key])
+            if aantal < 1:
                 self.stderr.write("[ERROR] Geen data voor top-level sleutel %s" % repr(key))
                 return
 
-        self._maak_cache()
-        self._vind_recordhouders()
-        self._import_rayons(data['rayons'])
-        self._import_regions(data['regions'])
+        if self._vorige_fname:
+            members = self._meet_fase('delta', self._bepaal_delta, fname, data['clubs'])
+            if members is None:
+                # geblokkeerd door de limieten
+                return
+        else:
+            # tweede doorgang door het bestand: de leden 1 voor 1
+            members = JsonStroomLezer(fname).lijst_van('members')
+
+        self._meet_fase('cache', self._maak_cache)
+        self._meet_fase('recordhouders', self._vind_recordhouders)
+        self._meet_fase('rayons', self._import_rayons, data['rayons'])
+        self._meet_fase('regios', self._import_regions, data['regions'])
         # circular dependency: secretaris van vereniging is lid; lid hoort bij vereniging
         # doe clubs eerst, dan members, dan club.secretaris
-        self._import_clubs(data['clubs'])
-        self._import_members(data['members'])
-        self._import_clubs_secretaris(data['clubs'])
-        self._import_clubs_member_admin(data['clubs'])
-        self._import_locaties(data['clubs'])
-        self._verwijder_verlopen_diplomas()
+        self._meet_fase('verenigingen', self._import_clubs, data['clubs'])
+        self._meet_fase('leden', self._import_members, members)
+        self._meet_fase('secretarissen', self._import_clubs_secretaris, data['clubs'])
+        self._meet_fase('ledenadministrateurs', self._import_clubs_member_admin, data['clubs'])
+        self._meet_fase('locaties', self._import_locaties, data['clubs'])
+        self._meet_fase('verlopen diploma\'s', self._verwijder_verlopen_diplomas)
 
         self.stdout.write('Import van CRM data is klaar')
         # self.stdout.write("Read %s lines; skipped %s dupes; skipped %s errors; added %s records" % (
@@ -1992,6 +2292,12 @@ class Command(BaseCommand):
             self.stdout.write('   %s' % deel)
         # for
 
+        self.stdout.write("\n")
+        self.stdout.write("Tijdsduur per fase:")
+        for fase, duur in self._fase_duur:
+            self.stdout.write('   %s: %.2f seconden' % (fase, duur))
+        # for
+
         self.stdout.write('Done')
 
     def handle(self, *args, **options):
@@ -2001,6 +2307,9 @@ class Command(BaseCommand):
 
         fname = options['filename'][0]
 
+        if options['vorige']:
+            self._vorige_fname = options['vorige'][0]
+
         if options['sim_now']:
             try:
                 sim_now = datetime.datetime.strptime(options['sim_now'][0], '%Y-%m-%d')
@@ -0,0 +1,11 @@
+# -*- coding: utf-8 -*-
+
+#  Copyright (c) 2026 Ramon van der Winkel.
+#  All rights reserved.
+#  Licensed under BSD-3-Clause-Clear. See LICENSE file for details.
+
+from .json_stroom import JsonStroomLezer
+
+__all__ = ['JsonStroomLezer']
+
+# end of file
@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+
+#  Copyright (c) 2026 Ramon van der Winkel.
+#  All rights reserved.
+#  Licensed under BSD-3-Clause-Clear. See LICENSE file for details.
+
+""" lezen van een groot JSON bestand, zonder het hele bestand in het geheugen te laden """
+
+import json
+
+WITRUIMTE = ' \t\n\r'
+
+
+class JsonStroomLezer(object):
+
+    """ Leest een JSON bestand met een object op het hoogste niveau, in blokken.
+
+        De sleutels op het hoogste niveau worden 1 voor 1 opgeleverd door sleutels().
+        Van elke sleutel kan de waarde in zijn geheel gelezen worden met waarde(),
+        of, als het een lijst is, element voor element met lijst().
+        Alleen de waarde of het element dat opgeleverd wordt staat in het geheugen.
+
+        Fouten in het JSON formaat geven een json.JSONDecodeError, net als json.load.
+    """
+
+    def __init__(self, fname, encoding='raw_unicode_escape', blok_grootte=65536):
+        self._fname = fname
+        self._encoding = encoding
+        self._blok_grootte = blok_grootte
+        self._decoder = json.JSONDecoder()
+        self._handle = None
+        self._buf = ''
+        self._pos = 0
+        self._eof = False
+        self._waarde_gelezen = False
+
+    def _open(self):
+        self._handle = open(self._fname, encoding=self._encoding)
+        self._buf = ''
+        self._pos = 0
+        self._eof = False
+
+    def _sluit(self):
+        if self._handle:
+            self._handle.close()
+            self._handle = None
+        self._buf = ''
+
+    def _vul(self):
+        """ lees het volgende blok en gooi het verwerkte deel van de buffer weg """
+        blok = self._handle.read(self._blok_grootte)
+        if blok:
+            self._buf = self._buf[self._pos:] + blok
+            self._pos = 0
+        else:
+            self._eof = True
+        return not self._eof
+
+    def _fout(self, msg):
+        return json.JSONDecodeError(msg, self._buf, self._pos)
+
+    def _teken(self):
+        """ geef het volgende teken dat geen witruimte is, of '' aan het einde van het bestand """
+        while True:
+            while self._pos < len(self._buf) and self._buf[self._pos] in WITRUIMTE:
+                self._pos += 1
+            # while
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._vul():
+                return ''
+        # while
+
+    def _verwacht(self, teken):
+        if self._teken() != teken:
+            raise self._fout('Expecting %s' % repr(teken))
+        self._pos += 1
+
+    def _lees_waarde(self):
+        """ lees 1 complete JSON waarde """
+        self._teken()
+        while True:
+            try:
+                waarde, eind = self._decoder.raw_decode(self._buf, self._pos)
+            except json.JSONDecodeError:
+                # waarde is misschien nog niet compleet
+                if not self._vul():
+                    raise
+            else:
+                # een getal aan het einde van de buffer kan in het volgende blok doorlopen
+                # (ook als de buffer eindigt met een half exponent, zoals "12e" of "12e+")
+                if eind + 2 < len(self._buf) or not self._vul():
+                    self._pos = eind
+                    return waarde
+        # while
+
+    def sleutels(self):
+        """ doorloop de sleutels van het object op het hoogste niveau
+            na elke sleutel kan de waarde gelezen worden met waarde() of lijst()
+            een waarde die niet gelezen wordt, wordt overgeslagen
+        """
+        self._open()
+        try:
+            self._verwacht('{')
+            if self._teken() == '}':
+                self._pos += 1
+            else:
+                while True:
+                    sleutel = self._lees_waarde()
+                    if not isinstance(sleutel, str):
+                        raise self._fout('Expecting property name enclosed in double quotes')
+                    self._verwacht(':')
+
+                    self._waarde_gelezen = False
+                    yield sleutel
+
+                    if not self._waarde_gelezen:
+                        self._sla_waarde_over()
+
+                    if self._teken() == '}':
+                        self._pos += 1
+                        break
+                    self._verwacht(',')
+                # while
+
+            if self._teken() != '':
+                raise self._fout('Extra data')
+        finally:
+            self._sluit()
+
+    def waarde(self):
+        """ lees de complete waarde van de huidige sleutel """
+        self._waarde_gelezen = True
+        return self._lees_waarde()
+
+    def lijst(self):
+        """ doorloop de elementen van de lijst van de huidige sleutel
+            de lijst moet helemaal doorlopen worden voordat verder gegaan wordt met de volgende sleutel
+        """
+        self._waarde_gelezen = True
+        self._verwacht('[')
+        if self._teken() == ']':
+            self._pos += 1
+            return
+
+        while True:
+            yield self._lees_waarde()
+
+            if self._teken() == ']':
+                self._pos += 1
+                return
+            self._verwacht(',')
+        # while
+
+    def _sla_waarde_over(self):
+        if self._teken() == '[':
+            for _ in self.lijst():
+                pass
+            # for
+        else:
+            self._lees_waarde()
+
+    def lijst_van(self, naam):
+        """ doorloop de elementen van de lijst onder sleutel 'naam' op het hoogste niveau """
+        sleutels = self.sleutels()
+        try:
+            for sleutel in sleutels:
+                if sleutel == naam:
+                    yield from self.lijst()
+                    break
+            # for
+        finally:
+            sleutels.close()
+
+
+# end of file
@@ -10,6 +10,7 @@ from django.core.management import call_command
 from django.core.exceptions import ObjectDoesNotExist
 from Functie.models import Functie
 from Geo.models import Regio
+from ImportCRM.models import ImportLimieten
 from Locatie.definities import BAAN_TYPE_BUITEN
 from Locatie.models import WedstrijdLocatie
 from Mailer.models import MailQueue
@@ -25,6 +26,7 @@ import io
 IMPORT_COMMAND = 'import_crm_json'
 OPTION_DRY_RUN = '--dryrun'
 OPTION_SIM = '--sim_now=2020-07-01'
+OPTION_VORIGE = '--vorige='
 
 TESTFILES_PATH = './ImportCRM/test-files/'
 
@@ -118,7 +120,7 @@ class TestImportCRMImport(E2EHelpers, TestCase):
         # self.assertEqual(f2.getvalue(), '')
 
     def test_import(self):
-        with self.assert_max_queries(158):
+        with self.assert_max_queries(177):
             f1, f2 = self.run_management_command(IMPORT_COMMAND,
                                                  TESTFILE_03_BASE_DATA,
                                                  OPTION_SIM)
@@ -133,6 +135,8 @@ class TestImportCRMImport(E2EHelpers, TestCase):
         self.assertTrue("[INFO] Lid 100001 e-mail: 'rdetester@gmail.not' --> ''" in f2.getvalue())
         self.assertTrue("[INFO] Lid 100001 geslacht: M --> V" in f2.getvalue())
         self.assertTrue("[INFO] Lid 100001 geboortedatum: 1972-03-04 --> 2000-02-01" in f2.getvalue())
+        self.assertTrue("Tijdsduur per fase:" in f2.getvalue())
+        self.assertTrue("   leden: " in f2.getvalue())
         self.assertTrue("[INFO] Lid 100001: sinds_datum: 2010-11-12 --> 2000-01-01" in f2.getvalue())
         self.assertTrue("[INFO] Lid 100001: nieuwe speelsterkte 1990-01-01, Recurve, Recurve 1000" in f2.getvalue())
         self.assertTrue("[WARNING] Vereniging 1000 heeft geen KvK nummer" in f2.getvalue())
@@ -176,7 +180,7 @@ class TestImportCRMImport(E2EHelpers, TestCase):
 
     def test_extra_geo_structuur(self):
         # extra rayon/regio
-        with self.assert_max_queries(73):
+        with self.assert_max_queries(85):
             f1, f2 = self.run_management_command(IMPORT_COMMAND,
                                                  TESTFILE_06_BAD_RAYON_REGIO)
         self.assertTrue("[ERROR] Onbekend rayon {'rayon_number': 0, 'name': 'Rayon 0'}" in f1.getvalue())
@@ -210,7 +214,7 @@ class TestImportCRMImport(E2EHelpers, TestCase):
         locatie.save()
         locatie.verenigingen.add(ver)
 
-        with self.assert_max_queries(151):
+        with self.assert_max_queries(152):
             f1, f2 = self.run_management_command(IMPORT_COMMAND,
                                                  TESTFILE_08_VER_MUTATIES,
                                                  OPTION_SIM)
@@ -270,7 +274,7 @@ class TestImportCRMImport(E2EHelpers, TestCase):
         sporter = Sporter.objects.get(lid_nr=100025)
         self.assertEqual(sporter.wa_id, '90025')
 
-        with self.assert_max_queries(66):
+        with self.assert_max_queries(73):
             f1, f2 = self.run_management_command(IMPORT_COMMAND,
                                                  TESTFILE_09_LID_MUTATIES,
                                                  OPTION_SIM)
@@ -313,7 +317,7 @@ class TestImportCRMImport(E2EHelpers, TestCase):
         self.assertFalse(sporter.is_actief_lid)      # want: overleden
 
         # nog een keer hetzelfde commando geeft geen nieuwe log regels
-        with self.assert_max_queries(118):
+        with self.assert_max_queries(120):
             f1, f2 = self.run_management_command(IMPORT_COMMAND,
                                                  TESTFILE_09_LID_MUTATIES,
                                                  OPTION_SIM)
@@ -326,7 +330,7 @@ class TestImportCRMImport(E2EHelpers, TestCase):
         # andere leden hebben een toevoeging achter hun voornaam: "Tineke (Tini)" - niet over klagen
         # some ontbreekt er een haakje
         # import verwijderd dit
-        with self.assert_max_queries(84):
+        with self.assert_max_queries(87):
             f1, f2 = self.run_management_command(IMPORT_COMMAND,
                                                  TESTFILE_10_TOEVOEGING_NAAM,
                                                  OPTION_SIM)
@@ -339,7 +343,7 @@ class TestImportCRMImport(E2EHelpers, TestCase):
 
     def test_datum_zonder_eeuw(self):
         # sommige leden hebben een geboortedatum zonder eeuw
-        with self.assert_max_queries(78):
+        with self.assert_max_queries(87):
             f1, f2 = self.run_management_command(IMPORT_COMMAND,
                                                  TESTFILE_11_BAD_DATE,
                                                  OPTION_SIM)
@@ -361,7 +365,7 @@ class TestImportCRMImport(E2EHelpers, TestCase):
         # sommige leden worden niet geïmporteerd
         # geen (valide) geboortedatum
         # geen (valid) datum van lidmaatschap
-        with self.assert_max_queries(72):
+        with self.assert_max_queries(84):
             self.run_management_command(IMPORT_COMMAND,
                                         TESTFILE_12_MEMBER_INCOMPLETE_1,
                                         OPTION_SIM)
@@ -378,7 +382,7 @@ class TestImportCRMImport(E2EHelpers, TestCase):
                     regio=Regio.objects.get(pk=116))
         ver.save()
 
-        with self.assert_max_queries(92):
+        with self.assert_max_queries(105):
             f1, f2 = self.run_management_command(IMPORT_COMMAND,
                                                  TESTFILE_12_MEMBER_INCOMPLETE_1,
                                                  OPTION_SIM)
@@ -402,7 +406,7 @@ class TestImportCRMImport(E2EHelpers, TestCase):
                     is_actief_lid=False)
         sporter.save()
 
-        with self.assert_max_queries(74):
+        with self.assert_max_queries(86):
             f1, f2 = self.run_management_command(IMPORT_COMMAND,
                                                  TESTFILE_13_WIJZIG_GESLACHT_1,
                                                  OPTION_SIM)
@@ -445,7 +449,7 @@ class TestImportCRMImport(E2EHelpers, TestCase):
         self.assertTrue("[INFO] Lid 100001 voorkeuren: wedstrijd geslacht instelbaar gemaakt" in f2.getvalue())
 
         # nu weer de andere kant op (X --> M)
-        with self.assert_max_queries(70):
+        with self.assert_max_queries(78):
             f1, f2 = self.run_management_command(IMPORT_COMMAND,
                                                  TESTFILE_14_WIJZIG_GESLACHT_2,
                                                  OPTION_SIM)
@@ -456,7 +460,7 @@ class TestImportCRMImport(E2EHelpers, TestCase):
 
     def test_maak_secretaris(self):
         # een lid secretaris maken
-        with self.assert_max_queries(117):
+        with self.assert_max_queries(135):
             f1, f2 = self.run_management_command(IMPORT_COMMAND,
                                                  TESTFILE_14_WIJZIG_GESLACHT_2,
                                                  OPTION_SIM)
@@ -516,7 +520,7 @@ class TestImportCRMImport(E2EHelpers, TestCase):
     def test_club_1377(self):
         # een paar speciale import gevallen
 
-        with self.assert_max_queries(109):
+        with self.assert_max_queries(127):
             self.run_management_command(IMPORT_COMMAND,
                                         TESTFILE_15_CLUB_1377,
                                         OPTION_SIM)
@@ -540,7 +544,7 @@ class TestImportCRMImport(E2EHelpers, TestCase):
         ver.geen_wedstrijden = False
         ver.save()
 
-        with self.assert_max_queries(28):
+        with self.assert_max_queries(29):
             f1, f2 = self.run_management_command(IMPORT_COMMAND,
                                                  TESTFILE_15_CLUB_1377,
                                                  OPTION_SIM)
@@ -572,7 +576,7 @@ class TestImportCRMImport(E2EHelpers, TestCase):
         self.assertTrue("[INFO] Secretaris 100024 van vereniging 2000 is gekoppeld aan SEC functie" in f2.getvalue())
 
         # probeer 100024 te verwijderen
-        with self.assert_max_queries(91):
+        with self.assert_max_queries(95):
             f1, f2 = self.run_management_command(IMPORT_COMMAND,
                                                  TESTFILE_16_VERWIJDER_LID,
                                                  OPTION_SIM)
@@ -594,7 +598,7 @@ class TestImportCRMImport(E2EHelpers, TestCase):
                     datum="2018-01-01").save()
 
         # probeer 100024 te verwijderen
-        with self.assert_max_queries(31):
+        with self.assert_max_queries(33):
             f1, f2 = self.run_management_command(IMPORT_COMMAND,
                                                  TESTFILE_16_VERWIJDER_LID,
                                                  OPTION_SIM)
@@ -602,14 +606,14 @@ class TestImportCRMImport(E2EHelpers, TestCase):
 
     def test_import_crm_dryrun(self):
         # dryrun
-        with self.assert_max_queries(60):
+        with self.assert_max_queries(68):
             f1, f2 = self.run_management_command(IMPORT_COMMAND,
                                                  TESTFILE_08_VER_MUTATIES,
                                                  OPTION_SIM,
                                                  OPTION_DRY_RUN)
         self.assertTrue("DRY RUN" in f2.getvalue())
 
-        with self.assert_max_queries(120):
+        with self.assert_max_queries(131):
             self.run_management_command(IMPORT_COMMAND,
                                         TESTFILE_03_BASE_DATA,
                                         OPTION_SIM)
@@ -628,7 +632,7 @@ class TestImportCRMImport(E2EHelpers, TestCase):
                                         TESTFILE_09_LID_MUTATIES,
                                         OPTION_SIM,
                                         OPTION_DRY_RUN)
-        with self.assert_max_queries(41):
+        with self.assert_max_queries(45):
             self.run_management_command(IMPORT_COMMAND,
                                         TESTFILE_14_WIJZIG_GESLACHT_2,
                                         OPTION_SIM,
@@ -648,7 +652,7 @@ class TestImportCRMImport(E2EHelpers, TestCase):
 
     def test_incomplete_data(self):
         # test import met een incomplete entry van een nieuw lid
-        with self.assert_max_queries(88):
+        with self.assert_max_queries(91):
             f1, f2 = self.run_management_command(IMPORT_COMMAND,
                                                  TESTFILE_17_MEMBER_INCOMPLETE_2,
                                                  OPTION_SIM)
@@ -658,6 +662,7 @@ class TestImportCRMImport(E2EHelpers, TestCase):
         self.assertTrue("[ERROR] Lid 100007 heeft geen valide geboortedatum" in f1.getvalue())
         self.assertTrue("[ERROR] Lid 100008 heeft geen valide lidmaatschapsdatum" in f1.getvalue())
         self.assertTrue("[ERROR] Lid 100009 heeft geen voornaam of initials" in f1.getvalue())
+        self.assertTrue("[ERROR] Lid 100008 mist verplichte sleutels: wa_id" in f1.getvalue())
 
     def test_bad_sim_now(self):
         # puur voor de coverage
@@ -901,5 +906,69 @@ class TestImportCRMImport(E2EHelpers, TestCase):
 
         self.assertEqual(0, Vereniging.objects.filter(ver_nr=ver_nr).count())
 
+    def test_delta(self):
+        # volledige import als basis
+        self.run_management_command(IMPORT_COMMAND,
+                                    TESTFILE_03_BASE_DATA,
+                                    OPTION_SIM)
+
+        # alleen de verschillen met de vorige import verwerken
+        with self.assert_max_queries(75):
+            f1, f2 = self.run_management_command(IMPORT_COMMAND,
+                                                 TESTFILE_09_LID_MUTATIES,
+                                                 OPTION_SIM,
+                                                 OPTION_VORIGE + TESTFILE_03_BASE_DATA)
+        # print('f1:', f1.getvalue())
+        # print('f2:', f2.getvalue())
+        self.assertTrue("[INFO] Delta import: " in f2.getvalue())
+        self.assertTrue("[ERROR] Lid 100001 heeft geen valide geboortedatum" in f1.getvalue())
+        self.assertTrue("[INFO] Lid 100001: is_actief_lid: ja --> nee" in f2.getvalue())
+        self.assertTrue("[INFO] Lid 100098: adres_code '1111AA111' --> '1115AB5'" in f2.getvalue())
+        self.assertTrue("[INFO] Lid 100024: is_erelid False --> True" in f2.getvalue())
+
+        sporter = Sporter.objects.get(lid_nr=100098)
+        self.assertEqual(sporter.adres_code, '1115AB5')
+
+        # geen verschillen
+        f1, f2 = self.run_management_command(IMPORT_COMMAND,
+                                             TESTFILE_09_LID_MUTATIES,
+                                             OPTION_SIM,
+                                             OPTION_VORIGE + TESTFILE_09_LID_MUTATIES)
+        # print('f1:', f1.getvalue())
+        # print('f2:', f2.getvalue())
+        self.assertTrue("[INFO] Delta import: 0 van de " in f2.getvalue())
+        self.assertTrue("[INFO] Delta import: 0 verenigingen gewijzigd" in f2.getvalue())
+        self.assertFalse("[INFO] Lid " in f2.getvalue())
+
+        # vorige import niet bruikbaar
+        f1, f2 = self.run_management_command(IMPORT_COMMAND,
+                                             TESTFILE_09_LID_MUTATIES,
+                                             OPTION_SIM,
+                                             OPTION_VORIGE + TESTFILE_NOT_EXISTING)
+        self.assertTrue("[WARNING] Vorige import is niet bruikbaar" in f2.getvalue())
+        self.assertFalse("[INFO] Delta import: " in f2.getvalue())
+
+        # limieten
+        limieten = ImportLimieten.objects.first()
+        limieten.use_limits = True
+        limieten.max_member_changes = 1
+        limieten.max_club_changes = 1
+        limieten.save()
+
+        f1, f2 = self.run_management_command(IMPORT_COMMAND,
+                                             TESTFILE_03_BASE_DATA,
+                                             OPTION_SIM,
+                                             OPTION_VORIGE + TESTFILE_09_LID_MUTATIES,
+                                             report_exit_code=False)
+        # print('f1:', f1.getvalue())
+        # print('f2:', f2.getvalue())
+        self.assertTrue("[ERROR] Te veel gewijzigde leden: " in f1.getvalue())
+        self.assertTrue("[ERROR] Te veel gewijzigde verenigingen: " in f1.getvalue())
+        self.assertTrue("[TEST] Management command raised SystemExit(2)" in f1.getvalue())
+
+        # de import is niet uitgevoerd
+        sporter = Sporter.objects.get(lid_nr=100098)
+        self.assertEqual(sporter.adres_code, '1115AB5')
+
 
 # end of file
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+
+#  Copyright (c) 2026 Ramon van der Winkel.
+#  All rights reserved.
+#  Licensed under BSD-3-Clause-Clear. See LICENSE file for details.
+
+from django.test import TestCase
+from ImportCRM.operations import JsonStroomLezer
+import tempfile
+import json
+import os
+
+
+TESTFILES_PATH = './ImportCRM/test-files/'
+
+TESTFILE_03_BASE_DATA = TESTFILES_PATH + 'testfile_03.json'
+TESTFILE_09_LID_MUTATIES = TESTFILES_PATH + 'testfile_09.json'
+
+
+class TestImportCRMJsonStroom(TestCase):
+
+    """ tests voor de ImportCRM applicatie, lezen van een JSON bestand in blokken """
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _maak_bestand(self, inhoud):
+        fname = os.path.join(self.tmp_dir.name, 'test.json')
+        with open(fname, 'w') as f_handle:
+            f_handle.write(inhoud)
+        return fname
+
+    @staticmethod
+    def _lees_alles(fname, blok_grootte):
+        data = dict()
+        lezer = JsonStroomLezer(fname, blok_grootte=blok_grootte)
+        for sleutel in lezer.sleutels():
+            if sleutel in ('clubs', 'members'):
+                data[sleutel] = list(lezer.lijst())
+            else:
+                data[sleutel] = lezer.waarde()
+        # for
+        return data
+
+    def test_gelijk_aan_json_load(self):
+        for fname in (TESTFILE_03_BASE_DATA, TESTFILE_09_LID_MUTATIES):
+            with open(fname, encoding='raw_unicode_escape') as f_handle:
+                verwacht = json.load(f_handle)
+
+            # kleine blokken, zodat waarden over de blokgrens heen lopen
+            for blok_grootte in (1, 7, 65536):
+                self.assertEqual(self._lees_alles(fname, blok_grootte), verwacht)
+            # for
+
+            lezer = JsonStroomLezer(fname, blok_grootte=5)
+            self.assertEqual(list(lezer.lijst_van('members')), verwacht['members'])
+        # for
+
+    def test_overslaan(self):
+        fname = self._maak_bestand('{"a": [1, {"b": [2, 3]}], "getal": 12.5e+3, "leeg": [], "c": "\\u00e9"}')
+        for blok_grootte in (1, 2, 3):
+            lezer = JsonStroomLezer(fname, blok_grootte=blok_grootte)
+            gelezen = dict()
+            for sleutel in lezer.sleutels():
+                # de waarde van 'a' wordt niet gelezen en dus overgeslagen
+                if sleutel == 'getal':
+                    gelezen[sleutel] = lezer.waarde()
+                elif sleutel == 'leeg':
+                    gelezen[sleutel] = list(lezer.lijst())
+                elif sleutel == 'c':
+                    gelezen[sleutel] = lezer.waarde()
+            # for
+            self.assertEqual(gelezen, {'getal': 12500.0, 'leeg': [], 'c': 'é'})
+        # for
+
+        fname = self._maak_bestand(' {} ')
+        self.assertEqual(list(JsonStroomLezer(fname).sleutels()), [])
+        self.assertEqual(list(JsonStroomLezer(fname).lijst_van('members')), [])
+
+    def test_fouten(self):
+        for inhoud in ('', '[1]', '{"a": 1} x', '{"a": [1, 2}', '{"a": 1,}', '{1: 2}', '{"a": [1 2]}', '{"a": tru}'):
+            fname = self._maak_bestand(inhoud)
+            with self.assertRaises(json.JSONDecodeError):
+                self._lees_alles(fname, 2)
+        # for
+
+        # geen lijst
+        fname = self._maak_bestand('{"members": 1}')
+        with self.assertRaises(json.JSONDecodeError):
+            list(JsonStroomLezer(fname).lijst_van('members'))
+
+        with self.assertRaises(IOError):
+            self._lees_alles(os.path.join(self.tmp_dir.name, 'bestaat_niet.json'), 10)
+
+
+# end of file
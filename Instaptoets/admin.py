@@ -5,7 +5,8 @@
 #  Licensed under BSD-3-Clause-Clear. See LICENSE file for details.
 
 from django.contrib import admin
-from Instaptoets.models import Categorie, Vraag, ToetsAntwoord, Instaptoets, Quiz, Uitdaging
+from Instaptoets.models import (Categorie, Vraag, ToetsAntwoord, Instaptoets, Quiz, Uitdaging,
+                                VraagStatistiek, ToetsStatistiek)
 
 
 class InstaptoetsAdmin(admin.ModelAdmin):
@@ -29,5 +30,7 @@ admin.site.register(ToetsAntwoord)
 admin.site.register(Instaptoets, InstaptoetsAdmin)
 admin.site.register(Quiz)
 admin.site.register(Uitdaging)
+admin.site.register(VraagStatistiek)
+admin.site.register(ToetsStatistiek)
 
 # end of file
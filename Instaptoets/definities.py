@@ -1,9 +1,11 @@
 # -*- coding: utf-8 -*-
 
-#  Copyright (c) 2024 Ramon van der Winkel.
+#  Copyright (c) 2024-2026 Ramon van der Winkel.
 #  All rights reserved.
 #  Licensed under BSD-3-Clause-Clear. See LICENSE file for details.
 
+# er is maar 1 ToetsStatistiek record, met deze vaste primary key
+TOETS_STATISTIEK_PK = 1
 
 
 # end of file
@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
 
-#  Copyright (c) 2025 Ramon van der Winkel.
+#  Copyright (c) 2025-2026 Ramon van der Winkel.
 #  All rights reserved.
 #  Licensed under BSD-3-Clause-Clear. See LICENSE file for details.
 
@@ -8,6 +8,7 @@
 
 from django.core.management.base import BaseCommand
 from Instaptoets.models import Instaptoets
+from Instaptoets.operations import toets_statistiek_gestart
 from Sporter.models import Sporter
 import datetime
 
@@ -44,6 +45,8 @@ class Command(BaseCommand):
                 self.stderr.write('[ERROR] Datum moet in de afgelopen 365 dagen liggen')
 
     def _zet_fake_gehaald(self):
+        is_eerste_toets = not Instaptoets.objects.filter(sporter=self.sporter).exists()
+
         instaptoets = Instaptoets(
                         afgerond=self.datum,
                         sporter=self.sporter,
@@ -53,6 +56,8 @@ class Command(BaseCommand):
         instaptoets.opgestart = self.datum
         instaptoets.save(update_fields=['opgestart'])
 
+        toets_statistiek_gestart(is_eerste_toets)
+
         self.stdout.write('[INFO] Instaptoets afgerond + geslaagd voor %s' % self.sporter)
 
     def handle(self, *args, **options):
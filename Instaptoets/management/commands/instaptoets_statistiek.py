@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+
+#  Copyright (c) 2026 Ramon van der Winkel.
+#  All rights reserved.
+#  Licensed under BSD-3-Clause-Clear. See LICENSE file for details.
+
+""" Statistiek van de instaptoets opnieuw bepalen vanuit alle gemaakte toetsen """
+
+from django.core.management.base import BaseCommand
+from Instaptoets.definities import TOETS_STATISTIEK_PK
+from Instaptoets.models import ToetsStatistiek
+from Instaptoets.operations import bepaal_instaptoets_statistiek
+
+
+class Command(BaseCommand):
+    help = "Bepaal de statistiek van de instaptoets opnieuw"
+
+    def handle(self, *args, **options):
+        aantal_vragen = bepaal_instaptoets_statistiek()
+
+        stat = ToetsStatistiek.objects.get(pk=TOETS_STATISTIEK_PK)
+        self.stdout.write('[INFO] Statistiek bepaald voor %s vragen' % aantal_vragen)
+        self.stdout.write('[INFO] %s toetsen gestart door %s sporters; %s afgerond, waarvan %s geslaagd' % (
+                            stat.aantal_gestart, stat.aantal_unieke_sporters,
+                            stat.aantal_afgerond, stat.aantal_geslaagd))
+
+
+# end of file
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+
+#  Copyright (c) 2026 Ramon van der Winkel.
+#  All rights reserved.
+#  Licensed under BSD-3-Clause-Clear. See LICENSE file for details.
+
+from django.db import migrations, models
+from django.db.models import Count, Sum, Q
+
+TOETS_STATISTIEK_PK = 1         # zie Instaptoets.definities
+
+
+def vul_statistiek(apps, _):
+    """ bepaal de statistiek eenmalig vanuit de al gemaakte toetsen
+        daarna wordt de statistiek bijgewerkt bij het starten en afronden van een toets
+    """
+
+    # haal de juiste klassen op
+    instaptoets_klas = apps.get_model('Instaptoets', 'Instaptoets')
+    antwoord_klas = apps.get_model('Instaptoets', 'ToetsAntwoord')
+    vraag_stat_klas = apps.get_model('Instaptoets', 'VraagStatistiek')
+    toets_stat_klas = apps.get_model('Instaptoets', 'ToetsStatistiek')
+
+    # tellingen per vraag, over de afgeronde toetsen
+    pk2stat = dict()        # [vraag.pk] = VraagStatistiek
+    for tel in (antwoord_klas
+                .objects
+                .filter(instaptoets__is_afgerond=True,
+                        antwoord__in=('A', 'B', 'C', 'D'))
+                .values('vraag__pk', 'vraag__juiste_antwoord', 'antwoord')
+                .annotate(aantal=Count('pk'))
+                .order_by()):
+        vraag_pk = tel['vraag__pk']
+        try:
+            stat = pk2stat[vraag_pk]
+        except KeyError:
+            stat = pk2stat[vraag_pk] = vraag_stat_klas(vraag_id=vraag_pk)
+
+        aantal = tel['aantal']
+        stat.aantal_gesteld += aantal
+        if tel['antwoord'] == tel['vraag__juiste_antwoord']:
+            stat.aantal_goed += aantal
+
+        veld = 'aantal_' + tel['antwoord'].lower()
+        setattr(stat, veld, getattr(stat, veld) + aantal)
+    # for
+
+    vraag_stat_klas.objects.bulk_create(pk2stat.values())
+
+    # tellingen over alle toetsen
+    afgerond = Q(is_afgerond=True) & ~Q(aantal_goed=0)
+    totalen = instaptoets_klas.objects.aggregate(
+                                        gestart=Count('pk'),
+                                        unieke_sporters=Count('sporter', distinct=True),
+                                        afgerond=Count('pk', filter=afgerond),
+                                        geslaagd=Count('pk', filter=afgerond & Q(geslaagd=True)),
+                                        som_goed=Sum('aantal_goed', filter=afgerond, default=0))
+
+    toets_stat_klas.objects.create(
+                            pk=TOETS_STATISTIEK_PK,
+                            aantal_gestart=totalen['gestart'],
+                            aantal_unieke_sporters=totalen['unieke_sporters'],
+                            aantal_afgerond=totalen['afgerond'],
+                            aantal_geslaagd=totalen['geslaagd'],
+                            som_aantal_goed=totalen['som_goed'])
+
+
+class Migration(migrations.Migration):
+
+    """ Migratie class voor dit deel van de applicatie """
+
+    # volgorde afdwingen
+    dependencies = [
+        ('Instaptoets', 'm0005_squashed'),
+    ]
+
+    # migratie functies
+    operations = [
+        migrations.CreateModel(
+            name='ToetsStatistiek',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('aantal_gestart', models.PositiveIntegerField(default=0)),
+                ('aantal_unieke_sporters', models.PositiveIntegerField(default=0)),
+                ('aantal_afgerond', models.PositiveIntegerField(default=0)),
+                ('aantal_geslaagd', models.PositiveIntegerField(default=0)),
+                ('som_aantal_goed', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Toets statistiek',
+                'verbose_name_plural': 'Toets statistiek',
+            },
+        ),
+        migrations.CreateModel(
+            name='VraagStatistiek',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('aantal_gesteld', models.PositiveIntegerField(default=0)),
+                ('aantal_goed', models.PositiveIntegerField(default=0)),
+                ('aantal_a', models.PositiveIntegerField(default=0)),
+                ('aantal_b', models.PositiveIntegerField(default=0)),
+                ('aantal_c', models.PositiveIntegerField(default=0)),
+                ('aantal_d', models.PositiveIntegerField(default=0)),
+                ('vraag', models.OneToOneField(on_delete=models.deletion.CASCADE, related_name='statistiek',
+                                               to='Instaptoets.vraag')),
+            ],
+            options={
+                'verbose_name': 'Vraag statistiek',
+                'verbose_name_plural': 'Vraag statistieken',
+            },
+        ),
+        migrations.RunPython(vul_statistiek, reverse_code=migrations.RunPython.noop),
+    ]
+
+# end of file
@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
 
-#  Copyright (c) 2024-2025 Ramon van der Winkel.
+#  Copyright (c) 2024-2026 Ramon van der Winkel.
 #  All rights reserved.
 #  Licensed under BSD-3-Clause-Clear. See LICENSE file for details.
 
@@ -179,6 +179,64 @@ class Quiz(models.Model):
     objects = models.Manager()      # for the editor only
 
 
+class VraagStatistiek(models.Model):
+
+    """ tellingen van de antwoorden op een vraag in de afgeronde instaptoetsen
+        wordt bijgewerkt zodra een toets afgerond is (zie controleer_toets)
+    """
+
+    # over welke vraag gaat dit?
+    vraag = models.OneToOneField(Vraag, on_delete=models.CASCADE, related_name='statistiek')
+
+    # hoe vaak is de vraag beantwoord en hoe vaak was dat goed?
+    aantal_gesteld = models.PositiveIntegerField(default=0)
+    aantal_goed = models.PositiveIntegerField(default=0)
+
+    # hoe vaak is elk van de antwoorden gekozen?
+    aantal_a = models.PositiveIntegerField(default=0)
+    aantal_b = models.PositiveIntegerField(default=0)
+    aantal_c = models.PositiveIntegerField(default=0)
+    aantal_d = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        """ Lever een tekstuele beschrijving van een database record, voor de admin interface """
+        return "[%s] %s/%s goed" % (self.vraag.pk, self.aantal_goed, self.aantal_gesteld)
+
+    class Meta:
+        """ meta data voor de admin interface """
+        verbose_name = "Vraag statistiek"
+        verbose_name_plural = "Vraag statistieken"
+
+    objects = models.Manager()      # for the editor only
+
+
+class ToetsStatistiek(models.Model):
+
+    """ tellingen over alle instaptoetsen samen (maar 1 record)
+        wordt bijgewerkt bij het starten en afronden van een toets
+    """
+
+    # aantal opgestarte toetsen en het aantal verschillende sporters
+    aantal_gestart = models.PositiveIntegerField(default=0)
+    aantal_unieke_sporters = models.PositiveIntegerField(default=0)
+
+    # afgeronde toetsen (met minimaal 1 vraag goed)
+    aantal_afgerond = models.PositiveIntegerField(default=0)
+    aantal_geslaagd = models.PositiveIntegerField(default=0)
+    som_aantal_goed = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        """ Lever een tekstuele beschrijving van een database record, voor de admin interface """
+        return "%s gestart, %s afgerond" % (self.aantal_gestart, self.aantal_afgerond)
+
+    class Meta:
+        """ meta data voor de admin interface """
+        verbose_name = "Toets statistiek"
+        verbose_name_plural = "Toets statistiek"
+
+    objects = models.Manager()      # for the editor only
+
+
 class Uitdaging(models.Model):
 
     """ Uitdaging van de week/maand """
@@ -1,12 +1,15 @@
 # -*- coding: utf-8 -*-
 
-#  Copyright (c) 2024-2025 Ramon van der Winkel.
+#  Copyright (c) 2024-2026 Ramon van der Winkel.
 #  All rights reserved.
 #  Licensed under BSD-3-Clause-Clear. See LICENSE file for details.
 
 from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Sum, Q, F
 from django.utils import timezone
-from Instaptoets.models import Instaptoets, Vraag, ToetsAntwoord
+from Instaptoets.definities import TOETS_STATISTIEK_PK
+from Instaptoets.models import Instaptoets, Vraag, ToetsAntwoord, VraagStatistiek, ToetsStatistiek
 from Logboek.models import schrijf_in_logboek
 from Sporter.models import Sporter
 import datetime
@@ -154,9 +157,123 @@ def vind_toets_prioriteer_geslaagd(sporter: Sporter) -> Instaptoets | None:
     return vind_toets(sporter)
 
 
+def bepaal_instaptoets_statistiek():
+    """ bepaal alle tellingen van de statistiek opnieuw vanuit de toetsen
+        de statistiek wordt eenmalig gevuld door migratie m0006 en daarna bijgehouden bij het starten
+        en afronden van een toets; dit is alleen nodig om de tellingen te herstellen (zie instaptoets_statistiek)
+    """
+    with transaction.atomic():
+        VraagStatistiek.objects.all().delete()
+        ToetsStatistiek.objects.all().delete()
+
+        # tellingen per vraag, over de afgeronde toetsen
+        pk2stat = dict()        # [vraag.pk] = VraagStatistiek
+        for tel in (ToetsAntwoord
+                    .objects
+                    .filter(instaptoets__is_afgerond=True,
+                            antwoord__in=('A', 'B', 'C', 'D'))
+                    .values('vraag__pk', 'vraag__juiste_antwoord', 'antwoord')
+                    .annotate(aantal=Count('pk'))
+                    .order_by()):
+            vraag_pk = tel['vraag__pk']
+            try:
+                stat = pk2stat[vraag_pk]
+            except KeyError:
+                stat = pk2stat[vraag_pk] = VraagStatistiek(vraag_id=vraag_pk)
+
+            aantal = tel['aantal']
+            stat.aantal_gesteld += aantal
+            if tel['antwoord'] == tel['vraag__juiste_antwoord']:
+                stat.aantal_goed += aantal
+
+            veld = 'aantal_' + tel['antwoord'].lower()
+            setattr(stat, veld, getattr(stat, veld) + aantal)
+        # for
+
+        VraagStatistiek.objects.bulk_create(pk2stat.values())
+
+        # tellingen over alle toetsen
+        afgerond = Q(is_afgerond=True) & ~Q(aantal_goed=0)
+        totalen = Instaptoets.objects.aggregate(
+                                        gestart=Count('pk'),
+                                        unieke_sporters=Count('sporter', distinct=True),
+                                        afgerond=Count('pk', filter=afgerond),
+                                        geslaagd=Count('pk', filter=afgerond & Q(geslaagd=True)),
+                                        som_goed=Sum('aantal_goed', filter=afgerond, default=0))
+
+        ToetsStatistiek.objects.create(
+                                pk=TOETS_STATISTIEK_PK,
+                                aantal_gestart=totalen['gestart'],
+                                aantal_unieke_sporters=totalen['unieke_sporters'],
+                                aantal_afgerond=totalen['afgerond'],
+                                aantal_geslaagd=totalen['geslaagd'],
+                                som_aantal_goed=totalen['som_goed'])
+
+    return len(pk2stat)
+
+
+def _verhoog_toets_statistiek(**verhoging):
+    """ verhoog de tellers in het ToetsStatistiek record """
+    updates = {veld: F(veld) + aantal for veld, aantal in verhoging.items()}
+    if ToetsStatistiek.objects.filter(pk=TOETS_STATISTIEK_PK).update(**updates) == 0:
+        # record is verwijderd (via de admin): begin opnieuw bij nul
+        # de tellingen kunnen hersteld worden met het management command instaptoets_statistiek
+        ToetsStatistiek.objects.get_or_create(pk=TOETS_STATISTIEK_PK)
+        ToetsStatistiek.objects.filter(pk=TOETS_STATISTIEK_PK).update(**updates)
+
+
+def toets_statistiek_gestart(is_eerste_toets: bool):
+    """ werk de statistiek bij nadat een nieuwe toets aangemaakt is
+        is_eerste_toets: True als dit de eerste toets van de sporter is
+    """
+    _verhoog_toets_statistiek(aantal_gestart=1,
+                              aantal_unieke_sporters=1 if is_eerste_toets else 0)
+
+
+def _toets_statistiek_afgerond(toets: Instaptoets, antwoorden):
+    """ werk de statistiek bij met de uitslag van een zojuist afgeronde toets """
+
+    if toets.aantal_goed > 0:
+        _verhoog_toets_statistiek(aantal_afgerond=1,
+                                  aantal_geslaagd=1 if toets.geslaagd else 0,
+                                  som_aantal_goed=toets.aantal_goed)
+
+    # groepeer de vragen op gegeven antwoord, zodat er maximaal 8 updates nodig zijn
+    groepen = dict()        # [(antwoord, is_goed)] = [vraag.pk, ...]
+    for antwoord in antwoorden:
+        if antwoord.antwoord in ('A', 'B', 'C', 'D'):
+            tup = (antwoord.antwoord, antwoord.antwoord == antwoord.vraag.juiste_antwoord)
+            try:
+                groepen[tup].append(antwoord.vraag.pk)
+            except KeyError:
+                groepen[tup] = [antwoord.vraag.pk]
+    # for
+
+    if len(groepen) == 0:
+        return
+
+    # zorg dat elke vraag een record heeft
+    vraag_pks = [pk for pks in groepen.values() for pk in pks]
+    VraagStatistiek.objects.bulk_create([VraagStatistiek(vraag_id=pk) for pk in vraag_pks],
+                                        ignore_conflicts=True)
+
+    for (keuze, is_goed), pks in groepen.items():
+        veld = 'aantal_' + keuze.lower()
+        updates = {
+            'aantal_gesteld': F('aantal_gesteld') + 1,
+            veld: F(veld) + 1,
+        }
+        if is_goed:
+            updates['aantal_goed'] = F('aantal_goed') + 1
+        VraagStatistiek.objects.filter(vraag__pk__in=pks).update(**updates)
+    # for
+
+
 def controleer_toets(toets: Instaptoets):
+    antwoorden = list(toets.vraag_antwoord.select_related('vraag').all())
+
     toets.aantal_goed = 0
-    for antwoord in toets.vraag_antwoord.select_related('vraag').all():
+    for antwoord in antwoorden:
         vraag = antwoord.vraag
         if antwoord.antwoord == vraag.juiste_antwoord:
             toets.aantal_goed += 1
@@ -166,7 +283,10 @@ def controleer_toets(toets: Instaptoets):
     # corner case: 1/2 = 50% < 70%
     perc_goed = (toets.aantal_goed * 100.0) / toets.aantal_vragen
     toets.geslaagd = perc_goed >= settings.INSTAPTOETS_AANTAL_GOED_EIS
-    toets.save(update_fields=['geslaagd', 'aantal_goed'])
+
+    with transaction.atomic():
+        toets.save(update_fields=['geslaagd', 'aantal_goed'])
+        _toets_statistiek_afgerond(toets, antwoorden)
 
     if toets.geslaagd:
         msg = '%s is geslaagd voor de instaptoets' % toets.sporter.lid_nr_en_volledige_naam()
@@ -1,13 +1,15 @@
 # -*- coding: utf-8 -*-
 
-#  Copyright (c) 2024-2025 Ramon van der Winkel.
+#  Copyright (c) 2024-2026 Ramon van der Winkel.
 #  All rights reserved.
 #  Licensed under BSD-3-Clause-Clear. See LICENSE file for details.
 
 from django.test import TestCase
 from Functie.models import Functie
 from Geo.models import Regio
-from Instaptoets.models import Categorie, Vraag, ToetsAntwoord, Instaptoets
+from Instaptoets.definities import TOETS_STATISTIEK_PK
+from Instaptoets.models import Categorie, Vraag, ToetsAntwoord, Instaptoets, VraagStatistiek, ToetsStatistiek
+from Instaptoets.operations import controleer_toets, toets_statistiek_gestart
 from Sporter.models import Sporter
 from TestHelpers.e2ehelpers import E2EHelpers
 from Vereniging.models import Vereniging
@@ -182,6 +184,112 @@ class TestInstaptoetsStats(E2EHelpers, TestCase):
         self.assert_html_ok(resp)
         self.assert_template_used(resp, ('instaptoets/stats-antwoorden.dtl', 'design/site_layout.dtl'))
 
+    def test_statistiek(self):
+        self.e2e_login_and_pass_otp(self.account_100000)
+        self.e2e_wissel_naar_functie(self.functie_mo)
+
+        # afgeronde toets met de antwoorden die in setUp aangemaakt zijn
+        toets = Instaptoets(
+                    sporter=self.sporter_100000,
+                    aantal_vragen=20,
+                    aantal_antwoorden=20,
+                    is_afgerond=True)
+        toets.save()
+        antwoorden = list(ToetsAntwoord.objects.select_related('vraag').order_by('pk')[:20])
+        toets.vraag_antwoord.set(antwoorden)
+
+        # toets die nog niet af is telt niet mee
+        toets2 = Instaptoets(
+                    sporter=self.sporter_100000,
+                    aantal_vragen=20,
+                    aantal_antwoorden=2)
+        toets2.save()
+        toets2.vraag_antwoord.set(ToetsAntwoord.objects.order_by('pk')[20:])
+
+        # de migratie heeft een leeg record aangemaakt; deze toetsen zijn buiten de statistiek om aangemaakt
+        stat = ToetsStatistiek.objects.get(pk=TOETS_STATISTIEK_PK)
+        self.assertEqual(stat.aantal_gestart, 0)
+
+        # vul de statistiek vanuit de bestaande toetsen
+        f1, f2 = self.run_management_command('instaptoets_statistiek')
+        self.assertEqual(f1.getvalue(), '')
+        self.assertTrue('[INFO] Statistiek bepaald voor 20 vragen' in f2.getvalue())
+
+        stat = ToetsStatistiek.objects.first()
+        self.assertEqual(stat.aantal_gestart, 2)
+        self.assertEqual(stat.aantal_unieke_sporters, 1)
+        self.assertEqual(stat.aantal_afgerond, 0)       # want aantal_goed=0
+
+        aantal_goed = len([antwoord for antwoord in antwoorden
+                           if antwoord.antwoord == antwoord.vraag.juiste_antwoord])
+        aantal_actief = len([antwoord for antwoord in antwoorden if antwoord.vraag.is_actief])    # wordt getoond
+        self.assertEqual(VraagStatistiek.objects.count(), 20)
+        vraag_stat = VraagStatistiek.objects.get(vraag=antwoorden[0].vraag)
+        self.assertEqual(vraag_stat.aantal_gesteld, 1)
+        self.assertEqual(vraag_stat.aantal_a, 1)
+
+        with self.assert_max_queries(20):
+            resp = self.client.get(self.url_stats)
+        self.assertEqual(resp.status_code, 200)     # 200 = OK
+        self.assert_html_ok(resp)
+        self.assertEqual(resp.context['antwoord_count'], aantal_actief)
+        self.assertEqual(resp.context['toets_gestart'], 2)
+        self.assertEqual(resp.context['toets_unieke_sporters'], 1)
+
+        # nog een toets afronden; de statistiek wordt direct bijgewerkt
+        toets3 = Instaptoets(
+                    sporter=self.sporter_100000,
+                    aantal_vragen=20,
+                    aantal_antwoorden=20,
+                    is_afgerond=True)
+        toets3.save()
+        nieuw = [ToetsAntwoord(vraag=antwoord.vraag, antwoord=antwoord.vraag.juiste_antwoord)
+                 for antwoord in antwoorden]
+        ToetsAntwoord.objects.bulk_create(nieuw)
+        toets3.vraag_antwoord.set(nieuw)
+        controleer_toets(toets3)
+        self.assertEqual(toets3.aantal_goed, 20)
+        self.assertTrue(toets3.geslaagd)
+
+        stat.refresh_from_db()
+        self.assertEqual(stat.aantal_afgerond, 1)
+        self.assertEqual(stat.aantal_geslaagd, 1)
+        self.assertEqual(stat.som_aantal_goed, 20)
+        self.assertEqual(sum(VraagStatistiek.objects.values_list('aantal_goed', flat=True)), aantal_goed + 20)
+
+        resp = self.client.get(self.url_stats)
+        self.assertEqual(resp.status_code, 200)     # 200 = OK
+        self.assertEqual(resp.context['antwoord_count'], 2 * aantal_actief)
+        self.assertEqual(resp.context['toets_afgerond'], 1)
+        self.assertEqual(resp.context['gemiddeld_goed'], 20)
+
+        # opnieuw bepalen geeft dezelfde tellingen
+        tellingen = list(VraagStatistiek.objects.order_by('vraag__pk').values_list('vraag__pk', 'aantal_gesteld',
+                                                                                    'aantal_goed', 'aantal_a',
+                                                                                    'aantal_b', 'aantal_c', 'aantal_d'))
+        self.run_management_command('instaptoets_statistiek')
+        self.assertEqual(tellingen,
+                         list(VraagStatistiek.objects.order_by('vraag__pk').values_list('vraag__pk', 'aantal_gesteld',
+                                                                                         'aantal_goed', 'aantal_a',
+                                                                                         'aantal_b', 'aantal_c',
+                                                                                         'aantal_d')))
+        stat = ToetsStatistiek.objects.get(pk=TOETS_STATISTIEK_PK)
+        self.assertEqual(stat.aantal_afgerond, 1)
+        self.assertEqual(stat.som_aantal_goed, 20)
+        self.assertEqual(ToetsStatistiek.objects.count(), 1)
+
+        # verwijderd record wordt opnieuw aangemaakt, zonder alles opnieuw te bepalen
+        ToetsStatistiek.objects.all().delete()
+        resp = self.client.get(self.url_stats)
+        self.assertEqual(resp.status_code, 200)     # 200 = OK
+        self.assertEqual(resp.context['toets_gestart'], 0)
+
+        toets_statistiek_gestart(is_eerste_toets=False)
+        stat = ToetsStatistiek.objects.get(pk=TOETS_STATISTIEK_PK)
+        self.assertEqual(stat.aantal_gestart, 1)
+        self.assertEqual(stat.aantal_unieke_sporters, 0)
+        self.assertEqual(stat.aantal_afgerond, 0)
+
     def test_gezakt(self):
         self.e2e_login_and_pass_otp(self.account_100000)
         self.e2e_wissel_naar_functie(self.functie_mo)
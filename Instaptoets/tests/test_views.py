@@ -1,13 +1,13 @@
 # -*- coding: utf-8 -*-
 
-#  Copyright (c) 2024-2025 Ramon van der Winkel.
+#  Copyright (c) 2024-2026 Ramon van der Winkel.
 #  All rights reserved.
 #  Licensed under BSD-3-Clause-Clear. See LICENSE file for details.
 
 from django.test import TestCase, override_settings
 from django.utils import timezone
 from Geo.models import Regio
-from Instaptoets.models import Categorie, Instaptoets, Vraag
+from Instaptoets.models import Categorie, Instaptoets, Vraag, VraagStatistiek, ToetsStatistiek
 from Instaptoets.operations import selecteer_huidige_vraag
 from Sporter.models import Sporter
 from TestHelpers.e2ehelpers import E2EHelpers
@@ -390,6 +390,24 @@ class TestInstaptoetsViews(E2EHelpers, TestCase):
         self.assert_template_used(resp, ('instaptoets/toon-uitslag.dtl', 'design/site_layout.dtl'))
         self.assertContains(resp, 'Gefeliciteerd')
 
+        # controleer dat de statistiek bijgewerkt is
+        stat = ToetsStatistiek.objects.first()
+        self.assertTrue(str(stat) != '')
+        self.assertEqual(stat.aantal_gestart, 1)
+        self.assertEqual(stat.aantal_unieke_sporters, 1)
+        self.assertEqual(stat.aantal_afgerond, 1)
+        self.assertEqual(stat.aantal_geslaagd, 1)
+        toets = Instaptoets.objects.first()
+        self.assertEqual(stat.som_aantal_goed, toets.aantal_goed)
+
+        self.assertEqual(VraagStatistiek.objects.count(), 20)
+        for vraag_stat in VraagStatistiek.objects.select_related('vraag'):
+            self.assertTrue(str(vraag_stat) != '')
+            self.assertEqual(vraag_stat.aantal_gesteld, 1)
+            self.assertEqual(vraag_stat.aantal_a, 1)
+            self.assertEqual(vraag_stat.aantal_goed, 1 if vraag_stat.vraag.juiste_antwoord == 'A' else 0)
+        # for
+
     def test_operations(self):
         # corner cases
         self.e2e_login(self.account_100000)
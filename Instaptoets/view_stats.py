@@ -1,17 +1,17 @@
 # -*- coding: utf-8 -*-
 
-#  Copyright (c) 2024-2025 Ramon van der Winkel.
+#  Copyright (c) 2024-2026 Ramon van der Winkel.
 #  All rights reserved.
 #  Licensed under BSD-3-Clause-Clear. See LICENSE file for details.
 
 from django.urls import reverse
-from django.db.models import Sum
 from django.shortcuts import redirect
 from django.views.generic import TemplateView
 from django.contrib.auth.mixins import UserPassesTestMixin
 from Functie.definities import Rol
 from Functie.rol import rol_get_huidige, rol_get_beschrijving
-from Instaptoets.models import Vraag, ToetsAntwoord, Instaptoets
+from Instaptoets.definities import TOETS_STATISTIEK_PK
+from Instaptoets.models import Vraag, Instaptoets, VraagStatistiek, ToetsStatistiek
 from Instaptoets.operations import instaptoets_is_beschikbaar
 from types import SimpleNamespace
 
@@ -41,28 +41,17 @@ class StatsInstaptoetsView(UserPassesTestMixin, TemplateView):
         # gebruiker moet ingelogd zijn, geen gast zijn en rol Sporter gekozen hebben
         return rol_get_huidige(self.request) == Rol.ROL_MO
 
-    def _get_stats_vragen(self):
-        count_vraag_antwoord = dict()       # [vraag.pk][antwoord] = int
+    @staticmethod
+    def _get_stats_vragen():
+        # de tellingen worden bijgehouden in VraagStatistiek (zie controleer_toets)
         antwoord_count = 0
 
-        for antwoord in ToetsAntwoord.objects.filter(antwoord__in=('A', 'B', 'C', 'D')).select_related('vraag').all():
-            antwoord_count += 1
-            try:
-                count_antwoorden = count_vraag_antwoord[antwoord.vraag.pk]
-            except KeyError:
-                count_vraag_antwoord[antwoord.vraag.pk] = count_antwoorden = dict()
-
-            try:
-                count_antwoorden[antwoord.antwoord] += 1
-            except KeyError:
-                count_antwoorden[antwoord.antwoord] = 1
-        # for
-
         vragen = (Vraag
                   .objects
                   .exclude(is_actief=False)
                   .exclude(gebruik_voor_toets=False, gebruik_voor_quiz=False)   # niet voor de toets, noch voor de quiz
-                  .select_related('categorie')
+                  .select_related('categorie',
+                                  'statistiek')
                   .order_by('categorie',
                             'pk'))
 
@@ -79,23 +68,25 @@ class StatsInstaptoetsView(UserPassesTestMixin, TemplateView):
                 vraag.rows -= 1
 
             try:
-                count_antwoorden = count_vraag_antwoord[vraag.pk]
-            except KeyError:
+                stat = vraag.statistiek
+            except VraagStatistiek.DoesNotExist:
                 vraag.count_a = 0
                 vraag.count_b = 0
                 vraag.count_c = 0
                 vraag.count_d = 0
             else:
-                vraag.count_a = count_a = count_antwoorden.get('A', 0)
-                vraag.count_b = count_b = count_antwoorden.get('B', 0)
-                vraag.count_c = count_c = count_antwoorden.get('C', 0)
-                vraag.count_d = count_d = count_antwoorden.get('D', 0)
+                vraag.count_a = count_a = stat.aantal_a
+                vraag.count_b = count_b = stat.aantal_b
+                vraag.count_c = count_c = stat.aantal_c
+                vraag.count_d = count_d = stat.aantal_d
                 count_sum = count_a + count_b + count_c + count_d
-                count_sum /= 100.0
-                vraag.perc_a = "%.0f" % (count_a / count_sum)
-                vraag.perc_b = "%.0f" % (count_b / count_sum)
-                vraag.perc_c = "%.0f" % (count_c / count_sum)
-                vraag.perc_d = "%.0f" % (count_d / count_sum)
+                antwoord_count += count_sum
+                if count_sum > 0:
+                    count_sum /= 100.0
+                    vraag.perc_a = "%.0f" % (count_a / count_sum)
+                    vraag.perc_b = "%.0f" % (count_b / count_sum)
+                    vraag.perc_c = "%.0f" % (count_c / count_sum)
+                    vraag.perc_d = "%.0f" % (count_d / count_sum)
 
             vraag.kleur_a = ''
             vraag.kleur_b = ''
@@ -153,27 +144,29 @@ class StatsInstaptoetsView(UserPassesTestMixin, TemplateView):
 
         context['antwoord_count'], context['vragen'] = self._get_stats_vragen()
 
-        context['toets_gestart'] = gestart = Instaptoets.objects.count()
+        stat = ToetsStatistiek.objects.filter(pk=TOETS_STATISTIEK_PK).first()
+        if not stat:
+            # record is verwijderd en er is nog geen toets gestart
+            stat = ToetsStatistiek()
 
-        context['toets_unieke_sporters'] = Instaptoets.objects.distinct('sporter').count()
+        context['toets_gestart'] = gestart = stat.aantal_gestart
 
-        qset = Instaptoets.objects.exclude(aantal_goed=0).filter(is_afgerond=True)
+        context['toets_unieke_sporters'] = stat.aantal_unieke_sporters
 
-        context['toets_afgerond'] = afgerond = qset.count()
+        context['toets_afgerond'] = afgerond = stat.aantal_afgerond
         if gestart > 0:
             context['toets_afgerond_perc'] = "%.0f%%" % round((afgerond * 100.0) / gestart, 0)
         else:
             context['toets_afgerond_perc'] = "0%"
 
-        context['toets_geslaagd'] = geslaagd = qset.filter(geslaagd=True).count()
+        context['toets_geslaagd'] = geslaagd = stat.aantal_geslaagd
         if afgerond > 0:
             context['toets_geslaagd_perc'] = "%.0f%%" % round((geslaagd * 100.0) / afgerond, 0)
         else:
             context['toets_geslaagd_perc'] = "0%"
 
-        aantal_goed = qset.aggregate(Sum('aantal_goed'))['aantal_goed__sum']
         if afgerond > 0:
-            context['gemiddeld_goed'] = round(aantal_goed / afgerond, 0)
+            context['gemiddeld_goed'] = round(stat.som_aantal_goed / afgerond, 0)
         else:
             context['gemiddeld_goed'] = '?'
 
@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
 
-#  Copyright (c) 2024-2025 Ramon van der Winkel.
+#  Copyright (c) 2024-2026 Ramon van der Winkel.
 #  All rights reserved.
 #  Licensed under BSD-3-Clause-Clear. See LICENSE file for details.
 
@@ -16,7 +16,7 @@ from Functie.definities import Rol
 from Functie.rol import rol_get_huidige
 from Instaptoets.models import Instaptoets
 from Instaptoets.operations import (selecteer_toets_vragen, selecteer_huidige_vraag, toets_geldig, controleer_toets,
-                                    vind_toets, instaptoets_is_beschikbaar)
+                                    vind_toets, instaptoets_is_beschikbaar, toets_statistiek_gestart)
 from Sporter.models import get_sporter
 
 TEMPLATE_BEGIN_TOETS = 'instaptoets/begin-toets.dtl'
@@ -94,6 +94,7 @@ class BeginToetsView(UserPassesTestMixin, TemplateView):
         opnieuw = str(request.POST.get('opnieuw', 'N'))[:1]      # afkappen voor de veiligheid
 
         toets = vind_toets(self.sporter)
+        is_eerste_toets = toets is None
         if toets:
             if toets.is_afgerond:
                 if not toets.geslaagd:
@@ -114,6 +115,7 @@ class BeginToetsView(UserPassesTestMixin, TemplateView):
             # begin een nieuwe toets
             toets = Instaptoets(sporter=self.sporter)
             toets.save()
+            toets_statistiek_gestart(is_eerste_toets)
 
             selecteer_toets_vragen(toets)
 
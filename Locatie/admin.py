@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
 
-#  Copyright (c) 2020-2025 Ramon van der Winkel.
+#  Copyright (c) 2020-2026 Ramon van der Winkel.
 #  All rights reserved.
 #  Licensed under BSD-3-Clause-Clear. See LICENSE file for details.
 
@@ -70,7 +70,7 @@ class GeenReistijdFilter(admin.SimpleListFilter):
 
 class ReistijdAdmin(admin.ModelAdmin):
 
-    list_filter = (GeenReistijdFilter,)
+    list_filter = (GeenReistijdFilter, 'is_schatting')
 
 
 admin.site.register(WedstrijdLocatie, WedstrijdLocatieAdmin)
@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+
+#  Copyright (c) 2026 Ramon van der Winkel.
+#  All rights reserved.
+#  Licensed under BSD-3-Clause-Clear. See LICENSE file for details.
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    """ Migratie class voor dit deel van de applicatie """
+
+    # volgorde afdwingen
+    dependencies = [
+        ('Locatie', 'm0009_squashed'),
+    ]
+
+    # migratie functies
+    operations = [
+        migrations.AddField(
+            model_name='reistijd',
+            name='is_schatting',
+            field=models.BooleanField(default=False),
+        ),
+    ]
+
+# end of file
@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
 
-#  Copyright (c) 2020-2025 Ramon van der Winkel.
+#  Copyright (c) 2020-2026 Ramon van der Winkel.
 #  All rights reserved.
 #  Licensed under BSD-3-Clause-Clear. See LICENSE file for details.
 
@@ -181,6 +181,10 @@ class Reistijd(models.Model):
     # aankomsttijd 08:00 op een zaterdag of zondag
     reistijd_min = models.PositiveSmallIntegerField(default=0)   # max 32767
 
+    # is reistijd_min een schatting op basis van de afstand hemelsbreed?
+    # deze wordt later vervangen door de reistijd van de Routes API
+    is_schatting = models.BooleanField(default=False)
+
     # bijhouden hoe oud deze informatie is
     op_datum = models.DateField(default='2000-01-01')
 
@@ -1,36 +1,60 @@
 # -*- coding: utf-8 -*-
 
-#  Copyright (c) 2023-2025 Ramon van der Winkel.
+#  Copyright (c) 2023-2026 Ramon van der Winkel.
 #  All rights reserved.
 #  Licensed under BSD-3-Clause-Clear. See LICENSE file for details.
 
 # maak een account HWL van specifieke vereniging, vanaf de commandline
 
 from django.conf import settings
+from django.db.models import Q
 from django.utils import timezone
 from BasisTypen.definities import SCHEIDS_NIET
 from Locatie.models import WedstrijdLocatie, Reistijd
 from Sporter.models import Sporter
 from google.auth.api_key import Credentials
-from google.maps.routing_v2 import RoutesClient, RouteTravelMode, Units, RoutingPreference
+from google.maps.routing_v2 import (RoutesClient, RouteTravelMode, Units, RoutingPreference,
+                                    RouteMatrixElementCondition)
+from concurrent.futures import ThreadPoolExecutor
 import googlemaps
+import itertools
 import datetime
+import math
 
 TEST_TRIGGER = '##TEST##'
 
+# de Routes API accepteert maximaal 100 elementen (vertrekpunten x doelen) per matrix verzoek
+# bij routing_preference TRAFFIC_AWARE_OPTIMAL
+MATRIX_MAX_ELEMENTEN = 100
+
+# aantal matrix verzoeken dat tegelijk uitstaat
+MATRIX_PARALLEL = 4
+
+# schatting van de reistijd op basis van de afstand hemelsbreed
+SCHATTING_OMRIJ_FACTOR = 1.3        # wegen lopen niet in een rechte lijn
+SCHATTING_KM_PER_UUR = 70
+SCHATTING_EXTRA_MIN = 5             # wegrijden en parkeren
+AARDE_STRAAL_KM = 6371.0
+
 
 class ReistijdBepaler(object):
 
-    """ Bereken de reistijd tussen twee locaties met Google Maps Routing v2 """
+    """ Bereken de reistijd tussen twee locaties met Google Maps Routing v2
+
+        routes_client: optioneel, bijvoorbeeld een stub voor de tests
+                       moet compute_route_matrix(request, metadata) ondersteunen
+    """
 
-    def __init__(self, stdout, stderr, verzoeken_grens):
+    def __init__(self, stdout, stderr, verzoeken_grens, routes_client=None):
         self.stdout = stdout
         self.stderr = stderr
 
-        self._client: RoutesClient | None = None
+        self._client: RoutesClient | None = routes_client
         self._gmaps: googlemaps.Client | None = None
-        self.verzoeken_teller = 0
+        self.verzoeken_teller = 0           # aantal elementen; de Routes API rekent per element
         self.verzoeken_grens = verzoeken_grens
+        self.matrix_teller = 0
+        self._raster = settings.REISTIJD_RASTER_GRADEN
 
     def _connect_gmaps(self):
         """ Init de google maps library
@@ -106,62 +130,201 @@ class ReistijdBepaler(object):
         return lat, lon
 
     @staticmethod
-    def _lat_lon_to_api(lat, lon) -> dict:
+    def _lat_lon_float(lat, lon):
         if lat == lon == TEST_TRIGGER:
             raise SystemError('test')
 
+        # geeft ValueError als dit geen getallen zijn
+        return float(lat), float(lon)
+
+    def _op_raster(self, lat: float, lon: float) -> tuple:
+        # rond af op het raster, zodat vrijwel gelijke coördinaten 1 resultaat delen
+        if self._raster > 0:
+            lat = round(round(lat / self._raster) * self._raster, 6)
+            lon = round(round(lon / self._raster) * self._raster, 6)
+        return lat, lon
+
+    @staticmethod
+    def _lat_lon_to_api(lat, lon) -> dict:
         d = {
             "location": {
                 "lat_lng": {
-                    "latitude": float(lat),
-                    "longitude": float(lon),
+                    "latitude": lat,
+                    "longitude": lon,
                 }
             }
         }
         return d
 
-    def _reistijd_met_auto(self, vanaf_lat_lon, naar_lat_lon):
+    @staticmethod
+    def _schat_reistijd_min(vanaf: tuple, naar: tuple) -> int:
+        """ schat de reistijd met de auto op basis van de afstand hemelsbreed (haversine) """
+        lat1, lon1 = math.radians(vanaf[0]), math.radians(vanaf[1])
+        lat2, lon2 = math.radians(naar[0]), math.radians(naar[1])
+
+        a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+        km = 2 * AARDE_STRAAL_KM * math.asin(min(1.0, math.sqrt(a)))
+
+        mins = SCHATTING_EXTRA_MIN + (km * SCHATTING_OMRIJ_FACTOR / SCHATTING_KM_PER_UUR) * 60
+
+        # 0 betekent "nog niet bepaald", dus minimaal 1 minuut
+        return max(1, int(round(mins, 0)))
+
+    @staticmethod
+    def _maak_matrices(paren, max_elementen: int) -> list:
+        """ verdeel de paren (vanaf, naar) over zo min mogelijk matrix verzoeken
+            vertrekpunten met precies dezelfde doelen komen samen in een matrix,
+            zodat er geen overbodige elementen opgevraagd worden
+
+            geeft een lijst van tuples terug: (vertrekpunten, doelen)
+        """
+        vanaf2doelen = dict()
+        for vanaf, naar in paren:
+            try:
+                vanaf2doelen[vanaf].add(naar)
+            except KeyError:
+                vanaf2doelen[vanaf] = {naar}
+        # for
+
+        doelen2vanaf = dict()
+        for vanaf, doelen in sorted(vanaf2doelen.items()):
+            doelen = tuple(sorted(doelen))
+            try:
+                doelen2vanaf[doelen].append(vanaf)
+            except KeyError:
+                doelen2vanaf[doelen] = [vanaf]
+        # for
+
+        matrices = list()
+        for doelen, vertrekpunten in doelen2vanaf.items():
+            # bij te veel doelen opknippen
+            for doel_nr in range(0, len(doelen), max_elementen):
+                deel_doelen = doelen[doel_nr:doel_nr + max_elementen]
+                per_matrix = max_elementen // len(deel_doelen)
+
+                for vanaf_nr in range(0, len(vertrekpunten), per_matrix):
+                    matrices.append((vertrekpunten[vanaf_nr:vanaf_nr + per_matrix], deel_doelen))
+                # for
+            # for
+        # for
+
+        return matrices
+
+    def _reistijd_matrix(self, vertrekpunten: list, doelen: list) -> dict:
+        """ vraag de reistijd met de auto op voor alle vertrekpunten x doelen in 1 verzoek
+            geeft een dict terug: [(vanaf, naar)] = reistijd in minuten
+
+            draait in een worker thread, dus geen database toegang hier
+        """
         request = {
-            "origin": vanaf_lat_lon,
-            "destination": naar_lat_lon,
+            "origins": [
+                {
+                    "waypoint": self._lat_lon_to_api(lat, lon),
+                    "route_modifiers": {
+                        "avoid_ferries": False,
+                        "avoid_highways": False,
+                        "avoid_tolls": False,
+                    }
+                } for lat, lon in vertrekpunten],
+            "destinations": [
+                {
+                    "waypoint": self._lat_lon_to_api(lat, lon),
+                } for lat, lon in doelen],
             "travel_mode": RouteTravelMode.DRIVE,
             "units": Units.METRIC,
-            # "arrival_time": self._future_saturday_0800.isoformat(),       # includes date
-            "compute_alternative_routes": False,
             "routing_preference": RoutingPreference.TRAFFIC_AWARE_OPTIMAL,  # anders geen veerboot!
-            # "language_code": "NL",
-            "route_modifiers": {
-                "avoid_ferries": False,
-                "avoid_highways": False,
-                "avoid_tolls": False,
-            }
         }
 
+        # paren waarvoor geen antwoord komt (fout van de API) worden niet in het resultaat opgenomen
+        # deze houden de schatting en worden de volgende keer opnieuw opgevraagd
+        resultaten = dict()
+        beantwoord = set()
         try:
             metadata = [
-                ('x-goog-fieldmask', 'routes.static_duration'),
+                ('x-goog-fieldmask', 'originIndex,destinationIndex,status,condition,staticDuration'),
             ]
-            # self.stdout.write('[DEBUG] compute routes request: %s' % repr(request))
-            self.verzoeken_teller += 1
-            response = self._client.compute_routes(request, metadata=metadata)
+            # self.stdout.write('[DEBUG] compute route matrix request: %s' % repr(request))
+            for element in self._client.compute_route_matrix(request, metadata=metadata):
+                paar = (vertrekpunten[element.origin_index], doelen[element.destination_index])
+                beantwoord.add(paar)
+
+                if element.status.code != 0:
+                    self.stderr.write('[ERROR] Fout in routes antwoord voor %s: %s' % (repr(paar), repr(element)))
+                elif (element.condition == RouteMatrixElementCondition.ROUTE_EXISTS and
+                        element.static_duration):
+                    secs = element.static_duration.total_seconds()
+                    resultaten[paar] = int(round(secs / 60, 0))
+                    # self.stdout.write('[DEBUG] Reistijd %s seconden wordt %s minuten' % (secs, mins))
+                else:
+                    # geldig antwoord, maar geen route gevonden
+                    self.stderr.write('[ERROR] Onvolledig routes antwoord: %s' % repr(element))
+                    resultaten[paar] = 17 * 60      # geef een gek getal (17 uur) terug wat om aandacht vraagt
+            # for
         except Exception as exc:
             self.stderr.write('[ERROR] Fout van routing_v2 (%s)' % str(exc))
-            self.stdout.write('[DEBUG] compute routes request was: %s' % repr(request))
-            mins = 16 * 60      # geef een gek getal (16 uur) terug wat om aandacht vraagt
+            self.stdout.write('[DEBUG] compute route matrix request was: %s' % repr(request))
         else:
-            # self.stdout.write('[DEBUG] response=%s' % repr(response))
+            for paar in itertools.product(vertrekpunten, doelen):
+                if paar not in beantwoord:
+                    self.stderr.write('[ERROR] Onvolledig routes antwoord: geen element voor %s' % repr(paar))
+            # for
+
+        return resultaten
+
+    def _verzamel_paren(self, qset) -> dict:
+        """ groepeer de reistijden op het (afgeronde) vertrekpunt en doel
+            geeft een dict terug: [(vanaf, naar)] = [reistijd, ...]
+        """
+        paren = dict()
+        for reistijd in qset:
+            if not reistijd.is_compleet():
+                self.stdout.write('[WARNING] Reistijd met pk=%s is niet compleet; skipping' % reistijd.pk)
+                continue
 
             try:
-                secs = response.routes[0].static_duration.seconds
-            except (KeyError, IndexError):
-                self.stderr.write('[ERROR] Onvolledig routes antwoord: %s' % repr(response))
-                self.stdout.write('[DEBUG] compute routes request was: %s' % repr(request))
-                mins = 17 * 60      # geef een gek getal (17 uur) terug wat om aandacht vraagt
+                vanaf = self._op_raster(*self._lat_lon_float(reistijd.vanaf_lat, reistijd.vanaf_lon))
+                naar = self._op_raster(*self._lat_lon_float(reistijd.naar_lat, reistijd.naar_lon))
+            except ValueError:
+                self.stdout.write('[WARNING] Fout in lat/lon (geen float?) voor reistijd pk=%s' % reistijd.pk)
             else:
-                mins = int(round(secs / 60, 0))
-                # self.stdout.write('[DEBUG] Reistijd %s seconden wordt %s minuten' % (secs, mins))
+                try:
+                    paren[(vanaf, naar)].append(reistijd)
+                except KeyError:
+                    paren[(vanaf, naar)] = [reistijd]
+        # for
+
+        return paren
 
-        return mins
+    def _bereken_reistijden(self, paren: dict) -> dict:
+        """ vraag de reistijd op voor alle paren, met meerdere matrix verzoeken tegelijk
+            begrensd op verzoeken_grens elementen per keer
+
+            geeft een dict terug: [(vanaf, naar)] = reistijd in minuten
+        """
+        max_elementen = max(1, min(MATRIX_MAX_ELEMENTEN, self.verzoeken_grens))
+
+        matrices = list()
+        for vertrekpunten, doelen in self._maak_matrices(paren.keys(), max_elementen):
+            aantal = len(vertrekpunten) * len(doelen)
+
+            # begrens het aantal verzoeken per keer
+            if self.verzoeken_teller + aantal > self.verzoeken_grens:
+                self.stdout.write('[WARNING] Limit van %s verzoeken per keer bereikt' % self.verzoeken_grens)
+                break
+
+            self.verzoeken_teller += aantal
+            self.matrix_teller += 1
+            matrices.append((vertrekpunten, doelen))
+        # for
+
+        resultaten = dict()
+        if len(matrices) > 0:
+            with ThreadPoolExecutor(max_workers=MATRIX_PARALLEL) as pool:
+                for deel in pool.map(lambda tup: self._reistijd_matrix(*tup), matrices):
+                    resultaten.update(deel)
+                # for
+
+        return resultaten
 
     def _update_locaties(self):
         # adressen van de locaties aanvullen met lat/lon
@@ -259,86 +422,110 @@ class ReistijdBepaler(object):
                 self.stdout.write('[WARNING] Geen fallback voor locatie pk=%s met adres %s' % (locatie.pk, repr(adres)))
         # for
 
-    def _update_reistijd(self):
-
+    def _schat_reistijd(self):
+        """ geef nieuwe reistijden meteen een schatting op basis van de afstand hemelsbreed,
+            zodat niemand hoeft te wachten op de Routes API
+            de schatting wordt later vervangen door _update_reistijd
+        """
         today = timezone.localtime(timezone.now()).date()
 
+        bijgewerkt = list()
         for reistijd in Reistijd.objects.filter(reistijd_min=0):
+            if reistijd.is_compleet():
+                try:
+                    vanaf = self._lat_lon_float(reistijd.vanaf_lat, reistijd.vanaf_lon)
+                    naar = self._lat_lon_float(reistijd.naar_lat, reistijd.naar_lon)
+                except ValueError:
+                    # wordt gerapporteerd door _update_reistijd
+                    pass
+                else:
+                    reistijd.reistijd_min = self._schat_reistijd_min(vanaf, naar)
+                    reistijd.is_schatting = True
+                    reistijd.op_datum = today
+                    bijgewerkt.append(reistijd)
+        # for
 
-            if not reistijd.is_compleet():
-                self.stdout.write('[WARNING] Reistijd met pk=%s is niet compleet; skipping' % reistijd.pk)
-                continue
+        if len(bijgewerkt) > 0:
+            Reistijd.objects.bulk_update(bijgewerkt, ['reistijd_min', 'is_schatting', 'op_datum'])
+            self.stdout.write('[INFO] Reistijd geschat voor %s verzoeken' % len(bijgewerkt))
 
-            try:
-                vanaf_lat_lon = self._lat_lon_to_api(reistijd.vanaf_lat, reistijd.vanaf_lon)
-                naar_lat_lon = self._lat_lon_to_api(reistijd.naar_lat, reistijd.naar_lon)
-            except ValueError:
-                self.stdout.write('[WARNING] Fout in lat/lon (geen float?) voor reistijd pk=%s' % reistijd.pk)
-            else:
-                mins = self._reistijd_met_auto(vanaf_lat_lon, naar_lat_lon)
+    def _update_reistijd(self):
+        # vervang de schattingen door de reistijd van de Routes API
 
-                reistijd.reistijd_min = mins
-                reistijd.op_datum = today
+        today = timezone.localtime(timezone.now()).date()
 
-                reistijd.save(update_fields=['reistijd_min', 'op_datum'])
+        paren = self._verzamel_paren(Reistijd.objects.filter(Q(reistijd_min=0) | Q(is_schatting=True)))
+        resultaten = self._bereken_reistijden(paren)
 
-            # begrens het aantal verzoeken per keer
-            if self.verzoeken_teller >= self.verzoeken_grens:
-                self.stdout.write('[WARNING] Limit van %s verzoeken per keer bereikt' % self.verzoeken_grens)
-                break
+        bijgewerkt = list()
+        for paar, mins in resultaten.items():
+            for reistijd in paren[paar]:
+                reistijd.reistijd_min = mins
+                reistijd.is_schatting = False
+                reistijd.op_datum = today
+                bijgewerkt.append(reistijd)
+            # for
         # for
 
+        if len(bijgewerkt) > 0:
+            Reistijd.objects.bulk_update(bijgewerkt, ['reistijd_min', 'is_schatting', 'op_datum'])
+
     def _refresh_reistijd(self):
         # na 6 maanden verversen we de reistijd
 
         today = timezone.localtime(timezone.now()).date()
         oud = today - datetime.timedelta(days=settings.REISTIJD_VERVERSEN_NA_DAGEN)
 
-        for reistijd in Reistijd.objects.filter(op_datum__lt=oud):
-
-            if not reistijd.is_compleet():
-                self.stdout.write('[WARNING] Reistijd met pk=%s is niet compleet; skipping' % reistijd.pk)
+        paren = self._verzamel_paren(Reistijd
+                                     .objects
+                                     .filter(op_datum__lt=oud,
+                                             is_schatting=False)
+                                     .exclude(reistijd_min=0))
+        resultaten = self._bereken_reistijden(paren)
+
+        bijgewerkt = list()
+        for paar, mins in resultaten.items():
+            if mins > 5 * 60:
+                self.stdout.write('[WARNING] Rare reistijd (%s minuten) wordt niet opgeslagen' % mins)
                 continue
 
-            try:
-                vanaf_lat_lon = self._lat_lon_to_api(reistijd.vanaf_lat, reistijd.vanaf_lon)
-                naar_lat_lon = self._lat_lon_to_api(reistijd.naar_lat, reistijd.naar_lon)
-            except ValueError:
-                self.stdout.write('[WARNING] Fout in lat/lon (geen float?) voor reistijd pk=%s' % reistijd.pk)
-            else:
-                mins = self._reistijd_met_auto(vanaf_lat_lon, naar_lat_lon)
-
-                if mins > 5 * 60:
-                    self.stdout.write('[WARNING] Rare reistijd (%s minuten) wordt niet opgeslagen' % mins)
+            for reistijd in paren[paar]:
+                if mins != reistijd.reistijd_min:
+                    self.stdout.write('[INFO] Reistijd pk=%s is aangepast van %s naar %s minuten' % (reistijd.pk,
+                                                                                                     reistijd.reistijd_min,
+                                                                                                     mins))
+                    reistijd.reistijd_min = mins
                 else:
-                    if mins != reistijd.reistijd_min:
-                        self.stdout.write('[INFO] Reistijd pk=%s is aangepast van %s naar %s minuten' % (reistijd.pk,
-                                                                                                         reistijd.reistijd_min,
-                                                                                                         mins))
-                        reistijd.reistijd_min = mins
-                    else:
-                        self.stdout.write('[INFO] Reistijd pk=%s is niet gewijzigd' % reistijd.pk)
-
-                    reistijd.op_datum = today
-                    reistijd.save(update_fields=['reistijd_min', 'op_datum'])
+                    self.stdout.write('[INFO] Reistijd pk=%s is niet gewijzigd' % reistijd.pk)
 
-            # begrens het aantal verzoeken per keer
-            if self.verzoeken_teller >= self.verzoeken_grens:
-                self.stdout.write('[WARNING] Limit van %s verzoeken per keer bereikt' % self.verzoeken_grens)
-                break
+                reistijd.op_datum = today
+                bijgewerkt.append(reistijd)
+            # for
         # for
 
-    def run(self):
+        if len(bijgewerkt) > 0:
+            Reistijd.objects.bulk_update(bijgewerkt, ['reistijd_min', 'op_datum'])
+
+    def run(self, verfijnen=True):
+        """ werk de coördinaten en reistijden bij
+
+            verfijnen: False = alleen de schatting invullen voor nieuwe reistijden;
+                               de Routes API wordt later gebruikt (door reistijd_bijwerken)
+        """
 
         if self._connect_gmaps():
             # connection success
             self._update_scheids()
             self._update_locaties()
             self._update_locaties_fallback()
-            self._update_reistijd()
-            self._refresh_reistijd()
+            self._schat_reistijd()
+
+            if verfijnen:
+                self._update_reistijd()
+                self._refresh_reistijd()
 
         self.stdout.write('[INFO] Aantal verzoeken naar Routes API: %s' % self.verzoeken_teller)
+        self.stdout.write('[INFO] Aantal route matrix aanroepen: %s' % self.matrix_teller)
 
 
 # end of file
@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
 
-#  Copyright (c) 2020-2025 Ramon van der Winkel.
+#  Copyright (c) 2020-2026 Ramon van der Winkel.
 #  All rights reserved.
 #  Licensed under BSD-3-Clause-Clear. See LICENSE file for details.
 
@@ -227,6 +227,46 @@ class MyServer(BaseHTTPRequestHandler):
         self.end_headers()
         self.wfile.write("POST request for {}".format(self.path).encode('utf-8'))
 
+    def handle_compute_route_matrix(self, body):
+
+        data = json.loads(body)
+        # print('{websim_gmaps} compute route matrix: body=%s' % repr(data))
+
+        # het antwoord is een lijst met een element voor elke combinatie van vertrekpunt en doel
+        resp = list()
+        for origin_index, _origin in enumerate(data['origins']):
+            for destination_index, destination in enumerate(data['destinations']):
+                element = {
+                    'originIndex': origin_index,
+                    'destinationIndex': destination_index,
+                    'status': {},
+                }
+
+                if destination['waypoint']['location']['latLng']['latitude'] == 420.0:
+                    # geen route
+                    element['condition'] = 'ROUTE_NOT_FOUND'
+                else:
+                    element['condition'] = 'ROUTE_EXISTS'
+                    element['staticDuration'] = '1020s'     # 1020 seconds = 17 minutes
+
+                resp.append(element)
+            # for
+        # for
+
+        data = json.dumps(resp)
+        enc_data = data.encode()  # convert string to bytes
+        enc_data_len = len(enc_data)
+
+        self.send_response(200)
+        self.send_header('Content-type', 'application/json')
+        self.send_header('Content-length', str(enc_data_len))
+        self.end_headers()
+
+        # stuur de data zelf
+        if enc_data_len > 0:
+            self.wfile.write(enc_data)
+            self.wfile.flush()
+
     def do_GET(self):       # noqa
         # print("GET request,\nPath: %s\nHeaders:\n%s" % (str(self.path), str(self.headers)))
 
@@ -245,6 +285,11 @@ class MyServer(BaseHTTPRequestHandler):
             body = self.rfile.read(content_len)
             return self.handle_compute_routes(body)
 
+        if self.path.startswith('/distanceMatrix/v2:computeRouteMatrix'):
+            content_len = int(self.headers.get('Content-Length'))
+            body = self.rfile.read(content_len)
+            return self.handle_compute_route_matrix(body)
+
         print('{websim_gmaps} Unknown POST url: %s' % repr(self.path))
         self.send_response(404)
 
@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
 
-#  Copyright (c) 2023-2025 Ramon van der Winkel.
+#  Copyright (c) 2023-2026 Ramon van der Winkel.
 #  All rights reserved.
 #  Licensed under BSD-3-Clause-Clear. See LICENSE file for details.
 
@@ -11,9 +11,51 @@ from Locatie.models import WedstrijdLocatie, Reistijd
 from Locatie.operations import ReistijdBepaler, reistijd_opschonen
 from Sporter.models import Sporter
 from TestHelpers.e2ehelpers import E2EHelpers
+from google.maps.routing_v2 import RouteMatrixElement, RouteMatrixElementCondition
+from unittest.mock import patch
+import datetime
 import io
 
 
+class RoutesClientStub:
+
+    """ vervanger van de RoutesClient, zonder netwerk verkeer """
+
+    def __init__(self, fout=False):
+        self.verzoeken = list()
+        self.fout = fout
+
+    def compute_route_matrix(self, request, metadata):
+        self.verzoeken.append(request)
+
+        if self.fout:
+            raise ConnectionError('test')
+
+        for origin_index, origin in enumerate(request['origins']):
+            for destination_index, destination in enumerate(request['destinations']):
+                lat = destination['waypoint']['location']['lat_lng']['latitude']
+                if lat == 3.0:
+                    # element ontbreekt in het antwoord
+                    continue
+
+                if lat == 9.0:
+                    # fout voor dit element
+                    yield RouteMatrixElement(origin_index=origin_index,
+                                             destination_index=destination_index,
+                                             status={'code': 14, 'message': 'test'})
+                    continue
+
+                # reistijd = 10 minuten per graad verschil in latitude
+                lat_vanaf = origin['waypoint']['location']['lat_lng']['latitude']
+                secs = abs(lat - lat_vanaf) * 600
+                yield RouteMatrixElement(origin_index=origin_index,
+                                         destination_index=destination_index,
+                                         condition=RouteMatrixElementCondition.ROUTE_EXISTS,
+                                         static_duration=datetime.timedelta(seconds=secs))
+            # for
+        # for
+
+
 class TestLocatieOperations(E2EHelpers, TestCase):
 
     """ tests voor de Locatie applicatie, operations """
@@ -349,6 +391,117 @@ class TestLocatieOperations(E2EHelpers, TestCase):
         reistijd = Reistijd(naar_lat='', vanaf_lat='x', vanaf_lon='y')
         self.assertFalse(reistijd.is_compleet())
 
+    def test_reistijd_matrix(self):
+        # 3 vertrekpunten, waarvan 2 vrijwel gelijk, naar 2 doelen
+        for vanaf_lat in ('1.000001', '1.000002', '4.5'):
+            for naar_lat in ('2.0', '6.0'):
+                Reistijd.objects.create(vanaf_lat=vanaf_lat, vanaf_lon='5.0',
+                                        naar_lat=naar_lat, naar_lon='5.0')
+        # for
+        self.assertEqual(Reistijd.objects.count(), 6)
+
+        stdout = OutputWrapper(io.StringIO())
+        stderr = OutputWrapper(io.StringIO())
+        stub = RoutesClientStub()
+
+        # alleen schatten; geen verzoeken
+        bepaler = ReistijdBepaler(stdout, stderr, 25, routes_client=stub)
+        bepaler.run(verfijnen=False)
+        # print('\nf1: %s\nf2: %s' % (stderr.getvalue(), stdout.getvalue()))
+        self.assertTrue('[INFO] Reistijd geschat voor 6 verzoeken' in stdout.getvalue())
+        self.assertEqual(len(stub.verzoeken), 0)
+        self.assertEqual(Reistijd.objects.filter(is_schatting=True).count(), 6)
+        self.assertEqual(Reistijd.objects.filter(reistijd_min=0).count(), 0)
+
+        # 1 graad is ongeveer 111 km, dus hemelsbreed ruim een uur rijden
+        reistijd = Reistijd.objects.get(vanaf_lat='1.000001', naar_lat='2.0')
+        self.assertTrue(100 < reistijd.reistijd_min < 150)
+
+        # schattingen vervangen: 2 vertrekpunten x 2 doelen in 1 matrix
+        bepaler = ReistijdBepaler(stdout, stderr, 25, routes_client=stub)
+        bepaler.run()
+        # print('\nf1: %s\nf2: %s' % (stderr.getvalue(), stdout.getvalue()))
+        self.assertEqual(stderr.getvalue(), '')
+        self.assertEqual(len(stub.verzoeken), 1)
+        self.assertEqual(len(stub.verzoeken[0]['origins']), 2)
+        self.assertEqual(len(stub.verzoeken[0]['destinations']), 2)
+        self.assertTrue('[INFO] Aantal verzoeken naar Routes API: 4' in stdout.getvalue())
+        self.assertTrue('[INFO] Aantal route matrix aanroepen: 1' in stdout.getvalue())
+
+        self.assertEqual(Reistijd.objects.filter(is_schatting=True).count(), 0)
+        reistijd_min = list(Reistijd.objects.order_by('pk').values_list('reistijd_min', flat=True))
+        self.assertEqual(reistijd_min, [10, 50, 10, 50, 25, 15])
+
+        # element ontbreekt in het antwoord + begrenzing aantal verzoeken
+        Reistijd.objects.create(vanaf_lat='1.0', vanaf_lon='5.0', naar_lat='3.0', naar_lon='5.0')
+        Reistijd.objects.create(vanaf_lat='1.0', vanaf_lon='5.0', naar_lat='4.0', naar_lon='5.0')
+        Reistijd.objects.create(vanaf_lat='7.0', vanaf_lon='5.0', naar_lat='8.0', naar_lon='5.0')
+
+        stdout = OutputWrapper(io.StringIO())
+        stderr = OutputWrapper(io.StringIO())
+        bepaler = ReistijdBepaler(stdout, stderr, 2, routes_client=stub)
+        bepaler.run()
+        # print('\nf1: %s\nf2: %s' % (stderr.getvalue(), stdout.getvalue()))
+        self.assertTrue('[ERROR] Onvolledig routes antwoord: geen element voor ((1.0, 5.0), (3.0, 5.0))' in stderr.getvalue())
+        self.assertTrue('[WARNING] Limit van 2 verzoeken per keer bereikt' in stdout.getvalue())
+        self.assertEqual(Reistijd.objects.get(naar_lat='4.0').reistijd_min, 30)
+        self.assertTrue(Reistijd.objects.get(naar_lat='8.0').is_schatting)
+
+        # zonder antwoord blijft de schatting staan, zodat deze de volgende keer opnieuw opgevraagd wordt
+        reistijd = Reistijd.objects.get(naar_lat='3.0')
+        self.assertTrue(reistijd.is_schatting)
+        self.assertTrue(0 < reistijd.reistijd_min < 5 * 60)
+
+        # fout voor 1 element in het antwoord
+        Reistijd.objects.create(vanaf_lat='7.0', vanaf_lon='5.0', naar_lat='9.0', naar_lon='5.0')
+        stdout = OutputWrapper(io.StringIO())
+        stderr = OutputWrapper(io.StringIO())
+        bepaler = ReistijdBepaler(stdout, stderr, 25, routes_client=stub)
+        bepaler.run()
+        # print('\nf1: %s\nf2: %s' % (stderr.getvalue(), stdout.getvalue()))
+        self.assertTrue('[ERROR] Fout in routes antwoord voor ((7.0, 5.0), (9.0, 5.0))' in stderr.getvalue())
+        self.assertFalse('geen element voor ((7.0, 5.0), (9.0, 5.0))' in stderr.getvalue())
+        self.assertTrue(Reistijd.objects.get(naar_lat='9.0').is_schatting)
+        reistijd = Reistijd.objects.get(naar_lat='8.0')
+        self.assertEqual(reistijd.reistijd_min, 10)
+        self.assertFalse(reistijd.is_schatting)
+        Reistijd.objects.filter(naar_lat='9.0').delete()
+
+        # fout van de Routes API: de schatting blijft staan
+        Reistijd.objects.filter(naar_lat='8.0').update(reistijd_min=0)
+        stdout = OutputWrapper(io.StringIO())
+        stderr = OutputWrapper(io.StringIO())
+        bepaler = ReistijdBepaler(stdout, stderr, 25, routes_client=RoutesClientStub(fout=True))
+        bepaler.run()
+        # print('\nf1: %s\nf2: %s' % (stderr.getvalue(), stdout.getvalue()))
+        self.assertTrue('[ERROR] Fout van routing_v2 (test)' in stderr.getvalue())
+        reistijd = Reistijd.objects.get(naar_lat='8.0')
+        self.assertTrue(0 < reistijd.reistijd_min < 5 * 60)
+        self.assertTrue(reistijd.is_schatting)
+
+        # verversen na een half jaar
+        Reistijd.objects.update(op_datum='2000-01-01')
+        stdout = OutputWrapper(io.StringIO())
+        stderr = OutputWrapper(io.StringIO())
+        bepaler = ReistijdBepaler(stdout, stderr, 100, routes_client=stub)
+        bepaler.run()
+        # print('\nf1: %s\nf2: %s' % (stderr.getvalue(), stdout.getvalue()))
+        self.assertTrue(' is niet gewijzigd' in stdout.getvalue())
+        reistijd = Reistijd.objects.get(naar_lat='8.0')
+        self.assertEqual(reistijd.reistijd_min, 10)
+        self.assertFalse(reistijd.is_schatting)
+
+        # rare reistijd wordt niet opgeslagen
+        Reistijd.objects.filter(naar_lat='8.0').update(reistijd_min=99, op_datum='2000-01-01')
+        stdout = OutputWrapper(io.StringIO())
+        stderr = OutputWrapper(io.StringIO())
+        bepaler = ReistijdBepaler(stdout, stderr, 100, routes_client=stub)
+        with patch.object(bepaler, '_reistijd_matrix', side_effect=lambda vanaf, naar: {(vanaf[0], naar[0]): 17 * 60}):
+            bepaler.run()
+        # print('\nf1: %s\nf2: %s' % (stderr.getvalue(), stdout.getvalue()))
+        self.assertTrue('[WARNING] Rare reistijd (1020 minuten) wordt niet opgeslagen' in stdout.getvalue())
+        self.assertEqual(Reistijd.objects.get(naar_lat='8.0').reistijd_min, 99)
+
     def test_opschonen(self):
         # reistijd niet gekoppeld aan sporter
         Reistijd.objects.create(vanaf_lat=self.SR3_LAT, vanaf_lon=self.SR3_LON,
@@ -6,20 +6,37 @@
 
 """ dit commando probeert een aantal mail te versturen
     normaal gebruik is aanroep vanuit een cron-job, typisch elke 5 minuten
+
+    met --workers kunnen meerdere threads parallel mails versturen
+    elke worker claimt een batch mails met SELECT .. FOR UPDATE SKIP LOCKED en legt in dezelfde korte transactie
+    de poging vast; daarna valt de mail buiten de selectie (wachttijd na een poging), zodat een mail nooit door
+    twee workers verstuurd wordt. Het versturen zelf gebeurt buiten de transactie.
+
+    na een mislukte poging wordt steeds langer gewacht voordat een mail opnieuw geprobeerd wordt
 """
 
-from Mailer.operations import send_mail
+from Mailer.operations.send import POSTMARK_BATCH_MAX, registreer_poging, verstuur_mails
 from Mailer.models import MailQueue
+from Site.core.background_sync import BackgroundSync
 from Taken.operations import herinner_aan_taken
+from django.conf import settings
 from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Q
 from django.db.utils import OperationalError, IntegrityError
 from django.utils import timezone
 from django.db.utils import DataError
+import threading
 import traceback
 import datetime
-import time
 import sys
 
+# na zoveel pogingen geven we het op (zie registreer_poging)
+MAX_POGINGEN = 25
+
+# maximale wachttijd tussen twee pogingen
+BACKOFF_MAX_MINUTEN = 4 * 60
+
 
 class Command(BaseCommand):
 
@@ -28,6 +45,13 @@ class Command(BaseCommand):
     def __init__(self, stdout=None, stderr=None, no_color=False, force_color=False):
         super().__init__(stdout, stderr, no_color, force_color)
         self.stop_at = datetime.datetime.now()
+        self._sync = BackgroundSync(settings.BACKGROUND_SYNC__STUUR_MAILS)
+        self._count_ping = 0
+        self._workers = 1
+        self._claim_max = POSTMARK_BATCH_MAX
+        self._send_count = 0
+        self._lock = threading.Lock()
+        self._werk = threading.Condition()
 
     def add_arguments(self, parser):
         parser.add_argument('duration', type=int,
@@ -35,6 +59,8 @@ class Command(BaseCommand):
                             help="Maximum aantal minuten actief blijven")
         parser.add_argument('--stop_exactly', type=int, default=None, choices=range(60),
                             help="Stop op deze minuut")
+        parser.add_argument('--workers', type=int, default=1, choices=range(1, 17),
+                            help="Aantal threads dat parallel mails verstuurt")
         parser.add_argument('--quick', action='store_true')     # for testing
         parser.add_argument('--skip_old', action='store_true')  # for testing
 
@@ -48,49 +74,136 @@ class Command(BaseCommand):
             self.stdout.write('[DEBUG] Found %s blocked mails over 1 month old (that could be deleted)' % len(objs))
             # FUTURE: actually delete old blocked mails
 
-    def _stuur_oude_mails(self):
-        # probeer eenmalig oude mails te sturen en keer daarna terug
-        send_count = 0
-        for obj in (MailQueue
-                    .objects
-                    .filter(is_verstuurd=False,
-                            is_blocked=False,
-                            aantal_pogingen__lt=25)):
-            send_mail(obj, self.stdout, self.stderr)
-            send_count += 1
-
-            # bail out when time's up
+    @staticmethod
+    def _filter_poging_toegestaan(now):
+        """ selecteer de mails waarvan de wachttijd na de vorige poging verstreken is
+            de wachttijd verdubbelt na elke mislukte poging, tot een maximum
+        """
+        filter_q = Q(aantal_pogingen=0)
+        for aantal in range(1, MAX_POGINGEN):
+            minuten = min(2 ** (aantal - 1), BACKOFF_MAX_MINUTEN)
+            filter_q |= Q(aantal_pogingen=aantal,
+                          laatste_poging__lte=now - datetime.timedelta(minutes=minuten))
+        # for
+        return filter_q
+
+    def _claim_en_verstuur(self, alleen_nieuw):
+        """ claim een aantal mails en verstuur deze
+
+            de regels in de database zijn alleen gelocked tijdens het claimen (SKIP LOCKED)
+            de vastgelegde poging houdt een andere worker daarna weg bij deze mails,
+            want een nieuwe poging mag pas na de wachttijd (zie _filter_poging_toegestaan)
+
+            geeft het aantal geclaimde mails terug
+        """
+        if alleen_nieuw:
+            filter_q = Q(aantal_pogingen=0)
+        else:
+            filter_q = self._filter_poging_toegestaan(timezone.now())
+
+        # dit is altijd de buitenste transactie, dus een savepoint is niet nodig
+        with transaction.atomic(savepoint=False):
+            objs = list(MailQueue
+                        .objects
+                        .select_for_update(skip_locked=True)
+                        .filter(filter_q,
+                                is_verstuurd=False,
+                                is_blocked=False)
+                        .order_by('pk')[:self._claim_max])
+            aantal = len(objs)
+            objs = registreer_poging(objs)
+
+        # verstuur buiten de transactie, zodat er geen locks vast gehouden worden tijdens het wachten op Postmark
+        if len(objs):
+            verstuur_mails(objs, self.stdout, self.stderr)
+
+        return aantal
+
+    def _tel_verstuurd(self, aantal):
+        with self._lock:
+            self._send_count += aantal
+
+    def _wacht_op_werk(self, secs):
+        if self._workers == 1:
+            # wacht even, of tot mailer_queue_email een ping stuurt
+            if self._sync.wait_for_ping(secs):
+                self._count_ping += 1
+        else:
+            # de hoofd-thread wacht op de ping en maakt de workers wakker
+            with self._werk:
+                self._werk.wait(secs)
+
+    def _worker(self, alleen_nieuw, eenmalig):
+        try:
             now = datetime.datetime.now()
-            if now > self.stop_at:
-                break       # from the for
+            while now < self.stop_at:
+                aantal = self._claim_en_verstuur(alleen_nieuw)
+                self._tel_verstuurd(aantal)
+
+                if aantal == 0:
+                    if eenmalig:
+                        break       # from the while
+
+                    secs = (self.stop_at - datetime.datetime.now()).total_seconds()
+                    if secs > 5.0:
+                        secs = 5.0
+                    if secs > 0:
+                        self._wacht_op_werk(secs)
+
+                now = datetime.datetime.now()
+            # while
+        except (DataError, OperationalError, IntegrityError) as exc:                        # pragma: no cover
+            if threading.current_thread() is threading.main_thread():
+                raise
+            self._meld_database_fout(exc)
+        finally:
+            if threading.current_thread() is not threading.main_thread():
+                # elke thread heeft een eigen database verbinding
+                connection.close()
+
+    def _start_workers(self, alleen_nieuw, eenmalig):
+        self._send_count = 0
+
+        if self._workers == 1:
+            self._worker(alleen_nieuw, eenmalig)
+            return
+
+        threads = list()
+        for nr in range(self._workers):
+            thread = threading.Thread(target=self._worker,
+                                      args=(alleen_nieuw, eenmalig),
+                                      name='stuur_mails_%s' % (nr + 1))
+            thread.start()
+            threads.append(thread)
         # for
-        self.stdout.write("[INFO] Aantal oude mails geprobeerd te versturen: %s" % send_count)
 
-    def _stuur_nieuwe_mails(self):
-        # monitor voor nieuwe mails en verstuur die
-        send_count = 0
-        now = datetime.datetime.now()
-        while now < self.stop_at:
-
-            objs = (MailQueue
-                    .objects
-                    .filter(is_verstuurd=False,
-                            is_blocked=False,
-                            aantal_pogingen=0))
-            if len(objs):
-                obj = objs[0]
-                send_mail(obj, self.stdout, self.stderr)
-                send_count += 1
-            else:
-                # sleep a bit, then check again
+        if not eenmalig:
+            # geef een ping door aan de workers
+            now = datetime.datetime.now()
+            while now < self.stop_at:
                 secs = (self.stop_at - now).total_seconds()
                 if secs > 5.0:
                     secs = 5.0
-                time.sleep(secs)
+                if self._sync.wait_for_ping(secs):
+                    self._count_ping += 1
+                    with self._werk:
+                        self._werk.notify_all()
+                now = datetime.datetime.now()
+            # while
 
-            now = datetime.datetime.now()
-        # while
-        self.stdout.write("[INFO] Aantal nieuwe mails geprobeerd te versturen: %s" % send_count)
+        for thread in threads:
+            thread.join()
+        # for
+
+    def _stuur_oude_mails(self):
+        # probeer eenmalig de mails te sturen waarvan de wachttijd verstreken is en keer daarna terug
+        self._start_workers(alleen_nieuw=False, eenmalig=True)
+        self.stdout.write("[INFO] Aantal oude mails geprobeerd te versturen: %s" % self._send_count)
+
+    def _stuur_nieuwe_mails(self):
+        # monitor voor nieuwe mails en verstuur die, in batches
+        self._start_workers(alleen_nieuw=True, eenmalig=False)
+        self.stdout.write("[INFO] Aantal nieuwe mails geprobeerd te versturen: %s" % self._send_count)
 
     def _set_stop_time(self, **options):
         # bepaal wanneer we moeten stoppen (zoals gevraagd)
@@ -120,9 +233,20 @@ class Command(BaseCommand):
 
         self.stdout.write('[INFO] {stuur_mails} Taak loopt tot %s' % str(self.stop_at))
 
+    def _meld_database_fout(self, exc):                                                     # pragma: no cover
+        _, _, tb = sys.exc_info()
+        lst = traceback.format_tb(tb)
+        self.stderr.write('[ERROR] Onverwachte database fout tijdens stuur_mails: %s' % str(exc))
+        self.stderr.write('Traceback:')
+        self.stderr.write(''.join(lst))
+
     def handle(self, *args, **options):
         self._set_stop_time(**options)
 
+        # verdeel een batch over de workers, zodat deze allemaal werk krijgen
+        self._workers = options['workers']
+        self._claim_max = max(1, POSTMARK_BATCH_MAX // self._workers)
+
         # verwijder oude geblokkeerde mails
         self._cleanout_old_blocked_mails()
 
@@ -135,11 +259,7 @@ class Command(BaseCommand):
 
         except (DataError, OperationalError, IntegrityError) as exc:                        # pragma: no cover
             # OperationalError treed op bij system shutdown, als database gesloten wordt
-            _, _, tb = sys.exc_info()
-            lst = traceback.format_tb(tb)
-            self.stderr.write('[ERROR] Onverwachte database fout tijdens stuur_mails: %s' % str(exc))
-            self.stderr.write('Traceback:')
-            self.stderr.write(''.join(lst))
+            self._meld_database_fout(exc)
 
         except KeyboardInterrupt:                       # pragma: no cover
             pass
@@ -7,16 +7,26 @@
 from django.conf import settings
 from django.utils import timezone
 from Mailer.models import MailQueue
+from Mailer.operations.render import render_email_template_bulk
+from Site.core.background_sync import BackgroundSync
 
+stuur_mails_ping = BackgroundSync(settings.BACKGROUND_SYNC__STUUR_MAILS)
 
-def mailer_queue_email(to_address, onderwerp, mail_body, enforce_whitelist=True):
-    """ Deze functie accepteert het verzoek om een mail te versturen en slaat deze op in de database
-        Het feitelijk versturen van de e-mail wordt door een achtergrondtaak gedaan
 
-        mail_body kan een string zijn, of een tuple van (text body, html body)
+# aantal mails per INSERT in mailer_queue_bulk
+BULK_CREATE_BATCH_SIZE = 500
 
-        Returns: True = success
-                 False = failure because of to_address
+
+def _maak_mail_date(now):
+    # maak de date: header voor in de mail, in lokale tijdzone
+    # formaat: Tue, 01 Jan 2020 20:00:03 +0100
+    return timezone.localtime(now).strftime("%a, %d %b %Y %H:%M:%S %z")
+
+
+def _maak_mail(now, mail_date, to_address, onderwerp, mail_body, whitelist):
+    """ maak een nieuw (nog niet opgeslagen) MailQueue object
+
+        whitelist: set met toegestane e-mailadressen, of None als er niet gefilterd moet worden
     """
 
     if isinstance(mail_body, tuple):
@@ -25,36 +35,106 @@ def mailer_queue_email(to_address, onderwerp, mail_body, enforce_whitelist=True)
         mail_text = mail_body
         mail_html = ''
         template_name = ''
-    del mail_body
+
+    obj = MailQueue(toegevoegd_op=now,
+                    laatste_poging=now,
+                    mail_to=to_address,
+                    mail_subj=onderwerp,
+                    mail_date=mail_date,
+                    mail_text=mail_text,
+                    mail_html=mail_html,
+                    template_used=template_name)
+
+    # als er een whitelist is, dan moet het e-mailadres er in voorkomen
+    if whitelist and to_address not in whitelist:
+        # blokkeer het versturen
+        # op deze manier kunnen we wel zien dat het bericht aangemaakt is
+        obj.is_blocked = True
+
+    return obj
+
+
+def _bepaal_whitelist(enforce_whitelist):
+    if enforce_whitelist and len(settings.EMAIL_ADDRESS_WHITELIST) > 0:
+        return set(settings.EMAIL_ADDRESS_WHITELIST)
+    return None
+
+
+def mailer_queue_email(to_address, onderwerp, mail_body, enforce_whitelist=True):
+    """ Deze functie accepteert het verzoek om een mail te versturen en slaat deze op in de database
+        Het feitelijk versturen van de e-mail wordt door een achtergrondtaak gedaan
+
+        mail_body kan een string zijn, of een tuple van (text body, html body)
+
+        Returns: True = success
+                 False = failure because of to_address
+    """
 
     # e-mailadres is verplicht
     if to_address:
         now = timezone.now()    # in utc
 
-        # maak de date: header voor in de mail, in lokale tijdzone
-        # formaat: Tue, 01 Jan 2020 20:00:03 +0100
-        mail_date = timezone.localtime(now).strftime("%a, %d %b %Y %H:%M:%S %z")
-
-        obj = MailQueue(toegevoegd_op=now,
-                        laatste_poging=now,
-                        mail_to=to_address,
-                        mail_subj=onderwerp,
-                        mail_date=mail_date,
-                        mail_text=mail_text,
-                        mail_html=mail_html,
-                        template_used=template_name)
-
-        # als er een whitelist is, dan moet het e-mailadres er in voorkomen
-        if enforce_whitelist and len(settings.EMAIL_ADDRESS_WHITELIST) > 0:
-            if to_address not in settings.EMAIL_ADDRESS_WHITELIST:
-                # blokkeer het versturen
-                # op deze manier kunnen we wel zien dat het bericht aangemaakt is
-                obj.is_blocked = True
-
+        obj = _maak_mail(now, _maak_mail_date(now), to_address, onderwerp, mail_body,
+                         _bepaal_whitelist(enforce_whitelist))
         obj.save()
+
+        if not obj.is_blocked:
+            # wek de achtergrondtaak die de mails verstuurt
+            stuur_mails_ping.ping()
+
         return True
 
     return False
 
 
+def mailer_queue_bulk(email_template_name, onderwerp, ontvangers, enforce_whitelist=True):
+    """ Zet dezelfde e-mail (gepersonaliseerd) in de queue voor een groot aantal ontvangers
+
+        De template wordt 1x geladen en de styles 1x verwerkt; per ontvanger wordt alleen gerenderd.
+        De mails worden in batches aangemaakt, met 1 INSERT per batch.
+
+        email_template_name: de e-mail template, zoals voor render_email_template
+        onderwerp: het onderwerp van de e-mail
+        ontvangers: lijst van (to_address, context)
+
+        Returns: aantal mails in de queue gezet
+                 ontvangers zonder e-mailadres worden overgeslagen
+    """
+
+    ontvangers = [(to_address, context)
+                  for to_address, context in ontvangers
+                  if to_address]
+
+    if len(ontvangers) == 0:
+        return 0
+
+    now = timezone.now()    # in utc
+    mail_date = _maak_mail_date(now)
+    whitelist = _bepaal_whitelist(enforce_whitelist)
+
+    mail_bodies = render_email_template_bulk([context for _, context in ontvangers], email_template_name)
+
+    bulk = list()
+    any_unblocked = False
+    for (to_address, _), mail_body in zip(ontvangers, mail_bodies):
+        obj = _maak_mail(now, mail_date, to_address, onderwerp, mail_body, whitelist)
+        if not obj.is_blocked:
+            any_unblocked = True
+        bulk.append(obj)
+
+        if len(bulk) >= BULK_CREATE_BATCH_SIZE:
+            MailQueue.objects.bulk_create(bulk)
+            bulk = list()
+    # for
+
+    if len(bulk):
+        MailQueue.objects.bulk_create(bulk)
+
+    if any_unblocked:
+        # wek de achtergrondtaak die de mails verstuurt
+        stuur_mails_ping.ping()
+
+    return len(ontvangers)
+
+
 # end of file
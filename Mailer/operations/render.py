@@ -6,14 +6,52 @@
 
 from django.conf import settings
 from django.utils import timezone
-from django.template.loader import render_to_string
+from django.template.loader import render_to_string, get_template
 from Site.core.minify_dtl import minify_scripts, minify_css, remove_html_comments
 from Site.core.static import static_safe
 from html import unescape
 import re
 
 
-def _inline_styles(html):
+# per e-mail template: de voorbereide styles uit het <style> blok
+_inline_cache = dict()
+
+
+def _parse_styles(styles):
+    """ zet de style definities om in een reguliere expressie die de betreffende tags vindt
+        en een tabel met de styles per tag
+
+        de styles worden 1x per template verwerkt (zie _inline_cache)
+    """
+
+    if not settings.ENABLE_MINIFY:          # pragma: no branch
+        # late minification
+        styles = minify_css(styles)
+
+    # tag --> [(style, [(keyword, sub_style), ...]), ...]
+    tag2styles = dict()
+    for regel in styles.split('}'):
+        pos = regel.find('{')
+        if pos < 0:
+            continue
+        style = regel[pos+1:]
+        sub_styles = [(sub_style.split(':')[0], sub_style) for sub_style in style.split(';')]
+        for tag in regel[:pos].split(','):
+            tag2styles.setdefault(tag.strip(), list()).append((style, sub_styles))
+        # for
+    # for
+
+    if len(tag2styles) == 0:
+        return None, tag2styles
+
+    # langste tag eerst, zodat "th" niet "thead" vindt
+    tags = sorted(tag2styles.keys(), key=lambda tag: len(tag), reverse=True)
+    regexp = re.compile(r'<(%s)(?=[\s/>])([^>]*)>' % '|'.join([re.escape(tag) for tag in tags]))
+
+    return regexp, tag2styles
+
+
+def _inline_styles(html, email_template_name=None):
     """ E-mail programs have the tendency to drop the <styles> section declared in the header,
         causing the layout to break. To avoid this, inlines the styles.
 
@@ -35,55 +73,47 @@ def _inline_styles(html):
                     font-size: large;
                 }
             </style>
+
+        De styles worden 1x per template geanalyseerd en daarna in 1 doorgang door de html toegepast.
     """
 
-    # convert the style definitions into a table
     pos1 = html.find('<style>')
     pos2 = html.find('</style>')
-    styles = html[pos1+7:pos2]
+    if pos1 < 0 or pos2 < pos1:
+        return html
 
-    if not settings.ENABLE_MINIFY:          # pragma: no branch
-        # late minification
-        styles = minify_css(styles)
+    try:
+        regexp, tag2styles = _inline_cache[email_template_name]
+    except KeyError:
+        regexp, tag2styles = _parse_styles(html[pos1+7:pos2])
+        if email_template_name:
+            _inline_cache[email_template_name] = (regexp, tag2styles)
 
     html = html[:pos1] + html[pos2+8:]
-    while len(styles) > 0:
-        pos1 = styles.find('{')
-        pos2 = styles.find('}')
-        style = styles[pos1+1:pos2]
-        tags = styles[:pos1].split(',')
-        styles = styles[pos2+1:]
-
-        for tag in tags:
-            pos1 = html.find('<' + tag)
-            while pos1 > 0:
-                pos2 = html.find('>', pos1+1)
-                html1 = html[:pos1]
-                sub = html[pos1:pos2]
-                html2 = html[pos2:]
-
-                pos = sub.find(' style="')
-                if pos >= 0:
-                    # prepend with the extra styles
-                    new_styles = list()
-                    for sub_style in style.split(';'):
-                        keyword, _ = sub_style.split(':')
-                        if keyword not in sub:                  # pragma: no branch
-                            # this one is new
-                            new_styles.append(sub_style)
-                    # for
-                    sub = sub[:pos+8] + ";".join(new_styles) + ';' + sub[pos+8:]
-                else:
-                    # insert the styles
-                    sub += ' style="' + style + '"'
-
-                html = html1 + sub + html2
-                pos1 = html.find('<' + tag, pos1+1)
-            # while
+
+    if regexp is None:
+        return html
+
+    def _vervang(match):
+        tag = match.group(1)
+        sub = '<' + tag + match.group(2)
+
+        for style, sub_styles in tag2styles[tag]:
+            pos = sub.find(' style="')
+            if pos >= 0:
+                # prepend with the extra styles
+                new_styles = [sub_style
+                              for keyword, sub_style in sub_styles
+                              if keyword not in sub]       # this one is new
+                sub = sub[:pos+8] + ";".join(new_styles) + ';' + sub[pos+8:]
+            else:
+                # insert the styles
+                sub += ' style="' + style + '"'
         # for
-    # while
 
-    return html
+        return sub + '>'
+
+    return regexp.sub(_vervang, html)
 
 
 def _minify_html(contents):
@@ -105,14 +135,9 @@ def _minify_html(contents):
     return clean
 
 
-def render_email_template(context, email_template_name):
-    """
-        Verwerk een django email template tot een mail body.
-        De inhoud van context is beschikbaar voor het renderen van de template.
-
-        Returns: email body in text, html + email_template_name
-    """
-
+def _basis_context():
+    """ de context die voor elke e-mail hetzelfde is """
+    context = dict()
     context['logo_url'] = settings.SITE_URL + static_safe('design/logo_with_text_khsn.png')
     # aspect ratio: 400x92 --> 217x50
     context['logo_width'] = 217
@@ -120,8 +145,12 @@ def render_email_template(context, email_template_name):
 
     context['basis_when'] = timezone.localtime(timezone.now()).strftime('%Y-%m-%d om %H:%M')
     context['basis_naam_site'] = settings.NAAM_SITE
+    return context
+
+
+def _verwerk_rendered(rendered_content, email_template_name):
+    """ splits de gerenderde template in de tekst en html versie en maak deze klaar voor verzending """
 
-    rendered_content = render_to_string(email_template_name, context)
     pos = rendered_content.find('<!DOCTYPE')
     text_content = rendered_content[:pos]
     html_content = rendered_content[pos:]
@@ -136,11 +165,44 @@ def render_email_template(context, email_template_name):
     text_content = text_content.replace('|', '\n')
     text_content = unescape(text_content)
 
-    html_content = _inline_styles(html_content)
+    html_content = _inline_styles(html_content, email_template_name)
     if not settings.ENABLE_MINIFY:              # pragma: no branch
         html_content = _minify_html(html_content)
 
     return text_content, html_content, email_template_name
 
 
+def render_email_template(context, email_template_name):
+    """
+        Verwerk een django email template tot een mail body.
+        De inhoud van context is beschikbaar voor het renderen van de template.
+
+        Returns: email body in text, html + email_template_name
+    """
+
+    context.update(_basis_context())
+
+    rendered_content = render_to_string(email_template_name, context)
+
+    return _verwerk_rendered(rendered_content, email_template_name)
+
+
+def render_email_template_bulk(contexts, email_template_name):
+    """
+        Zoals render_email_template, maar voor een reeks ontvangers.
+        De template wordt 1x geladen en de gemeenschappelijke context wordt 1x bepaald.
+
+        Levert per context de email body: text, html + email_template_name
+    """
+
+    template = get_template(email_template_name)
+    basis = _basis_context()
+
+    for context in contexts:
+        context.update(basis)
+        rendered_content = template.render(context)
+        yield _verwerk_rendered(rendered_content, email_template_name)
+    # for
+
+
 # end of file
@@ -13,10 +13,28 @@
 
 from django.conf import settings
 from django.utils import timezone
+from Mailer.models import MailQueue
+import threading
 import requests
+import json
+
+# maximaal aantal berichten per aanroep van de batch API van Postmark
+POSTMARK_BATCH_MAX = 500
+
+# maximale grootte van de berichten samen (de JSON payload) per aanroep van de batch API van Postmark
+POSTMARK_BATCH_MAX_BYTES = 50 * 1024 * 1024
+
+# maximaal aantal seconden wachten op de verbinding of het antwoord van Postmark
+# ruim korter dan de kortste wachttijd tussen twee pogingen (zie stuur_mails), zodat een mail
+# niet opnieuw geclaimd kan worden terwijl deze nog verstuurd wordt
+POSTMARK_TIMEOUT = 30
 
 _bad_email_handler = None
 
+# hergebruik de verbinding (keep-alive), zodat niet elke mail een TLS handshake kost
+# elke thread krijgt een eigen sessie, want requests.Session is niet thread-safe
+_thread_data = threading.local()
+
 
 # wordt aangeroepen vanuit ready() in Mailer.apps
 def set_bad_email_handler(f):
@@ -24,17 +42,24 @@ def set_bad_email_handler(f):
     _bad_email_handler = f
 
 
-def _send_mail_postmark(obj, stdout=None, stderr=None):
+def _get_session():
+    session = getattr(_thread_data, 'session', None)
+    if session is None:
+        session = requests.Session()
+        _thread_data.session = session
+    return session
 
-    """ Deze functie probeert een mail te versturen via PostMark.
 
-        obj: MailQueue object
-        stdout: Voor rapportage voortgang
-        stderr: Voor melden van problemen
-    """
+def _maak_headers():
+    headers = {
+        'X-Postmark-Server-Token': settings.POSTMARK_API_KEY,
+        'Accept': 'application/json',
+        'Content-Type': 'application/json',
+    }
+    return headers
 
-    # API specs: https://postmarkapp.com/developer/api/email-api
 
+def _maak_data(obj):
     data = {
         'From': settings.EMAIL_FROM_ADDRESS,
         'To': obj.mail_to,
@@ -45,20 +70,37 @@ def _send_mail_postmark(obj, stdout=None, stderr=None):
     if obj.mail_html != '':
         data['HtmlBody'] = obj.mail_html
 
-    headers = {
-        'X-Postmark-Server-Token': settings.POSTMARK_API_KEY,
-        'Accept': 'application/json',
-        'Content-Type': 'application/json',
-    }
+    return data
+
+
+def _meld_bad_email(mail_to):
+    global _bad_email_handler
+    if _bad_email_handler:                  # pragma: no branch
+        _bad_email_handler(mail_to)         # noqa
+
+
+def _send_mail_postmark(obj, stdout=None, stderr=None):
+
+    """ Deze functie probeert een mail te versturen via PostMark.
+
+        obj: MailQueue object
+        stdout: Voor rapportage voortgang
+        stderr: Voor melden van problemen
+    """
+
+    # API specs: https://postmarkapp.com/developer/api/email-api
+
+    data = _maak_data(obj)
 
     flag_bad = False
 
     try:
-        resp = requests.post(
+        resp = _get_session().post(
                         settings.POSTMARK_URL,
-                        headers=headers,
-                        json=data)
-    except (requests.exceptions.SSLError, requests.exceptions.ConnectionError) as exc:
+                        headers=_maak_headers(),
+                        json=data,
+                        timeout=POSTMARK_TIMEOUT)
+    except (requests.exceptions.SSLError, requests.exceptions.ConnectionError, requests.exceptions.Timeout) as exc:
         obj.log += "[WARNING] Exceptie bij versturen: %s\n" % str(exc)
         if stderr:
             stderr.write("[ERROR] Exceptie bij versturen e-mail: %s" % str(exc))
@@ -91,9 +133,85 @@ def _send_mail_postmark(obj, stdout=None, stderr=None):
     obj.save()
 
     if flag_bad:
-        global _bad_email_handler
-        if _bad_email_handler:                  # pragma: no branch
-            _bad_email_handler(obj.mail_to)     # noqa
+        _meld_bad_email(obj.mail_to)
+
+
+def _send_batch_postmark(objs, data, stdout=None, stderr=None):
+
+    """ Deze functie probeert een batch mails in 1 keer te versturen via PostMark.
+        Het antwoord bevat de status van elk bericht, in dezelfde volgorde.
+
+        objs: lijst met MailQueue objecten
+        data: de berichten voor Postmark, in dezelfde volgorde
+        stdout: Voor rapportage voortgang
+        stderr: Voor melden van problemen
+    """
+
+    # API specs: https://postmarkapp.com/developer/api/email-api#send-batch-emails
+
+    bad_mail_to = list()
+    aantal_verstuurd = 0
+
+    try:
+        resp = _get_session().post(
+                        settings.POSTMARK_URL + '/batch',
+                        headers=_maak_headers(),
+                        json=data,
+                        timeout=POSTMARK_TIMEOUT)
+    except (requests.exceptions.SSLError, requests.exceptions.ConnectionError, requests.exceptions.Timeout) as exc:
+        for obj in objs:
+            obj.log += "[WARNING] Exceptie bij versturen: %s\n" % str(exc)
+        # for
+        if stderr:
+            stderr.write("[ERROR] Exceptie bij versturen van %s e-mails: %s" % (len(objs), str(exc)))
+    else:
+        antwoorden = None
+        if resp.status_code == 200:
+            try:
+                antwoorden = resp.json()
+            except ValueError:
+                pass
+
+        if isinstance(antwoorden, list) and len(antwoorden) == len(objs):
+            for obj, antwoord in zip(objs, antwoorden):
+                error_code = antwoord.get('ErrorCode', -1)
+                if error_code == 0:
+                    # success!
+                    obj.log += "[INFO] Success (batch)\n"
+                    obj.is_verstuurd = True
+                    aantal_verstuurd += 1
+                else:
+                    obj.log += "[WARNING] Send mail request gaf onverwacht antwoord\n"
+                    obj.log += "  antwoord: %s\n" % repr(antwoord)
+                    if stdout:
+                        stdout.write("[WARNING] Send mail request gaf onverwacht antwoord voor mail pk=%s: %s" % (
+                                        obj.pk, repr(antwoord)))
+
+                    if error_code == 406:
+                        # inactive recipient, zie _send_mail_postmark
+                        obj.log += "[WARNING] ErrorCode 406 ontdekt in reactie, dus zet is_blocked = True\n"
+                        obj.is_blocked = True
+                        bad_mail_to.append(obj.mail_to)
+            # for
+        else:
+            for obj in objs:
+                obj.log += "[WARNING] Send batch request gaf onverwacht antwoord\n"
+                obj.log += "  response encoding:%s, status_code:%s\n" % (repr(resp.encoding), repr(resp.status_code))
+                obj.log += "  full response: %s\n" % repr(resp.text)
+            # for
+            if stdout:
+                stdout.write("[WARNING] Send batch request gaf onverwacht antwoord! response encoding:%s, status_code:%s" % (
+                                repr(resp.encoding), repr(resp.status_code)))
+                stdout.write("  full response: %s" % repr(resp.text))
+
+    MailQueue.objects.bulk_update(objs, ('log', 'is_verstuurd', 'is_blocked'))
+
+    if stdout and aantal_verstuurd:
+        stdout.write("[INFO] %s mails verstuurd" % aantal_verstuurd)
+
+    for mail_to in bad_mail_to:
+        _meld_bad_email(mail_to)
+    # for
 
 
 def send_mail(obj, stdout=None, stderr=None):
@@ -122,4 +240,79 @@ def send_mail(obj, stdout=None, stderr=None):
         _send_mail_postmark(obj, stdout, stderr)
 
 
+def _verdeel_in_batches(objs):
+    """ verdeel de mails in batches voor de batch API van Postmark
+        een batch heeft maximaal POSTMARK_BATCH_MAX berichten en maximaal POSTMARK_BATCH_MAX_BYTES aan JSON
+
+        geeft (objs, data) per batch
+    """
+    batch_objs = list()
+    batch_data = list()
+    batch_bytes = 2                             # [ en ]
+
+    for obj in objs:
+        data = _maak_data(obj)
+        aantal_bytes = len(json.dumps(data).encode('utf-8')) + 1       # +1 voor de komma
+
+        if len(batch_objs) > 0 and (len(batch_objs) >= POSTMARK_BATCH_MAX or
+                                    batch_bytes + aantal_bytes > POSTMARK_BATCH_MAX_BYTES):
+            yield batch_objs, batch_data
+            batch_objs = list()
+            batch_data = list()
+            batch_bytes = 2
+
+        batch_objs.append(obj)
+        batch_data.append(data)
+        batch_bytes += aantal_bytes
+    # for
+
+    if len(batch_objs) > 0:
+        yield batch_objs, batch_data
+
+
+def registreer_poging(objs) -> list:
+    """
+        Leg vast dat er een poging gedaan wordt om deze mails te versturen: laatste_poging, aantal_pogingen, log
+        Geeft de mails terug die verstuurd mogen worden.
+
+        Aanroepen in een korte transactie waarin de mails geclaimd zijn. Na het afronden van de transactie
+        wordt de mail door stuur_mails pas weer opgepakt als de wachttijd na deze poging verstreken is.
+    """
+
+    # voorkom problemen en dubbel zenden
+    objs = [obj for obj in objs if not obj.is_verstuurd and obj.aantal_pogingen < 25]
+    if len(objs) == 0:
+        return objs
+
+    now = timezone.localtime(timezone.now())
+    for obj in objs:
+        obj.laatste_poging = now
+        obj.aantal_pogingen += 1
+        obj.log += "[INFO] Nieuwe poging om %s\n" % now.strftime('%Y-%m-%d %H:%M:%S')
+    # for
+    MailQueue.objects.bulk_update(objs, ('laatste_poging', 'aantal_pogingen', 'log'))
+
+    return objs
+
+
+def verstuur_mails(objs, stdout=None, stderr=None):
+    """
+        Verstuur mails waarvoor de poging al vastgelegd is (zie registreer_poging)
+        via de batch API en sla per batch de resultaten op.
+        Niet aanroepen binnen een transactie, want dan blijven de mails gelockt tijdens het versturen.
+    """
+    for batch_objs, batch_data in _verdeel_in_batches(objs):
+        _send_batch_postmark(batch_objs, batch_data, stdout, stderr)
+    # for
+
+
+def send_mails(objs, stdout=None, stderr=None):
+    """
+        Zoals send_mail, maar voor een lijst met mails.
+        De mails worden via de batch API verstuurd (zie _verdeel_in_batches).
+    """
+    objs = registreer_poging(objs)
+    verstuur_mails(objs, stdout, stderr)
+
+
 # end of file
@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
 
-#  Copyright (c) 2020-2024 Ramon van der Winkel.
+#  Copyright (c) 2020-2026 Ramon van der Winkel.
 #  All rights reserved.
 #  Licensed under BSD-3-Clause-Clear. See LICENSE file for details.
 
@@ -9,11 +9,13 @@
     Luistert op localhost poort 8123
 
     Simuleert de e-mail dienst API, inclusief fout-situatie
+    Ondersteunt ook de batch API (pad eindigt op /batch)
 """
 
 # used example: https://gist.github.com/mdonkers/63e115cc0c79b4f6b8b3a6b797e485c7
 
 from http.server import BaseHTTPRequestHandler, HTTPServer
+import json
 import time
 
 
@@ -30,11 +32,44 @@ class MyServer(BaseHTTPRequestHandler):
     #    self.end_headers()
     #    self.wfile.write("GET request for {}".format(self.path).encode('utf-8'))
 
+    def _do_batch(self, data):
+        # batch API: antwoord met de status van elk bericht, in dezelfde volgorde
+        antwoorden = list()
+        is_delay = False
+        for bericht in json.loads(data):
+            bericht_str = json.dumps(bericht)
+            if "@bounce.now" in bericht['To']:
+                antwoord = {"ErrorCode": 406,
+                            "Message": "You tried to send to recipient(s) that have been marked as inactive."}
+            elif "faal" in bericht_str:
+                antwoord = {"ErrorCode": 300,
+                            "Message": "Gesimuleerde faal"}
+            else:
+                if "delay" in bericht_str:
+                    is_delay = True
+                antwoord = {"ErrorCode": 0,
+                            "Message": "OK",
+                            "To": bericht['To']}
+            antwoorden.append(antwoord)
+        # for
+
+        if is_delay:
+            time.sleep(3)
+
+        self.send_response(200)
+        self.send_header('Content-type', 'application/json')
+        self.end_headers()
+        self.wfile.write(json.dumps(antwoorden).encode('utf-8'))
+
     def do_POST(self):                                          # noqa
         data_len = int(self.headers['Content-Length'])
         data = self.rfile.read(data_len).decode('utf-8')
         # print("POST request\nPath: %s\nHeaders:\n%s\n\nBody:\n%s" % (str(self.path), str(self.headers), data))
 
+        if self.path.endswith('/batch'):
+            self._do_batch(data)
+            return
+
         resp = ''
 
         if "@bounce.now" in data:
@@ -1,10 +1,11 @@
 # -*- coding: utf-8 -*-
 
-#  Copyright (c) 2020-2025 Ramon van der Winkel.
+#  Copyright (c) 2020-2026 Ramon van der Winkel.
 #  All rights reserved.
 #  Licensed under BSD-3-Clause-Clear. See LICENSE file for details.
 
 from django.test import TestCase, override_settings
+from django.utils import timezone
 from django.core import management
 from Mailer.models import MailQueue, mailer_opschonen
 from Mailer.operations import mailer_queue_email, mailer_notify_internal_error
@@ -102,6 +103,84 @@ class TestMailerCliGoedBase(E2EHelpers, TestCase):
         self.assertTrue(obj.is_verstuurd)
         self.assertTrue('(verstuurd)' in str(obj))
 
+    def test_batch(self):
+        # requires websim_mailer.py running in the background
+
+        # stop een aantal mails in de queue, waaronder een paar die niet verstuurd kunnen worden
+        mailer_queue_email(TEST_EMAIL_ADRES, 'onderwerp_1', 'body\ndoei!\n')
+        mailer_queue_email(TEST_EMAIL_ADRES, 'onderwerp faal', 'body\ndoei!\n')
+        mailer_queue_email('iemand@bounce.now', 'onderwerp_3', 'body\ndoei!\n')
+        mailer_queue_email(TEST_EMAIL_ADRES, 'onderwerp_4', ('body\ndoei!\n', '<html>body</html>', 'template'))
+
+        with self.assert_max_queries(20):
+            f1, f2 = self.run_management_command('stuur_mails', '--skip_old', '--quick', '1')
+        # print("f1: %s" % f1.getvalue())
+        # print("f2: %s" % f2.getvalue())
+        self.assertTrue('[INFO] Aantal nieuwe mails geprobeerd te versturen: 4' in f2.getvalue())
+        self.assertTrue('[INFO] 2 mails verstuurd' in f2.getvalue())
+        self.assertEqual(f1.getvalue(), '')
+
+        for obj in MailQueue.objects.all():
+            self.assertEqual(obj.aantal_pogingen, 1)
+            if obj.mail_subj == 'onderwerp faal':
+                self.assertFalse(obj.is_verstuurd)
+                self.assertFalse(obj.is_blocked)
+            elif obj.mail_to == 'iemand@bounce.now':
+                self.assertFalse(obj.is_verstuurd)
+                self.assertTrue(obj.is_blocked)
+                self.assertTrue('ErrorCode 406' in obj.log)
+            else:
+                self.assertTrue(obj.is_verstuurd)
+        # for
+
+    def test_backoff(self):
+        # requires websim_mailer.py running in the background
+
+        # een mail waarvoor net een poging mislukt is
+        mailer_queue_email(TEST_EMAIL_ADRES, 'onderwerp_1', 'body\ndoei!\n')
+        obj = MailQueue.objects.first()
+        obj.aantal_pogingen = 3
+        obj.laatste_poging = timezone.now() - datetime.timedelta(minutes=3)
+        obj.save(update_fields=['aantal_pogingen', 'laatste_poging'])
+
+        # na 3 pogingen moet 4 minuten gewacht worden
+        with self.assert_max_queries(20):
+            f1, f2 = self.run_management_command('stuur_mails', '1', '--quick')
+        self.assertTrue('[INFO] Aantal oude mails geprobeerd te versturen: 0' in f2.getvalue())
+
+        obj.refresh_from_db()
+        self.assertEqual(obj.aantal_pogingen, 3)
+        self.assertFalse(obj.is_verstuurd)
+
+        # wachttijd is verstreken
+        obj.laatste_poging = timezone.now() - datetime.timedelta(minutes=5)
+        obj.save(update_fields=['laatste_poging'])
+
+        with self.assert_max_queries(20):
+            f1, f2 = self.run_management_command('stuur_mails', '1', '--quick')
+        self.assertTrue('[INFO] Aantal oude mails geprobeerd te versturen: 1' in f2.getvalue())
+
+        obj.refresh_from_db()
+        self.assertEqual(obj.aantal_pogingen, 4)
+        self.assertTrue(obj.is_verstuurd)
+
+        # na het maximum aantal pogingen wordt het niet meer geprobeerd
+        mailer_queue_email(TEST_EMAIL_ADRES, 'onderwerp_2', 'body\ndoei!\n')
+        MailQueue.objects.filter(is_verstuurd=False).update(
+                                    aantal_pogingen=25,
+                                    laatste_poging=timezone.now() - datetime.timedelta(days=1))
+
+        f1, f2 = self.run_management_command('stuur_mails', '1', '--quick')
+        self.assertTrue('[INFO] Aantal oude mails geprobeerd te versturen: 0' in f2.getvalue())
+
+    def test_workers(self):
+        # de workers draaien in eigen threads met een eigen database verbinding
+        # en kunnen de mails van de test (nog niet gecommit) dus niet zien
+        f1, f2 = self.run_management_command('stuur_mails', '1', '--quick', '--workers', '3')
+        self.assertTrue('[INFO] Aantal oude mails geprobeerd te versturen: 0' in f2.getvalue())
+        self.assertTrue('[INFO] Aantal nieuwe mails geprobeerd te versturen: 0' in f2.getvalue())
+        self.assertEqual(f1.getvalue(), '')
+
     def test_stuur_mail_vertraag(self):
         # requires websim_mailer.py running in the background
 
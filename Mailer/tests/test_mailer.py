@@ -6,7 +6,10 @@
 
 from django.test import TestCase, override_settings
 from Mailer.models import MailQueue
-from Mailer.operations import mailer_queue_email, send_mail
+from Mailer.operations import mailer_queue_email, send_mail, send_mails
+from Mailer.operations.send import _maak_data
+from unittest.mock import patch
+import json
 
 
 class TestMailerGoodBase(TestCase):
@@ -53,6 +56,43 @@ class TestMailerGoodBase(TestCase):
         self.assertEqual(obj.aantal_pogingen, 1)
         self.assertFalse(obj.is_verstuurd)
 
+    def test_send_mails_batches(self):
+        # requires websim_mailer.py running in the background
+
+        for nr in range(5):
+            mailer_queue_email('schutter@test.not', 'onderwerp %s' % nr, 'body\ndoei!\n')
+        # for
+        objs = list(MailQueue.objects.order_by('pk'))
+
+        # de batches worden begrensd op het aantal berichten
+        posts = list()
+        with patch('Mailer.operations.send.POSTMARK_BATCH_MAX', 3):
+            with patch('Mailer.operations.send._send_batch_postmark',
+                       side_effect=lambda batch_objs, data, *args: posts.append(len(data))):
+                send_mails(objs)
+        self.assertEqual(posts, [3, 2])
+
+        # en op de grootte van de payload: ruimte voor 2 berichten per batch
+        grootte = len(json.dumps(_maak_data(objs[0])).encode('utf-8')) + 1
+        posts = list()
+        MailQueue.objects.update(aantal_pogingen=0)
+        objs = list(MailQueue.objects.order_by('pk'))
+        with patch('Mailer.operations.send.POSTMARK_BATCH_MAX_BYTES', 2 + 2 * grootte + 10):
+            with patch('Mailer.operations.send._send_batch_postmark',
+                       side_effect=lambda batch_objs, data, *args: posts.append(len(data))):
+                send_mails(objs)
+        self.assertEqual(posts, [2, 2, 1])
+
+        # echt versturen
+        MailQueue.objects.update(aantal_pogingen=0)
+        objs = list(MailQueue.objects.order_by('pk'))
+        with patch('Mailer.operations.send.POSTMARK_BATCH_MAX', 2):
+            send_mails(objs)
+        for obj in MailQueue.objects.all():
+            self.assertEqual(obj.aantal_pogingen, 1)
+            self.assertTrue(obj.is_verstuurd)
+        # for
+
     def test_whitelist(self):
         # controleer dat de whitelist zijn werk doet
         self.assertEqual(0, MailQueue.objects.count())
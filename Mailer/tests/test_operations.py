@@ -1,12 +1,14 @@
 # -*- coding: utf-8 -*-
 
-#  Copyright (c) 2020-2025 Ramon van der Winkel.
+#  Copyright (c) 2020-2026 Ramon van der Winkel.
 #  All rights reserved.
 #  Licensed under BSD-3-Clause-Clear. See LICENSE file for details.
 
 from django.test import TestCase, override_settings
 from Mailer.models import MailQueue
-from Mailer.operations import mailer_queue_email, mailer_obfuscate_email, mailer_email_is_valide, render_email_template
+from Mailer.operations import (mailer_queue_email, mailer_queue_bulk, mailer_obfuscate_email, mailer_email_is_valide,
+                               render_email_template)
+from Mailer.operations.render import _inline_styles, _inline_cache
 
 
 class TestMailerOperations(TestCase):
@@ -37,6 +39,38 @@ class TestMailerOperations(TestCase):
         mailer_queue_email('', 'onderwerp', 'body\ndoei!\n')
         self.assertEqual(1, MailQueue.objects.count())
 
+    def test_queue_bulk(self):
+        test_email_template = 'email_account/wachtwoord-vergeten.dtl'
+        ontvangers = [('een@test.not', {'url': 'url_een', 'naam_site': 'TestSite', 'contact_email': 'x@test.not'}),
+                      ('', {'url': 'url_leeg'}),
+                      ('twee@test.not', {'url': 'url_twee', 'naam_site': 'TestSite', 'contact_email': 'x@test.not'})]
+
+        with override_settings(EMAIL_ADDRESS_WHITELIST=('twee@test.not',)):
+            aantal = mailer_queue_bulk(test_email_template, 'onderwerp', ontvangers)
+        self.assertEqual(aantal, 2)
+        self.assertEqual(MailQueue.objects.count(), 2)
+
+        mail = MailQueue.objects.get(mail_to='een@test.not')
+        self.assertTrue(mail.is_blocked)
+        self.assertEqual(mail.mail_subj, 'onderwerp')
+        self.assertEqual(mail.template_used, test_email_template)
+        self.assertTrue('url_een' in mail.mail_html)
+        self.assertTrue('url_een' in mail.mail_text)
+
+        mail = MailQueue.objects.get(mail_to='twee@test.not')
+        self.assertFalse(mail.is_blocked)
+        self.assertTrue('url_twee' in mail.mail_html)
+        self.assertFalse('url_een' in mail.mail_html)
+
+        # gelijk aan een losse mail
+        context = dict(ontvangers[2][1])
+        out_text, out_html, _ = render_email_template(context, test_email_template)
+        self.assertEqual(mail.mail_text, out_text)
+        self.assertEqual(mail.mail_html, out_html)
+
+        # niemand om naar te sturen
+        self.assertEqual(mailer_queue_bulk(test_email_template, 'onderwerp', [('', {})]), 0)
+
     def test_obfuscate_email(self):
         self.assertEqual(mailer_obfuscate_email(''), '')
         self.assertEqual(mailer_obfuscate_email('x'), 'x')
@@ -88,5 +122,32 @@ class TestMailerOperations(TestCase):
         self.assertTrue(out_html != '')
         self.assertEqual(template_used, test_email_template)
 
+        # de styles van deze template zijn nu in de cache
+        self.assertTrue(test_email_template in _inline_cache)
+
+    def test_inline_styles(self):
+        html = ('<html><head><style>table{border:1px}th,td{padding:10px;color:red}</style></head>'
+                '<body><table><thead><tr><th>kop</th></tr></thead>'
+                '<tr><td>1</td><td style="color:blue">2</td></tr></table></body></html>')
+
+        out = _inline_styles(html)
+        self.assertEqual(out,
+                         '<html><head></head>'
+                         '<body><table style="border:1px"><thead><tr><th style="padding:10px;color:red">kop</th></tr></thead>'
+                         '<tr><td style="padding:10px;color:red">1</td><td style="padding:10px;color:blue">2</td></tr></table>'
+                         '</body></html>')
+
+        # de tweede keer komen de styles uit de cache
+        out1 = _inline_styles(html, 'test_inline.dtl')
+        self.assertEqual(out, out1)
+        out2 = _inline_styles(html.replace('color:red', 'color:green'), 'test_inline.dtl')
+        self.assertEqual(out, out2)
+        del _inline_cache['test_inline.dtl']
+
+        # geen styles
+        html = '<html><head></head><body><table></table></body></html>'
+        self.assertEqual(_inline_styles(html), html)
+        self.assertEqual(_inline_styles('<html><style></style><p>hoi</p></html>'), '<html><p>hoi</p></html>')
+
 
 # end of file
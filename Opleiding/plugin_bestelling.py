@@ -8,7 +8,7 @@ from django.conf import settings
 from django.utils import timezone
 from Bestelling.bestel_plugin_base import BestelPluginBase
 from Bestelling.definities import BESTELLING_REGEL_CODE_OPLEIDING, BESTELLING_KORT_BREAK
-from Bestelling.models import BestellingRegel
+from Bestelling.models import BestellingRegel, BestellingMandje
 from Betaal.format import format_bedrag_euro
 from Functie.models import Functie
 from Opleiding.definities import (OPLEIDING_INSCHRIJVING_STATUS_TO_STR, OPLEIDING_AFMELDING_STATUS_TO_STR,
@@ -29,12 +29,19 @@ class OpleidingBestelPlugin(BestelPluginBase):
     def __init__(self):
         super().__init__()
 
-    def mandje_opschonen(self, verval_datum):
-        mandje_pks = list()
-        for inschrijving in (OpleidingInschrijving
-                             .objects
-                             .filter(status=OPLEIDING_INSCHRIJVING_STATUS_RESERVERING_MANDJE,
-                                     wanneer_aangemeld__lt=verval_datum)
+    @staticmethod
+    def _vervallen(verval_datum):
+        return (OpleidingInschrijving
+                .objects
+                .filter(status=OPLEIDING_INSCHRIJVING_STATUS_RESERVERING_MANDJE,
+                        wanneer_aangemeld__lt=verval_datum))
+
+    def mandjes_met_vervallen(self, verval_datum) -> list[int]:
+        return self._get_mandje_pks(self._vervallen(verval_datum))
+
+    def mandje_opschonen(self, mandje: BestellingMandje, verval_datum):
+        for inschrijving in (self._vervallen(verval_datum)
+                             .filter(bestelling_regel__bestellingmandje=mandje)
                              .select_related('bestelling_regel',
                                              'koper')):
 
@@ -43,11 +50,6 @@ class OpleidingBestelPlugin(BestelPluginBase):
             self.stdout.write('[INFO] Vervallen: BestellingRegel pk=%s inschrijving (%s) in mandje van %s' % (
                               regel.pk, inschrijving, inschrijving.koper))
 
-            # onthoud in welk mandje deze lag
-            mandje = regel.bestellingmandje_set.first()
-            if mandje.pk not in mandje_pks:
-                mandje_pks.append(mandje.pk)
-
             self.annuleer(regel)
 
             # verwijder het product, dan verdwijnt deze ook uit het mandje
@@ -55,8 +57,6 @@ class OpleidingBestelPlugin(BestelPluginBase):
             regel.delete()
         # for
 
-        return mandje_pks
-
     def reserveer(self, product_pk: int, mandje_van_str: str) -> BestellingRegel | None:
         """ Maak een reservering voor de opleiding
             en geef een BestellingRegel terug.
@@ -4,7 +4,8 @@
 #  All rights reserved.
 #  Licensed under BSD-3-Clause-Clear. See LICENSE file for details.
 
-from django.contrib.sessions.backends.db import SessionStore
+from django.core.cache import cache
+from Account.operations.session_vars import VLUCHTIG_CACHE_KEY
 from TestHelpers import browser_helper as bh
 from Plein.views import SESSIONVAR_VORIGE_POST
 import time
@@ -17,9 +18,8 @@ class TestBrowserPleinStuurPing(bh.BrowserTestCase):
     def _check_ping(self):
         mh_session_id = self.get_browser_cookie_value('mh_session_id')
         # print('mh_session_id cookie value: %s' % mh_session_id)
-        session = SessionStore(session_key=mh_session_id)
-        session[SESSIONVAR_VORIGE_POST] = 'forceer'
-        session.save()
+        cache_key = VLUCHTIG_CACHE_KEY % (mh_session_id, SESSIONVAR_VORIGE_POST)
+        cache.set(cache_key, 'forceer')
 
         self.do_navigate_to(self.url_plein, allow_same=True)
 
@@ -33,9 +33,8 @@ class TestBrowserPleinStuurPing(bh.BrowserTestCase):
         # wacht even en check daarna dat de post gedaan is door de js load event handler
         time.sleep(1)
 
-        session = SessionStore(session_key=mh_session_id)
-        stamp = session.get(SESSIONVAR_VORIGE_POST, '')
-        self.assertFalse(stamp == '')
+        stamp = cache.get(cache_key, '')
+        self.assertFalse(stamp in ('', 'forceer'))
 
     def test_sporter(self):
         self.do_wissel_naar_sporter()       # doet redirect naar /plein/
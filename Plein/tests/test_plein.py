@@ -5,6 +5,7 @@
 #  Licensed under BSD-3-Clause-Clear. See LICENSE file for details.
 
 from django.test import TestCase, override_settings
+from django.contrib.sessions.models import Session
 from BasisTypen.definities import SCHEIDS_VERENIGING
 from Bestelling.definities import BESTELLING_REGEL_CODE_WEBWINKEL
 from Bestelling.models import BestellingMandje, BestellingRegel
@@ -428,5 +429,13 @@ class TestPlein(E2EHelpers, TestCase):
         resp = self.client.get(self.url_plein)
         self.assertFalse(b'data-url-ping' in resp.content)
 
+        # nog een ping --> sessie wordt niet opnieuw opgeslagen
+        session_key = self.client.session.session_key
+        session_data = Session.objects.get(session_key=session_key).session_data
+        resp = self.client.post(self.url_ping)
+        data = self.assert200_json(resp)
+        self.assertEqual(data, {'ok': 'j'})
+        self.assertEqual(Session.objects.get(session_key=session_key).session_data, session_data)
+
 
 # end of file
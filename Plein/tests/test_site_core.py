@@ -1,15 +1,19 @@
 # -*- coding: utf-8 -*-
 
-#  Copyright (c) 2021-2025 Ramon van der Winkel.
+#  Copyright (c) 2021-2026 Ramon van der Winkel.
 #  All rights reserved.
 #  Licensed under BSD-3-Clause-Clear. See LICENSE file for details.
 
 from django.conf import settings
+from django.db import connection
 from django.test import TestCase
-from Site.core.background_sync import BackgroundSync
+from Site.core.background_sync import BackgroundSync, get_verwerkt_listener
 from Site.core.transpose_js import AppJsFinder
+from unittest.mock import patch
 import tempfile
+import psycopg
 import os
+import threading
 
 
 class TestSiteCore(TestCase):
@@ -17,7 +21,7 @@ class TestSiteCore(TestCase):
     """ unit tests voor de Site applicatie, diverse core modules """
 
     def test_background_sync(self):
-        sync = BackgroundSync(settings.BACKGROUND_SYNC_POORT)
+        sync = BackgroundSync(settings.BACKGROUND_SYNC_POORT, methode='udp')
 
         got_ping = sync.wait_for_ping(timeout=0.01)
         self.assertFalse(got_ping)
@@ -27,9 +31,27 @@ class TestSiteCore(TestCase):
         got_ping = sync.wait_for_ping(timeout=0.01)
         self.assertTrue(got_ping)
 
+    def test_background_sync_fork(self):
+        # de socket wordt pas aangemaakt bij het eerste gebruik
+        sync = BackgroundSync(settings.BACKGROUND_SYNC_POORT, methode='udp')
+        self.assertIsNone(sync._sock)
+
+        sync.ping()
+        sock = sync._sock
+        self.assertIsNotNone(sock)
+        sync.ping()
+        self.assertTrue(sync._sock is sock)
+
+        # na een fork() maakt het nieuwe proces een eigen socket
+        with patch('Site.core.background_sync.os.getpid', return_value=os.getpid() + 1):
+            self.assertFalse(sync.wait_for_ping(timeout=0.01))
+            self.assertFalse(sync._sock is sock)
+            sync.ping()
+            self.assertTrue(sync.wait_for_ping(timeout=0.01))
+
     def test_conflict(self):
-        sync1 = BackgroundSync(settings.BACKGROUND_SYNC_POORT)
-        sync2 = BackgroundSync(settings.BACKGROUND_SYNC_POORT)
+        sync1 = BackgroundSync(settings.BACKGROUND_SYNC_POORT, methode='udp')
+        sync2 = BackgroundSync(settings.BACKGROUND_SYNC_POORT, methode='udp')
 
         got_ping = sync1.wait_for_ping(timeout=0.01)
         self.assertFalse(got_ping)
@@ -38,6 +60,129 @@ class TestSiteCore(TestCase):
         got_ping = sync2.wait_for_ping(timeout=0.01)
         self.assertFalse(got_ping)
 
+    def test_background_sync_notify(self):
+        sync = BackgroundSync(settings.BACKGROUND_SYNC_POORT, methode='notify')
+
+        got_ping = sync.wait_for_ping(timeout=0.01)
+        self.assertFalse(got_ping)
+
+        # de test draait in een transactie, dus de NOTIFY moet via een andere verbinding
+        zender = connection.get_new_connection(connection.get_connection_params())
+        zender.autocommit = True
+        # twee pings in 1 transactie, zodat deze tegelijk afgeleverd worden
+        zender.execute("SELECT pg_notify('background_sync_%s', '1'), pg_notify('background_sync_%s', '2')" % (
+                            settings.BACKGROUND_SYNC_POORT, settings.BACKGROUND_SYNC_POORT))
+
+        got_ping = sync.wait_for_ping(timeout=1.0)
+        self.assertTrue(got_ping)
+
+        # twee pings tellen als 1
+        got_ping = sync.wait_for_ping(timeout=0.01)
+        self.assertFalse(got_ping)
+
+        # meerdere ontvangers op hetzelfde kanaal is geen probleem
+        sync2 = BackgroundSync(settings.BACKGROUND_SYNC_POORT, methode='notify')
+        got_ping = sync2.wait_for_ping(timeout=0.01)
+        self.assertFalse(got_ping)
+
+        # verbroken verbinding: timeout afwachten en daarna opnieuw verbinden
+        zender.execute("SELECT pg_terminate_backend(%s)" % sync._listen_conn.info.backend_pid)
+        zender.close()
+        got_ping = sync.wait_for_ping(timeout=0.01)
+        self.assertFalse(got_ping)
+        self.assertIsNone(sync._listen_conn)
+
+        # ping stuurt alleen een NOTIFY (binnen de transactie, dus komt niet aan) en geen UDP ping
+        with patch.object(sync, '_sock') as mock_sock:
+            sync.ping()
+        mock_sock.sendto.assert_not_called()
+        got_ping = sync.wait_for_ping(timeout=0.01)
+        self.assertFalse(got_ping)
+        self.assertIsNotNone(sync._listen_conn)
+
+        # database niet bereikbaar: wacht de timeout af
+        with patch.object(connection, 'get_new_connection', side_effect=psycopg.OperationalError):
+            sync2._sluit_listener()
+            got_ping = sync2.wait_for_ping(timeout=0.01)
+        self.assertFalse(got_ping)
+        self.assertIsNone(sync2._listen_conn)
+
+    def test_wacht_op_verwerkt(self):
+        sync = BackgroundSync(settings.BACKGROUND_SYNC_POORT, methode='notify')
+        listener = get_verwerkt_listener()
+        self.addCleanup(listener.stop)
+
+        # achtergrondtaak was al klaar
+        self.assertTrue(sync.wacht_op_verwerkt(5, lambda: True, timeout=0.01))
+
+        # geen melding
+        self.assertFalse(sync.wacht_op_verwerkt(5, lambda: False, timeout=0.01))
+
+        # de test draait in een transactie, dus de NOTIFY moet via een andere verbinding
+        zender = connection.get_new_connection(connection.get_connection_params())
+        zender.autocommit = True
+        kanaal = 'background_sync_%s_verwerkt' % settings.BACKGROUND_SYNC_POORT
+
+        # melding voor een andere mutatie
+        zender.execute("SELECT pg_notify('%s', '4,50')" % kanaal)
+        self.assertFalse(sync.wacht_op_verwerkt(5, lambda: False, timeout=0.1))
+
+        # melding komt binnen tijdens het wachten
+        timer = threading.Timer(0.1, lambda: zender.execute("SELECT pg_notify('%s', '4,5,6')" % kanaal))
+        timer.start()
+        self.assertTrue(sync.wacht_op_verwerkt(5, lambda: False, timeout=2.0))
+        timer.join()
+
+        # de LISTEN verbinding wordt gedeeld en blijft open
+        conn = listener._conn
+        self.assertIsNotNone(conn)
+        self.assertTrue(sync.wacht_op_verwerkt(5, lambda: True, timeout=0.01))
+        sync2 = BackgroundSync(settings.BACKGROUND_SYNC_POORT + 1, methode='notify')
+        self.assertFalse(sync2.wacht_op_verwerkt(5, lambda: False, timeout=0.01))
+        self.assertTrue(listener._conn is conn)
+        self.assertFalse(conn.closed)
+        self.assertEqual(listener._wachters, dict())
+
+        # nieuw kanaal: de thread voert de LISTEN uit
+        timer = threading.Timer(0.6, lambda: zender.execute("SELECT pg_notify('%s', '7')" %
+                                                            sync2._kanaal_verwerkt))
+        timer.start()
+        self.assertTrue(sync2.wacht_op_verwerkt(7, lambda: False, timeout=2.0))
+        timer.join()
+
+        # verbroken verbinding: terugvallen op pollen
+        zender.execute("SELECT pg_terminate_backend(%s)" % conn.info.backend_pid)
+        antwoorden = [False, False, True]
+        self.assertTrue(sync.wacht_op_verwerkt(5, lambda: antwoorden.pop(0), timeout=2.0))
+        self.assertIsNone(listener._conn)
+
+        # na een fout wordt niet meteen opnieuw verbonden
+        self.assertFalse(sync.wacht_op_verwerkt(5, lambda: False, timeout=0.01))
+        self.assertIsNone(listener._conn)
+
+        # database niet bereikbaar
+        listener._volgende_poging = 0.0
+        with patch.object(connection, 'get_new_connection', side_effect=psycopg.OperationalError):
+            self.assertFalse(sync.wacht_op_verwerkt(5, lambda: False, timeout=0.01))
+        self.assertIsNone(listener._conn)
+
+        # daarna wordt opnieuw verbonden
+        listener._volgende_poging = 0.0
+        self.assertFalse(sync.wacht_op_verwerkt(5, lambda: False, timeout=0.01))
+        self.assertIsNotNone(listener._conn)
+        zender.close()
+
+        # in de transactie komt de melding niet aan
+        sync.meld_verwerkt([5])
+        self.assertFalse(sync.wacht_op_verwerkt(5, lambda: False, timeout=0.01))
+
+        # methode udp: pollen
+        sync = BackgroundSync(settings.BACKGROUND_SYNC_POORT, methode='udp')
+        sync.meld_verwerkt([5])
+        antwoorden = [False, True]
+        self.assertTrue(sync.wacht_op_verwerkt(5, lambda: antwoorden.pop(0), timeout=1.0))
+        self.assertFalse(sync.wacht_op_verwerkt(5, lambda: False, timeout=0.1))
+
     def test_minify_js(self):
         obj = AppJsFinder(app_names=['Avoid all real apps'])
 
@@ -11,7 +11,7 @@ from django.shortcuts import redirect, render, reverse
 from django.views.generic import TemplateView, View
 from django.contrib.auth.mixins import UserPassesTestMixin
 from Account.models import get_account
-from Account.operations import zet_sessionvar_if_changed
+from Account.operations import get_vluchtige_sessionvar, zet_vluchtige_sessionvar
 from Bestelling.operations import eval_mandje_inhoud
 from Functie.definities import Rol
 from Functie.rol import (rol_get_huidige, rol_get_beschrijving, rol_mag_wisselen, rol_eval_rechten_simpel,
@@ -200,7 +200,7 @@ class PleinView(View):
         if allow_ping:
             # laat een POST doen naar onszelf, maar maximaal 1x per minuut
             # (stamp bevat geen seconden)
-            prev_stamp = request.session.get(SESSIONVAR_VORIGE_POST, '')
+            prev_stamp = get_vluchtige_sessionvar(request, SESSIONVAR_VORIGE_POST, '')
             do_ping = prev_stamp != plein_datetime_stamp_str()
             if do_ping:
                 context['url_ping'] = reverse('Plein:plein')        # geen opvallende url
@@ -233,8 +233,9 @@ class PleinView(View):
 
             # onthoud wanneer deze post was
             # wordt gebruikt om de frequentie te beperken
+            # staat niet in de sessie, zodat de ping-back niet steeds de sessie opslaat
             stamp = plein_datetime_stamp_str()
-            zet_sessionvar_if_changed(request, SESSIONVAR_VORIGE_POST, stamp)
+            zet_vluchtige_sessionvar(request, SESSIONVAR_VORIGE_POST, stamp, 2 * 60)
 
             out = {'ok': 'j'}
         else:
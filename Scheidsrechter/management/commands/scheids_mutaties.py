@@ -8,13 +8,10 @@
     deze komen binnen via ScheidsMutatie
 """
 
-from django.db import connection
 from django.conf import settings
 from django.urls import reverse
 from django.utils import timezone
 from django.utils.formats import date_format
-from django.db.utils import DataError, OperationalError, IntegrityError, DEFAULT_DB_ALIAS
-from django.core.management.base import BaseCommand
 from Account.models import Account
 from BasisTypen.definities import SCHEIDS_NIET, SCHEIDS_VERENIGING
 from Competitie.models import CompetitieMatch
@@ -22,7 +19,7 @@ from Functie.models import Functie
 from Locatie.models import Reistijd, WedstrijdLocatie
 from Locatie.operations.reistijd_bepalen import ReistijdBepaler
 from Mailer.operations import mailer_queue_email, render_email_template
-from Site.core.background_sync import BackgroundSync
+from Site.core.mutatie_daemon import MutatieDaemonCommand
 from Scheidsrechter.definities import (SCHEIDS_MUTATIE_WEDSTRIJD_BESCHIKBAARHEID_OPVRAGEN,
                                        SCHEIDS_MUTATIE_STUUR_NOTIFICATIES_WEDSTRIJD,
                                        SCHEIDS_MUTATIE_STUUR_NOTIFICATIES_MATCH,
@@ -35,9 +32,7 @@ from Vereniging.models import Vereniging
 from Wedstrijden.definities import (WEDSTRIJD_STATUS_GEACCEPTEERD, WEDSTRIJD_BEGRENZING_LANDELIJK,
                                     WEDSTRIJD_DISCIPLINE_INDOOR)
 from Wedstrijden.models import Wedstrijd
-import traceback
 import datetime
-import sys
 
 
 EMAIL_TEMPLATE_BESCHIKBAARHEID_OPGEVEN = 'email_scheidsrechter/beschikbaarheid-opgeven.dtl'
@@ -219,20 +214,19 @@ def stuur_email_naar_sr_voor_match_niet_meer_nodig(match: CompetitieMatch, sport
                        mail_body)
 
 
-class Command(BaseCommand):
+class Command(MutatieDaemonCommand):
 
     help = "Scheidsrechter mutaties verwerken"
 
+    taak_naam = 'scheids_mutaties'
+    mutatie_model = ScheidsMutatie
+    mutatie_select_related = ('wedstrijd',
+                              'wedstrijd__locatie')
+    sync_poort_setting = 'BACKGROUND_SYNC__SCHEIDS_MUTATIES'
+
     def __init__(self, stdout=None, stderr=None, no_color=False, force_color=False):
         super().__init__(stdout, stderr, no_color, force_color)
 
-        self.stop_at = datetime.datetime.now()
-
-        self._sync = BackgroundSync(settings.BACKGROUND_SYNC__SCHEIDS_MUTATIES)
-        self._count_ping = 0
-
-        self._hoogste_mutatie_pk = None
-
         functie_cs = Functie.objects.get(rol='CS')
         self._email_cs = functie_cs.bevestigde_email
 
@@ -250,15 +244,6 @@ class Command(BaseCommand):
             loc.verenigingen.add(self.ver_bondsbureau)
         self.locatie_placeholder = loc
 
-    def add_arguments(self, parser):
-        parser.add_argument('duration', type=int,
-                            choices=(1, 2, 5, 7, 10, 15, 20, 30, 45, 60),
-                            help="Maximum aantal minuten actief blijven")
-        parser.add_argument('--stop_exactly', type=int, default=None, choices=range(60),
-                            help="Stop op deze minuut")
-        parser.add_argument('--quick', action='store_true')                 # for testing
-        parser.add_argument('--use-test-database', action='store_true')     # for testing
-
     def _reistijd_opvragen(self, locatie, sporter):
         """ vraag de reistijd op tussen de postcode van de sporter/scheidsrechter en de locatie """
 
@@ -320,9 +305,10 @@ class Command(BaseCommand):
                 stuur_email_naar_sr_beschikbaarheid_opgeven(wedstrijd, vraag, sporter.account, self._email_cs)
         # for
 
-        # verwerk de nieuwe verzoeken voor reistijd
+        # geef de nieuwe verzoeken voor reistijd meteen een schatting
+        # de echte reistijd wordt later opgevraagd door reistijd_bijwerken
         bepaler = ReistijdBepaler(self.stdout, self.stderr, 75)
-        bepaler.run()
+        bepaler.run(verfijnen=False)
 
     def _adjust_rk_bk_datum_reeks(self, wedstrijd, alle_datums):
         self.stdout.write('[WARNING] Wijziging RK/BK datum reeks: datum_begin: %s --> %s; datum_einde: %s --> %s' % (
@@ -745,7 +731,7 @@ class Command(BaseCommand):
                 self.stdout.write('[WARNING] Geen lat/lon bekend voor locatie met pk=%s' % locatie.pk)
         # for
 
-    def _verwerk_mutatie(self, mutatie):
+    def verwerk_mutatie(self, mutatie):
         code = mutatie.mutatie
 
         if code == SCHEIDS_MUTATIE_WEDSTRIJD_BESCHIKBAARHEID_OPVRAGEN:
@@ -771,136 +757,6 @@ class Command(BaseCommand):
         else:
             self.stdout.write('[ERROR] Onbekende mutatie code %s (pk=%s)' % (code, mutatie.pk))
 
-    def _verwerk_nieuwe_mutaties(self):
-        """ Deze routine wordt aangeroepen als het aantal mutaties in de database gewijzigd is """
-        begin = datetime.datetime.now()
-
-        try:
-            mutatie_latest = ScheidsMutatie.objects.latest('pk')
-        except ScheidsMutatie.DoesNotExist:             # pragma: no cover
-            # alle mutatie records zijn verwijderd
-            return
-        # als hierna een extra mutatie aangemaakt wordt dan verwerken we een record
-        # misschien dubbel, maar daar kunnen we tegen
-
-        if self._hoogste_mutatie_pk:        # staat initieel op None        # pragma: no cover
-            # gebruik deze informatie om te filteren
-            self.stdout.write('[INFO] vorige hoogste ScheidsMutatie pk is %s' % self._hoogste_mutatie_pk)
-            qset = (ScheidsMutatie
-                    .objects
-                    .filter(pk__gt=self._hoogste_mutatie_pk))
-        else:
-            qset = (ScheidsMutatie
-                    .objects
-                    .all())         # deferred
-
-        mutatie_pks = qset.exclude(is_verwerkt=True).order_by('pk').values_list('pk', flat=True)     # deferred
-
-        self._hoogste_mutatie_pk = mutatie_latest.pk
-
-        for pk in mutatie_pks:
-            # we halen de records hier 1 voor 1 op
-            # zodat we verse informatie hebben inclusief de vorige mutatie
-            # en zodat we 1 plek hebben voor select/prefetch
-            mutatie = (ScheidsMutatie
-                       .objects
-                       .select_related('wedstrijd',
-                                       'wedstrijd__locatie')
-                       .get(pk=pk))
-
-            if not mutatie.is_verwerkt:             # pragma: no branch
-                self._verwerk_mutatie(mutatie)
-
-                mutatie.is_verwerkt = True
-                mutatie.save(update_fields=['is_verwerkt'])
-        # for
-
-        self.stdout.write('[INFO] nieuwe hoogste ScheidsMutatie pk is %s' % self._hoogste_mutatie_pk)
-
-        klaar = datetime.datetime.now()
-        self.stdout.write('[INFO] Mutaties verwerkt in %s seconden' % (klaar - begin))
-
-    def _monitor_nieuwe_mutaties(self):
-        # monitor voor nieuwe mutaties
-        mutatie_count = 0      # moet 0 zijn: beschermd tegen query op lege mutatie tabel
-        now = datetime.datetime.now()
-        while now < self.stop_at:                   # pragma: no branch
-            # self.stdout.write('tick')
-            new_count = ScheidsMutatie.objects.count()
-            if new_count != mutatie_count:
-                mutatie_count = new_count
-                self._verwerk_nieuwe_mutaties()
-                now = datetime.datetime.now()
-
-            # wacht 5 seconden voordat we opnieuw in de database kijken
-            # het wachten kan onderbroken worden door een ping, als er een nieuwe mutatie toegevoegd is
-            secs = (self.stop_at - now).total_seconds()
-            if secs > 1:                                    # pragma: no branch
-                timeout = min(5.0, secs)
-                if self._sync.wait_for_ping(timeout):       # pragma: no branch
-                    self._count_ping += 1                   # pragma: no cover
-            else:
-                # near the end
-                break       # from the while                # pragma: no cover
-
-            now = datetime.datetime.now()
-        # while
-
-    def _set_stop_time(self, **options):
-        # bepaal wanneer we moeten stoppen (zoals gevraagd)
-        duration = options['duration']
-        stop_minute = options['stop_exactly']
-
-        now = datetime.datetime.now()
-        self.stop_at = now + datetime.timedelta(minutes=duration)
-
-        if isinstance(stop_minute, int):
-            delta = stop_minute - now.minute
-            if delta < 0:
-                delta += 60
-            if delta != 0:    # avoid stopping in start minute
-                stop_at_exact = now + datetime.timedelta(minutes=delta)
-                stop_at_exact -= datetime.timedelta(seconds=self.stop_at.second,
-                                                    microseconds=self.stop_at.microsecond)
-                self.stdout.write('[INFO] Calculated stop at is %s' % stop_at_exact)
-                if stop_at_exact < self.stop_at:
-                    # run duration passes the requested stop minute
-                    self.stop_at = stop_at_exact
-
-        # test moet snel stoppen dus interpreteer duration in seconden
-        if options['quick']:        # pragma: no branch
-            self.stop_at = (datetime.datetime.now()
-                            + datetime.timedelta(seconds=duration))
-
-        self.stdout.write('[INFO] {scheids_mutaties} Taak loopt tot %s' % str(self.stop_at))
-
-    def handle(self, *args, **options):
-
-        if options['use_test_database']:                    # pragma: no cover
-            # voor gebruik tijdens browser tests
-            connection.close()
-            test_database_name = "test_" + settings.DATABASES[DEFAULT_DB_ALIAS]["NAME"]
-            settings.DATABASES[DEFAULT_DB_ALIAS]["NAME"] = test_database_name
-            connection.settings_dict["NAME"] = test_database_name
-
-        self._set_stop_time(**options)
-
-        # vang generieke fouten af
-        try:
-            self._monitor_nieuwe_mutaties()
-        except (DataError, OperationalError, IntegrityError) as exc:  # pragma: no cover
-            _, _, tb = sys.exc_info()
-            lst = traceback.format_tb(tb)
-            self.stderr.write('[ERROR] Onverwachte database fout: %s' % str(exc))
-            self.stderr.write('Traceback:')
-            self.stderr.write(''.join(lst))
-        except KeyboardInterrupt:                       # pragma: no cover
-            pass
-
-        self.stdout.write('[DEBUG] Aantal pings ontvangen: %s' % self._count_ping)
-
-        self.stdout.write('Klaar')
-
 
 """
     performance debug helper:
@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+
+#  Copyright (c) 2026 Ramon van der Winkel.
+#  All rights reserved.
+#  Licensed under BSD-3-Clause-Clear. See LICENSE file for details.
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    """ Migratie class voor dit deel van de applicatie """
+
+    # volgorde afdwingen
+    dependencies = [
+        ('Scheidsrechter', 'm0013_mutatie_door_langer'),
+    ]
+
+    # migratie functies
+    operations = [
+        migrations.AddField(
+            model_name='scheidsmutatie',
+            name='pogingen',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+    ]
+
+# end of file
@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
 
-#  Copyright (c) 2023-2025 Ramon van der Winkel.
+#  Copyright (c) 2023-2026 Ramon van der Winkel.
 #  All rights reserved.
 #  Licensed under BSD-3-Clause-Clear. See LICENSE file for details.
 
@@ -152,6 +152,10 @@ class ScheidsMutatie(models.Model):
     # is deze mutatie al verwerkt?
     is_verwerkt = models.BooleanField(default=False)
 
+    # houdt bij hoeveel keer de verwerking van deze mutatie mislukt is
+    # na N mislukte pogingen wordt de mutatie niet meer opgepakt (geparkeerd)
+    pogingen = models.PositiveSmallIntegerField(default=0)
+
     # door wie is de mutatie geïnitieerd
     # als het een account is, dan volledige naam + rol
     # als er geen account is (sporter zonder account) dan lid details
@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
 
-#  Copyright (c) 2020-2023 Ramon van der Winkel.
+#  Copyright (c) 2020-2026 Ramon van der Winkel.
 #  All rights reserved.
 #  Licensed under BSD-3-Clause-Clear. See LICENSE file for details.
 
@@ -11,10 +11,202 @@
     De queue met data van de verzoeken is typisch een database tabel.
 
     Elke taak kan met een unieke naam benaderd worden.
+
+    Er zijn twee methodes om de taak te wekken (zie settings.BACKGROUND_SYNC_METHODE):
+        'notify'    PostgreSQL NOTIFY/LISTEN via de database.
+                    Werkt ook als de achtergrondtaken op een andere server draaien dan de website.
+                    De NOTIFY wordt pas afgeleverd als de transactie met de nieuwe mutatie afgerond is.
+                    Als de LISTEN niet opgezet kan worden, dan wacht de ontvanger de timeout af (pollen).
+        'udp'       UDP datagram naar een vaste poort op localhost.
+                    Alleen bruikbaar als alles op dezelfde server draait.
+                    Maar 1 proces kan de poort binden en pings ontvangen; elke achtergrondtaak moet dus
+                    maar 1 keer draaien. De socket wordt pas bij het eerste gebruik aangemaakt, zodat een
+                    webserver die na het laden van de code fork() gebruikt geen socket deelt tussen de workers.
+
+    Daarnaast kan de achtergrondtaak melden dat een mutatie verwerkt is (meld_verwerkt), zodat de website
+    daar op kan wachten (wacht_op_verwerkt) zonder steeds in de database te kijken.
+    Dit gaat via een NOTIFY op een tweede kanaal. Elk website proces heeft daarvoor 1 LISTEN verbinding,
+    die gedeeld wordt door alle wachtende verzoeken. Met methode 'udp', of als die verbinding niet opgezet kan
+    worden, valt de website terug op pollen.
 """
 
+from django.conf import settings
+from django.db import connection
+import threading
+import psycopg
 import socket
 import select
+import time
+import os
+
+
+class _Wachter(object):
+
+    """ een verzoek dat wacht tot een mutatie verwerkt is """
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.is_verwerkt = False
+        self.is_afgebroken = False      # LISTEN verbinding verbroken; terugvallen op pollen
+
+
+class _VerwerktListener(object):
+
+    """
+        Een LISTEN verbinding per proces voor alle verzoeken die wachten tot een mutatie verwerkt is.
+        Een achtergrond thread leest de notificaties en wekt de verzoeken die op een van de gemelde mutaties wachten.
+        Zo houdt een webserver maar 1 extra database verbinding open, hoeveel verzoeken er ook tegelijk wachten.
+    """
+
+    interval = 0.5              # maximaal aantal seconden voordat een nieuw kanaal opgepakt wordt
+    wacht_na_fout = 5.0         # minimaal aantal seconden tussen twee pogingen om te verbinden
+
+    def __init__(self):
+        self.pid = os.getpid()
+        self._lock = threading.Lock()
+        self._conn = None
+        self._thread = None
+        self._kanalen = set()           # kanalen waarop de LISTEN actief is
+        self._nieuwe_kanalen = dict()   # [kanaal] = Event, gezet als de LISTEN actief is
+        self._wachters = dict()         # [(kanaal, pk_str)] = [_Wachter, ..]
+        self._volgende_poging = 0.0
+
+    @staticmethod
+    def _listen(conn, kanaal):
+        conn.execute(psycopg.sql.SQL('LISTEN {}').format(psycopg.sql.Identifier(kanaal)))
+
+    def _verbind(self, kanaal) -> bool:
+        """ zet de verbinding op en start de thread; aanroepen met de lock vast """
+        try:
+            conn = connection.get_new_connection(connection.get_connection_params())
+            conn.autocommit = True
+            self._listen(conn, kanaal)
+        except psycopg.Error:
+            # database niet bereikbaar; niet voor elk verzoek opnieuw proberen
+            self._volgende_poging = time.monotonic() + self.wacht_na_fout
+            return False
+
+        self._conn = conn
+        self._kanalen = {kanaal}
+        self._thread = threading.Thread(target=self._run, args=(conn,), daemon=True)
+        self._thread.start()
+        return True
+
+    def _meld(self, notify):
+        with self._lock:
+            for pk_str in notify.payload.split(','):
+                for wachter in self._wachters.get((notify.channel, pk_str), []):
+                    wachter.is_verwerkt = True
+                    wachter.event.set()
+                # for
+            # for
+
+    def _run(self, conn):
+        """ achtergrond thread: lees de notificaties, totdat de verbinding verbroken wordt """
+        try:
+            while conn is self._conn:
+                with self._lock:
+                    nieuw = self._nieuwe_kanalen
+                    self._nieuwe_kanalen = dict()
+
+                for kanaal, actief in nieuw.items():
+                    self._listen(conn, kanaal)
+                    with self._lock:
+                        self._kanalen.add(kanaal)
+                    actief.set()
+                # for
+
+                for notify in conn.notifies(timeout=self.interval):
+                    self._meld(notify)
+                # for
+            # while
+        except psycopg.Error:
+            # verbinding verbroken (bijvoorbeeld een herstart van de database)
+            # de wachtende verzoeken vallen terug op pollen; een volgend verzoek verbindt opnieuw
+            with self._lock:
+                if conn is self._conn:
+                    self._afbreken()
+                    self._volgende_poging = time.monotonic() + self.wacht_na_fout
+
+        try:
+            conn.close()
+        except psycopg.Error:       # pragma: no cover
+            pass
+
+    def _afbreken(self):
+        """ wek alle wachtende verzoeken, zodat ze terugvallen op pollen; aanroepen met de lock vast """
+        self._conn = None
+        self._thread = None
+        self._kanalen = set()
+
+        for wachters in self._wachters.values():
+            for wachter in wachters:
+                wachter.is_afgebroken = True
+                wachter.event.set()
+            # for
+        # for
+
+        for actief in self._nieuwe_kanalen.values():
+            actief.set()
+        # for
+        self._nieuwe_kanalen = dict()
+
+    def stop(self):
+        """ sluit de verbinding; de thread stopt binnen interval seconden """
+        with self._lock:
+            if self._conn is not None:
+                self._afbreken()
+
+    def registreer(self, kanaal, pk, timeout) -> _Wachter | None:
+        """ meld een verzoek aan dat wacht op een melding voor mutatie pk
+            geeft None terug als de LISTEN niet (binnen de timeout) actief is
+        """
+        wachter = _Wachter()
+        sleutel = (kanaal, str(pk))
+        actief = None
+
+        with self._lock:
+            if self._conn is None:
+                if time.monotonic() < self._volgende_poging or not self._verbind(kanaal):
+                    return None
+
+            self._wachters.setdefault(sleutel, []).append(wachter)
+
+            if kanaal not in self._kanalen:
+                # de thread voert de LISTEN uit
+                actief = self._nieuwe_kanalen.setdefault(kanaal, threading.Event())
+
+        if actief is not None:
+            actief.wait(timeout)
+            if not actief.is_set() or wachter.is_afgebroken:
+                self.afmelden(kanaal, pk, wachter)
+                return None
+
+        return wachter
+
+    def afmelden(self, kanaal, pk, wachter):
+        sleutel = (kanaal, str(pk))
+        with self._lock:
+            wachters = self._wachters.get(sleutel, [])
+            if wachter in wachters:         # pragma: no branch
+                wachters.remove(wachter)
+            if not wachters:
+                self._wachters.pop(sleutel, None)
+
+
+_verwerkt_listener = None
+_verwerkt_listener_lock = threading.Lock()
+
+
+def get_verwerkt_listener() -> _VerwerktListener:
+    """ geef de LISTEN verbinding voor dit proces
+        na een fork (zoals bij het opstarten van webserver workers) krijgt het kind-proces een eigen verbinding
+    """
+    global _verwerkt_listener
+    with _verwerkt_listener_lock:
+        if _verwerkt_listener is None or _verwerkt_listener.pid != os.getpid():
+            _verwerkt_listener = _VerwerktListener()
+        return _verwerkt_listener
 
 
 class BackgroundSync(object):
@@ -25,38 +217,110 @@ class BackgroundSync(object):
         wait_for_ping() is voor de ontvanger
                         accepteert een maximale tijd om te wachten (default: 1 seconde)
 
+        meld_verwerkt()     is voor de ontvanger, nadat de mutaties verwerkt zijn
+        wacht_op_verwerkt() is voor de zender, om te wachten tot een mutatie verwerkt is
+                            gebruikt de LISTEN verbinding die gedeeld wordt binnen het proces
+
         Ontvanger en zender moeten geconfigureerd worden met hetzelfde poortnummer.
         Deze kunnen het beste dus globaal gealloceerd worden, typisch in settings.py
+        Het poortnummer wordt ook gebruikt voor de naam van het NOTIFY kanaal.
 
         De manier waarop de synchronisatie gedaan wordt is niet relevant voor zender of ontvanger.
-        De huidige implementation geeft geen belasting op de database.
     """
 
-    def __init__(self, poort_nummer):
-        self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    def __init__(self, poort_nummer, methode=None):
+        self._methode = methode or settings.BACKGROUND_SYNC_METHODE
+        self._kanaal = 'background_sync_%s' % poort_nummer
+        self._kanaal_verwerkt = self._kanaal + '_verwerkt'
+        self._sock = None           # wordt pas aangemaakt bij het eerste gebruik, zie _get_sock
+        self._sock_pid = None
         self._address = ('localhost', poort_nummer)
         self._is_setup = False
-        self._listener = None
+        self._listen_conn = None
 
     def __del__(self):
-        self._sock.close()
+        if self._sock is not None:
+            self._sock.close()
+        self._sluit_listener()
+
+    def _get_sock(self):
+        """ geef de socket van dit proces
+            na een fork() krijgt het nieuwe proces een eigen socket, zodat geen gebonden socket gedeeld wordt
+        """
+        pid = os.getpid()
+        if self._sock is None or self._sock_pid != pid:
+            if self._sock is not None:
+                # sluit de kopie die geërfd is van het ouder proces
+                self._sock.close()
+            self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self._sock_pid = pid
+            self._is_setup = False
+        return self._sock
 
     def _setup_receiver(self):
+        sock = self._get_sock()
         if not self._is_setup:
             try:
-                self._sock.bind(self._address)
+                sock.bind(self._address)
             except OSError:
                 # typisch: Address already in use
                 pass
             else:
-                self._sock.setblocking(False)
+                sock.setblocking(False)
                 self._is_setup = True
 
+    def _setup_listener(self):
+        """ zet een aparte database verbinding op voor LISTEN
+            de verbinding van Django kan niet gebruikt worden, want notificaties worden alleen
+            buiten een transactie afgeleverd en Django kan de verbinding sluiten
+        """
+        if self._listen_conn is None:
+            try:
+                conn = connection.get_new_connection(connection.get_connection_params())
+                conn.autocommit = True
+                conn.execute(psycopg.sql.SQL('LISTEN {}').format(psycopg.sql.Identifier(self._kanaal)))
+            except psycopg.Error:
+                # database niet bereikbaar; terugvallen op pollen en later opnieuw proberen
+                pass
+            else:
+                self._listen_conn = conn
+
+    def _sluit_listener(self):
+        if self._listen_conn is not None:
+            try:
+                self._listen_conn.close()
+            except psycopg.Error:       # pragma: no cover
+                pass
+            self._listen_conn = None
+
     def ping(self):
-        self._sock.sendto(b'ping', self._address)
+        if self._methode == 'notify':
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT pg_notify(%s, '')", [self._kanaal])
+        else:
+            self._get_sock().sendto(b'ping', self._address)
 
-    def wait_for_ping(self, timeout=1.0) -> bool:
-        """ returns True when a ping was received or False in case of a timeout """
+    def _wait_for_notify(self, timeout) -> bool:
+        got_ping = False
+        try:
+            for _ in self._listen_conn.notifies(timeout=timeout, stop_after=1):
+                got_ping = True
+            # for
+
+            if got_ping:
+                # meerdere pings die tegelijk binnen komen tellen als 1
+                for _ in self._listen_conn.notifies(timeout=0.0):
+                    pass
+                # for
+        except psycopg.Error:
+            # verbinding verbroken (bijvoorbeeld een herstart van de database)
+            # de volgende keer wordt een nieuwe verbinding opgezet
+            self._sluit_listener()
+            time.sleep(timeout)
+
+        return got_ping
+
+    def _wait_for_udp(self, timeout) -> bool:
         got_ping = False
 
         self._setup_receiver()
@@ -75,8 +339,86 @@ class BackgroundSync(object):
             else:
                 # receive some data
                 got_ping = True
+        else:
+            # kan niet ontvangen (poort is bezet); toch wachten om een snelle loop te voorkomen
+            time.sleep(timeout)
 
         return got_ping
 
+    def wait_for_ping(self, timeout=1.0) -> bool:
+        """ returns True when a ping was received or False in case of a timeout """
+
+        if self._methode == 'notify':
+            self._setup_listener()
+            if self._listen_conn is not None:
+                return self._wait_for_notify(timeout)
+
+            # geen LISTEN mogelijk; de aanroeper kijkt na de timeout zelf in de database
+            time.sleep(timeout)
+            return False
+
+        return self._wait_for_udp(timeout)
+
+    def meld_verwerkt(self, pks):
+        """ meld dat deze mutaties verwerkt zijn
+            aanroepen in de transactie die de mutaties als verwerkt markeert
+            de NOTIFY wordt pas afgeleverd als deze transactie afgerond is
+        """
+        if self._methode == 'notify' and len(pks) > 0:
+            payload = ','.join([str(pk) for pk in pks])
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT pg_notify(%s, %s)", [self._kanaal_verwerkt, payload])
+
+    @staticmethod
+    def _poll_verwerkt(is_verwerkt, timeout) -> bool:
+        # wacht maximaal timeout seconden tot de mutatie uitgevoerd is
+        interval = 0.2  # om steeds te verdubbelen
+        total = 0.0     # om een limiet te stellen
+        klaar = is_verwerkt()
+        while not klaar and total + interval <= timeout:
+            time.sleep(interval)
+            total += interval   # 0.0 --> 0.2, 0.6, 1.4, 3.0
+            interval *= 2       # 0.2 --> 0.4, 0.8, 1.6, 3.2
+            klaar = is_verwerkt()
+        # while
+        return klaar
+
+    def wacht_op_verwerkt(self, pk, is_verwerkt, timeout=3.0) -> bool:
+        """ wacht tot de achtergrondtaak meldt dat mutatie pk verwerkt is, of tot de timeout
+
+            is_verwerkt: functie die in de database kijkt of de mutatie verwerkt is
+                         wordt 1x aangeroepen, nadat de LISTEN actief is, voor het geval de
+                         achtergrondtaak al klaar was
+
+            geeft True terug als de mutatie verwerkt is
+        """
+        eind = time.monotonic() + timeout
+
+        listener = wachter = None
+        if self._methode == 'notify':
+            listener = get_verwerkt_listener()
+            wachter = listener.registreer(self._kanaal_verwerkt, pk, timeout)
+
+        if wachter is None:
+            return self._poll_verwerkt(is_verwerkt, max(eind - time.monotonic(), 0.0))
+
+        try:
+            if is_verwerkt():
+                return True
+
+            wachter.event.wait(max(eind - time.monotonic(), 0.0))
+            if wachter.is_verwerkt:
+                return True
+
+            if wachter.is_afgebroken:
+                # verbinding verbroken; terugvallen op pollen
+                rest = eind - time.monotonic()
+                if rest > 0:
+                    return self._poll_verwerkt(is_verwerkt, rest)
+        finally:
+            listener.afmelden(self._kanaal_verwerkt, pk, wachter)
+
+        return False
+
 
 # end of file
@@ -0,0 +1,652 @@
+# -*- coding: utf-8 -*-
+
+#  Copyright (c) 2026 Ramon van der Winkel.
+#  All rights reserved.
+#  Licensed under BSD-3-Clause-Clear. See LICENSE file for details.
+
+""" Gedeelde basis voor de achtergrondtaken die mutaties uit een database tabel verwerken,
+    zoals betaal_mutaties, bestel_mutaties, competitie_mutaties en scheids_mutaties.
+
+    De mutaties worden per batch geclaimd met SELECT .. FOR UPDATE SKIP LOCKED, inclusief de
+    gerelateerde objecten (select_related). Een piek van honderden mutaties kost daardoor maar een
+    paar round-trips naar de database, in plaats van een aantal queries per mutatie.
+
+    Elke batch wordt in 1 transactie verwerkt, met een savepoint per mutatie.
+    Een fout tijdens de verwerking van een mutatie draait de eerder verwerkte mutaties niet terug.
+    Een taak die tijdens de verwerking op een externe dienst wacht (zoals betaal_mutaties op Mollie) verwerkt
+    de mutaties 1 voor 1 buiten een transactie (verwerk_buiten_transactie), zodat er geen locks vast gehouden
+    worden tijdens het wachten.
+    De mislukte poging wordt geteld; na max_pogingen wordt de mutatie geparkeerd (niet meer opgepakt),
+    zodat een mutatie die steeds faalt niet eindeloos de worker laat crashen.
+
+    Normaal draait de taak een vast aantal minuten en wordt daarna opnieuw gestart door cron.
+    Met --forever blijft de taak actief totdat een SIGTERM ontvangen wordt. Het proces is dan een supervisor
+    die de worker in een kind-proces (fork) draait en deze vervangt na --max_mutaties verwerkte mutaties
+    of als het geheugengebruik boven --max_geheugen komt. Django hoeft daarvoor niet opnieuw geladen te worden.
+
+    Een taak kan de mutaties verdelen over meerdere workers die parallel draaien (--workers of --shard).
+    De verdeling gaat op een conflict sleutel (zoals het account), zodat de mutaties met dezelfde sleutel altijd
+    door dezelfde worker in volgorde verwerkt worden. Gedeelde gegevens (zoals tellers) moeten dan wel met
+    row-level locks of atomaire updates bijgewerkt worden.
+"""
+
+from django.conf import settings
+from django.db import connection, connections, transaction, close_old_connections
+from django.db.models import Value
+from django.db.models.functions import Mod
+from django.db.utils import DataError, OperationalError, IntegrityError, DEFAULT_DB_ALIAS
+from django.core.management.base import BaseCommand
+from Mailer.operations import mailer_notify_internal_error
+from Site.core.background_sync import BackgroundSync
+import threading
+import traceback
+import datetime
+import resource
+import signal
+import time
+import sys
+import os
+
+
+class MutatieDaemonCommand(BaseCommand):
+
+    """
+        Basis voor een management commando dat mutaties verwerkt.
+
+        Een afgeleide class vult de class variabelen in en implementeert verwerk_mutatie().
+        De volgende hooks zijn optioneel:
+
+            voorbereiden()              eenmalig aangeroepen, voordat de mutaties gemonitord worden
+            filter_openstaand(qset)     extra filter op de nog te verwerken mutaties
+            start_verwerking(mutatie)   aangeroepen vlak voor verwerk_mutatie, buiten het savepoint
+                                        (wijzigingen blijven bewaard, ook als de verwerking faalt)
+            verwerk_in_achtergrond()    klein beetje werk doen als er geen nieuwe mutaties zijn
+            batch_verwerkt()            aangeroepen na een batch, in dezelfde transactie als de mutaties
+            deelt_gegevens(mutatie)     True als de mutatie gedeelde gegevens gelockt heeft (zoals een teller);
+                                        de transactie wordt dan direct na deze mutatie afgesloten
+    """
+
+    taak_naam = ''                  # voor in de output, bijvoorbeeld 'bestel_mutaties'
+    mutatie_model = None            # database tabel met de mutaties, inclusief veld is_verwerkt
+    mutatie_select_related = ()     # relaties die met de batch mee opgehaald worden
+    mutatie_vaste_relaties = ()     # relaties die niet wijzigen door het verwerken van een mutatie
+    mutatie_shard_sleutel = None    # optioneel: expressie voor de conflict sleutel (integer) om te verdelen
+    sync_poort_setting = ''         # naam van de setting met het poortnummer voor BackgroundSync
+    max_wacht = 5.0                 # maximaal aantal seconden tussen twee keer kijken in de database
+    batch_grootte = 100             # maximaal aantal mutaties per claim
+    batch_max_duur = 1.0            # na dit aantal seconden wordt de transactie afgesloten
+    max_pogingen = 5                # na dit aantal mislukte pogingen wordt een mutatie geparkeerd
+    tel_elke_poging = False         # True: tel elke poging (vooraf), niet alleen de mislukte
+    verwerk_buiten_transactie = False   # True: claim 1 mutatie per keer en verwerk deze zonder transactie
+    logger = None                   # optioneel: volledige traceback van een onverwachte fout naar syslog
+    max_mutaties = 10000            # --forever: vervang de worker na dit aantal verwerkte mutaties
+    max_geheugen = 500              # --forever: vervang de worker als deze meer dan dit aantal MB gebruikt
+    conn_max_age = 600              # --forever: maximale leeftijd (in seconden) van een database verbinding
+
+    def __init__(self, stdout=None, stderr=None, no_color=False, force_color=False):
+        super().__init__(stdout, stderr, no_color, force_color)
+
+        self.stop_at = datetime.datetime.now()
+
+        self._sync = BackgroundSync(getattr(settings, self.sync_poort_setting))
+        self._count_ping = 0
+        self._count_verwerkt = 0
+
+        self._forever = False
+        self._max_mutaties = self.max_mutaties
+        self._max_geheugen = self.max_geheugen
+        self._beheer_verbindingen = False
+        self._stop_gevraagd = False
+        self._worker_pids = dict()      # [pid] = shard nr
+        self._aantal_workers = 1
+        self._shard = None              # (nr, aantal) als deze worker een deel van de mutaties verwerkt
+
+    def _naam(self):
+        if self._shard:
+            return '%s %s/%s' % (self.taak_naam, self._shard[0], self._shard[1])
+        return self.taak_naam
+
+    def _out_error(self, msg):
+        self.stdout.write('[ERROR] {%s} %s' % (self._naam(), msg))
+
+    def _out_debug(self, msg):
+        self.stdout.write('[DEBUG] {%s} %s' % (self._naam(), msg))
+
+    def _out_info(self, msg):
+        self.stdout.write('[INFO] {%s} %s' % (self._naam(), msg))
+
+    def add_arguments(self, parser):
+        parser.add_argument('duration', type=int, nargs='?', default=60,
+                            choices=(1, 2, 5, 7, 10, 15, 20, 30, 45, 60),
+                            help="Maximum aantal minuten actief blijven (niet gebruikt met --forever)")
+        parser.add_argument('--stop_exactly', type=int, default=None, choices=range(60),
+                            help="Stop op deze minuut")
+        parser.add_argument('--forever', action='store_true',
+                            help="Actief blijven tot SIGTERM; de worker wordt regelmatig vervangen")
+        parser.add_argument('--max_mutaties', type=int, default=self.max_mutaties,
+                            help="Met --forever: vervang de worker na dit aantal mutaties")
+        parser.add_argument('--max_geheugen', type=int, default=self.max_geheugen,
+                            help="Met --forever: vervang de worker boven dit geheugengebruik (in MB)")
+        parser.add_argument('--workers', type=int, default=1, choices=range(1, 17),
+                            help="Met --forever: verdeel de mutaties over dit aantal parallelle workers")
+        parser.add_argument('--shard', type=str, default=None,
+                            help="Verwerk alleen deel NR van AANTAL delen (formaat: NR/AANTAL, NR vanaf 0)")
+        parser.add_argument('--quick', action='store_true')                 # for testing
+        parser.add_argument('--use-test-database', action='store_true')     # for testing
+
+    def voorbereiden(self):
+        pass
+
+    def filter_openstaand(self, qset):
+        return qset
+
+    def start_verwerking(self, mutatie):
+        pass
+
+    def verwerk_mutatie(self, mutatie):                 # pragma: no cover
+        raise NotImplementedError()
+
+    def verwerk_in_achtergrond(self):
+        pass
+
+    def batch_verwerkt(self):
+        pass
+
+    def deelt_gegevens(self, mutatie) -> bool:
+        return False
+
+    def is_hoofd_worker(self) -> bool:
+        """ geeft True voor de worker die ook het werk doet dat niet aan een conflict sleutel gekoppeld is,
+            zoals opschonen. Zonder verdeling is er maar 1 worker.
+        """
+        return self._shard is None or self._shard[0] == 0
+
+    def _relatie_sleutels(self, mutatie) -> set:
+        """ geef de (model, pk) van alle objecten die met de mutatie mee opgehaald zijn """
+        sleutels = set()
+        for pad in self.mutatie_select_related:
+            obj = mutatie
+            deel_pad = ''
+            for veld in pad.split('__'):
+                obj = getattr(obj, veld)        # geen query: zit in select_related
+                if obj is None:
+                    break
+                deel_pad = deel_pad + '__' + veld if deel_pad else veld
+                if deel_pad not in self.mutatie_vaste_relaties:
+                    sleutels.add((obj._meta.label, obj.pk))
+            # for
+        # for
+        return sleutels
+
+    def _haal_mutatie_op(self, pk):
+        return (self.mutatie_model
+                .objects
+                .select_related(*self.mutatie_select_related)
+                .get(pk=pk))
+
+    def _claim_batch(self, aantal) -> list:
+        """ claim de volgende (maximaal aantal) nog niet verwerkte mutaties, in volgorde van aanmaken
+            mutaties die door een andere verwerker geclaimd zijn worden overgeslagen
+            moet aangeroepen worden binnen een transactie
+        """
+        qset = self.filter_openstaand(self.mutatie_model
+                                      .objects
+                                      .filter(is_verwerkt=False,
+                                              pogingen__lt=self.max_pogingen))
+        if self._shard:
+            # alleen de mutaties van deze worker
+            shard_nr, aantal = self._shard
+            qset = (qset
+                    .alias(shard=Mod(self.mutatie_shard_sleutel, Value(aantal)))
+                    .filter(shard=shard_nr))
+        return list(qset
+                    .select_for_update(skip_locked=True, of=('self',))
+                    .select_related(*self.mutatie_select_related)
+                    .order_by('pk')[:aantal])
+
+    def _poging_mislukt(self, mutatie):
+        """ tel de mislukte poging, buiten het (teruggedraaide) savepoint
+            na max_pogingen wordt de mutatie niet meer geclaimd
+        """
+        if not self.tel_elke_poging:
+            mutatie.pogingen += 1
+            mutatie.save(update_fields=['pogingen'])
+
+        if mutatie.pogingen >= self.max_pogingen:
+            self._out_error('Mutatie pk=%s geparkeerd na %s mislukte pogingen' % (mutatie.pk, mutatie.pogingen))
+
+    def _verwerk_batch(self) -> tuple[int, int]:
+        """ claim een batch met mutaties en verwerk deze in 1 transactie
+            geeft het aantal geclaimde en het aantal verwerkte mutaties terug
+        """
+        begin = time.monotonic()
+        verwerkt_pks = list()
+        fout = None
+
+        with transaction.atomic():
+            mutaties = self._claim_batch(self.batch_grootte)
+
+            gezien = set()
+            for mutatie in mutaties:
+                sleutels = self._relatie_sleutels(mutatie)
+                if sleutels & gezien:
+                    # een eerdere mutatie in deze batch kan deze objecten aangepast hebben
+                    # haal de mutatie opnieuw op, zodat we verse informatie hebben
+                    mutatie = self._haal_mutatie_op(mutatie.pk)
+                    sleutels = self._relatie_sleutels(mutatie)
+                gezien.update(sleutels)
+
+                if self.tel_elke_poging:
+                    # tel de poging vooraf, zodat deze ook meetelt als het proces halverwege afgebroken wordt
+                    mutatie.pogingen += 1
+                    mutatie.save(update_fields=['pogingen'])
+
+                self.start_verwerking(mutatie)
+
+                try:
+                    with transaction.atomic():
+                        self.verwerk_mutatie(mutatie)
+                except Exception as exc:
+                    self._poging_mislukt(mutatie)
+                    # de eerder verwerkte mutaties moeten wel afgerond worden
+                    fout = exc
+                    break
+
+                verwerkt_pks.append(mutatie.pk)
+
+                if self.deelt_gegevens(mutatie):
+                    # de lock op de gedeelde gegevens blijft staan tot het einde van de transactie
+                    # sluit de transactie af, zodat andere workers niet op de rest van de batch wachten
+                    # en een volgende mutatie niet met deze lock op een andere lock gaat wachten (deadlock)
+                    break
+
+                if time.monotonic() - begin > self.batch_max_duur:
+                    # niet te lang de transactie open houden
+                    # de rest van de batch wordt vrijgegeven en later opnieuw geclaimd
+                    break
+            # for
+
+            if len(verwerkt_pks):
+                self.mutatie_model.objects.filter(pk__in=verwerkt_pks).update(is_verwerkt=True)
+
+                self.batch_verwerkt()
+
+                # laat wachtende website processen weten dat deze mutaties verwerkt zijn
+                self._sync.meld_verwerkt(verwerkt_pks)
+
+        if fout:
+            raise fout
+
+        return len(mutaties), len(verwerkt_pks)
+
+    def _verwerk_los(self) -> tuple[int, int]:
+        """ claim 1 mutatie en verwerk deze buiten een transactie
+            de poging wordt vooraf vastgelegd in een korte transactie, zodat er tijdens het wachten
+            op een externe dienst geen transactie open staat en geen locks vast gehouden worden
+            geeft het aantal geclaimde en het aantal verwerkte mutaties terug
+        """
+        with transaction.atomic():
+            mutaties = self._claim_batch(1)
+            if len(mutaties) == 0:
+                return 0, 0
+
+            mutatie = mutaties[0]
+            if self.tel_elke_poging:
+                mutatie.pogingen += 1
+                mutatie.save(update_fields=['pogingen'])
+
+            self.start_verwerking(mutatie)
+
+        try:
+            self.verwerk_mutatie(mutatie)
+        except Exception:
+            self._poging_mislukt(mutatie)
+            raise
+
+        with transaction.atomic():
+            self.mutatie_model.objects.filter(pk=mutatie.pk).update(is_verwerkt=True)
+
+            self.batch_verwerkt()
+
+            # laat wachtende website processen weten dat deze mutatie verwerkt is
+            self._sync.meld_verwerkt([mutatie.pk])
+
+        return 1, 1
+
+    def _verwerk_nieuwe_mutaties(self) -> bool:
+        """ verwerk alle openstaande mutaties
+            geeft True terug als er mutaties verwerkt zijn
+        """
+        begin = datetime.datetime.now()
+
+        if self.verwerk_buiten_transactie:
+            batch_grootte = 1
+            verwerk_batch = self._verwerk_los
+        else:
+            batch_grootte = self.batch_grootte
+            verwerk_batch = self._verwerk_batch
+
+        totaal = 0
+        geclaimd = batch_grootte
+        verwerkt = 0
+        while geclaimd == batch_grootte or verwerkt < geclaimd:
+            geclaimd, verwerkt = verwerk_batch()
+            totaal += verwerkt
+            if geclaimd == 0:
+                break
+            if self._forever and self._count_verwerkt + totaal >= self._max_mutaties:
+                # de rest is voor de volgende worker
+                break
+        # while
+
+        if totaal:
+            self._count_verwerkt += totaal
+            klaar = datetime.datetime.now()
+            self.stdout.write('[INFO] %s %ss verwerkt in %s seconden' % (totaal,
+                                                                        self.mutatie_model.__name__,
+                                                                        klaar - begin))
+        return totaal > 0
+
+    @staticmethod
+    def _geheugen_mb() -> int:
+        # huidig geheugengebruik (resident set size) van dit proces
+        # ru_maxrss is de piek en daalt nooit, dus lees liever het huidige gebruik uit /proc (Linux)
+        try:
+            with open('/proc/self/statm', 'r') as f:
+                rss_pages = int(f.read().split()[1])
+        except (OSError, IndexError, ValueError):      # pragma: no cover
+            # ru_maxrss is in kB (Linux)
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // 1024
+        return rss_pages * resource.getpagesize() // (1024 * 1024)
+
+    def _moet_stoppen(self) -> bool:
+        if self._stop_gevraagd:
+            self._out_info('Gestopt door SIGTERM')
+            return True
+
+        if self._forever:
+            if self._count_verwerkt >= self._max_mutaties:
+                self._out_info('Worker wordt vervangen na %s mutaties' % self._count_verwerkt)
+                return True
+
+            geheugen = self._geheugen_mb()
+            if geheugen >= self._max_geheugen:
+                self._out_info('Worker wordt vervangen vanwege geheugengebruik (%s MB)' % geheugen)
+                return True
+
+        return False
+
+    def _zet_verbinding_beheer(self):
+        """ zonder request cycle moet de worker zelf de database verbindingen verversen
+            verbindingen blijven open (maximaal conn_max_age seconden) en worden gecontroleerd voor hergebruik
+        """
+        for conn in connections.all():
+            conn.settings_dict['CONN_HEALTH_CHECKS'] = True
+            if conn.settings_dict['CONN_MAX_AGE'] == 0:
+                conn.settings_dict['CONN_MAX_AGE'] = self.conn_max_age
+        # for
+        self._beheer_verbindingen = True
+
+    def _monitor_nieuwe_mutaties(self):
+        # de openstaande mutaties worden altijd minimaal 1 keer verwerkt,
+        # ook als het voorbereiden langer duurde dan de gevraagde looptijd
+        while True:
+            # self._out_debug('tick')
+            if self._beheer_verbindingen:
+                # sluit verbindingen die kapot of te oud zijn; de volgende query maakt een nieuwe
+                close_old_connections()
+
+            did_useful_work = self._verwerk_nieuwe_mutaties()
+
+            if self._moet_stoppen():
+                break       # from the while
+
+            # achtergrond werk alleen als er nog tijd over is
+            if not did_useful_work and (self.stop_at - datetime.datetime.now()).total_seconds() > 1:
+                self.verwerk_in_achtergrond()
+
+            # wacht even voordat we opnieuw in de database kijken
+            # het wachten kan onderbroken worden door een ping, als er een nieuwe mutatie toegevoegd is
+            now = datetime.datetime.now()
+            secs = (self.stop_at - now).total_seconds()
+            if secs > 1:                                    # pragma: no branch
+                timeout = min(self.max_wacht, secs)
+                if self._sync.wait_for_ping(timeout):       # pragma: no branch
+                    self._count_ping += 1                   # pragma: no cover
+            else:
+                # near the end
+                break       # from the while
+        # while
+
+    def _set_stop_time(self, **options):
+        # bepaal wanneer we moeten stoppen (zoals gevraagd)
+        duration = options['duration']
+        stop_minute = options['stop_exactly']
+
+        now = datetime.datetime.now()
+        self.stop_at = now + datetime.timedelta(minutes=duration)
+
+        if isinstance(stop_minute, int):
+            delta = stop_minute - now.minute
+            if delta < 0:
+                delta += 60
+            if delta != 0:    # avoid stopping in start minute
+                stop_at_exact = now + datetime.timedelta(minutes=delta)
+                stop_at_exact -= datetime.timedelta(seconds=self.stop_at.second,
+                                                    microseconds=self.stop_at.microsecond)
+                self._out_info('Calculated stop at is %s' % stop_at_exact)
+                if stop_at_exact < self.stop_at:
+                    # run duration passes the requested stop minute
+                    self.stop_at = stop_at_exact
+
+        if self._forever:
+            # geen eindtijd
+            self.stop_at = datetime.datetime.max
+
+        # test moet snel stoppen dus interpreteer duration in seconden
+        if options['quick']:        # pragma: no branch
+            if duration == 60:
+                # voorkom lang wachten in de test
+                duration = 2
+            self.stop_at = (datetime.datetime.now()
+                            + datetime.timedelta(seconds=duration))
+
+        if self.stop_at == datetime.datetime.max:           # pragma: no cover
+            self._out_info('Taak loopt tot SIGTERM')
+        else:
+            self._out_info('Taak loopt tot %s' % str(self.stop_at))
+
+    def _zet_verdeling(self, workers, shard_str) -> bool:
+        """ controleer de opties --workers en --shard
+            geeft False terug als de opties niet bruikbaar zijn
+        """
+        if workers == 1 and shard_str is None:
+            # niet verdelen
+            return True
+
+        if workers > 1 and not self._forever:
+            self.stderr.write('[ERROR] --workers kan alleen gebruikt worden met --forever')
+            return False
+
+        if workers > 1 and shard_str is not None:
+            self.stderr.write('[ERROR] --workers en --shard kunnen niet samen gebruikt worden')
+            return False
+
+        if self.mutatie_shard_sleutel is None:
+            self.stderr.write('[ERROR] %s ondersteunt geen verdeling over meerdere workers' % self.taak_naam)
+            return False
+
+        if shard_str is not None:
+            try:
+                nr_str, aantal_str = shard_str.split('/')
+                shard_nr = int(nr_str)
+                aantal = int(aantal_str)
+            except ValueError:
+                shard_nr = aantal = -1
+
+            if not (0 <= shard_nr < aantal):
+                self.stderr.write('[ERROR] Ongeldige --shard %s (verwacht NR/AANTAL met 0 <= NR < AANTAL)' % repr(
+                                    shard_str))
+                return False
+
+            if aantal > 1:
+                self._shard = (shard_nr, aantal)
+        else:
+            # de supervisor deelt de workers in
+            self._aantal_workers = workers
+
+        return True
+
+    def _sigterm(self, signum, frame):
+        # netjes stoppen: de lopende batch wordt nog afgerond
+        self._stop_gevraagd = True
+        for pid in list(self._worker_pids):                 # pragma: no cover
+            # supervisor: geef door aan de workers
+            os.kill(pid, signal.SIGTERM)
+        # for
+
+    def _start_worker(self, shard_nr):                      # pragma: no cover
+        """ start een worker in een kind-proces """
+        # de worker moet eigen database verbindingen opzetten
+        connections.close_all()
+        self.stdout.flush()
+        sys.stdout.flush()
+
+        pid = os.fork()
+        if pid == 0:
+            # kind-proces
+            exit_code = 1
+            try:
+                self._worker_pids = dict()
+                if self._aantal_workers > 1:
+                    self._shard = (shard_nr, self._aantal_workers)
+                self._zet_verbinding_beheer()
+                # na een onverwachte fout wacht de supervisor even voordat de worker vervangen wordt
+                exit_code = 0 if self._run_worker() else 1
+            finally:
+                self.stdout.flush()
+                sys.stdout.flush()
+                connections.close_all()
+                os._exit(exit_code)
+
+        self._worker_pids[pid] = shard_nr
+
+    def _supervisor(self):                                  # pragma: no cover
+        """ start de workers in kind-processen en vervang een worker als deze stopt """
+        self._out_info('Supervisor gestart (pid %s) met %s workers' % (os.getpid(), self._aantal_workers))
+
+        for shard_nr in range(self._aantal_workers):
+            self._start_worker(shard_nr)
+        # for
+
+        while len(self._worker_pids):
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break       # from the while
+            except InterruptedError:
+                continue
+
+            shard_nr = self._worker_pids.pop(pid, None)
+            if shard_nr is None:
+                continue
+
+            exit_code = os.waitstatus_to_exitcode(status)
+            if exit_code != 0 and not self._stop_gevraagd:
+                self._out_error('Worker (pid %s) gestopt met exit code %s' % (pid, exit_code))
+                # voorkom een snelle herhaling als de worker direct crasht
+                time.sleep(self.max_wacht)
+
+            if not self._stop_gevraagd:
+                self._start_worker(shard_nr)
+        # while
+
+    def _run_worker(self) -> bool:
+        """ verwerk mutaties tot de stoptijd
+            geeft False terug als de worker gestopt is door een onverwachte fout
+        """
+        self._count_verwerkt = 0
+        gelukt = False
+
+        # vang generieke fouten af
+        try:
+            self.voorbereiden()
+            self._monitor_nieuwe_mutaties()
+            gelukt = True
+        except (DataError, OperationalError, IntegrityError) as exc:  # pragma: no cover
+            # OperationalError treed op bij system shutdown, als database gesloten wordt
+            _, _, tb = sys.exc_info()
+            lst = traceback.format_tb(tb)
+            self.stderr.write('[ERROR] Onverwachte database fout in %s: %s' % (self._naam(), str(exc)))
+            self.stderr.write('Traceback:')
+            self.stderr.write(''.join(lst))
+
+        except KeyboardInterrupt:                       # pragma: no cover
+            gelukt = True
+
+        except Exception as exc:
+            # schrijf in de output
+            tups = sys.exc_info()
+            lst = traceback.format_tb(tups[2])
+            tb = traceback.format_exception(*tups)
+
+            tb_msg_start = 'Onverwachte fout tijdens %s\n' % self.taak_naam
+            tb_msg_start += '\n'
+
+            if self.logger:
+                # full traceback to syslog
+                self.logger.error(tb_msg_start + '\n'.join(tb))
+
+            self.stderr.write('[ERROR] Onverwachte fout (%s) tijdens %s: %s' % (type(exc), self.taak_naam, str(exc)))
+            self.stderr.write('Traceback:')
+            self.stderr.write(''.join(lst))
+
+            # stuur een mail naar de ontwikkelaars
+            # reduceer tot de nuttige regels
+            tb = [line for line in tb if '/site-packages/' not in line]
+            tb_msg = tb_msg_start + '\n'.join(tb)
+
+            # deze functie stuurt maximaal 1 mail per dag over hetzelfde probleem
+            mailer_notify_internal_error(tb_msg)
+
+        self._out_debug('Aantal pings ontvangen: %s' % self._count_ping)
+        return gelukt
+
+    def handle(self, *args, **options):
+
+        if options['use_test_database']:                    # pragma: no cover
+            # voor gebruik tijdens browser tests
+            connection.close()
+            test_database_name = "test_" + settings.DATABASES[DEFAULT_DB_ALIAS]["NAME"]
+            settings.DATABASES[DEFAULT_DB_ALIAS]["NAME"] = test_database_name
+            connection.settings_dict["NAME"] = test_database_name
+
+        self._forever = options['forever']
+        self._max_mutaties = options['max_mutaties']
+        self._max_geheugen = options['max_geheugen']
+
+        if not self._zet_verdeling(options['workers'], options['shard']):
+            return
+
+        self._set_stop_time(**options)
+
+        # SIGTERM (systemd, pkill) netjes afhandelen
+        # een signal handler kan alleen vanuit de main thread gezet worden
+        vorige_handler = None
+        if threading.current_thread() is threading.main_thread():   # pragma: no branch
+            vorige_handler = signal.signal(signal.SIGTERM, self._sigterm)
+
+        try:
+            if self._forever and not options['quick']:      # pragma: no cover
+                self._supervisor()
+            else:
+                # tijdens de test draait de worker in dit proces, zodat de test database gezien wordt
+                self._run_worker()
+        finally:
+            if vorige_handler is not None:                  # pragma: no branch
+                signal.signal(signal.SIGTERM, vorige_handler)
+
+        self.stdout.write('Klaar')
+
+
+# end of file
@@ -46,9 +46,22 @@ BETAAL_API_URL = None
 # None = use built-in default
 GOOGLEMAPS_API_URL = None
 
+# de coördinaten van vertrekpunt en doel worden op dit raster (in graden) afgerond
+# voordat de reistijd opgevraagd wordt, zodat vrijwel gelijke paren 1 resultaat delen
+# 0.005 graden is ongeveer 550 meter noord-zuid en 350 meter oost-west
+REISTIJD_RASTER_GRADEN = 0.005
+
 # toon het kaartje Ledenvoordeel?
 TOON_LEDENVOORDEEL = True
 
+# manier waarop de achtergrondtaken gewekt worden (zie Site/core/background_sync.py)
+# 'notify' = PostgreSQL NOTIFY/LISTEN; werkt ook als de achtergrondtaken op een andere server draaien
+# 'udp'    = UDP ping naar localhost; alleen als alles op dezelfde server draait
+BACKGROUND_SYNC_METHODE = 'notify'
+
+# directory voor de cache met bondspassen, per server (zie CACHES)
+CACHE_DIR = '/tmp/mh_cache'
+
 
 # import install-specific settings from a separate file
 # that is easy to replace as part of the deployment process
@@ -276,6 +289,29 @@ INTERNAL_IPS = [
     '127.0.0.1',
 ]
 
+# gedeelde cache, zodat alle processen van de webserver dezelfde gegevens zien, ook op meerdere servers
+# bevat alleen gegevens die opnieuw bepaald kunnen worden (vluchtige sessie variabelen, uitslagen)
+# 'default'  staat in de database; de tabel wordt aangemaakt door een migratie van BasisTypen
+# 'bondspas' bevat de (grote) plaatjes en pdf's van de bondspassen; die mogen per server opnieuw gemaakt worden
+# settings_local kan CACHES zelf zetten, bijvoorbeeld voor memcached of redis
+if 'CACHES' not in globals():
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'site_cache',
+            'OPTIONS': {
+                'MAX_ENTRIES': 10000,
+            },
+        },
+        'bondspas': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': CACHE_DIR,
+            'OPTIONS': {
+                'MAX_ENTRIES': 10000,
+            },
+        },
+    }
+
 # globale keuze voor automatische primary keys
 DEFAULT_AUTO_FIELD = 'django.db.models.AutoField'
 
@@ -286,6 +322,7 @@ BACKGROUND_SYNC__BONDSPAS_DOWNLOADER = BACKGROUND_SYNC_POORT + 2
 BACKGROUND_SYNC__BESTEL_MUTATIES = BACKGROUND_SYNC_POORT + 3
 BACKGROUND_SYNC__BETAAL_MUTATIES = BACKGROUND_SYNC_POORT + 4
 BACKGROUND_SYNC__SCHEIDS_MUTATIES = BACKGROUND_SYNC_POORT + 5
+BACKGROUND_SYNC__STUUR_MAILS = BACKGROUND_SYNC_POORT + 6
 
 # our own test runner that executes the tests ordered by application hierarchy indicators to ensure that
 # low-level errors are reported before applications depending that (broken) functionality report failures
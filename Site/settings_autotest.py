@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
 
-#  Copyright (c) 2021-2025 Ramon van der Winkel.
+#  Copyright (c) 2021-2026 Ramon van der Winkel.
 #  All rights reserved.
 #  Licensed under BSD-3-Clause-Clear. See LICENSE file for details.
 
@@ -55,6 +55,20 @@ KALENDER_API_TOKENS = ('autotest',)
 # Mollie endpoint URL override
 BETAAL_API_URL = 'http://localhost:8125'        # gebruik de simulator
 
+# de tests starten de achtergrondtaken zelf; een ping via de database zou meetellen in assert_max_queries
+BACKGROUND_SYNC_METHODE = 'udp'
+
+# elke test run een eigen (lege) cache
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'bondspas': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'bondspas',
+    },
+}
+
 # enable javascript validation using ESprima
 TEST_VALIDATE_JAVASCRIPT = True
 
@@ -1,111 +1,364 @@
 # -*- coding: utf-8 -*-
 
-#  Copyright (c) 2019-2025 Ramon van der Winkel.
+#  Copyright (c) 2019-2026 Ramon van der Winkel.
 #  All rights reserved.
 #  Licensed under BSD-3-Clause-Clear. See LICENSE file for details.
 
-""" ondersteuning voor de leeftijdsklassen binnen de applicatie """
+""" ondersteuning voor de leeftijdsklassen binnen de applicatie
 
-from BasisTypen.definities import (GESLACHT_ALLE, GESLACHT_ANDERS, GESLACHT_MAN,
+    De leeftijdsklassen veranderen bijna nooit (alleen via een migratie of de admin interface).
+    Daarom worden alle look-up tabellen 1x per proces opgebouwd: per (organisatie, wedstrijdgeslacht)
+    een tabel met de beschrijving voor elke wedstrijdleeftijd.
+    Na het opbouwen kost elke berekening geen database query meer.
+    Een wijziging van een Leeftijdsklasse of TemplateCompetitieIndivKlasse verhoogt het versienummer,
+    waarna de tabellen opnieuw opgebouwd worden. Het versienummer staat ook in de database (CacheVersie),
+    zodat de andere processen (website, achtergrondtaken) de wijziging binnen VERSIE_CONTROLE_INTERVAL zien.
+"""
+
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from BasisTypen.definities import (GESLACHT_ALLE, GESLACHT_ANDERS, GESLACHT_MAN, GESLACHT_VROUW,
                                    ORGANISATIE_IFAA, ORGANISATIE_KHSN, ORGANISATIE_WA,
                                    BOOGTYPE_AFKORTING_RECURVE)
 from BasisTypen.models import Leeftijdsklasse, TemplateCompetitieIndivKlasse
+from BasisTypen.operations import get_cache_versie, verhoog_cache_versie
+import threading
+import time
 
 
-def bereken_leeftijdsklassen_khsn(geboorte_jaar, wedstrijdgeslacht_khsn, huidige_jaar):
-    """ retourneert de wedstrijdklassen voor een sporter vanaf 1 jaar terug tot 4 jaar vooruit.
-        wedstrijdgeslacht_khsn kan zijn GESLACHT_MAN, GESLACHT_VROUW of GESLACHT_ANDERS
+# hoogste wedstrijdleeftijd in de look-up tabellen; oudere sporters krijgen de klasse van deze leeftijd
+MAX_WEDSTRIJDLEEFTIJD = 150
 
-        Retourneert:
-            Huidige jaar, Leeftijd, False, None, None als het geen jonge schutter betreft
-            Huidige jaar, Leeftijd, True, wlst, clst voor jonge schutters
-                wlst en clst zijn een lijst van wedstrijdklassen voor
-                de jaren -1, 0, +1, +2, +3 ten opzicht van Leeftijd
-                Voorbeeld:
-                    huidige jaar = 2019
-                    leeftijd = 17
-                    lkl_lst=(('Onder 18 Gemengd of Onder 18 Heren'),     # -1 = 16
-                             ('Onder 18 Gemengd of Onder 18 Heren'),     #  0 = 17
-                             ('Onder 21 Gemengd of Onder 21 Heren'),     # +1 = 18
-                             ('Onder 21 Gemengd of Onder 21 Heren'),     # +2 = 19
-                             ('Onder 21 Gemengd of Onder 21 Heren'))     # +3 = 20
+# de wedstrijdgeslachten waarvoor de tabellen opgebouwd worden
+TABEL_GESLACHTEN = (GESLACHT_MAN, GESLACHT_VROUW, GESLACHT_ANDERS, GESLACHT_ALLE)
+
+# naam van het versienummer in de database (CacheVersie)
+CACHE_VERSIE_NAAM = 'leeftijdsklassen'
+
+# hoe vaak (in seconden) het versienummer in de database gecontroleerd wordt
+# niet bij elke berekening, want dat zou weer een query per berekening kosten
+VERSIE_CONTROLE_INTERVAL = 10
+
+
+class LeeftijdsklassenTabellen(object):
+
+    """ alle look-up tabellen, opgebouwd met 2 database queries
+
+        elke tabel is een tuple met index wedstrijdleeftijd 0..MAX_WEDSTRIJDLEEFTIJD
+        een lege tabel betekent: geen leeftijdsklassen voor deze combinatie
     """
 
-    leeftijd2tekst = dict()     # [leeftijd] = beschrijving
+    def __init__(self, versie, db_versie):
+        self.versie = versie                    # versie in dit proces
+        self.db_versie = db_versie              # versie in de database
+        self.gecontroleerd = time.monotonic()   # laatste controle van db_versie
 
-    # begin met de Gemengd klassen
-    if True:
-        alle_lkl = list()
-        prev_lkl = None
-        min_wedstrijdleeftijd = 0
-        for lkl in (Leeftijdsklasse
-                    .objects
-                    .filter(organisatie__in=(ORGANISATIE_WA, ORGANISATIE_KHSN),
-                            wedstrijd_geslacht=GESLACHT_ALLE)
-                    .order_by('volgorde')):
+        # [(organisatie, wedstrijdgeslacht)] = tabel met de meest exacte leeftijdsklasse
+        self.klasse = dict()
+
+        # [(organisatie, wedstrijdgeslacht)] = tabel met aansluitende leeftijdsklassen
+        # voor KHSN: beschrijving "Gemengd of Heren"
+        self.reeks = dict()
+
+        # [wedstrijdgeslacht] = tabel voor de bondscompetitie
+        self.bondscompetitie = dict()
+
+        self._bouw()
+
+    @staticmethod
+    def _aansluitend(alle_lkl):
+        """ vul de ontbrekende grenzen aan, zodat de leeftijdsklassen op elkaar aansluiten
 
-            if lkl.min_wedstrijdleeftijd == 0:
+            min_wedstrijdleeftijd == 0 --> sluit aan op de vorige (jongere) klasse
+            max_wedstrijdleeftijd == 0 --> loopt door tot de volgende (oudere) klasse
+            de laatste klasse loopt door tot MAX_WEDSTRIJDLEEFTIJD
+
+            geeft een lijst terug met [min, max, beschrijving]
+        """
+        grenzen = list()
+        min_wedstrijdleeftijd = 0
+        for lkl in alle_lkl:
+            min_lft = lkl.min_wedstrijdleeftijd
+            if min_lft == 0:
                 # sluit aan op vorige (jongere) klasse
-                lkl.min_wedstrijdleeftijd = min_wedstrijdleeftijd
+                min_lft = min_wedstrijdleeftijd
 
-            if prev_lkl and prev_lkl.max_wedstrijdleeftijd == 0:
+            if len(grenzen) and grenzen[-1][1] == 0:
                 # sluit vorige (jongere) klasse aan op deze
-                prev_lkl.max_wedstrijdleeftijd = lkl.min_wedstrijdleeftijd - 1
+                grenzen[-1][1] = min_lft - 1
 
             # volgende leeftijdsklasse gaat verder waar deze ophoudt
             min_wedstrijdleeftijd = lkl.max_wedstrijdleeftijd + 1
-            alle_lkl.append(lkl)
-            prev_lkl = lkl
+            grenzen.append([min_lft, lkl.max_wedstrijdleeftijd, lkl.beschrijving])
         # for
-        prev_lkl.max_wedstrijdleeftijd = 150
 
-        # maak de look-up tabel
-        for lkl in alle_lkl:
-            for leeftijd in range(lkl.min_wedstrijdleeftijd, lkl.max_wedstrijdleeftijd+1):
-                leeftijd2tekst[leeftijd] = lkl.beschrijving     # 21+ Gemengd
+        if len(grenzen):
+            grenzen[-1][1] = MAX_WEDSTRIJDLEEFTIJD
+
+        return grenzen
+
+    @staticmethod
+    def _maak_tabel(grenzen):
+        """ zet de grenzen om in een tabel met index wedstrijdleeftijd """
+        if len(grenzen) == 0:
+            return tuple()
+
+        tabel = [None] * (MAX_WEDSTRIJDLEEFTIJD + 1)
+        for min_lft, max_lft, beschrijving in grenzen:
+            for leeftijd in range(max(min_lft, 0), min(max_lft, MAX_WEDSTRIJDLEEFTIJD) + 1):
+                tabel[leeftijd] = beschrijving
             # for
         # for
+        return tuple(tabel)
 
-    # nu uitbreiden met een specifiek geslacht, indien gekozen
-    if wedstrijdgeslacht_khsn != GESLACHT_ANDERS:
-        # haal alle leeftijdsklassen op en vul de min/max leeftijden aan
-        alle_lkl = list()
-        prev_lkl = None
-        min_wedstrijdleeftijd = 0
-        for lkl in (Leeftijdsklasse
-                    .objects
-                    .filter(organisatie__in=(ORGANISATIE_WA, ORGANISATIE_KHSN),
-                            wedstrijd_geslacht__in=wedstrijdgeslacht_khsn)
-                    .order_by('volgorde')):
-
-            if lkl.min_wedstrijdleeftijd == 0:
-                lkl.min_wedstrijdleeftijd = min_wedstrijdleeftijd
+    @staticmethod
+    def _maak_klasse_tabel(alle_lkl, eerste_past):
+        """ bepaal voor elke wedstrijdleeftijd de meest exacte leeftijdsklasse
 
-            if prev_lkl and prev_lkl.max_wedstrijdleeftijd == 0:
-                prev_lkl.max_wedstrijdleeftijd = lkl.min_wedstrijdleeftijd - 1
+            eerste_past = True:  de eerste passende klasse, met voorkeur voor klassen met een leeftijdsgrens (WA)
+            eerste_past = False: de laatste passende klasse, waarbij de jongste sporters niet ook in een
+                                 hogere klasse mogen passen (KHSN, IFAA)
+        """
+        if len(alle_lkl) == 0:
+            return tuple()
 
-            # volgende leeftijdsklasse gaat verder waar deze ophoudt
-            min_wedstrijdleeftijd = lkl.max_wedstrijdleeftijd + 1
-            alle_lkl.append(lkl)
+        grenzen = list()
+        prev_lkl = None
+        for lkl in alle_lkl:
+            min_lft = lkl.min_wedstrijdleeftijd
+            if not eerste_past:
+                # voorkom dat de jongste sporters ook in een hogere klasse passen
+                if prev_lkl and min_lft == 0:
+                    min_lft = prev_lkl.max_wedstrijdleeftijd + 1
+            grenzen.append((min_lft, lkl.max_wedstrijdleeftijd, lkl.beschrijving))
             prev_lkl = lkl
         # for
-        prev_lkl.max_wedstrijdleeftijd = 150
 
-        # de look-up tabel uitbreiden met een tweede beschrijving
-        # 21+ Gemengd --> 21+ Gemengd of 21+ Heren
-        for lkl in alle_lkl:
-            for leeftijd in range(lkl.min_wedstrijdleeftijd, lkl.max_wedstrijdleeftijd+1):
-                leeftijd2tekst[leeftijd] += ' of ' + lkl.beschrijving
+        tabel = list()
+        for leeftijd in range(MAX_WEDSTRIJDLEEFTIJD + 1):
+            fallback = None
+            gevonden = None
+            for min_lft, max_lft, beschrijving in grenzen:
+                # check leeftijd is compatible
+                if leeftijd >= min_lft and (max_lft == 0 or leeftijd <= max_lft):
+                    if not eerste_past:
+                        gevonden = beschrijving
+                        # blijf doorzoeken voor de oudere sporters
+                    elif min_lft == max_lft == 0:
+                        fallback = beschrijving
+                    else:
+                        gevonden = beschrijving
+                        break
             # for
+            tabel.append(gevonden or fallback)
+        # for
+        return tuple(tabel)
+
+    def _bouw(self):
+        # haal alle leeftijdsklassen in 1 keer op
+        org_geslacht2lkl = dict()       # [(organisatie, wedstrijd_geslacht)] = [Leeftijdsklasse, ...]
+        pk2lkl = dict()
+        for lkl in Leeftijdsklasse.objects.order_by('volgorde'):
+            tup = (lkl.organisatie, lkl.wedstrijd_geslacht)
+            try:
+                org_geslacht2lkl[tup].append(lkl)
+            except KeyError:
+                org_geslacht2lkl[tup] = [lkl]
+            pk2lkl[lkl.pk] = lkl
         # for
 
+        def zoek(organisaties, geslacht):
+            # combineer de leeftijdsklassen van meerdere organisaties, in de volgorde van presentatie
+            lkls = list()
+            for organisatie in organisaties:
+                lkls.extend(org_geslacht2lkl.get((organisatie, geslacht), list()))
+            # for
+            lkls.sort(key=lambda obj: obj.volgorde)
+            return lkls
+
+        wa_khsn = (ORGANISATIE_WA, ORGANISATIE_KHSN)
+
+        # KHSN: eerst de gemengde klassen, daarna uitbreiden met het specifieke geslacht
+        gemengd = self._maak_tabel(self._aansluitend(zoek(wa_khsn, GESLACHT_ALLE)))
+
+        for geslacht in TABEL_GESLACHTEN:
+            self.reeks[(ORGANISATIE_WA, geslacht)] = self._maak_tabel(
+                                                        self._aansluitend(zoek((ORGANISATIE_WA,), geslacht)))
+            self.reeks[(ORGANISATIE_IFAA, geslacht)] = self._maak_tabel(
+                                                        self._aansluitend(zoek((ORGANISATIE_IFAA,), geslacht)))
+
+            # 21+ Gemengd --> 21+ Gemengd of 21+ Heren
+            tabel = list(gemengd)
+            if geslacht != GESLACHT_ANDERS:
+                specifiek = self._maak_tabel(self._aansluitend(zoek(wa_khsn, geslacht)))
+                if len(specifiek):
+                    tabel = [(tekst + ' of ' + extra if tekst and extra else tekst)
+                             for tekst, extra in zip(gemengd, specifiek)]
+            self.reeks[(ORGANISATIE_KHSN, geslacht)] = tuple(tabel)
+
+            self.klasse[(ORGANISATIE_WA, geslacht)] = self._maak_klasse_tabel(
+                                                            zoek((ORGANISATIE_WA,), geslacht), True)
+
+            self.klasse[(ORGANISATIE_IFAA, geslacht)] = self._maak_klasse_tabel(
+                                                            zoek((ORGANISATIE_IFAA,), geslacht), False)
+
+            # eerste poging: geslacht-specifieke klasse; tweede poging: gender-neutrale klasse
+            specifiek = self._maak_klasse_tabel(zoek(wa_khsn, geslacht), False)
+            neutraal = self._maak_klasse_tabel(zoek(wa_khsn, GESLACHT_ALLE), False)
+            if len(specifiek) == 0:
+                specifiek = neutraal
+            elif len(neutraal):
+                specifiek = tuple([(tekst or extra) for tekst, extra in zip(specifiek, neutraal)])
+            self.klasse[(ORGANISATIE_KHSN, geslacht)] = specifiek
+        # for
+
+        # bondscompetitie: alleen de leeftijdsklassen gebruikt in de 18m recurve klassen
+        lkl_pks = set(TemplateCompetitieIndivKlasse
+                      .leeftijdsklassen
+                      .through
+                      .objects
+                      .filter(templatecompetitieindivklasse__gebruik_18m=True,
+                              templatecompetitieindivklasse__boogtype__afkorting=BOOGTYPE_AFKORTING_RECURVE)
+                      .values_list('leeftijdsklasse_id', flat=True))
+
+        comp_lkl = [lkl for lkl in pk2lkl.values() if lkl.pk in lkl_pks]
+        comp_lkl.sort(key=lambda obj: obj.volgorde)        # jongste sporters eerst
+
+        for geslacht in (GESLACHT_MAN, GESLACHT_VROUW, GESLACHT_ALLE):
+            tabel_w = [None] * (MAX_WEDSTRIJDLEEFTIJD + 1)      # beschrijving voor wedstrijdgeslacht
+            tabel_g = [None] * (MAX_WEDSTRIJDLEEFTIJD + 1)      # beschrijving voor gender-neutraal
+
+            alle_lkl = [lkl for lkl in comp_lkl if lkl.wedstrijd_geslacht in (geslacht, GESLACHT_ALLE)]
+            min_wedstrijdleeftijd = 0
+            for nr, lkl in enumerate(alle_lkl, start=1):
+                if nr == len(alle_lkl):
+                    max_wedstrijdleeftijd = MAX_WEDSTRIJDLEEFTIJD
+                else:
+                    max_wedstrijdleeftijd = lkl.max_wedstrijdleeftijd
+
+                if lkl.wedstrijd_geslacht == GESLACHT_ALLE:
+                    target = tabel_g
+                else:
+                    target = tabel_w
+
+                for leeftijd in range(min_wedstrijdleeftijd, min(max_wedstrijdleeftijd, MAX_WEDSTRIJDLEEFTIJD) + 1):
+                    target[leeftijd] = lkl.beschrijving.replace(' Gemengd', '')
+                # for
+
+                # volgende leeftijdsklasse gaat verder waar deze ophoudt
+                min_wedstrijdleeftijd = lkl.max_wedstrijdleeftijd + 1
+            # for
+
+            self.bondscompetitie[geslacht] = tuple([(tekst_w or tekst_g) for tekst_w, tekst_g in zip(tabel_w, tabel_g)])
+        # for
+
+
+_tabellen_lock = threading.Lock()
+_tabellen = None
+_tabellen_versie = 1
+
+
+def _is_actueel(tabellen: LeeftijdsklassenTabellen | None) -> bool:
+    if tabellen is None or tabellen.versie != _tabellen_versie:
+        return False
+
+    # controleer af en toe of een ander proces de leeftijdsklassen aangepast heeft
+    nu = time.monotonic()
+    if nu - tabellen.gecontroleerd >= VERSIE_CONTROLE_INTERVAL:
+        if get_cache_versie(CACHE_VERSIE_NAAM) != tabellen.db_versie:
+            return False
+        tabellen.gecontroleerd = nu
+
+    return True
+
+
+def get_leeftijdsklassen_tabellen() -> LeeftijdsklassenTabellen:
+    """ geef de actuele look-up tabellen terug; worden opgebouwd als ze nog niet bestaan of verouderd zijn """
+    global _tabellen
+
+    tabellen = _tabellen
+    if not _is_actueel(tabellen):
+        with _tabellen_lock:
+            tabellen = _tabellen
+            if not _is_actueel(tabellen):
+                # versie ophalen voor het opbouwen, zodat een gelijktijdige wijziging niet gemist wordt
+                tabellen = LeeftijdsklassenTabellen(_tabellen_versie, get_cache_versie(CACHE_VERSIE_NAAM))
+                _tabellen = tabellen
+
+    return tabellen
+
+
+def verhoog_leeftijdsklassen_versie(**kwargs):
+    """ signal handler: een leeftijdsklasse is aangepast --> tabellen opnieuw opbouwen bij volgende gebruik
+        in dit proces direct, in de andere processen via het versienummer in de database
+    """
+    global _tabellen_versie
+    _tabellen_versie += 1
+    verhoog_cache_versie(CACHE_VERSIE_NAAM)
+
+
+post_save.connect(verhoog_leeftijdsklassen_versie, sender=Leeftijdsklasse, dispatch_uid='lkl_tabellen_save')
+post_delete.connect(verhoog_leeftijdsklassen_versie, sender=Leeftijdsklasse, dispatch_uid='lkl_tabellen_del')
+post_save.connect(verhoog_leeftijdsklassen_versie, sender=TemplateCompetitieIndivKlasse,
+                  dispatch_uid='lkl_tabellen_template_save')
+post_delete.connect(verhoog_leeftijdsklassen_versie, sender=TemplateCompetitieIndivKlasse,
+                    dispatch_uid='lkl_tabellen_template_del')
+m2m_changed.connect(verhoog_leeftijdsklassen_versie, sender=TemplateCompetitieIndivKlasse.leeftijdsklassen.through,
+                    dispatch_uid='lkl_tabellen_template_m2m')
+
+
+def _opzoeken(tabel, wedstrijdleeftijd):
+    """ zoek de beschrijving op; leeftijden buiten de tabel worden begrensd """
+    if wedstrijdleeftijd < 0:
+        wedstrijdleeftijd = 0
+    elif wedstrijdleeftijd > MAX_WEDSTRIJDLEEFTIJD:
+        wedstrijdleeftijd = MAX_WEDSTRIJDLEEFTIJD
+    return tabel[wedstrijdleeftijd]
+
+
+def bereken_leeftijdsklasse(organisatie, wedstrijdleeftijd, wedstrijdgeslacht):
+    """ bepaal de meest exacte leeftijdsklasse voor een sporter, zonder database query
+        geschikt om duizenden sporters achter elkaar in te delen
+
+        organisatie: ORGANISATIE_WA, ORGANISATIE_KHSN of ORGANISATIE_IFAA
+        geeft "?" terug als er geen passende leeftijdsklasse is
+    """
+    if wedstrijdleeftijd < 0:
+        return "?"
+    tabel = get_leeftijdsklassen_tabellen().klasse.get((organisatie, wedstrijdgeslacht), tuple())
+    if len(tabel) == 0:
+        return "?"
+    return _opzoeken(tabel, wedstrijdleeftijd) or "?"
+
+
+def bereken_leeftijdsklassen_khsn(geboorte_jaar, wedstrijdgeslacht_khsn, huidige_jaar):
+    """ retourneert de wedstrijdklassen voor een sporter vanaf 1 jaar terug tot 4 jaar vooruit.
+        wedstrijdgeslacht_khsn kan zijn GESLACHT_MAN, GESLACHT_VROUW of GESLACHT_ANDERS
+
+        Retourneert:
+            Huidige jaar, Leeftijd, False, None, None als het geen jonge schutter betreft
+            Huidige jaar, Leeftijd, True, wlst, clst voor jonge schutters
+                wlst en clst zijn een lijst van wedstrijdklassen voor
+                de jaren -1, 0, +1, +2, +3 ten opzicht van Leeftijd
+                Voorbeeld:
+                    huidige jaar = 2019
+                    leeftijd = 17
+                    lkl_lst=(('Onder 18 Gemengd of Onder 18 Heren'),     # -1 = 16
+                             ('Onder 18 Gemengd of Onder 18 Heren'),     #  0 = 17
+                             ('Onder 21 Gemengd of Onder 21 Heren'),     # +1 = 18
+                             ('Onder 21 Gemengd of Onder 21 Heren'),     # +2 = 19
+                             ('Onder 21 Gemengd of Onder 21 Heren'))     # +3 = 20
+    """
+
+    # look-up tabel: [leeftijd] = "21+ Gemengd of 21+ Heren"
+    leeftijd2tekst = get_leeftijdsklassen_tabellen().reeks[(ORGANISATIE_KHSN, wedstrijdgeslacht_khsn)]
+
     wedstrijdleeftijd = huidige_jaar - geboorte_jaar
 
     # bereken de wedstrijdklassen en competitieklassen
     lkl_lst = list()
     lkl_dit_jaar = '?'
     for n in (-1, 0, 1, 2, 3):
-        tekst = leeftijd2tekst[wedstrijdleeftijd + n]
+        tekst = _opzoeken(leeftijd2tekst, wedstrijdleeftijd + n)
         lkl_lst.append(tekst)
         if n == 0:
             lkl_dit_jaar = tekst
@@ -139,49 +392,8 @@ def bereken_leeftijdsklassen_bondscompetitie(geboorte_jaar, wedstrijdgeslacht_kh
     if wedstrijdgeslacht_khsn == GESLACHT_ANDERS:
         wedstrijdgeslacht_khsn = GESLACHT_MAN
 
-    leeftijd2tekst_w = dict()  # [leeftijd] = beschrijving voor wedstrijdgeslacht
-    leeftijd2tekst_g = dict()  # [leeftijd] = beschrijving voor gender-neutraal
-
-    lkl_pks = list()
-    for ckl in (TemplateCompetitieIndivKlasse
-                .objects
-                .prefetch_related('leeftijdsklassen')
-                .filter(gebruik_18m=True,
-                        boogtype__afkorting=BOOGTYPE_AFKORTING_RECURVE)):
-        for lkl in ckl.leeftijdsklassen.all():
-            pk = lkl.pk
-            if pk not in lkl_pks:
-                lkl_pks.append(pk)
-        # for
-    # for
-
-    alle_lkl = list()
-    min_wedstrijdleeftijd = 0
-    for lkl in (Leeftijdsklasse
-                .objects
-                .filter(pk__in=lkl_pks,
-                        wedstrijd_geslacht__in=(wedstrijdgeslacht_khsn, GESLACHT_ALLE))
-                .order_by('volgorde')):        # jongste sporters eerst
-
-        lkl.min_wedstrijdleeftijd = min_wedstrijdleeftijd
-
-        # volgende leeftijdsklasse gaat verder waar deze ophoudt
-        min_wedstrijdleeftijd = lkl.max_wedstrijdleeftijd + 1
-        alle_lkl.append(lkl)
-    # for
-    alle_lkl[-1].max_wedstrijdleeftijd = 150
-
-    # maak de look-up tabel
-    for lkl in alle_lkl:
-        if lkl.wedstrijd_geslacht == GESLACHT_ALLE:
-            target = leeftijd2tekst_g
-        else:
-            target = leeftijd2tekst_w
-
-        for leeftijd in range(lkl.min_wedstrijdleeftijd, lkl.max_wedstrijdleeftijd + 1):
-            target[leeftijd] = lkl.beschrijving.replace(' Gemengd', '')
-        # for
-    # for
+    # look-up tabel: [leeftijd] = beschrijving voor wedstrijdgeslacht, anders gender-neutraal
+    leeftijd2tekst = get_leeftijdsklassen_tabellen().bondscompetitie[wedstrijdgeslacht_khsn]
 
     eerste_jaar = huidige_jaar
     if huidige_maand <= 6:
@@ -198,18 +410,11 @@ def bereken_leeftijdsklassen_bondscompetitie(geboorte_jaar, wedstrijdgeslacht_kh
     lkl_lst = list()
     for n in (-1, 0, 1, 2, 3):
         seizoen = '%s/%s' % (eerste_jaar+n, eerste_jaar+n+1)
-
-        try:
-            tekst = leeftijd2tekst_w[wedstrijdleeftijd + n]
-        except KeyError:
-            tekst = leeftijd2tekst_g[wedstrijdleeftijd + n]
-
+        tekst = _opzoeken(leeftijd2tekst, wedstrijdleeftijd + n)
         lkl = {'seizoen': seizoen, 'tekst': tekst}
         lkl_lst.append(lkl)
     # for
 
-    # print(lkl_lst)
-
     return wedstrijdleeftijd, lkl_lst
 
 
@@ -229,47 +434,18 @@ def bereken_leeftijdsklassen_wa(geboorte_jaar, wedstrijdgeslacht, huidige_jaar):
 
     sporter_leeftijd = huidige_jaar - geboorte_jaar
 
-    # haal alle leeftijdsklassen op en vul de min/max leeftijden aan
-    alle_lkl = list()
-    prev_lkl = None
-    min_wedstrijdleeftijd = 0
-    for lkl in (Leeftijdsklasse
-                .objects
-                .filter(organisatie=ORGANISATIE_WA,
-                        wedstrijd_geslacht=wedstrijdgeslacht)
-                .order_by('volgorde')):
-
-        if lkl.min_wedstrijdleeftijd == 0:
-            lkl.min_wedstrijdleeftijd = min_wedstrijdleeftijd
-
-        if prev_lkl and prev_lkl.max_wedstrijdleeftijd == 0:
-            prev_lkl.max_wedstrijdleeftijd = lkl.min_wedstrijdleeftijd - 1
-
-        # volgende leeftijdsklasse gaat verder waar deze ophoudt
-        min_wedstrijdleeftijd = lkl.max_wedstrijdleeftijd + 1
-        alle_lkl.append(lkl)
-        prev_lkl = lkl
-    # for
+    # look-up tabel met alle leeftijden
+    leeftijd2tekst = get_leeftijdsklassen_tabellen().reeks[(ORGANISATIE_WA, wedstrijdgeslacht)]
 
-    if not prev_lkl:
+    if len(leeftijd2tekst) == 0:
         # geen klassen gevonden
         return huidige_jaar, sporter_leeftijd, None, list()
 
-    prev_lkl.max_wedstrijdleeftijd = 150
-
-    # maak de look-up tabel met alle leeftijden
-    leeftijd2tekst = dict()
-    for lkl in alle_lkl:
-        for leeftijd in range(lkl.min_wedstrijdleeftijd, lkl.max_wedstrijdleeftijd+1):
-            leeftijd2tekst[leeftijd] = lkl.beschrijving
-        # for
-    # for
-
     # bereken de wedstrijdklassen en competitieklassen
     lkl_list = list()
     lkl_dit_jaar = ''
     for n in (-1, 0, 1, 2, 3):
-        lang = leeftijd2tekst[sporter_leeftijd + n]
+        lang = _opzoeken(leeftijd2tekst, sporter_leeftijd + n)
         lkl_list.append(lang)
         if n == 0:
             lkl_dit_jaar = lang
@@ -287,34 +463,12 @@ def bereken_leeftijdsklassen_ifaa(geboorte_jaar, wedstrijdgeslacht, huidige_jaar
         de lijst bevat 5 entries, voor de jaren -1, 0, +1, +2, +3 ten opzicht van het huidige jaartal
     """
 
-    # haal alle leeftijdsklassen op en vul de min/max leeftijden aan
-    alle_lkl = (Leeftijdsklasse
-                .objects
-                .filter(organisatie=ORGANISATIE_IFAA,
-                        wedstrijd_geslacht=wedstrijdgeslacht)
-                .order_by('volgorde'))
-    prev_lkl = None
-    min_wedstrijdleeftijd = 0
-    for lkl in alle_lkl:
-        if lkl.min_wedstrijdleeftijd == 0:
-            lkl.min_wedstrijdleeftijd = min_wedstrijdleeftijd
-
-        if prev_lkl and prev_lkl.max_wedstrijdleeftijd == 0:
-            prev_lkl.max_wedstrijdleeftijd = lkl.min_wedstrijdleeftijd - 1
-
-        # volgende leeftijdsklasse gaat verder waar deze ophoudt
-        min_wedstrijdleeftijd = lkl.max_wedstrijdleeftijd + 1
-        prev_lkl = lkl
-    # for
-    prev_lkl.max_wedstrijdleeftijd = 150
+    # look-up tabel met alle leeftijden
+    leeftijd2tekst = get_leeftijdsklassen_tabellen().reeks[(ORGANISATIE_IFAA, wedstrijdgeslacht)]
 
-    # zet om in look-up tabel
-    leeftijd2tekst = dict()
-    for lkl in alle_lkl:
-        for leeftijd in range(lkl.min_wedstrijdleeftijd, lkl.max_wedstrijdleeftijd+1):
-            leeftijd2tekst[leeftijd] = lkl.beschrijving
-        # for
-    # for
+    if len(leeftijd2tekst) == 0:
+        # geen klassen gevonden
+        return list()
 
     leeftijd = huidige_jaar - geboorte_jaar
 
@@ -323,7 +477,7 @@ def bereken_leeftijdsklassen_ifaa(geboorte_jaar, wedstrijdgeslacht, huidige_jaar
         wleeftijd2 = leeftijd + n
         wleeftijd1 = wleeftijd2 - 1
 
-        tup = (huidige_jaar + n, leeftijd2tekst[wleeftijd1], leeftijd2tekst[wleeftijd2])
+        tup = (huidige_jaar + n, _opzoeken(leeftijd2tekst, wleeftijd1), _opzoeken(leeftijd2tekst, wleeftijd2))
         lst.append(tup)
     # for
 
@@ -338,33 +492,7 @@ def bereken_leeftijdsklasse_wa(wedstrijdleeftijd, wedstrijdgeslacht):
         Voorbeeld: Onder 12 meisjes
                    Onder 18 jongens
     """
-
-    fallback_lkl = None
-    gevonden_lkl = None
-
-    # selecteer een geslacht-specifieke wedstrijdklasse
-    for lkl in (Leeftijdsklasse
-                .objects
-                .filter(organisatie=ORGANISATIE_WA,
-                        wedstrijd_geslacht=wedstrijdgeslacht)
-                .order_by('volgorde')):                              # pragma: no branch
-
-        # check leeftijd is compatible
-        if lkl.leeftijd_is_compatible(wedstrijdleeftijd):
-            if lkl.min_wedstrijdleeftijd == lkl.max_wedstrijdleeftijd == 0:
-                fallback_lkl = lkl
-            else:
-                gevonden_lkl = lkl
-                break
-    # for
-
-    if not gevonden_lkl:
-        gevonden_lkl = fallback_lkl
-
-    if not gevonden_lkl:
-        return "?"
-
-    return gevonden_lkl.beschrijving
+    return bereken_leeftijdsklasse(ORGANISATIE_WA, wedstrijdleeftijd, wedstrijdgeslacht)
 
 
 def bereken_leeftijdsklasse_ifaa(wedstrijdleeftijd, wedstrijdgeslacht):
@@ -374,36 +502,7 @@ def bereken_leeftijdsklasse_ifaa(wedstrijdleeftijd, wedstrijdgeslacht):
 
         Voorbeeld: Senioren vrouwen
     """
-
-    gevonden_lkl = None
-
-    # print('bereken_leeftijdsklasse_ifaa: wedstrijdleeftijd=%s, wedstrijdgeslacht=%s' % (
-    #           wedstrijdleeftijd, wedstrijdgeslacht))
-
-    # selecteer een geslacht-specifieke wedstrijdklasse
-    prev_lkl = None
-    for lkl in (Leeftijdsklasse
-                .objects
-                .filter(organisatie=ORGANISATIE_IFAA,
-                        wedstrijd_geslacht=wedstrijdgeslacht)
-                .order_by('volgorde')):
-
-        # voorkom dat de jongste sporters ook in een hogere klasse passen
-        if prev_lkl and lkl.min_wedstrijdleeftijd == 0:
-            lkl.min_wedstrijdleeftijd = prev_lkl.max_wedstrijdleeftijd + 1
-
-        # check leeftijd is compatible
-        if lkl.leeftijd_is_compatible(wedstrijdleeftijd):
-            gevonden_lkl = lkl
-            # blijf doorzoeken voor de oudere sporters
-
-        prev_lkl = lkl
-    # for
-
-    if not gevonden_lkl:
-        return "?"
-
-    return gevonden_lkl.beschrijving
+    return bereken_leeftijdsklasse(ORGANISATIE_IFAA, wedstrijdleeftijd, wedstrijdgeslacht)
 
 
 def bereken_leeftijdsklasse_khsn(wedstrijdleeftijd, wedstrijdgeslacht):
@@ -414,53 +513,7 @@ def bereken_leeftijdsklasse_khsn(wedstrijdleeftijd, wedstrijdgeslacht):
         Voorbeeld: Onder 12 Meisjes
                    Onder 18 Heren
     """
-
-    gevonden_lkl = None
-
-    # eerste poging: selecteer een geslacht-specifieke wedstrijdklasse
-    prev_lkl = None
-    for lkl in (Leeftijdsklasse
-                .objects
-                .filter(organisatie__in=(ORGANISATIE_WA, ORGANISATIE_KHSN),
-                        wedstrijd_geslacht=wedstrijdgeslacht)
-                .order_by('volgorde')):
-
-        # voorkom dat de jongste sporters ook in een hogere klasse passen
-        if prev_lkl and lkl.min_wedstrijdleeftijd == 0:
-            lkl.min_wedstrijdleeftijd = prev_lkl.max_wedstrijdleeftijd + 1
-
-        # check leeftijd is compatible
-        if lkl.leeftijd_is_compatible(wedstrijdleeftijd):
-            gevonden_lkl = lkl
-
-        prev_lkl = lkl
-    # for
-
-    if not gevonden_lkl:
-        # tweede poging: selecteer een gender-neutrale wedstrijdklasse
-        prev_lkl = None
-        for lkl in (Leeftijdsklasse
-                    .objects
-                    .filter(organisatie__in=(ORGANISATIE_WA, ORGANISATIE_KHSN),
-                            wedstrijd_geslacht=GESLACHT_ALLE)
-                    .order_by('volgorde')):
-
-            # voorkom dat de jongste sporters ook in een hogere klasse passen
-            if prev_lkl and lkl.min_wedstrijdleeftijd == 0:
-                lkl.min_wedstrijdleeftijd = prev_lkl.max_wedstrijdleeftijd + 1
-
-            # check leeftijd is compatible
-            if lkl.leeftijd_is_compatible(wedstrijdleeftijd):
-                gevonden_lkl = lkl
-
-            prev_lkl = lkl
-        # for
-
-    if not gevonden_lkl:        # pragma: no cover
-        # uitzondering tijdens browser tests
-        return "?"
-
-    return gevonden_lkl.beschrijving
+    return bereken_leeftijdsklasse(ORGANISATIE_KHSN, wedstrijdleeftijd, wedstrijdgeslacht)
 
 
 # end of file
@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
 
-#  Copyright (c) 2019-2025 Ramon van der Winkel.
+#  Copyright (c) 2019-2026 Ramon van der Winkel.
 #  All rights reserved.
 #  Licensed under BSD-3-Clause-Clear. See LICENSE file for details.
 
@@ -8,6 +8,8 @@ from django.test import TestCase
 from django.utils import timezone
 from BasisTypen.definities import (GESLACHT_ANDERS, GESLACHT_MAN, GESLACHT_VROUW,
                                    ORGANISATIE_IFAA, ORGANISATIE_KHSN, ORGANISATIE_WA)
+from BasisTypen.models import Leeftijdsklasse
+from BasisTypen.operations import verhoog_cache_versie
 from Geo.models import Regio
 from Registreer.definities import REGISTRATIE_FASE_COMPLEET
 from Registreer.models import GastRegistratie
@@ -17,7 +19,10 @@ from Sporter.leeftijdsklassen import (bereken_leeftijdsklassen_wa,
                                       bereken_leeftijdsklassen_bondscompetitie,
                                       bereken_leeftijdsklasse_wa,
                                       bereken_leeftijdsklasse_khsn,
-                                      bereken_leeftijdsklasse_ifaa)
+                                      bereken_leeftijdsklasse_ifaa,
+                                      bereken_leeftijdsklasse,
+                                      get_leeftijdsklassen_tabellen,
+                                      CACHE_VERSIE_NAAM, VERSIE_CONTROLE_INTERVAL)
 from Sporter.models import Sporter
 from Sporter.operations import get_sporter_voorkeuren
 from TestHelpers.e2ehelpers import E2EHelpers
@@ -561,6 +566,60 @@ class TestSporterLeeftijdsklassen(E2EHelpers, TestCase):
                            {'seizoen': '2024/2025', 'tekst': 'Gemengd'},
                            {'seizoen': '2025/2026', 'tekst': 'Gemengd'}]))
 
+    def test_tabellen(self):
+        # de tabellen worden 1x opgebouwd; daarna kost een berekening geen queries meer
+        tabellen = get_leeftijdsklassen_tabellen()
+        with self.assert_max_queries(0):
+            self.assertEqual(bereken_leeftijdsklasse_wa(17, GESLACHT_MAN), 'Onder 18 Heren')
+            self.assertEqual(bereken_leeftijdsklasse_khsn(13, GESLACHT_ANDERS), 'Onder 14 Gemengd')
+            self.assertEqual(bereken_leeftijdsklasse(ORGANISATIE_KHSN, 200, GESLACHT_VROUW), '60+ Dames')
+            self.assertEqual(bereken_leeftijdsklasse(ORGANISATIE_WA, -1, GESLACHT_MAN), '?')
+            bereken_leeftijdsklassen_khsn(self.huidige_jaar - 9, GESLACHT_MAN, self.huidige_jaar)
+            bereken_leeftijdsklassen_bondscompetitie(2022 - 9, GESLACHT_ANDERS, 2022, 3)
+            bereken_leeftijdsklassen_ifaa(self.huidige_jaar - 9, GESLACHT_MAN, self.huidige_jaar)
+            self.assertEqual(bereken_leeftijdsklassen_ifaa(self.huidige_jaar - 9, GESLACHT_ANDERS,
+                                                           self.huidige_jaar), [])
+        self.assertTrue(get_leeftijdsklassen_tabellen() is tabellen)
+
+        # een wijziging van een leeftijdsklasse zorgt voor nieuwe tabellen
+        lkl = Leeftijdsklasse.objects.get(organisatie=ORGANISATIE_WA, beschrijving='Onder 18 Heren')
+        lkl.beschrijving = 'Onder 18 Mannen'
+        lkl.save(update_fields=['beschrijving'])
+
+        self.assertFalse(get_leeftijdsklassen_tabellen() is tabellen)
+        self.assertEqual(bereken_leeftijdsklasse_wa(17, GESLACHT_MAN), 'Onder 18 Mannen')
+
+        # zet terug, anders blijft de gewijzigde tabel bestaan na de rollback van de test
+        lkl.beschrijving = 'Onder 18 Heren'
+        lkl.save(update_fields=['beschrijving'])
+        self.assertEqual(bereken_leeftijdsklasse_wa(17, GESLACHT_MAN), 'Onder 18 Heren')
+
+        # wijziging door een ander proces: alleen het versienummer in de database is verhoogd
+        tabellen = get_leeftijdsklassen_tabellen()
+        Leeftijdsklasse.objects.filter(pk=lkl.pk).update(beschrijving='Onder 18 Mannen')
+        verhoog_cache_versie(CACHE_VERSIE_NAAM)
+
+        # binnen het controle interval wordt de database niet geraadpleegd
+        with self.assert_max_queries(0):
+            self.assertEqual(bereken_leeftijdsklasse_wa(17, GESLACHT_MAN), 'Onder 18 Heren')
+        self.assertTrue(get_leeftijdsklassen_tabellen() is tabellen)
+
+        # na het controle interval worden de tabellen opnieuw opgebouwd
+        tabellen.gecontroleerd -= VERSIE_CONTROLE_INTERVAL
+        self.assertEqual(bereken_leeftijdsklasse_wa(17, GESLACHT_MAN), 'Onder 18 Mannen')
+        self.assertFalse(get_leeftijdsklassen_tabellen() is tabellen)
+
+        # ongewijzigde versie: tabellen blijven in gebruik
+        tabellen = get_leeftijdsklassen_tabellen()
+        tabellen.gecontroleerd -= VERSIE_CONTROLE_INTERVAL
+        with self.assert_max_queries(1):
+            get_leeftijdsklassen_tabellen()
+        self.assertTrue(get_leeftijdsklassen_tabellen() is tabellen)
+
+        # zet terug
+        lkl.save(update_fields=['beschrijving'])
+        self.assertEqual(bereken_leeftijdsklasse_wa(17, GESLACHT_MAN), 'Onder 18 Heren')
+
     def test_persoonlijk(self):
         # zonder login
         with self.assert_max_queries(20):
@@ -1,13 +1,13 @@
 # -*- coding: utf-8 -*-
 
-#  Copyright (c) 2020-2025 Ramon van der Winkel.
+#  Copyright (c) 2020-2026 Ramon van der Winkel.
 #  All rights reserved.
 #  Licensed under BSD-3-Clause-Clear. See LICENSE file for details.
 
 from django.utils import timezone
 from django.conf import settings
 from Account.models import get_account
-from Account.operations import zet_sessionvar_if_changed
+from Account.operations import zet_sessionvar_if_changed, get_vluchtige_sessionvar, zet_vluchtige_sessionvar
 from Functie.rol import rol_get_huidige_functie
 from Mailer.operations import mailer_queue_email, render_email_template
 from Taken.models import Taak
@@ -51,10 +51,7 @@ def eval_open_taken(request, forceer=False):
     """ voer elke paar minuten een evaluatie uit van het aantal taken
         dat open staat voor deze gebruiker
     """
-    try:
-        eval_after = request.session[SESSIONVAR_TAAK_EVAL_AFTER]
-    except KeyError:
-        eval_after = None
+    eval_after = get_vluchtige_sessionvar(request, SESSIONVAR_TAAK_EVAL_AFTER)
 
     if not forceer:
         now_str = str(timezone.now().timestamp())
@@ -65,7 +62,7 @@ def eval_open_taken(request, forceer=False):
     # en zet het volgende evaluatie moment
     next_eval = timezone.now() + timedelta(seconds=60*TAAK_EVAL_INTERVAL_MINUTES)
     eval_after = str(next_eval.timestamp())
-    zet_sessionvar_if_changed(request, SESSIONVAR_TAAK_EVAL_AFTER, eval_after)
+    zet_vluchtige_sessionvar(request, SESSIONVAR_TAAK_EVAL_AFTER, eval_after, 60*TAAK_EVAL_INTERVAL_MINUTES)
 
     functie_pks, _ = get_taak_functie_pks(request)
 
@@ -1,10 +1,11 @@
 # -*- coding: utf-8 -*-
 
-#  Copyright (c) 2019-2025 Ramon van der Winkel.
+#  Copyright (c) 2019-2026 Ramon van der Winkel.
 #  All rights reserved.
 #  Licensed under BSD-3-Clause-Clear. See LICENSE file for details.
 
 from django.test import TestCase
+from Account.operations import zet_vluchtige_sessionvar
 from Functie.models import Functie
 from Geo.models import Regio
 from Taken.models import Taak
@@ -177,9 +178,7 @@ class TestTakenViews(E2EHelpers, TestCase):
         request = resp.wsgi_request
         eval_open_taken(request, forceer=False)
 
-        session = request.session
-        del session[SESSIONVAR_TAAK_EVAL_AFTER]
-        session.save()
+        zet_vluchtige_sessionvar(request, SESSIONVAR_TAAK_EVAL_AFTER, None, 60)
         eval_open_taken(request, forceer=False)
 
     def test_bad(self):
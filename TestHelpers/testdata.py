@@ -24,6 +24,7 @@ from CompLaagBond.models import KampBK, DeelnemerBK, TeamBK
 from CompLaagRayon.models import KampRK, DeelnemerRK, TeamRK
 from CompLaagRegio.models import RegioComp, RegioDeelnemer, RegioTeam, RegioPoule
 from Functie.models import Functie, VerklaringHanterenPersoonsgegevens
+from Functie.rol.bepaal import verhoog_rol_index_versie
 from Geo.models import Rayon, Regio, Cluster
 from Locatie.models import WedstrijdLocatie
 from Score.definities import AG_DOEL_INDIV
@@ -496,6 +497,7 @@ class TestData(object):
         # for
 
         Vereniging.objects.bulk_create(bulk)     # 48x
+        verhoog_rol_index_versie()              # bulk_create stuurt geen signals
         # print('TestData: created %sx Vereniging' % len(bulk))
 
         for ver in bulk:
@@ -769,6 +771,7 @@ class TestData(object):
         if len(bulk) > 0:                           # pragma: no branch
             Functie.objects.bulk_create(bulk)
         del bulk
+        verhoog_rol_index_versie()                  # bulk_create stuurt geen signals
 
         # koppel de functies aan de accounts
         for functie in (Functie
@@ -5,6 +5,7 @@
 #  Licensed under BSD-3-Clause-Clear. See LICENSE file for details.
 
 from django.conf import settings
+from django.db.models import F
 from django.utils import timezone
 from Bestelling.bestel_plugin_base import BestelPluginBase
 from Bestelling.definities import BESTELLING_REGEL_CODE_WEBWINKEL
@@ -12,7 +13,7 @@ from Bestelling.models import Bestelling, BestellingRegel, BestellingMandje
 from Betaal.format import format_bedrag_euro
 from Webwinkel.definities import (KEUZE_STATUS_RESERVERING_MANDJE, KEUZE_STATUS_BESTELD, KEUZE_STATUS_BACKOFFICE,
                                   KEUZE_STATUS_GEANNULEERD, VERZENDKOSTEN_BRIEFPOST, VERZENDKOSTEN_PAKKETPOST)
-from Webwinkel.models import WebwinkelKeuze
+from Webwinkel.models import WebwinkelKeuze, WebwinkelProduct
 from decimal import Decimal
 
 
@@ -21,21 +22,23 @@ class WebwinkelBestelPlugin(BestelPluginBase):
     def __init__(self):
         super().__init__()
 
-    def mandje_opschonen(self, verval_datum):
-        mandje_pks = list()
-        for keuze in (WebwinkelKeuze
-                      .objects
-                      .filter(status=KEUZE_STATUS_RESERVERING_MANDJE,
-                              wanneer__lt=verval_datum)
+    @staticmethod
+    def _vervallen(verval_datum):
+        return (WebwinkelKeuze
+                .objects
+                .filter(status=KEUZE_STATUS_RESERVERING_MANDJE,
+                        wanneer__lt=verval_datum))
+
+    def mandjes_met_vervallen(self, verval_datum) -> list[int]:
+        return self._get_mandje_pks(self._vervallen(verval_datum))
+
+    def mandje_opschonen(self, mandje: BestellingMandje, verval_datum):
+        for keuze in (self._vervallen(verval_datum)
+                      .filter(bestelling_regel__bestellingmandje=mandje)
                       .select_related('bestelling_regel')):
 
             regel = keuze.bestelling_regel
 
-            # onthoud in welk mandje deze lag
-            mandje = regel.bestellingmandje_set.first()
-            if mandje.pk not in mandje_pks:
-                mandje_pks.append(mandje.pk)
-
             self.stdout.write('[INFO] Vervallen: BestellingRegel pk=%s webwinkel keuze (%s) in mandje van %s' % (
                               regel.pk, keuze, mandje.account))
 
@@ -46,8 +49,6 @@ class WebwinkelBestelPlugin(BestelPluginBase):
             regel.delete()
         # for
 
-        return mandje_pks
-
     def reserveer(self, product_pk: int, mandje_van_str: str) -> BestellingRegel | None:
         """ Maak een reservering voor het webwinkel product (zodat iemand anders deze niet kan reserveren)
             en geef een BestellingRegel terug.
@@ -68,10 +69,12 @@ class WebwinkelBestelPlugin(BestelPluginBase):
         kort = webwinkel_keuze.korte_beschrijving()
 
         if not product.onbeperkte_voorraad:
-            # Noteer: geen concurrency risico want serialisatie via deze achtergrondtaak
+            # atomaire update, want meerdere workers kunnen tegelijk hetzelfde product reserveren
             # TODO: waar zit de bescherming tegen "geen voorraad meer"?
-            product.aantal_op_voorraad -= aantal
-            product.save(update_fields=['aantal_op_voorraad'])
+            (WebwinkelProduct
+             .objects
+             .filter(pk=product.pk)
+             .update(aantal_op_voorraad=F('aantal_op_voorraad') - aantal))
 
         prijs_euro = aantal * product.prijs_euro
 
@@ -122,9 +125,11 @@ class WebwinkelBestelPlugin(BestelPluginBase):
 
         product = keuze.product
         if not product.onbeperkte_voorraad:
-            # Noteer: geen concurrency risico want serialisatie via deze achtergrondtaak
-            product.aantal_op_voorraad += keuze.aantal
-            product.save(update_fields=['aantal_op_voorraad'])
+            # atomaire update, want meerdere workers kunnen tegelijk hetzelfde product vrijgeven
+            (WebwinkelProduct
+             .objects
+             .filter(pk=product.pk)
+             .update(aantal_op_voorraad=F('aantal_op_voorraad') + keuze.aantal))
 
         # keuze.status = KEUZE_STATUS_GEANNULEERD
         # keuze.save(update_fields=['status'])
@@ -174,10 +179,14 @@ class WebwinkelBestelPlugin(BestelPluginBase):
 
 class VerzendkostenBestelPlugin(BestelPluginBase):
 
-    def mandje_opschonen(self, verval_datum):
+    def mandjes_met_vervallen(self, verval_datum) -> list[int]:
         # nothing to do
         return []
 
+    def mandje_opschonen(self, mandje: BestellingMandje, verval_datum):
+        # nothing to do
+        pass
+
     # TODO: ook een verklaring voor de transportkosten terug geven (tekst regel): gram + afstand
     # TODO: ook btw teruggeven, want sommige(!) pakketkosten zijn inclusief btw
     def bereken_verzendkosten(self, obj: BestellingMandje | Bestelling) -> tuple[Decimal, str, Decimal]:
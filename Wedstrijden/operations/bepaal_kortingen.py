@@ -18,22 +18,29 @@ class BepaalAutomatischeKorting(object):
     """
         Bepaal de beste, toegestane wedstrijdkorting voor een sporter uitzoeken.
         Wordt gebruikt vanuit de Bestellingen applicatie, als het mandje wijzigt (toevoegen, verwijderen, opschonen).
+
+        Elke inschrijving krijgt maximaal 1 korting (kortingen stapelen niet).
+        Persoonlijke kortingen en verenigingskortingen zitten elkaar niet in de weg: elke inschrijving kan
+        daarvan direct de hoogste krijgen. Een combinatiekorting geldt voor alle inschrijvingen van een sporter
+        op de wedstrijden uit de combinatie, of voor geen enkele. Combinatiekortingen die een inschrijving delen
+        sluiten elkaar dus uit. Uit deze "conflict graaf" wordt de combinatie met de hoogste totale korting gezocht.
     """
 
     def __init__(self, stdout, verbose=False):
         self._stdout = stdout
         self._verbose = verbose
-        self._org_ver_nrs = list()                                # verenigingen die voorkomen in het mandje
+        self._org_ver_nrs = set()                                 # verenigingen die voorkomen in het mandje
         self._lid_nr2ver_nr = dict()                              # [lid_nr] = ver_nr
         self._lid_nr2wedstrijd_pks = dict()                       # [lid_nr] = [wedstrijd.pk, ...]
         self._lid_nr2wedstrijd_pks_eerder = dict()                # [lid_nr] = [wedstrijd.pk, ...]
         self._lid_nr_wedstrijd_pk2inschrijving = dict()           # [(lid_nr, wedstrijd_pk)] = inschrijving
-        self._alle_combi_kortingen = list()
+        self._alle_combi_kortingen = list()                       # [(korting, [inschrijving, ...]), ...]
         self._max_korting_euro = None
         self._max_korting_pks = None
+        self.aantal_stappen = 0                                   # aantal doorzochte combinaties van combi-kortingen
 
     def _analyseer_inschrijvingen(self, regel_pks: list):
-        self._org_ver_nrs = list()
+        self._org_ver_nrs = set()
         self._lid_nr2ver_nr = dict()
         self._lid_nr2wedstrijd_pks = dict()
         self._lid_nr2wedstrijd_pks_eerder = dict()
@@ -45,6 +52,7 @@ class BepaalAutomatischeKorting(object):
                              .filter(bestelling_regel__pk__in=regel_pks)
                              .exclude(sporterboog__sporter__bij_vereniging=None)
                              .select_related('korting',
+                                             'bestelling_regel',
                                              'sporterboog',
                                              'sporterboog__sporter',
                                              'sporterboog__sporter__bij_vereniging',
@@ -57,11 +65,8 @@ class BepaalAutomatischeKorting(object):
                 inschrijving.save(update_fields=['korting'])
 
             inschrijving.mogelijke_kortingen = list()
-            inschrijving.heeft_mogelijke_combi_korting = False
 
-            ver_nr = inschrijving.wedstrijd.organiserende_vereniging.ver_nr
-            if ver_nr not in self._org_ver_nrs:
-                self._org_ver_nrs.append(ver_nr)
+            self._org_ver_nrs.add(inschrijving.wedstrijd.organiserende_vereniging.ver_nr)
 
             sporter = inschrijving.sporterboog.sporter
             lid_nr = sporter.lid_nr
@@ -79,14 +84,17 @@ class BepaalAutomatischeKorting(object):
 
         # zoek, i.v.m. combinatiekortingen, ook naar wedstrijden waar al op ingeschreven is
         # maar we willen niet stapelen, dus als een eerdere inschrijving al een korting heeft, dan niet overwegen
-        for lid_nr, nieuwe_pks in self._lid_nr2wedstrijd_pks.items():
-            pks = list(WedstrijdInschrijving
-                       .objects
-                       .filter(sporterboog__sporter__lid_nr=lid_nr)
-                       .filter(korting=None)                            # voorkom stapelen van kortingen
-                       .exclude(wedstrijd__pk__in=nieuwe_pks)
-                       .values_list('wedstrijd__pk', flat=True))
-            self._lid_nr2wedstrijd_pks_eerder[lid_nr] = pks
+        for lid_nr in self._lid_nr2wedstrijd_pks.keys():
+            self._lid_nr2wedstrijd_pks_eerder[lid_nr] = list()
+        # for
+
+        for lid_nr, wedstrijd_pk in (WedstrijdInschrijving
+                                     .objects
+                                     .filter(sporterboog__sporter__lid_nr__in=list(self._lid_nr2wedstrijd_pks.keys()))
+                                     .filter(korting=None)                        # voorkom stapelen van kortingen
+                                     .values_list('sporterboog__sporter__lid_nr', 'wedstrijd__pk')):
+            if wedstrijd_pk not in self._lid_nr2wedstrijd_pks[lid_nr]:
+                self._lid_nr2wedstrijd_pks_eerder[lid_nr].append(wedstrijd_pk)
         # for
 
         if self._verbose:
@@ -98,7 +106,7 @@ class BepaalAutomatischeKorting(object):
             for lid_nr, pks in self._lid_nr2wedstrijd_pks_eerder.items():
                 self._stdout.write('  %s in wedstrijd pks %s' % (lid_nr, repr(pks)))
 
-            self._stdout.write('org_ver_nrs: %s' % repr(self._org_ver_nrs))
+            self._stdout.write('org_ver_nrs: %s' % repr(sorted(self._org_ver_nrs)))
 
     def _zoek_mogelijke_kortingen(self):
         """ koppel aan elke inschrijving een mogelijke korting """
@@ -110,18 +118,20 @@ class BepaalAutomatischeKorting(object):
         for korting in (WedstrijdKorting
                         .objects
                         .filter(uitgegeven_door__ver_nr__in=self._org_ver_nrs)
-                        .select_related('voor_sporter')
+                        .select_related('voor_sporter',
+                                        'uitgegeven_door')
                         .prefetch_related('voor_wedstrijden')):
 
             # kijk of deze korting van toepassing is op het mandje
             # self._stdout.write('mogelijke korting: %s (%d%%)' % (korting, korting.percentage))
 
-            voor_wedstrijd_pks = list(korting.voor_wedstrijden.all().values_list('pk', flat=True))
+            # gebruik de prefetch
+            voor_wedstrijd_pks = set([wedstrijd.pk for wedstrijd in korting.voor_wedstrijden.all()])
             # print('  voor wedstrijd_pks: %s' % repr(voor_wedstrijd_pks))
 
             if korting.soort == WEDSTRIJD_KORTING_SPORTER and korting.voor_sporter:
                 lid_nr = korting.voor_sporter.lid_nr
-                if lid_nr in lid_nrs_in_mandje:
+                if lid_nr in self._lid_nr2wedstrijd_pks:
                     # inschrijving voor deze sporter is aanwezig in het mandje
                     # self._stdout.write('  kandidaat individuele korting voor sporter: %s' % korting.voor_sporter)
 
@@ -158,21 +168,14 @@ class BepaalAutomatischeKorting(object):
                 # kijk of deze korting van toepassing is op het mandje
                 for lid_nr in lid_nrs_in_mandje:
                     # kijk of voldaan wordt aan de eisen van de combi-korting
-                    pks = self._lid_nr2wedstrijd_pks[lid_nr] + self._lid_nr2wedstrijd_pks_eerder[lid_nr]
+                    pks = set(self._lid_nr2wedstrijd_pks[lid_nr] + self._lid_nr2wedstrijd_pks_eerder[lid_nr])
 
-                    alle_gevonden = True
-                    for pk in voor_wedstrijd_pks:
-                        if pk not in pks:
-                            alle_gevonden = False
-                            break
-                    # for
-
-                    if alle_gevonden:
+                    if voor_wedstrijd_pks.issubset(pks):
                         # dit is een kandidaat-korting
                         # print('  kandidaat combi-korting: %s' % korting)
-                        self._alle_combi_kortingen.append(korting)
 
                         # voeg deze toe aan alle producten in het mandje waar deze bij hoort
+                        inschrijvingen = list()
                         for wedstrijd_pk in voor_wedstrijd_pks:
                             tup = (lid_nr, wedstrijd_pk)
                             try:
@@ -182,9 +185,13 @@ class BepaalAutomatischeKorting(object):
                                 pass
                             else:
                                 inschrijving.mogelijke_kortingen.append(korting)
-                                inschrijving.heeft_mogelijke_combi_korting = True
+                                inschrijvingen.append(inschrijving)
                                 # print('    gevonden inschrijving: %s' % inschrijving)
                         # for
+
+                        if len(inschrijvingen):
+                            tup = (korting, inschrijvingen)
+                            self._alle_combi_kortingen.append(tup)
                 # for
         # for
 
@@ -194,140 +201,228 @@ class BepaalAutomatischeKorting(object):
         #     self._stdout.write('  voor %s %s --> %s' % (lid_nr, inschrijving, inschrijving.mogelijke_kortingen))
         # # for
 
-    def _analyseer_kortingen(self, alle_inschrijvingen):
-        totaal_korting_euro = Decimal(0)
-        toegepaste_korting_pks = list()
+    @staticmethod
+    def _korting_euro(inschrijving, korting):
+        procent = korting.percentage / Decimal('100')
+        return inschrijving.bestelling_regel.bedrag_euro * procent
+
+    def _bepaal_beste_enkele_korting(self, alle_inschrijvingen):
+        """ bepaal per inschrijving de hoogste persoonlijke korting of verenigingskorting
+            deze kortingen zitten elkaar niet in de weg, dus dit kan per inschrijving
+        """
         for inschrijving in alle_inschrijvingen:
-            if inschrijving.korting:
-                toegepaste_korting_pks.append(inschrijving.korting.pk)
-                procent = inschrijving.korting.percentage / Decimal('100')
-                regel = inschrijving.bestelling_regel
-                self._stdout.write(' procent=%s, bedrag=%s' % (procent, regel.bedrag_euro))
-                totaal_korting_euro += (regel.bedrag_euro * procent)
+            inschrijving.beste_korting = None
+            inschrijving.beste_korting_euro = Decimal(0)
+
+            for korting in inschrijving.mogelijke_kortingen:
+                if korting.soort != WEDSTRIJD_KORTING_COMBI:
+                    korting_euro = self._korting_euro(inschrijving, korting)
+                    if korting_euro > inschrijving.beste_korting_euro:
+                        inschrijving.beste_korting = korting
+                        inschrijving.beste_korting_euro = korting_euro
+            # for
         # for
 
-        if self._verbose:
-            self._stdout.write('  totaal_korting: %s met kortingen %s' % (format_bedrag_euro(totaal_korting_euro),
-                                                                          repr(toegepaste_korting_pks)))
+    def _zoek_beste_combi(self, open_mask, winst, buren, memo):
+        """ zoek de combinatie van combi-kortingen met de hoogste totale winst
 
-        if totaal_korting_euro > self._max_korting_euro:
-            self._max_korting_euro = totaal_korting_euro
-            self._max_korting_pks = tuple(toegepaste_korting_pks)
+            open_mask: bitmask met de combi-kortingen die nog gekozen kunnen worden
+            winst:     [nr] = extra korting t.o.v. de beste enkele kortingen op dezelfde inschrijvingen
+            buren:     [nr] = bitmask met de combi-kortingen die een inschrijving delen met nr
+            memo:      [open_mask] = (winst, gekozen_mask)
 
-    def _analyseer_kortingen_recursief(self, alle_inschrijvingen, gebruikte_kortingen):
-        if self._verbose:
-            self._stdout.write('analyseer_kortingen_recursief: gebruikte_kortingen: %s' % gebruikte_kortingen)
+            geeft (winst, gekozen_mask) terug
+        """
+        if open_mask == 0:
+            return Decimal(0), 0
+
+        try:
+            return memo[open_mask]
+        except KeyError:
+            pass
+
+        self.aantal_stappen += 1
+
+        bit = open_mask & -open_mask
+        nr = bit.bit_length() - 1
+        rest = open_mask & ~bit
+
+        # optie 1: deze combi-korting gebruiken; de buren vallen dan af
+        totaal, gekozen = self._zoek_beste_combi(rest & ~buren[nr], winst, buren, memo)
+        beste = (totaal + winst[nr], gekozen | bit)
+
+        # optie 2: deze combi-korting niet gebruiken
+        # dit is alleen zinvol als er buren zijn en de rest samen meer kan opleveren
+        if rest & buren[nr]:
+            bovengrens = Decimal(0)
+            mask = rest
+            while mask:
+                nr2 = (mask & -mask).bit_length() - 1
+                bovengrens += winst[nr2]
+                mask &= mask - 1
+            # while
+
+            if bovengrens > beste[0]:
+                totaal, gekozen = self._zoek_beste_combi(rest, winst, buren, memo)
+                if totaal > beste[0]:
+                    beste = (totaal, gekozen)
+
+        memo[open_mask] = beste
+        return beste
+
+    def _kies_combi_kortingen(self):
+        """ kies de combi-kortingen die de hoogste totale korting opleveren
+            geeft een lijst terug met de gekozen (korting, inschrijvingen)
+        """
 
-        self._analyseer_kortingen(alle_inschrijvingen)
+        # een combi-korting is alleen interessant als deze meer oplevert dan de beste enkele kortingen
+        opties = list()
+        for korting, inschrijvingen in self._alle_combi_kortingen:
+            extra_euro = Decimal(0)
+            for inschrijving in inschrijvingen:
+                extra_euro += self._korting_euro(inschrijving, korting) - inschrijving.beste_korting_euro
+            # for
+            if extra_euro > 0:
+                opties.append((extra_euro, korting.pk, korting, inschrijvingen))
+        # for
 
-        for inschrijving in alle_inschrijvingen:
-            if not inschrijving.korting:
-                for korting in inschrijving.mogelijke_kortingen:
-                    if korting.pk not in gebruikte_kortingen:
-                        gebruikte_kortingen.append(korting.pk)
-                        inschrijving.korting = korting
-                        self._analyseer_kortingen(alle_inschrijvingen)
-                        gebruikte_kortingen.remove(korting.pk)
-                # for
-                inschrijving.korting = None
+        # hoogste winst eerst: dan valt de rest van een groepje meestal direct af op de bovengrens
+        # (en de keuze hangt niet af van de volgorde waarin de database de kortingen oplevert)
+        opties.sort(key=lambda tup: (-tup[0], tup[1]))
+        winst = [tup[0] for tup in opties]
+        opties = [(korting, inschrijvingen) for _, _, korting, inschrijvingen in opties]
+
+        # bouw de conflict graaf: combi-kortingen met een gedeelde inschrijving sluiten elkaar uit
+        inschrijving2nrs = dict()       # [inschrijving.pk] = [nr, ...]
+        for nr, (_, inschrijvingen) in enumerate(opties):
+            for inschrijving in inschrijvingen:
+                try:
+                    inschrijving2nrs[inschrijving.pk].append(nr)
+                except KeyError:
+                    inschrijving2nrs[inschrijving.pk] = [nr]
+            # for
         # for
 
-    def _analyseer_kortingen_recursief_combi(self, alle_inschrijvingen, gebruikte_kortingen=()):
-        if self._verbose:
-            self._stdout.write('analyseer_kortingen_recursief_combi: gebruikte_kortingen: %s' % repr(gebruikte_kortingen))
-
-        gebruikte_kortingen = list(gebruikte_kortingen)     # maak een kopie
-
-        # pas een combi-korting toe
-        for korting in self._alle_combi_kortingen:
-            if korting.pk not in gebruikte_kortingen:
-                gebruikte_kortingen.append(korting.pk)
-
-                # pas deze korting toe
-                reset_lijst = list()
-                for inschrijving in alle_inschrijvingen:
-                    if not inschrijving.korting and inschrijving.heeft_mogelijke_combi_korting:
-                        if korting in inschrijving.mogelijke_kortingen:     # pragma: no branch
-                            inschrijving.korting = korting
-                            reset_lijst.append(inschrijving)
+        buren = [0] * len(opties)
+        for nrs in inschrijving2nrs.values():
+            for nr in nrs:
+                for nr2 in nrs:
+                    if nr2 != nr:
+                        buren[nr] |= 1 << nr2
                 # for
+            # for
+        # for
 
-                # probeer nog meer combi-kortingen
-                self._analyseer_kortingen_recursief_combi(alle_inschrijvingen, gebruikte_kortingen)
+        # zoek per groepje combi-kortingen die met elkaar verbonden zijn de beste keuze
+        # de groepjes zijn onafhankelijk, dus dit blijft klein, ook voor een groot mandje
+        gekozen = list()
+        niet_bezocht = (1 << len(opties)) - 1
+        while niet_bezocht:
+            groep = niet_bezocht & -niet_bezocht
+            nieuw = groep
+            while nieuw:
+                nr = (nieuw & -nieuw).bit_length() - 1
+                nieuw &= nieuw - 1
+                extra = buren[nr] & ~groep
+                groep |= extra
+                nieuw |= extra
+            # while
+            niet_bezocht &= ~groep
+
+            _, gekozen_mask = self._zoek_beste_combi(groep, winst, buren, dict())
+            while gekozen_mask:
+                nr = (gekozen_mask & -gekozen_mask).bit_length() - 1
+                gekozen_mask &= gekozen_mask - 1
+                gekozen.append(opties[nr])
+            # while
+        # while
+
+        return gekozen
 
-                for inschrijving in reset_lijst:
-                    inschrijving.korting = None
-                # for
+    def _analyseer_kortingen(self, alle_inschrijvingen):
+        """ kies de beste korting voor elke inschrijving en zet deze in inschrijving.korting """
+
+        self.aantal_stappen = 0
+
+        self._bepaal_beste_enkele_korting(alle_inschrijvingen)
 
-                gebruikte_kortingen.remove(korting.pk)
+        for inschrijving in alle_inschrijvingen:
+            inschrijving.korting = inschrijving.beste_korting
         # for
 
-        # alle combi-kortingen als "gebruikt" zetten en de rest doorlopen
-        for korting in self._alle_combi_kortingen:
-            if korting.pk not in gebruikte_kortingen:
-                gebruikte_kortingen.append(korting.pk)
+        for korting, inschrijvingen in self._kies_combi_kortingen():
+            for inschrijving in inschrijvingen:
+                inschrijving.korting = korting
+            # for
         # for
-        self._analyseer_kortingen_recursief(alle_inschrijvingen, gebruikte_kortingen)
 
-    def _kortingen_toepassen(self, alle_inschrijvingen, geef_korting_pks) -> list[BestellingRegel]:
+        totaal_korting_euro = Decimal(0)
+        toegepaste_korting_pks = list()
+        for inschrijving in alle_inschrijvingen:
+            if inschrijving.korting:
+                if inschrijving.korting.pk not in toegepaste_korting_pks:
+                    toegepaste_korting_pks.append(inschrijving.korting.pk)
+                totaal_korting_euro += self._korting_euro(inschrijving, inschrijving.korting)
+        # for
+
+        if self._verbose:
+            self._stdout.write('  totaal_korting: %s met kortingen %s in %s stappen' % (
+                                        format_bedrag_euro(totaal_korting_euro),
+                                        repr(toegepaste_korting_pks),
+                                        self.aantal_stappen))
+
+        self._max_korting_euro = totaal_korting_euro
+        self._max_korting_pks = tuple(toegepaste_korting_pks)
+
+    def _kortingen_toepassen(self, alle_inschrijvingen) -> list[BestellingRegel]:
         # self._stdout.write('[DEBUG] alle_inschrijvingen:')
         # for inschrijving in alle_inschrijvingen:
         #     self._stdout.write('  %s' % inschrijving)
         # # for
-        # self._stdout.write('[DEBUG] geef_korting_pks: %s' % repr(geef_korting_pks))
 
         nieuwe_regels = list()
-        combi_korting_euro = dict()     # [korting.pk] = Decimal
+        combi_korting_euro = dict()     # [korting.pk] = (korting, Decimal)
         for inschrijving in alle_inschrijvingen:
-            for korting in inschrijving.mogelijke_kortingen:
-                if korting.pk in geef_korting_pks:
-                    # geef deze korting
-                    # self._stdout.write('[DEBUG] gekozen korting: %s' % korting)
-                    inschrijving.korting = korting
-                    inschrijving.save(update_fields=['korting'])
-
-                    procent = korting.percentage / Decimal(100)
-                    korting_euro = inschrijving.bestelling_regel.bedrag_euro * procent
-                    korting_euro = 0 - korting_euro     # korting is een negatief bedrag
-                    # self._stdout.write('   korting_euro: %s' % korting_euro)
-
-                    if korting.soort == WEDSTRIJD_KORTING_COMBI:
-                        try:
-                            combi_korting_euro[korting.pk] += korting_euro
-                        except KeyError:
-                            combi_korting_euro[korting.pk] = korting_euro
-                    else:
-                        kort_str, redenen_lst = beschrijf_korting(korting)
-                        regel = BestellingRegel(
-                                        korte_beschrijving=kort_str,
-                                        korting_redenen=BESTELLING_KORT_BREAK.join(redenen_lst),
-                                        korting_ver_nr=korting.uitgegeven_door.ver_nr,
-                                        bedrag_euro=korting_euro,
-                                        code=BESTELLING_REGEL_CODE_WEDSTRIJD_KORTING)
-                        regel.save()
-                        nieuwe_regels.append(regel)
-            # for
+            korting = inschrijving.korting
+            if korting:
+                # geef deze korting
+                # self._stdout.write('[DEBUG] gekozen korting: %s' % korting)
+                inschrijving.save(update_fields=['korting'])
+
+                korting_euro = 0 - self._korting_euro(inschrijving, korting)   # korting is een negatief bedrag
+                # self._stdout.write('   korting_euro: %s' % korting_euro)
+
+                if korting.soort == WEDSTRIJD_KORTING_COMBI:
+                    try:
+                        _, som_euro = combi_korting_euro[korting.pk]
+                    except KeyError:
+                        som_euro = Decimal(0)
+                    combi_korting_euro[korting.pk] = (korting, som_euro + korting_euro)
+                else:
+                    kort_str, redenen_lst = beschrijf_korting(korting)
+                    regel = BestellingRegel(
+                                    korte_beschrijving=kort_str,
+                                    korting_redenen=BESTELLING_KORT_BREAK.join(redenen_lst),
+                                    korting_ver_nr=korting.uitgegeven_door.ver_nr,
+                                    bedrag_euro=korting_euro,
+                                    code=BESTELLING_REGEL_CODE_WEDSTRIJD_KORTING)
+                    regel.save()
+                    nieuwe_regels.append(regel)
         # for
 
         # voeg een regel toe voor het total combi-korting bedrag
-        combi_pks = list(combi_korting_euro.keys())
-        if len(combi_pks):
-            # self._stdout.write('[DEBUG] combi_pks: %s' % repr(combi_pks))
-            for inschrijving in alle_inschrijvingen:
-                if inschrijving.korting and inschrijving.korting.pk in combi_pks:
-                    korting_euro = combi_korting_euro[inschrijving.korting.pk]
-                    if korting_euro:
-                        kort_str, redenen_lst = beschrijf_korting(inschrijving.korting)
-                        regel = BestellingRegel(
-                                        korte_beschrijving=kort_str,
-                                        korting_redenen=BESTELLING_KORT_BREAK.join(redenen_lst),
-                                        korting_ver_nr=inschrijving.korting.uitgegeven_door.ver_nr,
-                                        bedrag_euro=korting_euro,
-                                        code=BESTELLING_REGEL_CODE_WEDSTRIJD_KORTING)
-                        regel.save()
-                        nieuwe_regels.append(regel)
-                        combi_korting_euro[inschrijving.korting.pk] = None      # niet nog een keer geven
-            # for
+        for korting, korting_euro in combi_korting_euro.values():
+            if korting_euro:
+                kort_str, redenen_lst = beschrijf_korting(korting)
+                regel = BestellingRegel(
+                                korte_beschrijving=kort_str,
+                                korting_redenen=BESTELLING_KORT_BREAK.join(redenen_lst),
+                                korting_ver_nr=korting.uitgegeven_door.ver_nr,
+                                bedrag_euro=korting_euro,
+                                code=BESTELLING_REGEL_CODE_WEDSTRIJD_KORTING)
+                regel.save()
+                nieuwe_regels.append(regel)
+        # for
 
         for inschrijving in alle_inschrijvingen:
             regel = inschrijving.bestelling_regel
@@ -366,13 +461,13 @@ class BepaalAutomatischeKorting(object):
 
         self._max_korting_euro = Decimal(0)
         self._max_korting_pks = None
-        self._analyseer_kortingen_recursief_combi(alle_inschrijvingen)
+        self._analyseer_kortingen(alle_inschrijvingen)
 
         if self._max_korting_pks:
             korting_euro_str = format_bedrag_euro(self._max_korting_euro)
             self._stdout.write('[INFO] Maximale korting is %s met korting pks=%s' % (korting_euro_str,
                                                                                      repr(self._max_korting_pks)))
-            nieuwe_regels = self._kortingen_toepassen(alle_inschrijvingen, self._max_korting_pks)
+            nieuwe_regels = self._kortingen_toepassen(alle_inschrijvingen)
         else:
             nieuwe_regels = list()
 
@@ -6,11 +6,12 @@
 
 from django.conf import settings
 from django.urls import reverse
+from django.db.models import F
 from django.utils import timezone
 from BasisTypen.definities import ORGANISATIE_IFAA
 from Bestelling.definities import BESTELLING_REGEL_CODE_WEDSTRIJD, BESTELLING_KORT_BREAK
 from Bestelling.bestel_plugin_base import BestelPluginBase
-from Bestelling.models import BestellingRegel
+from Bestelling.models import BestellingRegel, BestellingMandje
 from Betaal.format import format_bedrag_euro
 from Kalender.view_helpers import maak_compacte_wanneer_str
 from Mailer.operations import mailer_email_is_valide, mailer_queue_email, render_email_template
@@ -29,15 +30,56 @@ class WedstrijdBestelPlugin(BestelPluginBase):
     def __init__(self):
         super().__init__()
 
-    def mandje_opschonen(self, verval_datum):
-        # evenementen
-        mandje_pks = list()
+    def _verhoog_aantal_inschrijvingen(self, sessie: WedstrijdSessie) -> bool:
+        """ verhoog het aantal inschrijvingen op de sessie met een atomaire update
+            de sessie blijft gelockt tot het einde van de transactie, zodat parallelle workers
+            elkaars wijzigingen niet overschrijven
+            geeft False terug als de sessie al vol is; dan is er niets aangepast
+        """
+        aantal = (WedstrijdSessie
+                  .objects
+                  .filter(pk=sessie.pk,
+                          aantal_inschrijvingen__lt=F('max_sporters'))      # voorkom overboeking
+                  .update(aantal_inschrijvingen=F('aantal_inschrijvingen') + 1))
+
+        sessie.refresh_from_db(fields=['aantal_inschrijvingen'])
+
+        if aantal == 0:
+            self.stdout.write('[WARNING] Sessie %s is vol (aantal_inschrijvingen: %s)' % (
+                                sessie, sessie.aantal_inschrijvingen))
+            return False
 
-        # wedstrijden
-        for inschrijving in (WedstrijdInschrijving
-                             .objects
-                             .filter(wanneer__lt=verval_datum,
-                                     status=WEDSTRIJD_INSCHRIJVING_STATUS_RESERVERING_MANDJE)
+        self.stdout.write('[DEBUG] Sessie %s aantal_inschrijvingen: %s --> %s' % (sessie,
+                                                                                  sessie.aantal_inschrijvingen - 1,
+                                                                                  sessie.aantal_inschrijvingen))
+        return True
+
+    def _verlaag_aantal_inschrijvingen(self, sessie: WedstrijdSessie):
+        """ verlaag het aantal inschrijvingen op de sessie met een atomaire update (niet onder 0) """
+        aantal = (WedstrijdSessie
+                  .objects
+                  .filter(pk=sessie.pk,
+                          aantal_inschrijvingen__gt=0)      # voorkom -1
+                  .update(aantal_inschrijvingen=F('aantal_inschrijvingen') - 1))
+
+        sessie.refresh_from_db(fields=['aantal_inschrijvingen'])
+        self.stdout.write('[DEBUG] Sessie %s aantal_inschrijvingen: %s --> %s' % (sessie,
+                                                                                  sessie.aantal_inschrijvingen + aantal,
+                                                                                  sessie.aantal_inschrijvingen))
+
+    @staticmethod
+    def _vervallen(verval_datum):
+        return (WedstrijdInschrijving
+                .objects
+                .filter(wanneer__lt=verval_datum,
+                        status=WEDSTRIJD_INSCHRIJVING_STATUS_RESERVERING_MANDJE))
+
+    def mandjes_met_vervallen(self, verval_datum) -> list[int]:
+        return self._get_mandje_pks(self._vervallen(verval_datum))
+
+    def mandje_opschonen(self, mandje: BestellingMandje, verval_datum):
+        for inschrijving in (self._vervallen(verval_datum)
+                             .filter(bestelling_regel__bestellingmandje=mandje)
                              .select_related('bestelling_regel',
                                              'koper')):
 
@@ -46,10 +88,6 @@ class WedstrijdBestelPlugin(BestelPluginBase):
             self.stdout.write('[INFO] Vervallen: BestellingRegel pk=%s inschrijving (%s) in mandje van %s' % (
                               regel.pk, inschrijving, inschrijving.koper))
 
-            mandje = regel.bestellingmandje_set.first()
-            if mandje.pk not in mandje_pks:
-                mandje_pks.append(mandje.pk)
-
             self.annuleer(regel)
 
             # verwijder het product, dan verdwijnt deze ook uit het mandje
@@ -57,14 +95,14 @@ class WedstrijdBestelPlugin(BestelPluginBase):
             regel.delete()
         # for
 
-        return mandje_pks
-
     def reserveer(self, product_pk: int, mandje_van_str: str) -> BestellingRegel | None:
         """ Maak een reservering voor de wedstrijd sessie (zodat iemand anders deze niet kan reserveren)
             en geef een BestellingRegel terug.
         """
+        # lock de inschrijving altijd voor de sessie, om een deadlock met een andere worker te voorkomen
         inschrijving = (WedstrijdInschrijving
                         .objects
+                        .select_for_update(of=('self',))
                         .select_related('sessie',
                                         'wedstrijd',
                                         'sporterboog__sporter')
@@ -82,13 +120,12 @@ class WedstrijdBestelPlugin(BestelPluginBase):
 
         # verhoog het aantal inschrijvingen op deze sessie
         # hiermee geven we een garantie op een plekje
-        # Noteer: geen concurrency risico want serialisatie via deze achtergrondtaak
-        sessie = inschrijving.sessie
-        self.stdout.write('[DEBUG] Sessie %s aantal_inschrijvingen: %s --> %s' % (sessie,
-                                                                                  sessie.aantal_inschrijvingen,
-                                                                                  sessie.aantal_inschrijvingen + 1))
-        sessie.aantal_inschrijvingen += 1
-        sessie.save(update_fields=['aantal_inschrijvingen'])
+        if not self._verhoog_aantal_inschrijvingen(inschrijving.sessie):
+            # een andere worker heeft het laatste plekje net gereserveerd
+            self.stdout.write('[WARNING] {wedstrijden bestel plugin}.reserveer: ' +
+                              'sessie is vol; WedstrijdInschrijving pk=%s wordt verwijderd' % inschrijving.pk)
+            inschrijving.delete()
+            return None
 
         wedstrijd = inschrijving.wedstrijd
         sporter = inschrijving.sporterboog.sporter
@@ -124,8 +161,11 @@ class WedstrijdBestelPlugin(BestelPluginBase):
         """
             Verwerk het verzoek tot afmelden voor een wedstrijd.
         """
+        # lock de inschrijving, want een andere worker kan deze tegelijk annuleren of aanpassen
+        # als die de inschrijving net verwijderd heeft, dan vinden we hem na het wachten niet meer
         inschrijving = (WedstrijdInschrijving
                         .objects
+                        .select_for_update(of=('self',))
                         .select_related('sessie',
                                         'wedstrijd',
                                         'sporterboog')
@@ -141,11 +181,7 @@ class WedstrijdBestelPlugin(BestelPluginBase):
 
         # verlaag het aantal inschrijvingen op deze sessie
         sessie = inschrijving.sessie
-        self.stdout.write('[DEBUG] Sessie %s aantal_inschrijvingen: %s --> %s' % (sessie,
-                                                                                  sessie.aantal_inschrijvingen,
-                                                                                  sessie.aantal_inschrijvingen - 1))
-        sessie.aantal_inschrijvingen = max(sessie.aantal_inschrijvingen - 1, 0)     # voorkom -1
-        sessie.save(update_fields=['aantal_inschrijvingen'])
+        self._verlaag_aantal_inschrijvingen(sessie)
 
         now = timezone.now()
         stamp_str = timezone.localtime(now).strftime('%Y-%m-%d om %H:%M')
@@ -190,12 +226,15 @@ class WedstrijdBestelPlugin(BestelPluginBase):
 
         sessie = WedstrijdSessie.objects.get(pk=sessie_pk)
 
+        # lock de inschrijving, want een andere worker kan deze tegelijk afmelden of annuleren
         inschrijving = (WedstrijdInschrijving
                         .objects
+                        .select_for_update(of=('self',))
                         .select_related('sessie',
                                         'sporterboog',
                                         'wedstrijdklasse')
-                        .get(pk=product_pk))
+                        .filter(pk=product_pk)
+                        .first())
 
         if not inschrijving:
             self.stdout.write('[ERROR] {wedstrijden bestel plugin}.aanpassen: ' +
@@ -205,21 +244,20 @@ class WedstrijdBestelPlugin(BestelPluginBase):
         aanpassingen = list()
         if sessie != inschrijving.sessie:
             # aantallen aanpassen voor elke sessie
-            oude_sessie = inschrijving.sessie
-            self.stdout.write('[DEBUG] Sessie %s aantal_inschrijvingen: %s --> %s' % (oude_sessie,
-                                                                                      oude_sessie.aantal_inschrijvingen,
-                                                                                      oude_sessie.aantal_inschrijvingen - 1))
-            oude_sessie.aantal_inschrijvingen = max(oude_sessie.aantal_inschrijvingen - 1, 0)       # voorkom -1
-            oude_sessie.save(update_fields=['aantal_inschrijvingen'])
-
-            self.stdout.write('[DEBUG] Sessie %s aantal_inschrijvingen: %s --> %s' % (sessie,
-                                                                                      sessie.aantal_inschrijvingen,
-                                                                                      sessie.aantal_inschrijvingen + 1))
-            sessie.aantal_inschrijvingen += 1
-            sessie.save(update_fields=['aantal_inschrijvingen'])
-
-            inschrijving.sessie = sessie
-            aanpassingen.append("sessie")
+            # lock beide sessies in een vaste volgorde, om een deadlock met een andere worker te voorkomen
+            list(WedstrijdSessie
+                 .objects
+                 .select_for_update()
+                 .filter(pk__in=(inschrijving.sessie.pk, sessie.pk))
+                 .order_by('pk'))
+
+            if self._verhoog_aantal_inschrijvingen(sessie):
+                self._verlaag_aantal_inschrijvingen(inschrijving.sessie)
+
+                inschrijving.sessie = sessie
+                aanpassingen.append("sessie")
+            else:
+                aanpassingen.append("sessie niet: is vol")
 
         if sporterboog != inschrijving.sporterboog:
             inschrijving.sporterboog = sporterboog
@@ -234,7 +272,7 @@ class WedstrijdBestelPlugin(BestelPluginBase):
                                                      ", ".join(aanpassingen),
                                                      door_account_str)
         inschrijving.log += msg
-        inschrijving.save()
+        inschrijving.save(update_fields=['sessie', 'sporterboog', 'wedstrijdklasse', 'log'])
         self.stdout.write('[INFO] WedstrijdInschrijving pk=%s is aangepast' % inschrijving.pk)
 
     def annuleer(self, regel: BestellingRegel):
@@ -242,8 +280,10 @@ class WedstrijdBestelPlugin(BestelPluginBase):
             Het product wordt uit het mandje gehaald of de bestelling wordt geannuleerd (voordat deze betaald is)
             Geef een eerder gemaakte reservering voor een wedstrijd weer vrij.
         """
+        # lock de inschrijving, want een andere worker kan deze tegelijk afmelden of aanpassen
         inschrijving = (WedstrijdInschrijving
                         .objects
+                        .select_for_update(of=('self',))
                         .select_related('sessie',
                                         'wedstrijd',
                                         'sporterboog')
@@ -255,13 +295,15 @@ class WedstrijdBestelPlugin(BestelPluginBase):
                               'kan WedstrijdInschrijving met bestelling regel met pk=%s niet vinden' % regel.pk)
             return
 
+        if inschrijving.status == WEDSTRIJD_INSCHRIJVING_STATUS_DEFINITIEF:
+            # is intussen betaald
+            self.stdout.write('[WARNING] {wedstrijden bestel plugin}.annuleer: ' +
+                              'WedstrijdInschrijving pk=%s is al definitief; niet geannuleerd' % inschrijving.pk)
+            return
+
         # verlaag het aantal inschrijvingen op deze sessie
         sessie = inschrijving.sessie
-        self.stdout.write('[DEBUG] Sessie %s aantal_inschrijvingen: %s --> %s' % (sessie,
-                                                                                  sessie.aantal_inschrijvingen,
-                                                                                  sessie.aantal_inschrijvingen - 1))
-        sessie.aantal_inschrijvingen = max(sessie.aantal_inschrijvingen - 1, 0)     # voorkom -1
-        sessie.save(update_fields=['aantal_inschrijvingen'])
+        self._verlaag_aantal_inschrijvingen(sessie)
 
         # verwijder de inschrijving
         self.stdout.write('[INFO] WedstrijdInschrijving pk=%s is geannuleerd en wordt verwijderd' % inschrijving.pk)
@@ -437,10 +479,14 @@ class WedstrijdKortingBestelPlugin(BestelPluginBase):
     def __init__(self):
         super().__init__()
 
-    def mandje_opschonen(self, verval_datum):
+    def mandjes_met_vervallen(self, verval_datum) -> list[int]:
         # nothing to do
         return []
 
+    def mandje_opschonen(self, mandje: BestellingMandje, verval_datum):
+        # nothing to do
+        pass
+
     def annuleer(self, regel: BestellingRegel):
         """ niets te doen """
         pass
@@ -347,7 +347,7 @@ class TestWedstrijdenAanmeldingDetails(E2EHelpers, TestCase):
         # geeft fout bij "verwijder uit mandje" zonder bestelling regel
         f1, f2, = self.verwerk_bestel_mutaties(fail_on_error=False)
         # print('\nf1: %s\nf2: %s\n' % (f1.getvalue(), f2.getvalue()))
-        self.assertTrue('Onverwachte fout' in f2.getvalue())
+        self.assertTrue('Onverwachte fout' in f1.getvalue())
 
     def test_afmelden(self):
         # wordt HWL
@@ -478,5 +478,123 @@ class TestWedstrijdenBepaalKortingen(E2EHelpers, TestCase):
         self.assertEqual(regel.korting_redenen, 'Test wedstrijd 1||Test wedstrijd 2')
         self.assertEqual(round(regel.bedrag_euro, 2), -12.50)
 
+    def test_groot_mandje(self):
+        # familie met 6 sporters die elk op 4 wedstrijden inschrijven = 24 inschrijvingen in 1 mandje
+        self.wedstrijd3.boogtypen.add(self.boog_r)
+
+        wedstrijd4 = Wedstrijd(
+                        titel='Test wedstrijd 4',
+                        status=WEDSTRIJD_STATUS_GEACCEPTEERD,
+                        datum_begin=self.wedstrijd2.datum_begin,
+                        datum_einde=self.wedstrijd2.datum_einde,
+                        organiserende_vereniging=self.ver,
+                        locatie=self.wedstrijd1.locatie,
+                        prijs_euro_normaal=Decimal(25.0),
+                        prijs_euro_onder18=Decimal(15.0))
+        wedstrijd4.save()
+        wedstrijden = (self.wedstrijd1, self.wedstrijd2, self.wedstrijd3, wedstrijd4)
+
+        # elke wedstrijd een eigen R sessie
+        wedstrijd2sessie = dict()
+        for wedstrijd in wedstrijden:
+            sessie = WedstrijdSessie(
+                            datum=wedstrijd.datum_begin,
+                            tijd_begin='10:00',
+                            tijd_einde='15:00',
+                            max_sporters=50)
+            sessie.save()
+            sessie.wedstrijdklassen.add(self.klasse_r)
+            wedstrijd.sessies.add(sessie)
+            wedstrijd2sessie[wedstrijd.pk] = sessie
+        # for
+
+        # verwijder de standaard inschrijvingen
+        WedstrijdInschrijving.objects.all().delete()
+
+        sporterbogen = [self.sporterboog1_r]
+        for lid_nr in range(102100, 102105):
+            sporter = Sporter(
+                        lid_nr=lid_nr,
+                        geslacht='V',
+                        voornaam='Fa',
+                        achternaam='Millie %s' % lid_nr,
+                        geboorte_datum='1990-01-01',
+                        sinds_datum='2020-02-02',
+                        adres_code='1234AB56',
+                        bij_vereniging=self.ver)
+            sporter.save()
+
+            sporterboog = SporterBoog(sporter=sporter, boogtype=self.boog_r, voor_wedstrijd=True)
+            sporterboog.save()
+            sporterbogen.append(sporterboog)
+        # for
+
+        regels = list()
+        for sporterboog in sporterbogen:
+            for wedstrijd in wedstrijden:
+                regel = BestellingRegel(
+                            korte_beschrijving='Wedstrijd %s' % repr(wedstrijd.titel),
+                            code=BESTELLING_REGEL_CODE_WEDSTRIJD,
+                            bedrag_euro=Decimal(25.0))
+                regel.save()
+                regels.append(regel.pk)
+
+                WedstrijdInschrijving(
+                        wanneer=timezone.now(),
+                        status=WEDSTRIJD_INSCHRIJVING_STATUS_RESERVERING_MANDJE,
+                        wedstrijd=wedstrijd,
+                        sessie=wedstrijd2sessie[wedstrijd.pk],
+                        sporterboog=sporterboog,
+                        wedstrijdklasse=self.klasse_r,
+                        bestelling_regel=regel,
+                        koper=self.account_102030,
+                        korting=None).save()
+            # for
+        # for
+        self.assertEqual(len(regels), 24)
+
+        # verenigingskorting van 10% op alle wedstrijden
+        self.korting_v.percentage = 10
+        self.korting_v.save(update_fields=['percentage'])
+        self.korting_v.voor_wedstrijden.add(*wedstrijden)
+
+        # 2 combi-kortingen die elkaar uitsluiten (wedstrijd 2 zit in beide)
+        self.korting_c.voor_wedstrijden.add(self.wedstrijd1, self.wedstrijd2)       # 50%
+        korting_c2 = WedstrijdKorting(
+                            soort=WEDSTRIJD_KORTING_COMBI,
+                            geldig_tot_en_met='2099-01-01',
+                            uitgegeven_door=self.ver,
+                            percentage=30)
+        korting_c2.save()
+        korting_c2.voor_wedstrijden.add(self.wedstrijd2, self.wedstrijd3, wedstrijd4)
+
+        # persoonlijke korting van 100% voor 1 sporter, op een wedstrijd uit de tweede combi
+        self.korting_s.percentage = 100
+        self.korting_s.save(update_fields=['percentage'])
+        self.korting_s.voor_wedstrijden.add(self.wedstrijd3)
+
+        stdout = OutputWrapper(io.StringIO())
+        bepaal = BepaalAutomatischeKorting(stdout)
+        with self.assert_max_queries(45, check_duration=False):
+            res = bepaal.kies_kortingen(regels)
+        # print(stdout.getvalue())
+
+        # per sporter: combi 50% op wedstrijd 1+2 (25 euro) + verenigingskorting op wedstrijd 3 en 4 (2x 2,50)
+        # sporter1: persoonlijke korting op wedstrijd 3 (25 euro) i.p.v. de verenigingskorting
+        totaal = sum([regel.bedrag_euro for regel in res])
+        self.assertEqual(round(totaal, 2), Decimal('-202.50'))
+
+        beschrijvingen = [regel.korte_beschrijving for regel in res]
+        self.assertEqual(beschrijvingen.count('Combinatiekorting: 50%'), 1)
+        self.assertEqual(beschrijvingen.count('Combinatiekorting: 30%'), 0)
+        self.assertEqual(beschrijvingen.count('Persoonlijke korting: 100%'), 1)
+        self.assertEqual(beschrijvingen.count('Verenigingskorting: 10%'), 11)
+
+        self.assertEqual(WedstrijdInschrijving.objects.filter(korting=None).count(), 0)
+
+        # de combi-kortingen van elke sporter vormen een eigen groepje
+        # elk groepje kost 1 stap, dus dit groeit lineair met de grootte van het mandje
+        self.assertEqual(bepaal.aantal_stappen, len(sporterbogen))
+
 
 # end of file
@@ -189,9 +189,13 @@ class TestWedstrijdenBestellingPlugin(E2EHelpers, TestCase):
         inschrijving2.wanneer = verval - datetime.timedelta(days=1)
         inschrijving2.save(update_fields=['wanneer'])
 
-        mandje_pks = plugin.mandje_opschonen(verval)
+        mandje_pks = plugin.mandjes_met_vervallen(verval)
         self.assertEqual(len(mandje_pks), 1)
         self.assertEqual(mandje_pks, [self.mandje.pk])
+        self.assertEqual(self.mandje.regels.count(), 2)     # nog niets verwijderd
+
+        plugin.mandje_opschonen(self.mandje, verval)
+        self.assertEqual(self.mandje.regels.count(), 0)
 
         # print('{stdout} %s' % stdout.getvalue())
         self.assertTrue('[INFO] Vervallen: BestellingRegel pk=' in stdout.getvalue())
@@ -203,8 +207,9 @@ class TestWedstrijdenBestellingPlugin(E2EHelpers, TestCase):
         plugin.zet_stdout(stdout)
 
         # coverage (lege implementatie)
-        mandje_pks = plugin.mandje_opschonen(verval)
+        mandje_pks = plugin.mandjes_met_vervallen(verval)
         self.assertEqual(mandje_pks, [])
+        plugin.mandje_opschonen(self.mandje, verval)
 
     def test_reserveer(self):
         stdout = OutputWrapper(io.StringIO())
@@ -231,6 +236,53 @@ class TestWedstrijdenBestellingPlugin(E2EHelpers, TestCase):
         self.assertEqual(inschrijving.status, WEDSTRIJD_INSCHRIJVING_STATUS_RESERVERING_MANDJE)
         self.assertTrue("] Plekje gereserveerd voor de wedstrijd sessie" in inschrijving.log)
 
+        self.sessie.refresh_from_db()
+        self.assertEqual(self.sessie.aantal_inschrijvingen, 1)
+
+        # een andere worker heeft intussen plekjes gereserveerd op dezelfde sessie
+        # de teller mag niet overschreven worden met een verouderde waarde
+        WedstrijdSessie.objects.filter(pk=self.sessie.pk).update(aantal_inschrijvingen=5)
+        inschrijving2 = WedstrijdInschrijving(
+                                wanneer=timezone.now(),
+                                status=WEDSTRIJD_INSCHRIJVING_STATUS_RESERVERING_MANDJE,
+                                wedstrijd=self.wedstrijd,
+                                sessie=self.sessie,
+                                sporterboog=self.sporterboog_c,
+                                wedstrijdklasse=self.wedstrijdklasse_c,
+                                bestelling_regel=None,
+                                koper=self.account_100000)
+        inschrijving2.save()
+        plugin.reserveer(inschrijving2.pk, 'Mandje test')
+        self.assertTrue('aantal_inschrijvingen: 5 --> 6' in stdout.getvalue())
+        self.sessie.refresh_from_db()
+        self.assertEqual(self.sessie.aantal_inschrijvingen, 6)
+
+        # sessie is intussen vol geraakt door een andere worker --> geen overboeking
+        WedstrijdSessie.objects.filter(pk=self.sessie.pk).update(aantal_inschrijvingen=self.sessie.max_sporters)
+        sporterboog = SporterBoog(
+                            sporter=self.sporter_100001,
+                            boogtype=self.sporterboog_r.boogtype,
+                            voor_wedstrijd=True)
+        sporterboog.save()
+        inschrijving3 = WedstrijdInschrijving(
+                                wanneer=timezone.now(),
+                                status=WEDSTRIJD_INSCHRIJVING_STATUS_RESERVERING_MANDJE,
+                                wedstrijd=self.wedstrijd,
+                                sessie=self.sessie,
+                                sporterboog=sporterboog,
+                                wedstrijdklasse=self.wedstrijdklasse_r,
+                                bestelling_regel=None,
+                                koper=self.account_100001)
+        inschrijving3.save()
+        regel = plugin.reserveer(inschrijving3.pk, 'Mandje test')
+        self.assertIsNone(regel)
+        self.assertTrue('[WARNING] Sessie ' in stdout.getvalue())
+        self.assertTrue('sessie is vol; WedstrijdInschrijving pk=%s wordt verwijderd' % inschrijving3.pk
+                        in stdout.getvalue())
+        self.assertFalse(WedstrijdInschrijving.objects.filter(pk=inschrijving3.pk).exists())
+        self.sessie.refresh_from_db()
+        self.assertEqual(self.sessie.aantal_inschrijvingen, self.sessie.max_sporters)
+
     def test_afmelden(self):
         stdout = OutputWrapper(io.StringIO())
         plugin = WedstrijdBestelPlugin()
@@ -310,6 +362,17 @@ class TestWedstrijdenBestellingPlugin(E2EHelpers, TestCase):
         self.sessie.aantal_inschrijvingen = 1
         self.sessie.save(update_fields=['aantal_inschrijvingen'])
 
+        # intussen betaald --> wordt niet meer geannuleerd
+        inschrijving.status = WEDSTRIJD_INSCHRIJVING_STATUS_DEFINITIEF
+        inschrijving.save(update_fields=['status'])
+        plugin.annuleer(regel)
+        self.assertTrue('is al definitief; niet geannuleerd' in stdout.getvalue())
+        self.assertEqual(WedstrijdInschrijving.objects.filter(pk=inschrijving.pk).count(), 1)
+        self.sessie.refresh_from_db()
+        self.assertEqual(self.sessie.aantal_inschrijvingen, 1)
+
+        inschrijving.status = WEDSTRIJD_INSCHRIJVING_STATUS_BESTELD
+        inschrijving.save(update_fields=['status'])
         plugin.annuleer(regel)
 
         # inschrijving is verwijderd
@@ -322,6 +385,62 @@ class TestWedstrijdenBestellingPlugin(E2EHelpers, TestCase):
 
         plugin.annuleer(regel)      # dummy implementatie
 
+    def test_aanpassen(self):
+        stdout = OutputWrapper(io.StringIO())
+        plugin = WedstrijdBestelPlugin()
+        plugin.zet_stdout(stdout)
+
+        sessie2 = WedstrijdSessie(
+                        datum=self.sessie.datum,
+                        tijd_begin='16:00',
+                        tijd_einde='18:00',
+                        max_sporters=1,
+                        aantal_inschrijvingen=1)
+        sessie2.save()
+        self.wedstrijd.sessies.add(sessie2)
+
+        inschrijving = WedstrijdInschrijving(
+                                wanneer=timezone.now(),
+                                status=WEDSTRIJD_INSCHRIJVING_STATUS_BESTELD,
+                                wedstrijd=self.wedstrijd,
+                                sessie=self.sessie,
+                                sporterboog=self.sporterboog_r,
+                                wedstrijdklasse=self.wedstrijdklasse_r,
+                                koper=self.account_100000)
+        inschrijving.save()
+
+        self.sessie.aantal_inschrijvingen = 1
+        self.sessie.save(update_fields=['aantal_inschrijvingen'])
+
+        # andere sessie is vol --> alleen de boog wordt aangepast
+        plugin.aanpassen(inschrijving.pk, 'Test',
+                         sessie_pk=sessie2.pk, klasse=self.wedstrijdklasse_c, sporterboog=self.sporterboog_c)
+        inschrijving.refresh_from_db()
+        self.assertEqual(inschrijving.sessie, self.sessie)
+        self.assertEqual(inschrijving.sporterboog, self.sporterboog_c)
+        self.assertTrue('(sessie niet: is vol, boog type, wedstrijdklasse)' in inschrijving.log)
+        sessie2.refresh_from_db()
+        self.assertEqual(sessie2.aantal_inschrijvingen, 1)
+
+        # plek vrij gekomen
+        WedstrijdSessie.objects.filter(pk=sessie2.pk).update(aantal_inschrijvingen=0)
+        plugin.aanpassen(inschrijving.pk, 'Test',
+                         sessie_pk=sessie2.pk, klasse=self.wedstrijdklasse_c, sporterboog=self.sporterboog_c)
+        inschrijving.refresh_from_db()
+        self.assertEqual(inschrijving.sessie, sessie2)
+        self.sessie.refresh_from_db()
+        self.assertEqual(self.sessie.aantal_inschrijvingen, 0)
+        sessie2.refresh_from_db()
+        self.assertEqual(sessie2.aantal_inschrijvingen, 1)
+
+        # inschrijving is intussen afgemeld door een andere worker
+        inschrijving.delete()
+        plugin.aanpassen(inschrijving.pk, 'Test',
+                         sessie_pk=self.sessie.pk, klasse=self.wedstrijdklasse_r, sporterboog=self.sporterboog_r)
+        self.assertTrue('[ERROR] {wedstrijden bestel plugin}.aanpassen: kan WedstrijdInschrijving met pk=' in
+                        stdout.getvalue())
+        self.assertEqual(WedstrijdInschrijving.objects.count(), 0)
+
     def test_is_besteld(self):
         stdout = OutputWrapper(io.StringIO())
         plugin = WedstrijdBestelPlugin()
@@ -1,6 +1,6 @@
 #!/bin/bash
 
-#  Copyright (c) 2019-2025 Ramon van der Winkel.
+#  Copyright (c) 2019-2026 Ramon van der Winkel.
 #  All rights reserved.
 #  Licensed under BSD-3-Clause-Clear. See LICENSE file for details.
 
@@ -58,25 +58,25 @@ echo "[INFO] Starting Google Maps simulator"
 pkill -f websim_gmaps
 python3 ./Locatie/test_tools/websim_gmaps.py &
 
-echo "[INFO] Starting betaal_mutaties (runtime: $BG_DURATION minutes)"
+echo "[INFO] Starting betaal_mutaties"
 pkill -f betaal_mutaties
-./manage.py betaal_mutaties --settings="$SETTINGS" $BG_DURATION &
+./manage.py betaal_mutaties --settings="$SETTINGS" --forever &
 
-echo "[INFO] Starting bestel_mutaties (runtime: $BG_DURATION minutes)"
+echo "[INFO] Starting bestel_mutaties"
 pkill -f bestel_mutaties
-./manage.py bestel_mutaties --settings="$SETTINGS" $BG_DURATION &
+./manage.py bestel_mutaties --settings="$SETTINGS" --forever &
 
-echo "[INFO] Starting competitie_mutaties (runtime: $BG_DURATION minutes)"
+echo "[INFO] Starting competitie_mutaties"
 pkill -f competitie_mutaties
-./manage.py competitie_mutaties --settings="$SETTINGS" $BG_DURATION &
+./manage.py competitie_mutaties --settings="$SETTINGS" --forever &
 
 echo "[INFO] Starting regiocomp_tussenstand (runtime: $BG_DURATION minutes)"
 pkill -f regiocomp_tussenstand
 ./manage.py regiocomp_tussenstand --settings="$SETTINGS" $BG_DURATION &
 
-echo "[INFO] Starting scheids_mutaties (runtime: $BG_DURATION minutes)"
+echo "[INFO] Starting scheids_mutaties"
 pkill -f scheids_mutaties
-./manage.py scheids_mutaties --settings="$SETTINGS" $BG_DURATION &
+./manage.py scheids_mutaties --settings="$SETTINGS" --forever &
 
 # wacht tot alle achtergrondtaken gestart zijn
 #sleep 0.8